@@ -0,0 +1,136 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { exec } from 'child_process';
+import { promisify } from 'util';
+import fs from 'fs';
+import path from 'path';
+import os from 'os';
+
+const execPromise = promisify(exec);
+
+// Helper function to determine if we're running in a Docker container
+const isRunningInDocker = () => {
+  try {
+    return fs.existsSync('/.dockerenv');
+  } catch {
+    return false;
+  }
+};
+
+// Helper function to determine the Python command to use
+const getPythonCommand = () => {
+  // First check if there's an environment variable set
+  if (process.env.PYTHON_PATH) {
+    return process.env.PYTHON_PATH;
+  }
+  
+  // Check the platform
+  const platform = os.platform();
+  if (platform === 'win32') {
+    // On Windows, try 'python' first
+    return 'python';
+  }
+  
+  // For other platforms (Linux, macOS), default to python3
+  return 'python3';
+};
+
+const OPERATIONS = ['summarize', 'quiz', 'flashcards', 'ask', 'collection'];
+
+// Run jobs_api.py, which only touches the job store, so it answers quickly
+// however long the job itself takes
+const runJobsApi = async (inputData: Record<string, unknown>) => {
+  const baseDir = isRunningInDocker() ? '/app' : process.cwd();
+
+  // Create unique temporary files to store input and output
+  const uniqueId = `${Date.now()}-${Math.floor(Math.random() * 1e7)}`;
+  const inputFile = path.join(baseDir, `temp_jobs_input_${uniqueId}.json`);
+  const outputFile = path.join(baseDir, `temp_jobs_output_${uniqueId}.json`);
+  fs.writeFileSync(inputFile, JSON.stringify(inputData));
+
+  const scriptPath = path.join(baseDir, 'jobs_api.py');
+  const command = `${getPythonCommand()} "${scriptPath}" "${inputFile}" "${outputFile}"`;
+  try {
+    await execPromise(command);
+  } catch (execError) {
+    // The script exits non-zero on errors but still writes them to the output file
+    console.error('Jobs script failed:', execError);
+  }
+
+  try {
+    if (!fs.existsSync(outputFile)) {
+      return { error: 'Failed to reach the job queue' };
+    }
+    return JSON.parse(fs.readFileSync(outputFile, 'utf-8'));
+  } finally {
+    // Clean up temporary files
+    for (const file of [inputFile, outputFile]) {
+      try {
+        if (fs.existsSync(file)) fs.unlinkSync(file);
+      } catch (e) {
+        console.error('Error cleaning up temporary files:', e);
+      }
+    }
+  }
+};
+
+// Submit a job: { operation, input } where input is what the operation's own
+// route would send to its Python script. Poll GET /api/jobs?id=<jobId> for the result.
+export async function POST(request: NextRequest) {
+  try {
+    const { operation, input = {} } = await request.json();
+
+    if (!OPERATIONS.includes(operation)) {
+      return NextResponse.json(
+        { error: `Operation must be one of ${OPERATIONS.join(', ')}` },
+        { status: 400 }
+      );
+    }
+
+    const outputData = await runJobsApi({ action: 'submit', operation, input });
+    if (outputData.error) {
+      return NextResponse.json({ error: outputData.error }, { status: 500 });
+    }
+    return NextResponse.json(
+      { jobId: outputData.job_id, operation: outputData.operation, state: outputData.state },
+      { status: 202 }
+    );
+  } catch (error) {
+    console.error('Error processing request:', error);
+    return NextResponse.json(
+      { error: (error as Error).message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
+
+export async function GET(request: NextRequest) {
+  try {
+    const jobId = request.nextUrl.searchParams.get('id');
+    if (!jobId) {
+      return NextResponse.json(
+        { error: 'A job ID is required' },
+        { status: 400 }
+      );
+    }
+
+    const outputData = await runJobsApi({ action: 'status', job_id: jobId });
+    if (outputData.error) {
+      const status = outputData.error_type === 'JobNotFound' ? 404 : 500;
+      return NextResponse.json({ error: outputData.error }, { status });
+    }
+    return NextResponse.json({
+      jobId: outputData.job_id,
+      operation: outputData.operation,
+      state: outputData.state,
+      attempts: outputData.attempts,
+      progress: outputData.progress,
+      result: outputData.result
+    });
+  } catch (error) {
+    console.error('Error processing request:', error);
+    return NextResponse.json(
+      { error: (error as Error).message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
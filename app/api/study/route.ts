@@ -0,0 +1,115 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { exec } from 'child_process';
+import { promisify } from 'util';
+import fs from 'fs';
+import path from 'path';
+import os from 'os';
+
+const execPromise = promisify(exec);
+
+// Helper function to determine if we're running in a Docker container
+const isRunningInDocker = () => {
+  try {
+    return fs.existsSync('/.dockerenv');
+  } catch {
+    return false;
+  }
+};
+
+// Helper function to determine the Python command to use
+const getPythonCommand = () => {
+  // First check if there's an environment variable set
+  if (process.env.PYTHON_PATH) {
+    return process.env.PYTHON_PATH;
+  }
+  
+  // Check the platform
+  const platform = os.platform();
+  if (platform === 'win32') {
+    // On Windows, try 'python' first
+    return 'python';
+  }
+  
+  // For other platforms (Linux, macOS), default to python3
+  return 'python3';
+};
+
+const ACTIONS = ['add', 'due', 'review', 'stats'];
+
+// Run srs_api.py, which reads and updates the user's deck on disk
+const runSrsApi = async (inputData: Record<string, unknown>) => {
+  const baseDir = isRunningInDocker() ? '/app' : process.cwd();
+
+  // Create unique temporary files to store input and output
+  const uniqueId = `${Date.now()}-${Math.floor(Math.random() * 1e7)}`;
+  const inputFile = path.join(baseDir, `temp_study_input_${uniqueId}.json`);
+  const outputFile = path.join(baseDir, `temp_study_output_${uniqueId}.json`);
+  fs.writeFileSync(inputFile, JSON.stringify(inputData));
+
+  const scriptPath = path.join(baseDir, 'srs_api.py');
+  const command = `${getPythonCommand()} "${scriptPath}" "${inputFile}" "${outputFile}"`;
+  try {
+    await execPromise(command);
+  } catch (execError) {
+    // The script exits non-zero on errors but still writes them to the output file
+    console.error('Study script failed:', execError);
+  }
+
+  try {
+    if (!fs.existsSync(outputFile)) {
+      return { error: 'Failed to reach the study deck' };
+    }
+    return JSON.parse(fs.readFileSync(outputFile, 'utf-8'));
+  } finally {
+    // Clean up temporary files
+    for (const file of [inputFile, outputFile]) {
+      try {
+        if (fs.existsSync(file)) fs.unlinkSync(file);
+      } catch (e) {
+        console.error('Error cleaning up temporary files:', e);
+      }
+    }
+  }
+};
+
+// Spaced-repetition reviews across every video a user studied:
+//   { userId, action: 'add', videoId, flashcards }
+//   { userId, action: 'due', limit }
+//   { userId, action: 'review', cardId, grade }   grade: 0-5 or again/hard/good/easy
+//   { userId, action: 'stats' }
+export async function POST(request: NextRequest) {
+  try {
+    const { userId, action = 'due', videoId, flashcards, limit, cardId, grade } = await request.json();
+
+    if (!userId) {
+      return NextResponse.json({ error: 'A user ID is required' }, { status: 400 });
+    }
+    if (!ACTIONS.includes(action)) {
+      return NextResponse.json(
+        { error: `Action must be one of ${ACTIONS.join(', ')}` },
+        { status: 400 }
+      );
+    }
+
+    const outputData = await runSrsApi({
+      user_id: userId,
+      action,
+      video_id: videoId,
+      flashcards,
+      limit,
+      card_id: cardId,
+      grade
+    });
+    if (outputData.error) {
+      const status = outputData.error_type === 'CardNotFound' ? 404 : 500;
+      return NextResponse.json({ error: outputData.error }, { status });
+    }
+    return NextResponse.json(outputData);
+  } catch (error) {
+    console.error('Error processing request:', error);
+    return NextResponse.json(
+      { error: (error as Error).message || 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
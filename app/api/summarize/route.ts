@@ -36,7 +36,7 @@ const getPythonCommand = () => {
 
 export async function POST(request: NextRequest) {
   try {
-    const { url, language = 'en' } = await request.json();
+    const { url, language = 'auto' } = await request.json();
     
     if (!url) {
       return NextResponse.json(
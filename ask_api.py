@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+from typing import Dict, Any
+from deadline import Deadline, DeadlineExceeded
+from rate_limiter import RateLimitedError
+from instrumentation import start_request, finish_request, span
+from transcript import get_video_id
+from qa_index import ask, DEFAULT_TOP_K
+import language_id
+import llm_backend
+import cost_ledger
+from cost_ledger import BudgetExceeded
+
+def setup_api_keys() -> None:
+    """
+    Set up API keys from .env file.
+    """
+    if os.path.exists(".env"):
+        with open(".env", "r") as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    try:
+                        key, value = line.strip().split("=", 1)
+                        os.environ[key] = value
+                    except ValueError:
+                        # Skip lines that don't have the format KEY=VALUE
+                        continue
+
+    # Configure the LLM backend
+    llm_backend.configure_backend()
+
+def process_api_request(input_file: str, output_file: str) -> None:
+    """
+    Process an API request from input file and write result to output file.
+
+    Args:
+        input_file: Path to JSON file with input data
+        output_file: Path to write output JSON data
+    """
+    start_request("ask")
+    try:
+        # Read input data
+        with open(input_file, 'r') as f:
+            input_data = json.load(f)
+
+        question = (input_data.get('question') or "").strip()
+        language = input_data.get('language', language_id.AUTO)
+        top_k = input_data.get('top_k', DEFAULT_TOP_K)
+        deadline = Deadline.from_input(input_data)
+
+        video_id = input_data.get('video_id')
+        if not video_id and input_data.get('url'):
+            video_id = get_video_id(input_data['url'])
+
+        if not video_id:
+            raise ValueError("A video URL or ID is required")
+        cost_ledger.set_video(video_id)
+        if not question:
+            raise ValueError("Question is required")
+
+        # Answer from the most relevant parts of the transcript
+        result = ask(video_id, question, language, top_k, deadline)
+
+        # Prepare output data
+        output_data: Dict[str, Any] = {
+            'video_id': video_id,
+            'question': question,
+            'answer': result['answer'],
+            'sources': result['sources'],
+        }
+
+        # Write output data
+        with span("write_output"):
+            with open(output_file, 'w') as f:
+                json.dump(output_data, f)
+
+    except Exception as e:
+        # Write error to output file
+        error_data = {'error': str(e)}
+        if isinstance(e, DeadlineExceeded):
+            error_data['error_type'] = "DeadlineExceeded"
+            error_data['progress'] = e.progress
+        elif isinstance(e, RateLimitedError):
+            error_data['error'] = "YouTube is temporarily limiting our requests. Please try again in a few minutes."
+            error_data['error_type'] = "RateLimited"
+        elif isinstance(e, BudgetExceeded):
+            error_data['error_type'] = "BudgetExceeded"
+        with open(output_file, 'w') as f:
+            json.dump(error_data, f)
+        raise
+    finally:
+        finish_request()
+
+def main():
+    """
+    Main function to handle API requests.
+    """
+    if len(sys.argv) != 3:
+        print("Usage: python ask_api.py <input_file> <output_file>")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    # Set up API keys
+    setup_api_keys()
+
+    # Process the request
+    process_api_request(input_file, output_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+Offline benchmark suite: replays recorded YouTube and Gemini traffic from a
+local stand-in server. Run with ``python -m benchmarks.run``.
+"""
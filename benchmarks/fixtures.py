@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import random
+from typing import Dict, Any, List, Optional
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+# Transcript sizes covered by the suite, in minutes of video
+SIZES = {
+    "1min": 1,
+    "10min": 10,
+    "1h": 60,
+    "10h": 600,
+}
+
+# Speech is roughly 150 words per minute; YouTube emits a caption event every few seconds
+WORDS_PER_MINUTE = 150
+EVENT_DURATION_MS = 3000
+
+WORDS = (
+    "the of and to in is that it for you was with on as have but be they this at from "
+    "video data model system people time because really going about think first well "
+    "database server query index cache request response latency throughput memory "
+    "learning example important question answer different problem result simple"
+).split()
+
+def synthetic_video_id(minutes: int) -> str:
+    return f"bench-{minutes}m"
+
+def minutes_for_video_id(video_id: str) -> int:
+    """
+    Size encoded in a synthetic video ID ("bench-60m" -> 60). Unknown IDs get one minute.
+    """
+    match = re.search(r"-(\d+)m$", video_id)
+    return int(match.group(1)) if match else 1
+
+def _word_stream(minutes: int) -> List[List[str]]:
+    """
+    Deterministic caption lines, one list of words per caption event.
+    """
+    rng = random.Random(minutes)
+    words_per_event = WORDS_PER_MINUTE * EVENT_DURATION_MS // 60000
+    num_events = minutes * 60000 // EVENT_DURATION_MS
+    return [[rng.choice(WORDS) for _ in range(words_per_event)] for _ in range(num_events)]
+
+def make_json3(minutes: int) -> Dict[str, Any]:
+    """
+    A json3 caption payload shaped like YouTube's auto-generated tracks.
+    """
+    events: List[Dict[str, Any]] = [{
+        "tStartMs": 0,
+        "dDurationMs": minutes * 60000,
+        "id": 1,
+        "wpWinPosId": 1,
+        "wsWinStyleId": 1,
+    }]
+    for i, line in enumerate(_word_stream(minutes)):
+        start = i * EVENT_DURATION_MS
+        segs = [{"utf8": line[0], "acAsrConf": 0}]
+        for j, word in enumerate(line[1:], start=1):
+            segs.append({"utf8": f" {word}", "tOffsetMs": j * 300, "acAsrConf": 0})
+        events.append({"tStartMs": start, "dDurationMs": EVENT_DURATION_MS, "wWinId": 1, "segs": segs})
+        events.append({"tStartMs": start + EVENT_DURATION_MS - 10, "dDurationMs": 10, "wWinId": 1, "aAppend": 1, "segs": [{"utf8": "\n"}]})
+    return {
+        "wireMagic": "pb3",
+        "pens": [{}],
+        "wsWinStyles": [{}, {"mhModeHint": 2, "juJustifCode": 0, "sdScrollDir": 3}],
+        "wpWinPositions": [{}, {"apPoint": 6, "ahHorPos": 20, "avVerPos": 100, "rcRows": 2, "ccCols": 40}],
+        "events": events,
+    }
+
+def make_transcript_entries(minutes: int) -> List[Dict[str, Any]]:
+    """
+    What youtube_transcript_api.get_transcript returns for the same video.
+    """
+    return [
+        {"text": " ".join(line), "start": i * EVENT_DURATION_MS / 1000, "duration": EVENT_DURATION_MS / 1000}
+        for i, line in enumerate(_word_stream(minutes))
+    ]
+
+def make_watch_page(video_id: str, base_url: str, with_captions: bool = True) -> str:
+    """
+    A minimal watch page with the player response fields the fetchers look for.
+    """
+    tracks = []
+    if with_captions:
+        tracks = [{
+            "baseUrl": f"{base_url}/api/timedtext?v={video_id}&lang=en&kind=asr",
+            "name": {"simpleText": "English (auto-generated)"},
+            "vssId": "a.en",
+            "languageCode": "en",
+            "kind": "asr",
+            "isTranslatable": True,
+        }]
+    player_response = {
+        "videoDetails": {
+            "videoId": video_id,
+            "title": f"Benchmark video {video_id}",
+            "lengthSeconds": str(minutes_for_video_id(video_id) * 60),
+            "author": "Benchmark Channel",
+        },
+        "captions": {"playerCaptionsTracklistRenderer": {"captionTracks": tracks}},
+    }
+    return (
+        "<!DOCTYPE html><html><head><title>Benchmark</title></head><body>"
+        f'<script>ytcfg.set({{"INNERTUBE_API_KEY": "bench-key", "INNERTUBE_CLIENT_VERSION": "2.20240227.01.00"}});</script>'
+        f"<script>var ytInitialPlayerResponse = {json.dumps(player_response)};</script>"
+        "</body></html>"
+    )
+
+def make_innertube_response(minutes: int) -> Dict[str, Any]:
+    """
+    A youtubei/v1/get_transcript response with one segment per caption line.
+    """
+    segments = [
+        {"transcriptSegmentRenderer": {
+            "startMs": str(i * EVENT_DURATION_MS),
+            "endMs": str((i + 1) * EVENT_DURATION_MS),
+            "snippet": {"runs": [{"text": " ".join(line)}]},
+        }}
+        for i, line in enumerate(_word_stream(minutes))
+    ]
+    return {"actions": [{"updateEngagementPanelAction": {"content": {"transcriptRenderer": {"content": {
+        "transcriptSearchPanelRenderer": {"body": {"transcriptSegmentListRenderer": {"initialSegments": segments}}}
+    }}}}}]}
+
+def make_summary() -> str:
+    return (
+        "-Benchmark Video Overview\n"
+        "-A short introduction to the material covered in the video.\n"
+        "-The main points: caching, indexing and request latency, with examples.\n"
+        "-Final conclusion summarising the key takeaways."
+    )
+
+def make_quiz_response(num_questions: int) -> str:
+    questions = [
+        {
+            "question": f"Benchmark question {i + 1}?",
+            "options": [f"Option {c}" for c in "ABCD"],
+            "correctAnswer": i % 4,
+        }
+        for i in range(num_questions)
+    ]
+    # Models like to wrap JSON in a code fence; the parsers have to cope with that
+    return "```json\n" + json.dumps(questions, indent=2) + "\n```"
+
+def make_flashcards_response(num_cards: int) -> str:
+    cards = [{"front": f"What is concept {i + 1}?", "back": f"Concept {i + 1} explained."} for i in range(num_cards)]
+    return "```json\n" + json.dumps(cards, indent=2) + "\n```"
+
+def canned_llm_response(prompt: str) -> str:
+    """
+    Pick the canned response matching the operation a prompt belongs to.
+    """
+    count = re.search(r"\b(\d+)\s+(quiz questions|flashcards)", prompt)
+    num = int(count.group(1)) if count else 5
+    if "quiz questions" in prompt:
+        return make_quiz_response(num)
+    if "flashcards" in prompt:
+        return make_flashcards_response(num)
+    if "EXCERPTS:" in prompt:
+        return "The speaker says a cache in front of the database cuts query latency [1:30]."
+    if "TRANSCRIPT PART:" in prompt:
+        return "- A cache in front of the database cuts query latency.\n- Invalidation is the hard part."
+    if "CHAPTER TRANSCRIPT:" in prompt:
+        return "TITLE: Caching and query latency\nSUMMARY: The speaker explains how a cache in front of the database cuts query latency."
+    return make_summary()
+
+def load_recording(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a recorded video (watch page, json3 captions, innertube response) if one exists.
+    """
+    directory = os.path.join(RECORDINGS_DIR, name)
+    if not os.path.isdir(directory):
+        return None
+    recording: Dict[str, Any] = {}
+    for key, filename in (("watch", "watch.html"), ("json3", "captions.json3"), ("innertube", "innertube.json")):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                recording[key] = f.read()
+    return recording
+
+def record(video_id: str, language: str = "en") -> str:
+    """
+    Record a real video's watch page and json3 captions into benchmarks/recordings/<video_id>.
+
+    Needs network access; the benchmarks themselves never do.
+    """
+    import requests
+    from transcript import USER_AGENTS
+
+    headers = {"User-Agent": USER_AGENTS[0], "Accept-Language": "en-US,en;q=0.9"}
+    directory = os.path.join(RECORDINGS_DIR, video_id)
+    os.makedirs(directory, exist_ok=True)
+
+    page = requests.get(f"https://www.youtube.com/watch?v={video_id}", headers=headers, timeout=30)
+    page.raise_for_status()
+    with open(os.path.join(directory, "watch.html"), "w", encoding="utf-8") as f:
+        f.write(page.text)
+
+    match = re.search(r'"captionTracks":\s*(\[.+?\])', page.text)
+    if match:
+        tracks = json.loads(match.group(1))
+        track = next((t for t in tracks if t.get("languageCode") == language), tracks[0] if tracks else None)
+        if track:
+            captions = requests.get(track["baseUrl"] + "&fmt=json3", headers=headers, timeout=30)
+            captions.raise_for_status()
+            with open(os.path.join(directory, "captions.json3"), "w", encoding="utf-8") as f:
+                f.write(captions.text)
+    return directory
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.fixtures <video_id> [language]")
+        sys.exit(1)
+    print(f"Recorded into {record(*sys.argv[1:3])}")
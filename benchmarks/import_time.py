@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, Any, List, Tuple
+
+from benchmarks.run import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Every script the Next.js routes and the job worker spawn once per request
+ENTRY_POINTS = ("summarize_api", "quiz_api", "flashcards_api", "ask_api", "collection_api", "srs_api", "jobs_api")
+
+# Cold-start budget per entry point, in milliseconds of import time. Each worker
+# process pays this before it reads its input, so keep heavy SDKs behind first use.
+DEFAULT_BUDGET_MS = 60.0
+
+def measure_import(module: str) -> Tuple[float, Dict[str, Tuple[float, float]]]:
+    """
+    Import a module in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        The module's cumulative import time in ms, and {module: (self_ms, cumulative_ms)}
+        for everything it pulled in
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # Deployed workers import from the bytecode cache; without it every run recompiles the repo
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings: Dict[str, Tuple[float, float]] = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(own) / 1000, int(cumulative) / 1000)
+    return timings[module][1], timings
+
+def report_module(module: str, runs: int, top: int) -> Dict[str, Any]:
+    totals: List[float] = []
+    fastest: Dict[str, Tuple[float, float]] = {}
+    # Warm-up: a first import after a change also compiles and writes the bytecode cache
+    measure_import(module)
+    for _ in range(runs):
+        total, timings = measure_import(module)
+        totals.append(total)
+        # Keep the fastest run of each import to filter out scheduling noise
+        for name, timing in timings.items():
+            if name not in fastest or timing[1] < fastest[name][1]:
+                fastest[name] = timing
+    totals.sort()
+    heaviest = sorted(fastest.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        "median_ms": round(percentile(totals, 50), 2),
+        "min_ms": round(totals[0], 2),
+        "max_ms": round(totals[-1], 2),
+        "heaviest_imports": [
+            {"module": name, "self_ms": round(own, 2), "cumulative_ms": round(cumulative, 2)}
+            for name, (own, cumulative) in heaviest
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the API entry points")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Modules to import (default: the entry points)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="How many of the heaviest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Fail when a median exceeds this")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {}
+    over_budget = []
+    for module in args.modules:
+        result = report_module(module, args.runs, args.top)
+        report[module] = result
+        print(f"{module:20s} median {result['median_ms']:>8.2f}ms  (min {result['min_ms']:.2f}, max {result['max_ms']:.2f})")
+        for row in result["heaviest_imports"]:
+            print(f"    {row['module']:40s} self {row['self_ms']:>8.2f}ms  cumulative {row['cumulative_ms']:>8.2f}ms")
+        if result["median_ms"] > args.budget_ms:
+            over_budget.append(f"{module}: {result['median_ms']:.2f}ms > {args.budget_ms:.0f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if over_budget:
+        print(f"\n{len(over_budget)} entry point(s) over the import budget:")
+        for line in over_budget:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nAll entry points within the {args.budget_ms:.0f}ms import budget")
+
+if __name__ == "__main__":
+    main()
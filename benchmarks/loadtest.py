@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from benchmarks import fixtures
+from benchmarks.run import percentile
+from benchmarks.stub_server import start_stand_in_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_OPERATION_MIX = "summarize:0.5,ask:0.1,quiz:0.2,flashcards:0.2"
+DEFAULT_VIDEO_MIX = "1min:0.4,10min:0.4,1h:0.15,nocaptions:0.05"
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """
+    Parse "a:0.5,b:0.5" into [("a", 0.5), ("b", 0.5)].
+    """
+    mix = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition(":")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+def pick(mix: List[Tuple[str, float]], rng: random.Random) -> str:
+    return rng.choices([name for name, _ in mix], weights=[weight for _, weight in mix])[0]
+
+def video_url(kind: str) -> str:
+    """
+    Stand-in video for a mix entry: a size from fixtures.SIZES, or "nocaptions".
+    """
+    if kind == "nocaptions":
+        # No caption tracks and no innertube fallback outside Render: a NoTranscriptAvailable path
+        return "https://www.youtube.com/watch?v=nocap-video"
+    return f"https://www.youtube.com/watch?v={fixtures.synthetic_video_id(fixtures.SIZES[kind])}"
+
+class LoadTest:
+    """
+    Drives the API entry points as separate worker processes, like the Next.js routes do.
+    """
+    def __init__(self, args, base_url: str, work_dir: str):
+        self.args = args
+        self.base_url = base_url
+        self.work_dir = work_dir
+        self.operation_mix = parse_mix(args.operations)
+        self.video_mix = parse_mix(args.videos)
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.results: List[Dict[str, Any]] = []
+        self.results_lock = threading.Lock()
+        self.counter = 0
+        self.env = dict(
+            os.environ,
+            YOUTUBE_BASE_URL=base_url,
+            LLM_BACKEND="stub",
+            LLM_STUB_LATENCY=str(args.llm_latency),
+            LLM_STUB_TOKENS_PER_SECOND=str(args.llm_tokens_per_second),
+            YOUTUBE_RATE_STATE_FILE=os.path.join(work_dir, "rate_state.json"),
+            TRANSCRIPT_CACHE_DIR=os.path.join(work_dir, "transcripts"),
+            SUMMIFY_COST_LEDGER=os.path.join(work_dir, "cost_ledger.jsonl"),
+            LOADTEST_RATE_LIMITS="1" if args.rate_limits else "0",
+            PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        )
+
+    def _next_request(self) -> Tuple[int, str, Dict[str, Any]]:
+        with self.rng_lock:
+            self.counter += 1
+            operation = pick(self.operation_mix, self.rng)
+            video = pick(self.video_mix, self.rng)
+        if operation == "summarize":
+            payload = {"url": video_url(video), "language": "en"}
+        elif operation == "ask":
+            payload = {"url": video_url(video), "question": "How does the cache change query latency?"}
+        elif operation == "quiz":
+            payload = {"summary": fixtures.make_summary(), "num_questions": 5}
+        else:
+            payload = {"summary": fixtures.make_summary(), "num_cards": 10}
+        return self.counter, operation, payload
+
+    def _paths(self, request_number: int, operation: str) -> Tuple[str, str]:
+        if self.args.shared_files and operation == "summarize":
+            # What app/api/summarize/route.ts does: one input and one output file for everyone
+            return os.path.join(self.work_dir, "temp_input.json"), os.path.join(self.work_dir, "temp_output.json")
+        return (
+            os.path.join(self.work_dir, f"{operation}_{request_number}_input.json"),
+            os.path.join(self.work_dir, f"{operation}_{request_number}_output.json"),
+        )
+
+    def run_one(self, scheduled_at: float) -> None:
+        request_number, operation, payload = self._next_request()
+        input_file, output_file = self._paths(request_number, operation)
+        with open(input_file, "w") as f:
+            json.dump(payload, f)
+
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.replay_worker", operation, input_file, output_file],
+            cwd=self.work_dir,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        cpu_seconds, max_rss_mb = None, None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            cpu_seconds = usage.ru_utime + usage.ru_stime
+            # ru_maxrss is in KB on Linux and bytes on macOS
+            max_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+        finished = time.perf_counter()
+
+        outcome = self._classify(operation, payload, output_file, process.returncode)
+        with self.results_lock:
+            self.results.append({
+                "operation": operation,
+                "outcome": outcome,
+                # Measured from the scheduled arrival so queueing behind busy workers counts
+                "latency": finished - scheduled_at,
+                "service_time": finished - started,
+                "cpu_seconds": cpu_seconds,
+                "max_rss_mb": max_rss_mb,
+            })
+
+    @staticmethod
+    def _classify(operation: str, payload: Dict[str, Any], output_file: str, returncode: int) -> str:
+        try:
+            with open(output_file, "r") as f:
+                output = json.load(f)
+        except (OSError, ValueError):
+            return "WorkerCrashed" if returncode else "MissingOutput"
+        if "error" in output:
+            return output.get("error_type") or "Error"
+        if operation == "summarize":
+            # With shared files another request can overwrite our output
+            expected = payload["url"].split("v=")[-1]
+            if output.get("video_id") != expected:
+                return "MismatchedOutput"
+        return "ok"
+
+    def run(self) -> float:
+        """
+        Generate load until the request count or duration is reached. Returns elapsed seconds.
+        """
+        args = self.args
+        started = time.perf_counter()
+        deadline = started + args.duration if args.duration else None
+
+        def more() -> bool:
+            if args.requests and self.counter >= args.requests:
+                return False
+            return deadline is None or time.perf_counter() < deadline
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            if args.rate > 0:
+                # Open loop: Poisson arrivals, requests queue when every worker is busy
+                next_arrival = time.perf_counter()
+                submitted = 0
+                while more() and (not args.requests or submitted < args.requests):
+                    now = time.perf_counter()
+                    if next_arrival > now:
+                        time.sleep(next_arrival - now)
+                    pool.submit(self.run_one, next_arrival)
+                    submitted += 1
+                    with self.rng_lock:
+                        next_arrival += self.rng.expovariate(args.rate)
+            else:
+                # Closed loop: each worker sends its next request as soon as the last one finishes.
+                # Requests are counted when claimed, not when sent, so workers never overshoot --requests
+                claimed = [0]
+                claim_lock = threading.Lock()
+
+                def claim() -> bool:
+                    with claim_lock:
+                        if not more() or (args.requests and claimed[0] >= args.requests):
+                            return False
+                        claimed[0] += 1
+                        return True
+
+                def worker():
+                    while claim():
+                        self.run_one(time.perf_counter())
+                for _ in range(args.concurrency):
+                    pool.submit(worker)
+        return time.perf_counter() - started
+
+def summarize_results(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    def latency_stats(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+        values = sorted(row["latency"] for row in rows)
+        return {
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+        }
+
+    outcomes: Dict[str, int] = {}
+    for row in results:
+        outcomes[row["outcome"]] = outcomes.get(row["outcome"], 0) + 1
+
+    per_operation = {}
+    for operation in sorted({row["operation"] for row in results}):
+        rows = [row for row in results if row["operation"] == operation]
+        per_operation[operation] = dict(requests=len(rows), **latency_stats(rows))
+
+    cpu = [row["cpu_seconds"] for row in results if row["cpu_seconds"] is not None]
+    rss = [row["max_rss_mb"] for row in results if row["max_rss_mb"] is not None]
+    ok = outcomes.get("ok", 0)
+    return {
+        "requests": len(results),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_per_s": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "success_per_s": round(ok / elapsed, 3) if elapsed else 0.0,
+        "latency": latency_stats(results) if results else {},
+        "per_operation": per_operation,
+        "outcomes": outcomes,
+        "worker_cpu_seconds": {
+            "mean": round(sum(cpu) / len(cpu), 3),
+            "max": round(max(cpu), 3),
+        } if cpu else None,
+        "worker_max_rss_mb": {
+            "mean": round(sum(rss) / len(rss), 1),
+            "max": round(max(rss), 1),
+        } if rss else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API workers against local stand-ins")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker processes running at once")
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrivals per second (Poisson); 0 runs a closed loop")
+    parser.add_argument("--requests", type=int, default=100, help="Stop after this many requests (0: no limit)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Stop after this many seconds (0: no limit)")
+    parser.add_argument("--operations", default=DEFAULT_OPERATION_MIX, help="Operation mix, e.g. summarize:0.6,quiz:0.4")
+    parser.add_argument("--videos", default=DEFAULT_VIDEO_MIX, help=f"Video mix over {', '.join(fixtures.SIZES)} and nocaptions")
+    parser.add_argument("--youtube-latency", type=float, default=0.05, help="Stand-in YouTube latency per response (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM time to first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0, help="Stub LLM output throughput")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the YouTube rate limiter active")
+    parser.add_argument("--shared-files", action="store_true", help="Reuse one input/output file for summarize, like the Next.js route")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        parser.error("Set --requests or --duration")
+    for name, _ in parse_mix(args.videos):
+        if name != "nocaptions" and name not in fixtures.SIZES:
+            parser.error(f"Unknown video kind '{name}'")
+
+    server, base_url = start_stand_in_server(args.youtube_latency)
+    work_dir = tempfile.mkdtemp(prefix="summify-load-")
+    try:
+        test = LoadTest(args, base_url, work_dir)
+        elapsed = test.run()
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = summarize_results(test.results, elapsed)
+    report["config"] = vars(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+from typing import Optional
+
+import requests
+
+import llm_backend
+from llm_backend import LLMBackend, LLMResult
+
+class ReplayTrack:
+    """
+    The stand-in server's one caption track, fetched like youtube_transcript_api's Transcript.
+    """
+    language_code = "en"
+    language = "English"
+    is_generated = False
+    is_translatable = False
+    translation_languages = []
+
+    def __init__(self, base_url: str, video_id: str):
+        self.base_url = base_url
+        self.video_id = video_id
+
+    def fetch(self):
+        response = requests.get(f"{self.base_url}/transcript_api", params={"v": self.video_id}, timeout=30)
+        if response.status_code == 404:
+            # Same wording as youtube_transcript_api's TranscriptsDisabled
+            raise Exception(f"Subtitles are disabled for this video ({self.video_id})")
+        response.raise_for_status()
+        return response.json()
+
+class ReplayTranscriptApi:
+    """
+    Stands in for YouTubeTranscriptApi (0.6 interface), fetching entries from the stand-in server.
+    """
+    base_url = ""
+
+    @classmethod
+    def list_transcripts(cls, video_id):
+        return [ReplayTrack(cls.base_url, video_id)]
+
+class ReplayBackend(LLMBackend):
+    """
+    LLM backend answering from the stand-in server's canned responses.
+    """
+    name = "replay"
+    billed = False
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def generate(self, prompt, model, temperature=None, max_output_tokens=None, timeout=None) -> LLMResult:
+        response = requests.post(f"{self.base_url}/llm/generate", json={"model": model, "prompt": prompt}, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        return LLMResult(data["text"], model, data["usage"]["prompt_token_count"], data["usage"]["candidates_token_count"])
+
+def install_replay(base_url: str, backend: Optional[LLMBackend] = None, rate_limits: bool = False) -> None:
+    """
+    Point transcript fetching and LLM calls at the stand-in server.
+
+    Args:
+        base_url: Base URL of the stand-in server
+        backend: LLM backend to use instead of replaying canned responses
+        rate_limits: Keep the configured YouTube rate limits instead of lifting them
+    """
+    import transcript
+    from rate_limiter import HostRateLimiter, MemoryStateStore
+
+    ReplayTranscriptApi.base_url = base_url
+    transcript.YOUTUBE_BASE_URL = base_url
+    transcript.YouTubeTranscriptApi = ReplayTranscriptApi
+    if not rate_limits:
+        # The limiter protects us from YouTube, not from our own stand-in
+        transcript.rate_limiter = HostRateLimiter(MemoryStateStore(), requests_per_minute=10 ** 9, burst=10 ** 9)
+    # Skip the render fallback's courtesy pause between approaches
+    transcript.time = SimpleNamespace(sleep=lambda seconds: None)
+
+    llm_backend.set_backend(backend or ReplayBackend(base_url))
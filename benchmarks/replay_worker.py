@@ -0,0 +1,39 @@
+"""
+Run one API entry point against the stand-in server, as a worker process would.
+
+Usage: python -m benchmarks.replay_worker <summarize|quiz|flashcards|ask> <input_file> <output_file>
+
+The stand-in server's URL comes from YOUTUBE_BASE_URL; the LLM backend is
+whatever LLM_BACKEND selects (the load generator uses the stub backend).
+"""
+import os
+import sys
+import importlib
+
+ENTRY_POINTS = {
+    "summarize": "summarize_api",
+    "quiz": "quiz_api",
+    "flashcards": "flashcards_api",
+    "ask": "ask_api",
+}
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in ENTRY_POINTS:
+        print(f"Usage: python -m benchmarks.replay_worker <{'|'.join(ENTRY_POINTS)}> <input_file> <output_file>")
+        sys.exit(1)
+
+    import llm_backend
+    from benchmarks.replay import install_replay
+
+    install_replay(
+        os.environ["YOUTUBE_BASE_URL"],
+        backend=llm_backend.get_backend(),
+        rate_limits=os.environ.get("LOADTEST_RATE_LIMITS") == "1",
+    )
+    module = importlib.import_module(ENTRY_POINTS[sys.argv[1]])
+    # Same argv shape as the real entry points
+    sys.argv = [module.__file__, sys.argv[2], sys.argv[3]]
+    module.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import os
+import io
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import statistics
+import logging
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from typing import Dict, Any, List, Callable
+
+from benchmarks import fixtures
+from benchmarks.replay import install_replay
+from benchmarks.stub_server import start_stand_in_server
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = "bench_output.json"
+
+# A case is a regression when it gets this much slower (p50) or hungrier (peak memory)
+DEFAULT_TOLERANCE = 0.25
+
+# Timings are only comparable on the same host and load, so a fixed workload is
+# timed before every case and the runs are compared relative to it: a baseline
+# recorded on a faster (or quieter) machine is scaled up by how much faster
+# that machine ran the workload. The median over all cases is used, as one
+# short timing is as noisy as the cases themselves.
+CALIBRATION_SEGMENTS = 500
+CALIBRATION_TIME = 0.2
+# Differences this small are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.25
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100) - 1))
+    return sorted_values[rank]
+
+def measure(func: Callable[[], Any], min_time: float, min_iterations: int, max_iterations: int) -> Dict[str, Any]:
+    """
+    Time repeated calls of func, then run it once more under tracemalloc for peak memory.
+    """
+    func()  # warm-up: import caches, connection pools, lru caches in the stand-in server
+
+    latencies: List[float] = []
+    started = time.perf_counter()
+    while len(latencies) < max_iterations and (
+        len(latencies) < min_iterations or time.perf_counter() - started < min_time
+    ):
+        t0 = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+
+    # Memory is measured separately so tracing overhead doesn't skew the timings
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": len(latencies),
+        "throughput_per_s": round(len(latencies) / total, 3) if total else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+        },
+        "peak_memory_bytes": peak,
+    }
+
+def calibration_workload() -> None:
+    """
+    A fixed mix of the work the cases do (JSON, regexes, sorting strings) that never changes with the code.
+    """
+    payload = json.dumps([
+        {"start": i * 3.0, "text": " ".join(fixtures.WORDS[i % 40:i % 40 + 8])} for i in range(CALIBRATION_SEGMENTS)
+    ])
+    segments = json.loads(payload)
+    sorted(segment["text"] for segment in segments)
+    sum(len(re.findall(r"\w+", segment["text"])) for segment in segments)
+
+def host_info() -> Dict[str, Any]:
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+def build_cases(sizes: List[str], work_dir: str) -> Dict[str, Callable[[], Any]]:
+    import transcript
+    import chapters
+    import qa_index
+    import summarize_api
+    import quiz_api
+    import flashcards_api
+    import transcript_archive
+    import transcript_cache
+
+    cases: Dict[str, Callable[[], Any]] = {}
+
+    for size in sizes:
+        minutes = fixtures.SIZES[size]
+        video_id = fixtures.synthetic_video_id(minutes)
+        json3_payload = json.dumps(fixtures.make_json3(minutes))
+
+        cases[f"json3_parse[{size}]"] = lambda payload=json3_payload: transcript.parse_json3_captions(json.loads(payload))
+        json3_bytes = json3_payload.encode("utf-8")
+        cases[f"json3_stream_parse[{size}]"] = lambda payload=json3_bytes: list(transcript.iter_json3_segments(
+            payload[i:i + transcript.JSON3_STREAM_CHUNK_BYTES] for i in range(0, len(payload), transcript.JSON3_STREAM_CHUNK_BYTES)
+        ))
+        segments = transcript.parse_json3_segments(json.loads(json3_payload))
+        # Reading a cached transcript: one JSON file per video versus the memory-mapped archive
+        json_path = os.path.join(work_dir, f"segments_{size}.json")
+        with open(json_path, "w") as f:
+            json.dump({"segments": segments}, f)
+        cases[f"transcript_cache_json_load[{size}]"] = lambda path=json_path: transcript_cache.read_json(path)["segments"]
+        archive = transcript_archive.TranscriptArchive(os.path.join(work_dir, f"transcripts_{size}.archive"))
+        archive.append(video_id, "en", segments)
+        cases[f"transcript_archive_get[{size}]"] = lambda a=archive, vid=video_id: a.get(vid, "en")
+        cases[f"chapters_segment[{size}]"] = lambda segs=segments: chapters.find_chapters(segs)
+        cases[f"qa_index_build[{size}]"] = lambda segs=segments: qa_index.build_index(segs)
+        index = qa_index.build_index(segments)
+        cases[f"qa_search[{size}]"] = lambda idx=index: qa_index.search(idx, "how does the cache change query latency")
+        cases[f"get_transcript[{size}]"] = lambda vid=video_id: transcript.get_transcript(vid, "en")
+        cases[f"get_transcript.alternative[{size}]"] = lambda vid=video_id: transcript.get_transcript_from_alternative(vid, "en")
+        cases[f"get_transcript.innertube[{size}]"] = lambda vid=f"nocap-{video_id}": transcript.get_transcript_render_fallback(vid, "en")
+
+        input_file = os.path.join(work_dir, f"summarize_{size}_input.json")
+        output_file = os.path.join(work_dir, f"summarize_{size}_output.json")
+        with open(input_file, "w") as f:
+            json.dump({"url": f"https://www.youtube.com/watch?v={video_id}", "language": "en"}, f)
+        cases[f"summarize_orchestration[{size}]"] = (
+            lambda i=input_file, o=output_file: summarize_api.process_api_request(i, o)
+        )
+
+    # Recorded videos replay as they were captured, whatever their length
+    if os.path.isdir(fixtures.RECORDINGS_DIR):
+        for video_id in sorted(os.listdir(fixtures.RECORDINGS_DIR)):
+            recording = fixtures.load_recording(video_id)
+            if recording and "json3" in recording:
+                cases[f"json3_parse[rec:{video_id}]"] = lambda payload=recording["json3"]: transcript.parse_json3_captions(json.loads(payload))
+                cases[f"get_transcript.alternative[rec:{video_id}]"] = lambda vid=video_id: transcript.get_transcript_from_alternative(vid, "en")
+
+    summary = fixtures.make_summary()
+    for count in (5, 50):
+        cases[f"quiz_postprocess[{count}]"] = lambda n=count: quiz_api.generate_quiz_questions(summary, n)
+        cases[f"flashcards_postprocess[{count}]"] = lambda n=count: flashcards_api.generate_flashcards(summary, n)
+
+    return cases
+
+def calibration_ms(results: Dict[str, Any]) -> float:
+    return statistics.median(result["calibration_ms"] for result in results.values())
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    List the cases that regressed against the baseline. Baseline timings are
+    first scaled by the ratio of the two runs' calibration timings.
+    """
+    regressions = []
+    common = [case for case in results if case in baseline]
+    if not common:
+        return regressions
+    scale = (calibration_ms({case: results[case] for case in common})
+             / calibration_ms({case: baseline[case] for case in common}))
+    for case in common:
+        current, previous = results[case], baseline[case]
+        p50_now, p50_then = current["latency_ms"]["p50"], previous["latency_ms"]["p50"] * scale
+        if p50_then and p50_now > p50_then * (1 + tolerance) and p50_now - p50_then > MIN_REGRESSION_MS:
+            regressions.append(f"{case}: p50 {p50_then:.2f}ms (scaled by {scale:.2f}) -> {p50_now:.2f}ms")
+        mem_now, mem_then = current["peak_memory_bytes"], previous["peak_memory_bytes"]
+        if mem_then and mem_now > mem_then * (1 + tolerance):
+            regressions.append(f"{case}: peak memory {mem_then / 1e6:.1f}MB -> {mem_now / 1e6:.1f}MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--sizes", default=",".join(fixtures.SIZES), help=f"Comma-separated transcript sizes ({', '.join(fixtures.SIZES)})")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum seconds to spend timing each case")
+    parser.add_argument("--min-iterations", type=int, default=3)
+    parser.add_argument("--max-iterations", type=int, default=200)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in fixtures.SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(unknown)}")
+    if args.update_baseline and (args.filter or set(sizes) != set(fixtures.SIZES)):
+        parser.error("--update-baseline records the whole suite; drop --sizes and --filter")
+
+    # Keep the per-request INFO logging out of the measurements and the report
+    logging.disable(logging.INFO)
+    # Measure fetching, not the transcript cache
+    os.environ["TRANSCRIPT_CACHE_DIR"] = ""
+    # Keep benchmark calls out of the real cost ledger and its budgets
+    os.environ["SUMMIFY_COST_LEDGER"] = ""
+
+    server, base_url = start_stand_in_server()
+    install_replay(base_url)
+    work_dir = tempfile.mkdtemp(prefix="summify-bench-")
+
+    results: Dict[str, Any] = {}
+    try:
+        for name, func in build_cases(sizes, work_dir).items():
+            if args.filter and args.filter not in name:
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):
+                calibration = measure(calibration_workload, CALIBRATION_TIME, args.min_iterations, args.max_iterations)
+                result = measure(func, args.min_time, args.min_iterations, args.max_iterations)
+            result["calibration_ms"] = calibration["latency_ms"]["p50"]
+            results[name] = result
+            print(
+                f"{name:45s} {result['throughput_per_s']:>10.2f}/s  "
+                f"p50 {result['latency_ms']['p50']:>10.2f}ms  p99 {result['latency_ms']['p99']:>10.2f}ms  "
+                f"peak {result['peak_memory_bytes'] / 1e6:>8.2f}MB"
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "host": host_info(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --update-baseline to store one")
+        return
+
+    with open(args.baseline, "r") as f:
+        baseline_report = json.load(f)
+    baseline = baseline_report.get("results", {})
+    if any("calibration_ms" not in case for case in baseline.values()):
+        print("The baseline has no calibration timings to scale it to this host; regenerate it with --update-baseline")
+        sys.exit(1)
+    if baseline_report.get("meta", {}).get("host") != host_info():
+        print("The baseline was recorded on another host; its timings are scaled by the calibration workload")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
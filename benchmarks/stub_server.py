@@ -0,0 +1,113 @@
+import json
+import time
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Tuple
+
+from benchmarks import fixtures
+
+@lru_cache(maxsize=32)
+def _json3_body(minutes: int) -> bytes:
+    return json.dumps(fixtures.make_json3(minutes)).encode("utf-8")
+
+@lru_cache(maxsize=32)
+def _innertube_body(minutes: int) -> bytes:
+    return json.dumps(fixtures.make_innertube_response(minutes)).encode("utf-8")
+
+@lru_cache(maxsize=32)
+def _transcript_entries_body(minutes: int) -> bytes:
+    return json.dumps(fixtures.make_transcript_entries(minutes)).encode("utf-8")
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves recorded or synthetic YouTube pages and canned LLM responses.
+
+    Video IDs starting with "nocap-" get a watch page without caption tracks,
+    which pushes the fetchers onto the innertube path.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str, status: int = 200) -> None:
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        video_id = params.get("v", [""])[0]
+        minutes = fixtures.minutes_for_video_id(video_id)
+        recording = fixtures.load_recording(video_id)
+        base_url = self.server.base_url
+
+        if parsed.path == "/watch":
+            if recording and "watch" in recording:
+                # Point recorded caption URLs at this server instead of YouTube
+                page = recording["watch"].replace("https://www.youtube.com/api/timedtext", f"{base_url}/api/timedtext")
+            else:
+                page = fixtures.make_watch_page(video_id, base_url, with_captions=not video_id.startswith("nocap-"))
+            self._send(page.encode("utf-8"), "text/html; charset=utf-8")
+        elif parsed.path == "/api/timedtext":
+            if recording and "json3" in recording:
+                self._send(recording["json3"].encode("utf-8"), "application/json")
+            else:
+                self._send(_json3_body(minutes), "application/json")
+        elif parsed.path == "/transcript_api":
+            if video_id.startswith("nocap-"):
+                self._send(b"not found", "text/plain", status=404)
+            else:
+                self._send(_transcript_entries_body(minutes), "application/json")
+        else:
+            self._send(b"not found", "text/plain", status=404)
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if parsed.path == "/youtubei/v1/get_transcript":
+            video_id = payload.get("params", {}).get("videoId", "")
+            self._send(_innertube_body(fixtures.minutes_for_video_id(video_id)), "application/json")
+        elif parsed.path == "/llm/generate":
+            prompt = payload.get("prompt", "")
+            text = fixtures.canned_llm_response(prompt)
+            body = {
+                "text": text,
+                "usage": {"prompt_token_count": len(prompt) // 4, "candidates_token_count": len(text) // 4},
+            }
+            self._send(json.dumps(body).encode("utf-8"), "application/json")
+        else:
+            self._send(b"not found", "text/plain", status=404)
+
+def start_stand_in_server(latency: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the stand-in server on a free local port in a background thread.
+
+    Returns:
+        The server (call ``shutdown()`` when done) and its base URL
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="stand-in-server", daemon=True).start()
+    return server, server.base_url
+
+if __name__ == "__main__":
+    import sys
+    server, base_url = start_stand_in_server(float(sys.argv[1]) if len(sys.argv) > 1 else 0.0)
+    print(f"Stand-in server listening on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,136 @@
+import sys
+import hmac
+import json
+import time
+import socket
+import logging
+import secrets
+import argparse
+import threading
+import socketserver
+from typing import Optional, Tuple
+from cache_tier import MemoryTier, cache_secret
+
+logger = logging.getLogger("cache-server")
+
+DEFAULT_PORT = 7070
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Keys are cache-relative paths; anything bigger than this is a protocol error
+MAX_LINE_BYTES = 1024
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+    """
+    A line protocol over one persistent connection per client, which must
+    first prove it knows the shared secret:
+
+        AUTH <secret>                    -> OK | ERROR unauthorized (and the connection is closed)
+        GET <key> <max_age|->            -> HIT <stored_at> <length>\\n<value> | MISS
+        SET <key> <stored_at> <length>\\n<value> -> OK
+        STATS                            -> STATS <json>
+    """
+    def _authenticate(self) -> bool:
+        parts = self.rfile.readline(MAX_LINE_BYTES).split()
+        if len(parts) == 2 and parts[0] == b"AUTH" and hmac.compare_digest(parts[1], self.server.secret):
+            self.wfile.write(b"OK\n")
+            return True
+        logger.warning(f"Refused an unauthenticated connection from {self.client_address[0]}")
+        self.server.count("refused")
+        self.wfile.write(b"ERROR unauthorized\n")
+        return False
+
+    def handle(self):
+        store: MemoryTier = self.server.store
+        if not self._authenticate():
+            return
+        while True:
+            line = self.rfile.readline(MAX_LINE_BYTES)
+            if not line:
+                return
+            parts = line.decode("utf-8", "replace").split()
+            try:
+                command = parts[0] if parts else ""
+                if command == "GET":
+                    max_age = None if parts[2] == "-" else float(parts[2])
+                    found = store.get(parts[1], max_age)
+                    self.server.count("hits" if found else "misses")
+                    if found is None:
+                        self.wfile.write(b"MISS\n")
+                    else:
+                        value, stored_at = found
+                        self.wfile.write(f"HIT {stored_at!r} {len(value)}\n".encode("utf-8") + value)
+                elif command == "SET":
+                    stored_at, length = float(parts[2]), int(parts[3])
+                    value = self.rfile.read(length)
+                    if len(value) != length:
+                        return
+                    store.set(parts[1], value, stored_at)
+                    self.server.count("sets")
+                    self.wfile.write(b"OK\n")
+                elif command == "STATS":
+                    stats = dict(self.server.stats, keys=len(store), bytes=store.size, max_bytes=store.max_bytes)
+                    self.wfile.write(f"STATS {json.dumps(stats)}\n".encode("utf-8"))
+                else:
+                    self.wfile.write(b"ERROR unknown command\n")
+                    return
+            except (IndexError, ValueError):
+                self.wfile.write(b"ERROR bad request\n")
+                return
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], secret: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        if not secret:
+            raise ValueError("The cache server needs a shared secret (SUMMIFY_CACHE_SECRET)")
+        # IPv4 or IPv6 (like Fly's private network), whichever the host is
+        self.address_family = socket.getaddrinfo(address[0], address[1], type=socket.SOCK_STREAM)[0][0]
+        super().__init__(address, CacheRequestHandler)
+        self.secret = secret.encode("utf-8")
+        self.store = MemoryTier(max_bytes)
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "refused": 0, "started_at": time.time()}
+        self._stats_lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+def start_cache_server(port: int = 0, max_bytes: int = DEFAULT_MAX_BYTES, host: str = "127.0.0.1",
+                       secret: Optional[str] = None) -> Tuple[CacheServer, str]:
+    """
+    Start a cache server in a background thread, with SUMMIFY_CACHE_SECRET
+    as its secret, else ``secret``, else a random one (``server.secret``).
+
+    Returns:
+        The server (call ``shutdown()`` when done) and its host:port, ready for SUMMIFY_CACHE_SERVER
+    """
+    secret = secret or cache_secret() or secrets.token_hex(16)
+    server = CacheServer((host, port), secret, max_bytes)
+    threading.Thread(target=server.serve_forever, name="cache-server", daemon=True).start()
+    return server, f"{server.server_address[0]}:{server.server_address[1]}"
+
+def main():
+    """
+    Run the shared cache server in the foreground.
+    """
+    parser = argparse.ArgumentParser(description="Shared cache server for summify instances")
+    # Loopback by default; on Fly, --host fly-local-6pn serves the private network only
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    secret = cache_secret()
+    if not secret:
+        parser.error("set SUMMIFY_CACHE_SECRET to the secret the clients share")
+    server = CacheServer((args.host, args.port), secret, args.max_mb * 1024 * 1024)
+    print(f"Cache server listening on {args.host}:{args.port} ({args.max_mb}MB)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import os
+import time
+import queue
+import socket
+import atexit
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from instrumentation import metrics
+
+logger = logging.getLogger("cache-tier")
+
+DEFAULT_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+SHARED_TIMEOUT_SECONDS = 0.5
+# After a failure the shared tier is skipped for this long, so an outage costs one timeout per process
+SHARED_RETRY_SECONDS = 30.0
+# How long an exiting process waits for its queued shared writes
+SHARED_FLUSH_SECONDS = 2.0
+SHARED_QUEUE_SIZE = 256
+
+class CacheTier:
+    """
+    One level of the cache. Values are bytes; ``stored_at`` travels with them
+    so a value copied into a faster tier keeps its age instead of starting over.
+    """
+    name = "tier"
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, float]]:
+        """
+        The value and the time it was stored, or None on a miss or if it is older than ``max_age``.
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, stored_at: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+def _fresh(stored_at: float, max_age: Optional[float]) -> bool:
+    return max_age is None or time.time() - stored_at <= max_age
+
+class MemoryTier(CacheTier):
+    """
+    In-process LRU bounded by the total size of its values.
+    """
+    name = "memory"
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not _fresh(entry[1], max_age):
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: bytes, stored_at: Optional[float] = None) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = (value, stored_at if stored_at is not None else time.time())
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class DiskTier(CacheTier):
+    """
+    One file per key under ``root``; the file's mtime is when the value was stored.
+    """
+    name = "disk"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, float]]:
+        path = self.path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if not _fresh(stored_at, max_age):
+                return None
+            with open(path, "rb") as f:
+                return f.read(), stored_at
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes, stored_at: Optional[float] = None) -> None:
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            if stored_at is not None:
+                os.utime(tmp_path, (stored_at, stored_at))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+def cache_secret() -> str:
+    """
+    The secret every cache server connection starts with (SUMMIFY_CACHE_SECRET).
+    """
+    return os.environ.get("SUMMIFY_CACHE_SECRET", "")
+
+class SharedTier(CacheTier):
+    """
+    Client of a cache server (cache_server.py) shared by every machine.
+
+    The shared tier is an optimization, never a dependency: any error is
+    logged, counts as a miss, and keeps this process off the server for a while.
+    """
+    name = "shared"
+
+    def __init__(self, address: str, secret: str, timeout: float = SHARED_TIMEOUT_SECONDS):
+        host, _, port = address.rpartition(":")
+        self.address = (host.strip("[]") or "127.0.0.1", int(port))
+        self.secret = secret
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._sock is None:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._reader = self._sock.makefile("rb")
+            self._sock.sendall(f"AUTH {self.secret}\n".encode("utf-8"))
+            if self._reader.readline().strip() != b"OK":
+                raise ConnectionError("the cache server refused SUMMIFY_CACHE_SECRET")
+        return self._sock, self._reader
+
+    def _call(self, request: bytes, read_value: bool) -> Optional[Tuple[bytes, float]]:
+        if time.time() < self._down_until:
+            return None
+        with self._lock:
+            try:
+                sock, reader = self._connection()
+                sock.sendall(request)
+                status = reader.readline().split()
+                if not status:
+                    raise ConnectionError("connection closed by the cache server")
+                if status[0] == b"HIT" and read_value:
+                    stored_at, length = float(status[1]), int(status[2])
+                    value = reader.read(length)
+                    if len(value) != length:
+                        raise ConnectionError("short read from the cache server")
+                    return value, stored_at
+                if status[0] not in (b"MISS", b"OK"):
+                    raise ConnectionError(f"unexpected reply from the cache server: {status[0]!r}")
+                return None
+            except (OSError, ValueError, IndexError) as e:
+                logger.warning(f"Shared cache at {self.address[0]}:{self.address[1]} unavailable: {str(e)}")
+                self.close()
+                self._down_until = time.time() + SHARED_RETRY_SECONDS
+                return None
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, float]]:
+        age = "-" if max_age is None else repr(float(max_age))
+        return self._call(f"GET {key} {age}\n".encode("utf-8"), read_value=True)
+
+    def set(self, key: str, value: bytes, stored_at: Optional[float] = None) -> None:
+        stored_at = stored_at if stored_at is not None else time.time()
+        self._call(f"SET {key} {stored_at!r} {len(value)}\n".encode("utf-8") + value, read_value=False)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+class TieredCache:
+    """
+    Memory, disk and shared tiers, tried fastest first.
+
+    A hit in a slower tier is copied into the faster ones (read-through).
+    Writes go to the local tiers at once and to the shared tier from a
+    background thread (write-behind), so a request never waits on the network
+    to store something; an exiting process gives its queue a moment to drain.
+    """
+    def __init__(self, tiers: List[CacheTier]):
+        self.tiers = tiers
+        self._queue: Optional[queue.Queue] = None
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        for i, tier in enumerate(self.tiers):
+            found = tier.get(key, max_age)
+            metrics.inc("summify_cache_lookups_total", tier=tier.name, result="hit" if found else "miss")
+            if found is not None:
+                value, stored_at = found
+                for faster in self.tiers[:i]:
+                    self._set_tier(faster, key, value, stored_at)
+                return value
+        return None
+
+    def set(self, key: str, value: bytes, stored_at: Optional[float] = None, skip_disk: bool = False) -> None:
+        """
+        Store a value in every tier; ``skip_disk`` when the caller has just written the file itself.
+        """
+        for tier in self.tiers:
+            if not (skip_disk and isinstance(tier, DiskTier)):
+                self._set_tier(tier, key, value, stored_at)
+
+    def forget(self, key: str) -> None:
+        """
+        Drop an in-process copy, e.g. after the file behind it was rewritten.
+        """
+        for tier in self.tiers:
+            if isinstance(tier, MemoryTier):
+                tier.delete(key)
+
+    @property
+    def shared(self) -> bool:
+        return any(isinstance(tier, SharedTier) for tier in self.tiers)
+
+    def _set_tier(self, tier: CacheTier, key: str, value: bytes, stored_at: Optional[float]) -> None:
+        if isinstance(tier, SharedTier):
+            self._write_behind(tier, key, value, stored_at)
+            return
+        try:
+            tier.set(key, value, stored_at)
+        except OSError as e:
+            logger.warning(f"Failed to store {key} in the {tier.name} cache: {str(e)}")
+
+    def _write_behind(self, tier: SharedTier, key: str, value: bytes, stored_at: Optional[float]) -> None:
+        if self._queue is None:
+            self._queue = queue.Queue(maxsize=SHARED_QUEUE_SIZE)
+            threading.Thread(target=self._drain, name="cache-write-behind", daemon=True).start()
+            atexit.register(self.flush)
+        try:
+            self._queue.put_nowait((tier, key, value, stored_at if stored_at is not None else time.time()))
+        except queue.Full:
+            logger.warning(f"Shared cache write queue is full; not sharing {key}")
+
+    def _drain(self) -> None:
+        while True:
+            tier, key, value, stored_at = self._queue.get()
+            try:
+                tier.set(key, value, stored_at)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = SHARED_FLUSH_SECONDS) -> bool:
+        """
+        Wait up to ``timeout`` seconds for queued shared writes; returns whether they all went out.
+        """
+        if self._queue is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                logger.warning(f"Dropping {self._queue.unfinished_tasks} unsent shared cache writes")
+                return False
+            time.sleep(0.005)
+        return True
+
+_caches: Dict[Tuple[str, str, int], TieredCache] = {}
+
+def get_cache(root: str) -> TieredCache:
+    """
+    The tiered cache for a cache directory: an in-process LRU
+    (SUMMIFY_MEMORY_CACHE_BYTES, 0 turns it off), the directory itself, and
+    the shared server named by SUMMIFY_CACHE_SERVER (host:port) if set,
+    which needs SUMMIFY_CACHE_SECRET too.
+    """
+    shared = os.environ.get("SUMMIFY_CACHE_SERVER", "")
+    memory_bytes = int(os.environ.get("SUMMIFY_MEMORY_CACHE_BYTES", DEFAULT_MEMORY_CACHE_BYTES))
+    config = (root, shared, memory_bytes)
+    if config not in _caches:
+        tiers: List[CacheTier] = []
+        if memory_bytes > 0:
+            tiers.append(MemoryTier(memory_bytes))
+        tiers.append(DiskTier(root))
+        if shared and not cache_secret():
+            logger.warning("SUMMIFY_CACHE_SERVER is set without SUMMIFY_CACHE_SECRET; not using the shared cache")
+        elif shared:
+            tiers.append(SharedTier(shared, cache_secret()))
+        _caches[config] = TieredCache(tiers)
+    return _caches[config]
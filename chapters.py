@@ -0,0 +1,286 @@
+import re
+import math
+import logging
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from deadline import Deadline, ensure_deadline
+from instrumentation import span
+import llm_backend
+
+logger = logging.getLogger("chapter-segmenter")
+
+# TextTiling parameters: words per pseudo-sentence block, and blocks compared on each side of a gap
+BLOCK_WORDS = 20
+WINDOW_BLOCKS = 6
+
+# Chapter constraints; depth ranges from 0 (no dip in similarity) to 2 (windows share no words)
+MIN_BOUNDARY_DEPTH = 0.5
+MIN_CHAPTER_SECONDS = 90.0
+MAX_CHAPTERS = 12
+# Videos shorter than this get a single summary unless chapters are requested explicitly
+MIN_VIDEO_SECONDS_FOR_CHAPTERS = 600.0
+
+# Chapter summaries run concurrently; each prompt is capped so a long chapter can't blow the budget
+CHAPTER_MAX_WORKERS = 4
+MAX_CHAPTER_PROMPT_CHARS = 12000
+
+# Words that say nothing about the topic (English and Vietnamese)
+STOPWORDS = frozenset("""
+a an the and or but if so of to in on at by for with from as is are was were be been being it its this that
+these those there here i you he she we they me him her us them my your our their what which who whom when where
+why how not no yes do does did done have has had just very really also then than too can could will would should
+may might must about into over out up down again more most some such only own same all any both each few other
+going gonna know like yeah okay right well get got one two now
+và của là có không được cho này những các một với trong để thì mà khi người cũng như đã sẽ đang rất nhiều
+""".split())
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS and not w.isdigit()]
+
+def video_duration(segments: List[Dict[str, Any]]) -> float:
+    if not segments:
+        return 0.0
+    last = segments[-1]
+    return last["start"] + last.get("duration", 0.0)
+
+def _blocks(segments: List[Dict[str, Any]]):
+    """
+    Split the transcript into blocks of BLOCK_WORDS content words, each with the time it starts at.
+    """
+    words: List[str] = []
+    word_starts: List[float] = []
+    for segment in segments:
+        tokens = tokenize(segment["text"])
+        words.extend(tokens)
+        word_starts.extend([segment["start"]] * len(tokens))
+    blocks = [Counter(words[i:i + BLOCK_WORDS]) for i in range(0, len(words), BLOCK_WORDS)]
+    return blocks, word_starts[::BLOCK_WORDS]
+
+def _weight_blocks(blocks: List[Counter]) -> List[Dict[str, float]]:
+    """
+    Weight block counts by inverse block frequency, so filler words every block shares stop dominating.
+    """
+    df: Counter = Counter()
+    for block in blocks:
+        df.update(block.keys())
+    idf = {word: math.log(len(blocks) / n) for word, n in df.items()}
+    return [{word: count * idf[word] for word, count in block.items() if idf[word] > 0} for block in blocks]
+
+class _SlidingWindows:
+    """
+    Term vectors of the windows left and right of a gap, with their dot product
+    and squared norms kept up to date as blocks move across.
+
+    Moving a block costs time proportional to the block, not the window, which
+    keeps scoring linear in transcript length.
+    """
+    def __init__(self):
+        self.vectors = ({}, {})
+        self.norms = [0.0, 0.0]
+        self.dot = 0.0
+
+    def add(self, side: int, block: Dict[str, float], sign: float = 1.0) -> None:
+        vector, other = self.vectors[side], self.vectors[1 - side]
+        for word, weight in block.items():
+            old = vector.get(word, 0.0)
+            new = old + sign * weight
+            if abs(new) < 1e-9:
+                new = 0.0
+                vector.pop(word, None)
+            else:
+                vector[word] = new
+            self.norms[side] += new * new - old * old
+            self.dot += (new - old) * other.get(word, 0.0)
+
+    def cosine(self) -> float:
+        if self.norms[0] <= 1e-12 or self.norms[1] <= 1e-12:
+            return 0.0
+        return self.dot / math.sqrt(self.norms[0] * self.norms[1])
+
+def gap_scores(blocks: List[Dict[str, float]], window: int = WINDOW_BLOCKS) -> List[float]:
+    """
+    Lexical similarity (cosine) across every gap between blocks, comparing up to
+    ``window`` blocks on each side.
+    """
+    if len(blocks) < 2:
+        return []
+    windows = _SlidingWindows()
+    for block in blocks[:window]:
+        windows.add(1, block)
+
+    scores = []
+    for gap in range(1, len(blocks)):
+        # The gap sits before blocks[gap]: blocks[gap - window:gap] | blocks[gap:gap + window]
+        moved = blocks[gap - 1]
+        windows.add(1, moved, -1.0)
+        windows.add(0, moved)
+        if gap - 1 - window >= 0:
+            windows.add(0, blocks[gap - 1 - window], -1.0)
+        if gap - 1 + window < len(blocks):
+            windows.add(1, blocks[gap - 1 + window])
+        scores.append(windows.cosine())
+    return scores
+
+def depth_scores(scores: List[float]) -> List[float]:
+    """
+    How deep each gap sits in a similarity valley, measured against the peaks on either side.
+
+    Only valley bottoms (local minima) get a depth; every other gap scores 0.
+    """
+    # Light smoothing keeps single noisy gaps from looking like boundaries
+    smoothed = [
+        sum(scores[max(0, i - 1):i + 2]) / len(scores[max(0, i - 1):i + 2])
+        for i in range(len(scores))
+    ]
+    depths = []
+    for i, score in enumerate(smoothed):
+        if (i > 0 and smoothed[i - 1] < score) or (i < len(smoothed) - 1 and smoothed[i + 1] < score):
+            depths.append(0.0)
+            continue
+        left_peak = score
+        j = i
+        while j > 0 and smoothed[j - 1] >= left_peak:
+            left_peak = smoothed[j - 1]
+            j -= 1
+        right_peak = score
+        j = i
+        while j < len(smoothed) - 1 and smoothed[j + 1] >= right_peak:
+            right_peak = smoothed[j + 1]
+            j += 1
+        depths.append((left_peak - score) + (right_peak - score))
+    return depths
+
+def find_chapters(segments: List[Dict[str, Any]], min_chapter_seconds: float = MIN_CHAPTER_SECONDS,
+                  max_chapters: int = MAX_CHAPTERS) -> List[Dict[str, Any]]:
+    """
+    Split timed segments into topical chapters (TextTiling).
+
+    Returns:
+        [{"start", "end", "text"}] covering the whole transcript, in order
+    """
+    if not segments:
+        return []
+    duration = video_duration(segments)
+    blocks, starts = _blocks(segments)
+    depths = depth_scores(gap_scores(_weight_blocks(blocks)))
+
+    boundaries: List[float] = []
+    valleys = [depth for depth in depths if depth > 0]
+    if valleys:
+        # Valleys clearly deeper than the usual wobble between windows on the same topic
+        mean = sum(valleys) / len(valleys)
+        std = math.sqrt(sum((d - mean) ** 2 for d in valleys) / len(valleys))
+        cutoff = max(MIN_BOUNDARY_DEPTH, mean + std)
+        # Deepest valleys first; gap i starts block i + 1
+        candidates = sorted(
+            (depth, starts[i + 1]) for i, depth in enumerate(depths) if depth > cutoff
+        )
+        for depth, time in reversed(candidates):
+            if len(boundaries) >= max_chapters - 1:
+                break
+            if time < min_chapter_seconds or duration - time < min_chapter_seconds:
+                continue
+            if all(abs(time - other) >= min_chapter_seconds for other in boundaries):
+                boundaries.append(time)
+
+    edges = [segments[0]["start"]] + sorted(boundaries) + [duration]
+    chapters = []
+    index = 0
+    for start, end in zip(edges, edges[1:]):
+        texts = []
+        while index < len(segments) and (segments[index]["start"] < end or end == edges[-1]):
+            texts.append(segments[index]["text"])
+            index += 1
+        chapters.append({"start": round(start, 2), "end": round(end, 2), "text": " ".join(texts).strip()})
+    return chapters
+
+def keyword_title(text: str, corpus: List[str], count: int = 3) -> str:
+    """
+    A fallback title from the words most specific to this chapter (tf-idf over the chapters).
+    """
+    counts = Counter(tokenize(text))
+    if not counts:
+        return "Untitled chapter"
+    documents = [set(tokenize(other)) for other in corpus]
+    def weight(word: str) -> float:
+        df = sum(1 for document in documents if word in document)
+        return counts[word] * math.log((1 + len(documents)) / (1 + df) + 1)
+    top = sorted(counts, key=lambda word: (-weight(word), word))[:count]
+    return ", ".join(word.capitalize() for word in top)
+
+def _chapter_prompt(text: str) -> str:
+    return f"""
+You are a helpful assistant that summarizes one chapter of a video transcript. Give the chapter a short title (at most 8 words) and summarize it in 2-3 sentences. Do not change the language of the text: the title and summary must be in the same language as the transcript.
+Answer in exactly this format:
+TITLE: <title>
+SUMMARY: <summary>
+
+CHAPTER TRANSCRIPT:
+{text[:MAX_CHAPTER_PROMPT_CHARS]}
+"""
+
+def _parse_chapter_response(text: str) -> Dict[str, str]:
+    title = re.search(r"TITLE:\s*(.+)", text)
+    summary = re.search(r"SUMMARY:\s*(.+)", text, re.DOTALL)
+    return {
+        "title": title.group(1).strip().strip('"*') if title else "",
+        "summary": summary.group(1).strip() if summary else text.strip(),
+    }
+
+def summarize_chapter(chapter: Dict[str, Any], corpus: List[str], deadline: Deadline) -> Dict[str, Any]:
+    """
+    Title and summarize one chapter. Falls back to a keyword title without a summary on failure.
+    """
+    result = {"start": chapter["start"], "end": chapter["end"], "title": "", "summary": ""}
+    try:
+        deadline.check("chapters")
+        response = llm_backend.generate("chapters", _chapter_prompt(chapter["text"]), temperature=0.3,
+                                        max_output_tokens=200, deadline=deadline)
+        result.update(_parse_chapter_response(response.text))
+    except Exception as e:
+        logger.warning(f"Chapter at {chapter['start']:.0f}s was not summarized: {str(e)}")
+    if not result["title"]:
+        result["title"] = keyword_title(chapter["text"], corpus)
+    return result
+
+def build_chapters(segments: List[Dict[str, Any]], deadline: Optional[Deadline] = None,
+                   max_workers: int = CHAPTER_MAX_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Segment a transcript into chapters and summarize them in parallel.
+
+    A chapter whose summary fails or runs out of time keeps its timestamps and a
+    keyword title, so one slow call never costs the whole request its chapters.
+
+    Returns:
+        [{"start", "end", "title", "summary"}], times in seconds
+    """
+    deadline = ensure_deadline(deadline)
+    with span("chapters:segment", segments=len(segments)) as record:
+        chapters = find_chapters(segments)
+        record["chapters"] = len(chapters)
+    if len(chapters) < 2:
+        return []
+
+    corpus = [chapter["text"] for chapter in chapters]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Each task runs in a copy of this context so its spans land on the current request
+        futures = [
+            pool.submit(contextvars.copy_context().run, summarize_chapter, chapter, corpus, deadline)
+            for chapter in chapters
+        ]
+        results = [future.result() for future in futures]
+    deadline.mark("chapters", chapters=len(results))
+    return results
+
+def wants_chapters(input_data: Dict[str, Any], segments: List[Dict[str, Any]]) -> bool:
+    """
+    Chapters are on for long videos by default; ``"chapters": true/false`` in the input overrides that.
+    """
+    requested = input_data.get("chapters")
+    if requested is not None:
+        return bool(requested)
+    return video_duration(segments) >= MIN_VIDEO_SECONDS_FOR_CHAPTERS
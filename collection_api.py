@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+from typing import Dict, Any
+from deadline import Deadline, DeadlineExceeded
+from rate_limiter import RateLimitedError
+from instrumentation import start_request, finish_request, span
+from transcript import get_video_id
+from collection_summary import CollectionSummary, DEFAULT_FAN_IN
+import language_id
+import llm_backend
+import cost_ledger
+from cost_ledger import BudgetExceeded
+
+def setup_api_keys() -> None:
+    """
+    Set up API keys from .env file.
+    """
+    if os.path.exists(".env"):
+        with open(".env", "r") as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    try:
+                        key, value = line.strip().split("=", 1)
+                        os.environ[key] = value
+                    except ValueError:
+                        # Skip lines that don't have the format KEY=VALUE
+                        continue
+
+    # Configure the LLM backend
+    llm_backend.configure_backend()
+
+def process_api_request(input_file: str, output_file: str) -> None:
+    """
+    Summarize a collection of videos (a course, a playlist) as one.
+
+    Input is {"videos": [url or video ID, ...], "language", "fan_in"}; a long
+    collection is best submitted as a "collection" job.
+
+    Args:
+        input_file: Path to JSON file with input data
+        output_file: Path to write output JSON data
+    """
+    start_request("collection")
+    try:
+        # Read input data
+        with open(input_file, 'r') as f:
+            input_data = json.load(f)
+
+        language = input_data.get('language', language_id.AUTO)
+        fan_in = int(input_data.get('fan_in', DEFAULT_FAN_IN))
+        deadline = Deadline.from_input(input_data)
+
+        videos = input_data.get('videos') or []
+        with span("parse_urls", videos=len(videos)):
+            video_ids = [
+                get_video_id(video) if "youtube.com" in video or "youtu.be" in video else video
+                for video in videos
+            ]
+        if not video_ids:
+            raise ValueError("At least one video URL or ID is required")
+        # Spend is counted per collection rather than per video
+        cost_ledger.set_video(None)
+
+        output_data: Dict[str, Any] = dict(
+            CollectionSummary(language, fan_in, deadline).summarize(video_ids),
+            language=language,
+        )
+
+        with span("write_output"):
+            with open(output_file, 'w') as f:
+                json.dump(output_data, f)
+
+    except Exception as e:
+        # Write error to output file
+        error_data = {'error': str(e)}
+        if isinstance(e, DeadlineExceeded):
+            error_data['error_type'] = "DeadlineExceeded"
+            error_data['progress'] = e.progress
+        elif isinstance(e, RateLimitedError):
+            error_data['error'] = "YouTube is temporarily limiting our requests. Please try again in a few minutes."
+            error_data['error_type'] = "RateLimited"
+        elif isinstance(e, BudgetExceeded):
+            error_data['error_type'] = "BudgetExceeded"
+        with open(output_file, 'w') as f:
+            json.dump(error_data, f)
+        raise
+    finally:
+        finish_request()
+
+def main():
+    """
+    Main function to handle API requests.
+    """
+    if len(sys.argv) != 3:
+        print("Usage: python collection_api.py <input_file> <output_file>")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    # Set up API keys
+    setup_api_keys()
+
+    # Process the request
+    process_api_request(input_file, output_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from deadline import Deadline, DeadlineExceeded, ensure_deadline
+from instrumentation import span
+from rate_limiter import RateLimitedError
+from cost_ledger import BudgetExceeded
+from transcript_cache import get_transcript_segments, get_video_metadata, load_result, result_cache_key, store_result
+from pipeline import PipelinedSummary
+import language_id
+import llm_backend
+
+logger = logging.getLogger("collection-summary")
+
+# Videos (or sections) per section, on average; groups run from 2 to MAX_GROUP_SHARE times this
+DEFAULT_FAN_IN = 4
+MAX_GROUP_SHARE = 2
+COLLECTION_MAX_WORKERS = 4
+SECTION_SUMMARY_TOKENS = 700
+
+# The tree is a Merkle tree: a leaf is named by the hash of its video's summary
+# and a section by the hashes of its children, and each section's summary is
+# cached under its name. Sections are cut where a child's hash says so (as the
+# pipeline cuts transcript chunks), not every FAN_IN children, so adding or
+# removing a video only renames the sections on its path to the root; every
+# other section is found in the cache.
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def _section_prompt(summaries: List[str], final: bool) -> str:
+    scope = "the whole collection" if final else "this section of the collection"
+    parts = "\n\n".join(f"PART {i}:\n{summary}" for i, summary in enumerate(summaries, start=1))
+    return f"""
+You are a helpful assistant summarizing a collection of videos, such as a course or a playlist. Below are summaries of consecutive parts of it, in order. Write one summary of {scope}: its main topics, how they build on each other, and the key takeaways. Do not list the parts one by one. Do not change the language of the text: the summary must be in the same language as the part summaries.
+
+{parts}
+"""
+
+def group_children(hashes: List[str], fan_in: int = DEFAULT_FAN_IN) -> List[List[int]]:
+    """
+    Cut one level of the tree into sections, at children whose hash is a
+    boundary. Every section has at least two children, so each level is at
+    most half the size of the one below.
+
+    Returns:
+        Lists of child positions, in order
+    """
+    if len(hashes) <= 1:
+        return [list(range(len(hashes)))]
+    groups: List[List[int]] = [[]]
+    for i, child in enumerate(hashes):
+        groups[-1].append(i)
+        size = len(groups[-1])
+        if (size >= 2 and int(child[:8], 16) % fan_in == 0) or size >= fan_in * MAX_GROUP_SHARE:
+            groups.append([])
+    if not groups[-1]:
+        groups.pop()
+    if len(groups) > 1 and len(groups[-1]) < 2:
+        groups[-2].extend(groups.pop())
+    return groups
+
+def video_summary(video_id: str, language: str, deadline: Deadline) -> Tuple[str, bool]:
+    """
+    A video's summary: the one summarize_api.py cached, else this module's
+    own, else a fresh one through the summary pipeline.
+
+    Returns:
+        The summary and whether it came from a cache
+    """
+    cached = load_result("summary", result_cache_key("summarize", video_id, language, None))
+    if cached and cached.get("summary"):
+        return cached["summary"], True
+    leaf_key = result_cache_key("collection", "video", video_id, language)
+    cached = load_result("collection", leaf_key)
+    if cached:
+        return cached["summary"], True
+
+    segments = get_transcript_segments(video_id, language, deadline)
+    run = PipelinedSummary(deadline)
+    try:
+        run.consume(segments)
+        summary = run.result()
+    except BaseException:
+        run.close()
+        raise
+    store_result("collection", leaf_key, {"summary": summary, "model": run.routing["model"]})
+    return summary, False
+
+class CollectionSummary:
+    """
+    Summarizes a list of videos bottom-up: every video, then sections of
+    videos, then sections of sections, one level at a time with each level's
+    summaries made in parallel.
+    """
+    def __init__(self, language: str = language_id.AUTO, fan_in: int = DEFAULT_FAN_IN, deadline: Optional[Deadline] = None,
+                 max_workers: int = COLLECTION_MAX_WORKERS):
+        self.language = language
+        self.fan_in = max(2, fan_in)
+        self.deadline = ensure_deadline(deadline)
+        self.max_workers = max_workers
+
+    def _map(self, pool: ThreadPoolExecutor, fn, items: List[Any]) -> List[Any]:
+        # Each task runs in a copy of this context so its spans land on the current request
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    def _leaf(self, video_id: str) -> Dict[str, Any]:
+        try:
+            with span("collection:video", video_id=video_id) as record:
+                summary, cached = video_summary(video_id, self.language, self.deadline)
+                record["cached"] = cached
+        except (DeadlineExceeded, BudgetExceeded):
+            raise
+        except Exception as e:
+            # One video without captions should not sink the whole collection
+            logger.warning(f"Leaving {video_id} out of the collection: {str(e)}")
+            error_type = "RateLimited" if isinstance(e, RateLimitedError) else type(e).__name__
+            return {"video_id": video_id, "error": str(e), "error_type": error_type}
+        metadata = get_video_metadata(video_id) or {}
+        return {
+            "video_id": video_id,
+            "title": metadata.get("title") or f"YouTube Video ({video_id})",
+            "summary": summary,
+            "hash": _hash("video", video_id, summary),
+            "cached": cached,
+        }
+
+    def _section(self, task: Tuple[List[Dict[str, Any]], bool]) -> Dict[str, Any]:
+        children, final = task
+        node_hash = _hash("section", self.language, *(child["hash"] for child in children))
+        # Keyed by the model that will write the summary, which a budget may have downgraded
+        model, _ = llm_backend.resolve_model("collection")
+        key = result_cache_key("collection", "section", model, node_hash, final)
+        with span("collection:section", children=len(children), final=final) as record:
+            cached = load_result("collection", key)
+            record["cached"] = cached is not None
+            if cached is not None:
+                summary = cached["summary"]
+            else:
+                self.deadline.check("collection")
+                prompt = _section_prompt([child["summary"] for child in children], final)
+                response = llm_backend.generate("collection", prompt, temperature=0.5,
+                                                max_output_tokens=SECTION_SUMMARY_TOKENS,
+                                                deadline=self.deadline, model=model)
+                summary = response.text.strip()
+                if response.model != model:
+                    key = result_cache_key("collection", "section", response.model, node_hash, final)
+                store_result("collection", key, {"summary": summary})
+        return {
+            "hash": node_hash,
+            "summary": summary,
+            "cached": cached is not None,
+            "videos": [video for child in children for video in (child["videos"] if "videos" in child else [child["video_id"]])],
+        }
+
+    def summarize(self, video_ids: List[str]) -> Dict[str, Any]:
+        """
+        Returns:
+            {"summary", "videos", "sections", "levels", "failed", "computed", "reused"}: the
+            collection summary, each video's summary, the first level of sections, the
+            number of nodes per level, videos left out, and how many summaries were
+            made versus taken from a cache
+
+        Raises:
+            Exception: If no video could be summarized
+        """
+        # Repeats would be summarized twice and weigh twice in their section
+        video_ids = list(dict.fromkeys(video_ids))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            leaves = self._map(pool, self._leaf, video_ids)
+            self.deadline.mark("collection:videos", videos=len(leaves))
+            videos = [leaf for leaf in leaves if "summary" in leaf]
+            failed = [leaf for leaf in leaves if "summary" not in leaf]
+            if not videos:
+                raise Exception("None of the videos in the collection could be summarized")
+
+            levels = [len(videos)]
+            sections: Optional[List[Dict[str, Any]]] = None
+            nodes = videos
+            cached = [node["cached"] for node in videos]
+            while len(nodes) > 1:
+                groups = group_children([node["hash"] for node in nodes], self.fan_in)
+                final = len(groups) == 1
+                with span("collection:level", level=len(levels), sections=len(groups)):
+                    nodes = self._map(pool, self._section, [([nodes[i] for i in group], final) for group in groups])
+                cached.extend(node["cached"] for node in nodes)
+                levels.append(len(nodes))
+                if sections is None and not final:
+                    sections = nodes
+                self.deadline.mark("collection:level", level=len(levels) - 1, sections=len(nodes))
+
+        return {
+            "summary": nodes[0]["summary"],
+            "videos": [{key: video[key] for key in ("video_id", "title", "summary")} for video in videos],
+            "sections": [{"videos": section["videos"], "summary": section["summary"]} for section in sections or []],
+            "levels": levels,
+            "failed": failed,
+            "computed": cached.count(False),
+            "reused": cached.count(True),
+        }
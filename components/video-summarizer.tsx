@@ -47,7 +47,7 @@ export function VideoSummarizer() {
         },
         body: JSON.stringify({
           url,
-          language: 'en', // Default to English, could add language selector
+          language: 'auto', // The video's own language; could add language selector
         }),
       })
 
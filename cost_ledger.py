@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import contextvars
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from instrumentation import current_tracer, metrics
+from rate_limiter import FileStateStore
+
+logger = logging.getLogger("cost-ledger")
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmp", "cost_ledger.jsonl")
+
+# USD per million tokens (input, output); override or extend with "prices" in the budget file
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+# Budgets start downgrading to the cheapest model at this share of a limit, and refuse at the limit
+DEFAULT_DOWNGRADE_SHARE = 0.8
+# Days of running totals kept in the totals file
+TOTALS_DAYS_KEPT = 2
+
+class BudgetExceeded(Exception):
+    """
+    Raised instead of making an LLM call that would go over a configured budget.
+    """
+    pass
+
+# Set by the API entry points so every call of a request is charged to its video
+_video_id: contextvars.ContextVar = contextvars.ContextVar("summify_cost_video", default=None)
+# Tokens used so far by the current request, shared by its threads
+_request_tokens: contextvars.ContextVar = contextvars.ContextVar("summify_cost_request_tokens", default=None)
+
+def set_video(video_id: Optional[str]) -> None:
+    """
+    Charge the current request's LLM calls to ``video_id``.
+    """
+    _video_id.set(video_id)
+    _request_tokens.set([0])
+
+def ledger_path() -> str:
+    """
+    The ledger file (SUMMIFY_COST_LEDGER); an empty value turns the ledger and budgets off.
+    """
+    return os.environ.get("SUMMIFY_COST_LEDGER", DEFAULT_LEDGER_PATH)
+
+_budgets: Optional[Dict[str, Any]] = None
+
+def load_budgets() -> Dict[str, Any]:
+    """
+    Budgets from the JSON file named by SUMMIFY_COST_BUDGETS, e.g.
+
+        {"daily_usd": 5.0, "per_video_daily_usd": 0.25, "per_request_tokens": 400000,
+         "operations": {"quiz": {"daily_usd": 0.5}}, "downgrade_share": 0.8,
+         "prices": {"gemini-2.0-flash": [0.10, 0.40]}}
+
+    Every limit is optional; no file means no limits.
+    """
+    global _budgets
+    if _budgets is None:
+        budgets: Dict[str, Any] = {}
+        path = os.environ.get("SUMMIFY_COST_BUDGETS")
+        if path:
+            try:
+                with open(path, "r") as f:
+                    budgets = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring cost budgets {path}: {str(e)}")
+        _budgets = budgets
+    return _budgets
+
+def prices() -> Dict[str, Tuple[float, float]]:
+    table = dict(MODEL_PRICES)
+    table.update({model: tuple(price) for model, price in load_budgets().get("prices", {}).items()})
+    return table
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = prices().get(model, MODEL_PRICES["gemini-2.0-flash"])
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+def _day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+def _totals_store() -> FileStateStore:
+    return FileStateStore(ledger_path() + ".totals")
+
+def _limits(operation: str, video_id: Optional[str]) -> List[Tuple[str, float, str]]:
+    """
+    The daily limits that apply to a call: (name, USD limit, key in the day's totals).
+    """
+    budgets = load_budgets()
+    limits = []
+    if budgets.get("daily_usd") is not None:
+        limits.append(("daily", float(budgets["daily_usd"]), "total"))
+    op_limit = budgets.get("operations", {}).get(operation, {}).get("daily_usd")
+    if op_limit is not None:
+        limits.append((f"{operation} daily", float(op_limit), f"operation:{operation}"))
+    if video_id and budgets.get("per_video_daily_usd") is not None:
+        limits.append((f"video {video_id} daily", float(budgets["per_video_daily_usd"]), f"video:{video_id}"))
+    return limits
+
+def check_budget(operation: str, model: str) -> Tuple[str, bool]:
+    """
+    Decide whether a call may go ahead, and on which model.
+
+    Returns:
+        The model to use and whether it was downgraded to the cheapest one
+
+    Raises:
+        BudgetExceeded: If a daily limit is used up, or the request has used up its tokens
+    """
+    if not ledger_path():
+        return model, False
+    budgets = load_budgets()
+    request_limit = budgets.get("per_request_tokens")
+    used = _request_tokens.get()
+    if request_limit is not None and used is not None and used[0] >= request_limit:
+        raise BudgetExceeded(f"This request used its {request_limit} LLM tokens")
+
+    limits = _limits(operation, _video_id.get())
+    if not limits:
+        return model, False
+    with _totals_store().transaction() as state:
+        today = state.get(_day(time.time()), {})
+    share = float(budgets.get("downgrade_share", DEFAULT_DOWNGRADE_SHARE))
+    downgrade = False
+    for name, limit, key in limits:
+        spent = today.get(key, 0.0)
+        if spent >= limit:
+            metrics.inc("summify_llm_budget_refusals_total", operation=operation, budget=key.split(":")[0])
+            raise BudgetExceeded(f"The {name} LLM budget of ${limit:g} is used up")
+        if spent >= share * limit:
+            downgrade = True
+    if downgrade:
+        table = prices()
+        cheapest = min(table, key=lambda m: sum(table[m]))
+        if sum(table.get(model, MODEL_PRICES["gemini-2.0-flash"])) > sum(table[cheapest]):
+            return cheapest, True
+    return model, False
+
+def record(operation: str, model: str, backend: str, input_tokens: int, output_tokens: int,
+           latency_seconds: float, cache_hit: bool = False, downgraded: bool = False,
+           billed: bool = True) -> None:
+    """
+    Append one LLM call (or a call a cache made unnecessary) to the ledger and the running totals.
+
+    Calls to a backend that doesn't bill (``billed=False``: the stub and the
+    benchmark replay) are logged with their tokens at no cost, so they never
+    count against a budget.
+    """
+    path = ledger_path()
+    if not path:
+        return
+    now = time.time()
+    tracer = current_tracer()
+    video_id = _video_id.get()
+    cost = cost_usd(model, input_tokens, output_tokens) if billed and not cache_hit else 0.0
+    entry = {
+        "timestamp": now,
+        "request_id": tracer.request_id,
+        "request": tracer.operation,
+        "operation": operation,
+        "video_id": video_id,
+        "model": model,
+        "backend": backend,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency_ms": round(latency_seconds * 1000, 3),
+        "cache_hit": cache_hit,
+        "downgraded": downgraded,
+        "cost_usd": round(cost, 8),
+    }
+    used = _request_tokens.get()
+    if used is not None:
+        used[0] += input_tokens + output_tokens
+    if billed and not cache_hit:
+        metrics.inc("summify_llm_cost_usd_total", cost, operation=operation, model=model)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One short append per call; O_APPEND keeps lines from different processes whole
+        with open(path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if cost:
+            day = _day(now)
+            with _totals_store().transaction() as state:
+                for old_day in sorted(state)[:-TOTALS_DAYS_KEPT]:
+                    if old_day != day:
+                        del state[old_day]
+                totals = state.setdefault(day, {})
+                for key in ["total", f"operation:{operation}"] + ([f"video:{video_id}"] if video_id else []):
+                    totals[key] = totals.get(key, 0.0) + cost
+    except OSError as e:
+        logger.warning(f"Failed to record LLM usage: {str(e)}")
+
+def record_cache_hit(operation: str) -> None:
+    """
+    Note an LLM call a cache answered instead, so reports show the hit rate.
+    """
+    record(operation, "", "cache", 0, 0, 0.0, cache_hit=True)
+
+def read_ledger(path: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    entries = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or entry.get("timestamp", 0) >= since:
+                    entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+def report(entries: List[Dict[str, Any]], by: str = "operation") -> List[Dict[str, Any]]:
+    """
+    Aggregate ledger entries per ``by`` (operation, video, day, model or request),
+    most expensive first. ``avg_input_tokens`` is the one to watch for prompt bloat.
+    """
+    groups: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+        "calls": 0, "cache_hits": 0, "downgraded": 0, "input_tokens": 0, "output_tokens": 0,
+        "cost_usd": 0.0, "latency_ms": 0.0,
+    })
+    for entry in entries:
+        if by == "day":
+            key = _day(entry["timestamp"])
+        elif by == "video":
+            key = entry.get("video_id") or "(none)"
+        elif by == "request":
+            key = entry.get("request_id") or "(none)"
+        else:
+            key = entry.get(by) or "(none)"
+        group = groups[key]
+        if entry.get("cache_hit"):
+            group["cache_hits"] += 1
+            continue
+        group["calls"] += 1
+        group["downgraded"] += 1 if entry.get("downgraded") else 0
+        group["input_tokens"] += entry.get("input_tokens", 0)
+        group["output_tokens"] += entry.get("output_tokens", 0)
+        group["cost_usd"] += entry.get("cost_usd", 0.0)
+        group["latency_ms"] += entry.get("latency_ms", 0.0)
+
+    rows = []
+    for key, group in groups.items():
+        calls = group["calls"]
+        rows.append({
+            by: key,
+            "calls": calls,
+            "cache_hits": group["cache_hits"],
+            "cache_hit_rate": round(group["cache_hits"] / (calls + group["cache_hits"]), 3),
+            "downgraded": group["downgraded"],
+            "input_tokens": group["input_tokens"],
+            "output_tokens": group["output_tokens"],
+            "avg_input_tokens": round(group["input_tokens"] / calls) if calls else 0,
+            "avg_latency_ms": round(group["latency_ms"] / calls, 1) if calls else 0.0,
+            "cost_usd": round(group["cost_usd"], 6),
+        })
+    rows.sort(key=lambda row: row["cost_usd"], reverse=True)
+    return rows
+
+def main():
+    """
+    Print LLM usage from the ledger, grouped per operation, video, day, model or request.
+    """
+    parser = argparse.ArgumentParser(description="Report LLM token usage and cost from the ledger")
+    parser.add_argument("--by", choices=("operation", "video", "day", "model", "request"), default="operation")
+    parser.add_argument("--days", type=float, help="only the last N days")
+    parser.add_argument("--ledger", default=ledger_path())
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    if not args.ledger:
+        print("SUMMIFY_COST_LEDGER is empty, so nothing is recorded")
+        sys.exit(1)
+
+    since = time.time() - args.days * 86400 if args.days else None
+    rows = report(read_ledger(args.ledger, since), args.by)
+    print(json.dumps(rows[:args.top], indent=2))
+
+if __name__ == "__main__":
+    main()
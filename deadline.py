@@ -0,0 +1,166 @@
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+# Default settings
+DEFAULT_DEADLINE_SECONDS = 90.0
+DEFAULT_REQUEST_TIMEOUT = 10.0
+# Calls given up on by run_with_deadline that may still be running, at most
+MAX_ABANDONED_CALLS = int(os.environ.get("SUMMIFY_MAX_ABANDONED_CALLS", 8))
+
+logger = logging.getLogger("deadline")
+
+# Threads of calls that outlived their deadline; pruned as they finish
+_abandoned: set = set()
+_abandoned_lock = threading.Lock()
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a stage runs out of time. Carries a report of what was finished.
+    """
+    def __init__(self, stage: str, progress: Dict[str, Any]):
+        self.stage = stage
+        self.progress = progress
+        super().__init__(
+            f"Deadline exceeded during '{stage}' after {progress.get('elapsed_seconds', 0):.1f}s"
+        )
+
+class Deadline:
+    """
+    A request-wide time budget.
+
+    Stages take a share of whatever is left with ``child()``; children never
+    outlive their parent and record progress into the same report.
+    """
+    def __init__(self, seconds: Optional[float] = None, _parent: Optional["Deadline"] = None):
+        now = time.monotonic()
+        self.seconds = seconds
+        self.expires_at = now + seconds if seconds is not None else None
+        if _parent is not None:
+            self.started_at = _parent.started_at
+            self.progress = _parent.progress
+            self.total_seconds = _parent.total_seconds
+        else:
+            self.started_at = now
+            self.progress: List[Dict[str, Any]] = []
+            self.total_seconds = seconds
+
+    @classmethod
+    def from_input(cls, input_data: Dict[str, Any]) -> "Deadline":
+        """
+        Build a deadline from a request's ``deadline_seconds`` or SUMMIFY_DEADLINE_SECONDS.
+        """
+        seconds = input_data.get("deadline_seconds") or os.environ.get(
+            "SUMMIFY_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS
+        )
+        return cls(float(seconds))
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def child(self, share: float = 1.0) -> "Deadline":
+        """
+        Give a stage ``share`` of the remaining budget.
+        """
+        if self.expires_at is None:
+            return Deadline(None, _parent=self)
+        child = Deadline(self.remaining() * share, _parent=self)
+        # The child reads the clock after the parent did; don't let that outlast the parent
+        child.expires_at = min(child.expires_at, self.expires_at)
+        return child
+
+    def check(self, stage: str) -> None:
+        """
+        Raise DeadlineExceeded if no time is left for a stage.
+        """
+        if self.expired():
+            raise DeadlineExceeded(stage, self.report())
+
+    def timeout(self, cap: float = DEFAULT_REQUEST_TIMEOUT) -> float:
+        """
+        Timeout for a single network call: the remaining budget, capped.
+        """
+        return max(0.1, min(cap, self.remaining()))
+
+    def request_options(self) -> Dict[str, Any]:
+        """
+        ``request_options`` for google.generativeai calls; empty when there is no limit.
+        """
+        if self.expires_at is None:
+            return {}
+        return {"timeout": max(0.1, self.remaining())}
+
+    def mark(self, stage: str, **details) -> None:
+        """
+        Record that a stage completed.
+        """
+        entry = {"stage": stage, "elapsed_seconds": round(time.monotonic() - self.started_at, 3)}
+        entry.update(details)
+        self.progress.append(entry)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "deadline_seconds": self.total_seconds,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "completed_stages": list(self.progress),
+        }
+
+def ensure_deadline(deadline: Optional[Deadline]) -> Deadline:
+    """
+    Return the given deadline, or an unlimited one for callers that don't pass one.
+    """
+    return deadline if deadline is not None else Deadline(None)
+
+def abandoned_calls() -> int:
+    """
+    How many calls given up on by run_with_deadline are still running.
+    """
+    with _abandoned_lock:
+        _abandoned.difference_update([thread for thread in _abandoned if not thread.is_alive()])
+        return len(_abandoned)
+
+def run_with_deadline(stage: str, deadline: Deadline, func: Callable, *args, **kwargs):
+    """
+    Run a blocking call that has no timeout of its own, giving up when the deadline passes.
+
+    The call keeps running in a daemon thread, so it can't keep the worker alive
+    once the request has been answered. Abandoned calls are tracked: once
+    MAX_ABANDONED_CALLS of them are still running, new calls are refused rather
+    than piling up more threads.
+    """
+    if deadline.expires_at is None:
+        return func(*args, **kwargs)
+    deadline.check(stage)
+    running = abandoned_calls()
+    if running >= MAX_ABANDONED_CALLS:
+        logger.warning(f"Refusing '{stage}': {running} calls are still running past their deadline")
+        raise DeadlineExceeded(stage, deadline.report())
+
+    results: "queue.Queue" = queue.Queue(maxsize=1)
+
+    def target():
+        try:
+            results.put((True, func(*args, **kwargs)))
+        except BaseException as e:
+            results.put((False, e))
+
+    thread = threading.Thread(target=target, name=f"deadline-{stage}", daemon=True)
+    thread.start()
+    try:
+        ok, value = results.get(timeout=deadline.remaining())
+    except queue.Empty:
+        with _abandoned_lock:
+            _abandoned.add(thread)
+        logger.warning(f"Gave up on '{stage}' at its deadline; {abandoned_calls()} abandoned calls still running")
+        raise DeadlineExceeded(stage, deadline.report())
+    if not ok:
+        raise value
+    return value
@@ -0,0 +1,232 @@
+import os
+import re
+import sys
+import json
+import zlib
+import random
+import logging
+import argparse
+import unicodedata
+from array import array
+from contextlib import ExitStack
+from typing import Dict, Any, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger("deck-builder")
+
+# MinHash signatures of NUM_PERM values, split into BANDS bands for LSH. Two
+# cards share a band (and get compared) with probability s**ROWS per band for
+# Jaccard similarity s; with these settings cards at 0.6 almost always meet and
+# cards at 0.3 rarely do.
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_CHARS = 4
+# Estimated Jaccard similarity above which two cards are the same card
+SIMILARITY_THRESHOLD = 0.7
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+def normalize(text: str) -> str:
+    """
+    Lowercase, strip accents and punctuation, collapse whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+def signature(front: str, back: str) -> List[int]:
+    """
+    MinHash signature of a card's character shingles, front and back together.
+    """
+    text = f"{normalize(front)} | {normalize(back)}"
+    hashes = {zlib.crc32(text[i:i + SHINGLE_CHARS].encode("utf-8"))
+              for i in range(max(1, len(text) - SHINGLE_CHARS + 1))}
+    return [min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS]
+
+def iter_flashcards(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Cards from flashcard JSON files (or directories of them) in a stable order.
+
+    A file is {"flashcards": [...]}, as written by flashcards_api.py, its
+    result cache or this module. A card's video is its own ``video_id``,
+    else the file's, else the file name; ``start`` is kept when a card has one.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith(".json"))
+            yield from iter_flashcards(os.path.join(path, name) for name in names)
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping {path}: {str(e)}")
+            continue
+        if not isinstance(data, dict):
+            continue
+        default_video = data.get("video_id") or os.path.splitext(os.path.basename(path))[0]
+        for card in data.get("flashcards") or []:
+            front, back = card.get("front", ""), card.get("back", "")
+            if not front.strip():
+                continue
+            yield {
+                "front": front,
+                "back": back,
+                "video_id": card.get("video_id") or default_video,
+                "start": card.get("start"),
+                # Cards from a merged deck bring their duplicates' provenance along
+                "sources": card.get("sources"),
+            }
+
+def _sources(card: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return card.get("sources") or [{"video_id": card["video_id"], "start": card.get("start")}]
+
+class DeckBuilder:
+    """
+    Groups near-duplicate cards with MinHash and LSH, remembering only
+    signatures and indexes: card text is never kept, so the cards can be
+    streamed twice, once to group and once to write.
+    """
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.cards = 0
+        # Per card, the group it joined; per group, its first card and signature
+        self.group_of = array("i")
+        self.first_card = array("i")
+        self.signatures = array("I")
+        self.buckets: List[Dict[Tuple[int, ...], int]] = [{} for _ in range(BANDS)]
+        # Provenance of the cards folded into each group after its first
+        self.merged: Dict[int, List[Dict[str, Any]]] = {}
+
+    def _similarity(self, group: int, sig: List[int]) -> float:
+        stored = self.signatures[group * NUM_PERM:(group + 1) * NUM_PERM]
+        return sum(1 for x, y in zip(stored, sig) if x == y) / NUM_PERM
+
+    def add(self, card: Dict[str, Any]) -> int:
+        """
+        Place one card; returns its group.
+        """
+        sig = signature(card["front"], card["back"])
+        bands = [tuple(sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+        group = -1
+        for band, key in enumerate(bands):
+            candidate = self.buckets[band].get(key)
+            if candidate is not None and self._similarity(candidate, sig) >= self.threshold:
+                group = candidate
+                break
+        if group < 0:
+            group = len(self.first_card)
+            self.first_card.append(self.cards)
+            self.signatures.extend(sig)
+            for band, key in enumerate(bands):
+                self.buckets[band].setdefault(key, group)
+        else:
+            self.merged.setdefault(group, []).extend(_sources(card))
+        self.group_of.append(group)
+        self.cards += 1
+        return group
+
+    def unique(self, cards: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Given the same cards again, in the same order, yield the first card of
+        each group with the provenance of every card in it.
+        """
+        for index, card in enumerate(cards):
+            group = self.group_of[index]
+            if self.first_card[group] != index:
+                continue
+            yield {
+                "front": card["front"],
+                "back": card["back"],
+                "sources": _sources(card) + self.merged.get(group, []),
+            }
+
+    @property
+    def groups(self) -> int:
+        return len(self.first_card)
+
+def write_json(cards: Iterable[Dict[str, Any]], f: TextIO) -> int:
+    """
+    Write {"flashcards": [...]} one card at a time.
+
+    Returns:
+        The number of cards written
+    """
+    count = 0
+    f.write('{"flashcards": [')
+    for card in cards:
+        f.write(",\n  " if count else "\n  ")
+        f.write(json.dumps(card, ensure_ascii=False))
+        count += 1
+    f.write("\n]}\n")
+    return count
+
+ANKI_HEADER = "#separator:tab\n#html:false\n#tags column:3\n"
+
+def _tsv_field(text: str) -> str:
+    return text.replace("\t", "    ").replace("\r", " ").replace("\n", " ")
+
+def anki_line(card: Dict[str, Any], tags: bool = True) -> str:
+    """
+    One card in Anki's tab-separated import format. With ``tags`` the card
+    is tagged yt::<video_id> for every video it came from.
+    """
+    line = f"{_tsv_field(card.get('front', ''))}\t{_tsv_field(card.get('back', ''))}"
+    if tags:
+        videos = dict.fromkeys(source["video_id"] for source in card.get("sources") or [])
+        line += "\t" + " ".join(f"yt::{video}" for video in videos)
+    return line + "\n"
+
+def build_deck(paths: List[str], json_path: Optional[str] = None, anki_path: Optional[str] = None,
+               threshold: float = SIMILARITY_THRESHOLD) -> Dict[str, int]:
+    """
+    Merge the flashcards in ``paths`` into one deck without near-duplicates,
+    written as JSON and/or Anki TSV in a single streaming pass.
+
+    Returns:
+        Counts of cards read, kept and dropped as duplicates
+    """
+    builder = DeckBuilder(threshold)
+    for card in iter_flashcards(paths):
+        builder.add(card)
+
+    with ExitStack() as stack:
+        json_file = stack.enter_context(open(json_path, "w", encoding="utf-8")) if json_path else None
+        anki_file = stack.enter_context(open(anki_path, "w", encoding="utf-8")) if anki_path else None
+        if anki_file:
+            anki_file.write(ANKI_HEADER)
+
+        def exported(cards: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            for card in cards:
+                if anki_file:
+                    anki_file.write(anki_line(card))
+                yield card
+
+        unique = exported(builder.unique(iter_flashcards(paths)))
+        if json_file:
+            write_json(unique, json_file)
+        else:
+            for _ in unique:
+                pass
+    return {"cards": builder.cards, "unique": builder.groups, "duplicates": builder.cards - builder.groups}
+
+def main():
+    """
+    Merge flashcard files from many videos into one deck.
+    """
+    parser = argparse.ArgumentParser(description="Merge flashcards from many videos, dropping near-duplicates")
+    parser.add_argument("inputs", nargs="+", help="flashcard JSON files or directories of them")
+    parser.add_argument("--json", help="write the deck as JSON here")
+    parser.add_argument("--anki", help="write the deck as Anki TSV here")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help="similarity (0-1) above which two cards are duplicates")
+    args = parser.parse_args()
+    if not args.json and not args.anki:
+        parser.error("give --json and/or --anki")
+
+    print(json.dumps(build_deck(args.inputs, args.json, args.anki, args.threshold)))
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
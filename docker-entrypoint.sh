@@ -24,5 +24,10 @@ echo "PORT: $PORT"
 echo "NODE_ENV: $NODE_ENV"
 echo "In Render: $RENDER"
 
+# Run queued jobs (/api/jobs) in the background; SUMMIFY_JOB_WORKERS=0 turns this off
+if [ "${SUMMIFY_JOB_WORKERS:-2}" != "0" ]; then
+  python3 /app/job_worker.py --workers "${SUMMIFY_JOB_WORKERS:-2}" &
+fi
+
 # Execute the command passed to this script (usually npm run start)
 exec "$@" 
\ No newline at end of file
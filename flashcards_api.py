@@ -1,8 +1,14 @@
 import os
 import sys
 import json
-import google.generativeai as genai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from deadline import Deadline, DeadlineExceeded, ensure_deadline
+from instrumentation import start_request, finish_request, span
+from transcript_cache import load_result, result_cache_key, store_result
+import model_router
+import llm_backend
+import cost_ledger
+from cost_ledger import BudgetExceeded
 
 class Flashcard:
     def __init__(self, front: str, back: str):
@@ -30,23 +36,28 @@ def setup_api_keys() -> None:
                         # Skip lines that don't have the format KEY=VALUE
                         continue
     
-    # Configure Gemini API
-    if os.environ.get("GEMINI_API_KEY"):
-        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-    else:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    # Configure the LLM backend
+    llm_backend.configure_backend()
 
-def generate_flashcards(summary: str, num_cards: int = 10) -> List[Dict[str, str]]:
+def generate_flashcards(summary: str, num_cards: int = 10, deadline: Optional[Deadline] = None,
+                        routing: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
     """
     Generate flashcards based on a summary using Gemini API.
     
     Args:
         summary: The text summary
         num_cards: Number of flashcards to generate (default: 10)
+        deadline: Time budget for the generation call (default: no limit)
+        routing: The model_router decision to follow (default: route here)
         
     Returns:
         A list of flashcard dictionaries
+    
+    Raises:
+        DeadlineExceeded: If the deadline passes before or during generation
     """
+    deadline = ensure_deadline(deadline)
+    deadline.check("flashcards")
     # Create the prompt
     prompt = f"""
 You are a study aid creator that makes effective flashcards to help users remember key concepts.
@@ -79,16 +90,12 @@ Output only the JSON array without any additional text or explanations.
 """
 
     try:
-        # Configure the model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
         # Generate the flashcards
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.2,  # Lower temperature for more focused cards
-            )
-        )
+        if routing is None:
+            routing = model_router.route("flashcards", llm_backend.estimate_tokens(summary), deadline, items=num_cards)
+        response = llm_backend.generate("flashcards", prompt, temperature=0.2,  # Lower temperature for more focused cards
+                                        max_output_tokens=routing["max_output_tokens"], deadline=deadline,
+                                        model=routing["model"])
         
         # Extract the JSON from the response
         response_text = response.text.strip()
@@ -114,7 +121,10 @@ Output only the JSON array without any additional text or explanations.
             print("Error: Could not extract JSON from response")
             return []
     
+    except BudgetExceeded:
+        raise
     except Exception as e:
+        deadline.check("flashcards")
         print(f"Error generating flashcards: {str(e)}")
         return []
 
@@ -126,6 +136,7 @@ def process_api_request(input_file: str, output_file: str) -> None:
         input_file: Path to JSON file with input data
         output_file: Path to write output JSON data
     """
+    start_request("flashcards")
     try:
         # Read input data
         with open(input_file, 'r') as f:
@@ -133,60 +144,110 @@ def process_api_request(input_file: str, output_file: str) -> None:
         
         summary = input_data.get('summary')
         num_cards = input_data.get('num_cards', 10)
+        deadline = Deadline.from_input(input_data)
+        # Clients that know the video pass it along so its spend is counted per video
+        cost_ledger.set_video(input_data.get('video_id'))
         
         if not summary:
             raise ValueError("Summary is required")
+
+        # Pick the model and output budget for this input
+        routing = model_router.route("flashcards", llm_backend.estimate_tokens(summary), deadline, items=num_cards)
+        # The same summary gets the same flashcards from the same model again, often precomputed by hot_videos.py.
+        # The video is part of the key because the cached result names it for deck_builder.py
+        result_key = result_cache_key("flashcards", routing["model"], summary, num_cards, input_data.get('video_id'))
+        with span("flashcards:cache") as record:
+            cached_output = load_result("flashcards", result_key)
+            record["hit"] = cached_output is not None
+        if cached_output is not None:
+            cost_ledger.record_cache_hit("flashcards")
+            with span("write_output"):
+                with open(output_file, 'w') as f:
+                    json.dump(cached_output, f)
+            return
         
         # Generate flashcards
-        flashcards = generate_flashcards(summary, num_cards)
+        flashcards = generate_flashcards(summary, num_cards, deadline, routing)
         
         # Prepare output data
         output_data = {
-            'flashcards': flashcards
+            'flashcards': flashcards,
+            'routing': routing,
         }
+        if input_data.get('video_id'):
+            # Provenance for deck_builder.py when cached results are merged into a deck
+            output_data['video_id'] = input_data['video_id']
         
         # Write output data
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f)
+        with span("write_output"):
+            with open(output_file, 'w') as f:
+                json.dump(output_data, f)
+        # An empty list means generation failed; let the next request try again
+        if flashcards:
+            store_result("flashcards", result_key, output_data)
             
     except Exception as e:
         # Write error to output file
+        error_data = {'error': str(e)}
+        if isinstance(e, DeadlineExceeded):
+            error_data['error_type'] = "DeadlineExceeded"
+            error_data['progress'] = e.progress
+        elif isinstance(e, BudgetExceeded):
+            error_data['error_type'] = "BudgetExceeded"
         with open(output_file, 'w') as f:
-            json.dump({
-                'error': str(e)
-            }, f)
+            json.dump(error_data, f)
         raise
+    finally:
+        finish_request()
 
-def study_flashcards_in_terminal(flashcards):
+def study_flashcards_in_terminal(flashcards, video_id: str = "local", user_id: str = "local") -> None:
     """
-    Example placeholder or real implementation of
-    the "study_flashcards_in_terminal" function.
+    Add the flashcards to the user's spaced-repetition deck, then review
+    every card due, from this video or any other studied before.
     """
-    for i, card in enumerate(flashcards, start=1):
-        front = card.get("front", "")
-        back = card.get("back", "")
-        print(f"Card {i}: Front: {front}")
+    from srs_scheduler import get_deck, GRADES
+
+    deck = get_deck(user_id)
+    deck.add(video_id, flashcards)
+    cards = deck.due(limit=1000)
+    if not cards:
+        print("No cards are due. Come back later!")
+        return
+    for i, card in enumerate(cards, start=1):
+        print(f"\nCard {i}/{len(cards)}: Front: {card['front']}")
         input("Press Enter to view the back...")
-        print(f"Back: {back}")
-        input("Press Enter to continue to the next card...")
+        print(f"Back: {card['back']}")
+        while True:
+            grade = input(f"How well did you know it? ({'/'.join(GRADES)} or 0-5, q to stop): ").strip()
+            if grade.lower() == "q":
+                return
+            try:
+                card = deck.review(card["card_id"], grade)
+                break
+            except ValueError:
+                print("Invalid grade.")
+        print(f"Next review in {card['interval_days']:g} day(s).")
 
 def export_flashcards_to_json(flashcards, filename: str) -> None:
     """
-    Export flashcards to a JSON file.
+    Export flashcards (any iterable of cards) to a JSON file, one card at a time.
+    To merge many videos' cards into one deck, use deck_builder.py.
     """
+    from deck_builder import write_json
+
     with open(filename, "w", encoding="utf-8") as f:
-        json.dump({"flashcards": flashcards}, f, ensure_ascii=False, indent=2)
+        write_json(flashcards, f)
 
 def export_to_anki_format(flashcards, filename: str) -> None:
     """
     Export flashcards in a simple Anki-compatible text format.
     Each line contains 'front\tback'.
     """
+    from deck_builder import anki_line
+
     with open(filename, "w", encoding="utf-8") as f:
         for card in flashcards:
-            front = card.get("front", "").replace("\t", "    ")
-            back = card.get("back", "").replace("\t", "    ")
-            f.write(f"{front}\t{back}\n")
+            f.write(anki_line(card, tags=False))
 
 def main():
     """
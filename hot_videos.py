@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import logging
+import argparse
+import tempfile
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import language_id
+
+logger = logging.getLogger("hot-videos")
+
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+# Recent traffic decides what is hot; a day of traffic is the baseline a rising video is compared to
+FAST_HALF_LIFE_SECONDS = 3600.0
+SLOW_HALF_LIFE_SECONDS = 24 * 3600.0
+# Videos tracked by name; the sketch itself counts every video in fixed memory
+MAX_CANDIDATES = 1000
+HOT_MIN_REQUESTS_PER_HOUR = 2.0
+RISING_MIN_TREND = 3.0
+DEFAULT_TOP = 20
+# Prewarming only uses YouTube while at least this share of the rate limiter's burst is free,
+# so user requests never queue behind it
+PREWARM_RESERVE_SHARE = 0.5
+PREWARM_NICENESS = 10
+# Number of items the quiz and flashcard routes ask for by default
+PREWARM_QUIZ_QUESTIONS = 5
+PREWARM_FLASHCARDS = 10
+# Request ids remembered between reads of a followed log; a request's spans are written within seconds
+SEEN_REQUESTS_KEPT = 10000
+
+class DecayingCountMinSketch:
+    """
+    Count-min sketch whose counts halve every ``half_life`` seconds.
+
+    Decay is applied forward: a hit at time t is added with weight
+    2^((t - origin) / half_life) and estimates are divided by the same factor
+    at query time, so the table never has to be swept. Estimates only err
+    upwards, by at most about e/width of the total count.
+    """
+    def __init__(self, half_life: float, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH,
+                 origin: Optional[float] = None):
+        self.half_life = half_life
+        self.width = width
+        self.depth = depth
+        self.origin = origin
+        self.rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+
+    def _columns(self, key: str) -> Iterator[int]:
+        # Double hashing: depth independent-enough columns from two hashes
+        data = key.encode("utf-8")
+        h1 = zlib.crc32(data)
+        h2 = zlib.adler32(data) | 1
+        for i in range(self.depth):
+            yield (h1 + i * h2) % self.width
+
+    def _weight(self, t: float) -> float:
+        return 2.0 ** ((t - self.origin) / self.half_life)
+
+    def _rebase(self, t: float) -> None:
+        # Keep the weights far from overflowing by moving the origin forward
+        factor = 2.0 ** -((t - self.origin) / self.half_life)
+        for row in self.rows:
+            for i in range(self.width):
+                row[i] *= factor
+        self.origin = t
+
+    def add(self, key: str, t: float, count: float = 1.0) -> None:
+        if self.origin is None:
+            self.origin = t
+        if (t - self.origin) / self.half_life > 500:
+            self._rebase(t)
+        weight = count * self._weight(t)
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += weight
+
+    def estimate(self, key: str, now: float) -> float:
+        """
+        The decayed count of ``key`` as of ``now``.
+        """
+        if self.origin is None:
+            return 0.0
+        raw = min(row[column] for row, column in zip(self.rows, self._columns(key)))
+        # Decay rather than divide: long after the origin the weight itself would overflow
+        return raw * 2.0 ** -((now - self.origin) / self.half_life)
+
+    def rate_per_hour(self, key: str, now: float) -> float:
+        # At a steady rate r the decayed count settles at r * half_life / ln 2
+        return self.estimate(key, now) * math.log(2) / self.half_life * 3600.0
+
+class HotVideoTracker:
+    """
+    Finds hot and rising videos in a stream of requests.
+
+    Two decaying sketches count requests per video: one that forgets within
+    hours and one that remembers about a day. A video is hot when its recent
+    request rate is high, and rising when that rate is well above its daily one.
+    """
+    def __init__(self, max_candidates: int = MAX_CANDIDATES):
+        self.fast = DecayingCountMinSketch(FAST_HALF_LIFE_SECONDS)
+        self.slow = DecayingCountMinSketch(SLOW_HALF_LIFE_SECONDS)
+        self.max_candidates = max_candidates
+        self.candidates: Dict[str, float] = {}
+        self.last_seen = 0.0
+
+    def observe(self, video_id: str, t: float) -> None:
+        self.fast.add(video_id, t)
+        self.slow.add(video_id, t)
+        self.candidates[video_id] = t
+        self.last_seen = max(self.last_seen, t)
+        if len(self.candidates) > 2 * self.max_candidates:
+            self._prune(t)
+
+    def _prune(self, now: float) -> None:
+        ranked = sorted(self.candidates, key=lambda video_id: self.fast.estimate(video_id, now), reverse=True)
+        self.candidates = {video_id: self.candidates[video_id] for video_id in ranked[:self.max_candidates]}
+
+    def ranking(self, now: Optional[float] = None, top: int = DEFAULT_TOP) -> List[Dict[str, Any]]:
+        """
+        The ``top`` hot or rising videos, hottest first, as of ``now`` (by
+        default the last request seen, so old logs can be analyzed too).
+
+        Returns:
+            [{"video_id", "requests_per_hour", "daily_requests_per_hour", "trend", "hot", "rising"}]
+        """
+        now = now if now is not None else (self.last_seen or time.time())
+        ranked = []
+        for video_id in self.candidates:
+            recent = self.fast.rate_per_hour(video_id, now)
+            daily = self.slow.rate_per_hour(video_id, now)
+            # A video first seen minutes ago has almost no daily rate; don't let that blow up
+            trend = recent / max(daily, 1.0 / 24)
+            hot = recent >= HOT_MIN_REQUESTS_PER_HOUR
+            rising = trend >= RISING_MIN_TREND and recent >= HOT_MIN_REQUESTS_PER_HOUR / 2
+            if hot or rising:
+                ranked.append({
+                    "video_id": video_id,
+                    "requests_per_hour": round(recent, 2),
+                    "daily_requests_per_hour": round(daily, 2),
+                    "trend": round(trend, 2),
+                    "hot": hot,
+                    "rising": rising,
+                })
+        ranked.sort(key=lambda entry: entry["requests_per_hour"] * max(1.0, entry["trend"]), reverse=True)
+        return ranked[:top]
+
+def _request_video(event: Dict[str, Any]) -> Optional[str]:
+    video_id = event.get("video_id")
+    if not video_id and event.get("url"):
+        # Lazy: only plain request logs carry URLs, and transcript imports the fetchers
+        from transcript import get_video_id
+        try:
+            video_id = get_video_id(event["url"])
+        except ValueError:
+            return None
+    return video_id
+
+def read_request_log(path: str, offset: int = 0,
+                     seen: Optional[OrderedDict] = None) -> Tuple[List[Tuple[str, float]], int]:
+    """
+    Read (video_id, timestamp) pairs from a JSON-lines log, starting at byte ``offset``.
+
+    Accepts the span events of SUMMIFY_EVENTS_FILE (counted once per
+    request_id) as well as plain request lines with a video_id or url and a
+    timestamp. A trailing partial line is left for the next read.
+
+    Pass the same ``seen`` to every read of a log that is being followed: a
+    request whose spans straddle two reads is then still counted once. It
+    keeps the last SEEN_REQUESTS_KEPT requests.
+
+    Returns:
+        The requests and the offset to continue from
+    """
+    requests = []
+    seen = OrderedDict() if seen is None else seen
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            video_id = _request_video(event)
+            if not video_id:
+                continue
+            request_id = event.get("request_id")
+            if request_id is not None:
+                if (request_id, video_id) in seen:
+                    seen.move_to_end((request_id, video_id))
+                    continue
+                seen[(request_id, video_id)] = True
+                if len(seen) > SEEN_REQUESTS_KEPT:
+                    seen.popitem(last=False)
+            requests.append((video_id, float(event.get("timestamp") or time.time())))
+    return requests, offset
+
+def youtube_headroom() -> bool:
+    """
+    Whether the shared YouTube rate limiter has enough slack for background fetches.
+    """
+    from transcript import YOUTUBE_HOST, rate_limiter
+    return rate_limiter.headroom(YOUTUBE_HOST) >= rate_limiter.burst * PREWARM_RESERVE_SHARE
+
+def _run_api(module_name: str, input_data: Dict[str, Any], work_dir: str) -> Optional[Dict[str, Any]]:
+    import importlib
+    module = importlib.import_module(module_name)
+    fd, input_file = tempfile.mkstemp(dir=work_dir, prefix="prewarm_", suffix=".json")
+    output_file = input_file[:-len(".json")] + "_output.json"
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(input_data, f)
+        try:
+            module.process_api_request(input_file, output_file)
+        except Exception as e:
+            logger.warning(f"Prewarming with {module_name} failed: {str(e)}")
+        try:
+            with open(output_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    finally:
+        for path in (input_file, output_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+def prewarm(video_id: str, language: str = language_id.AUTO, work_dir: Optional[str] = None) -> bool:
+    """
+    Fetch a video's transcript and precompute its summary, quiz and flashcards,
+    through the same entry points (and so the same caches) as user requests.
+
+    Returns:
+        True if a summary is cached for the video afterwards
+    """
+    work_dir = work_dir or tempfile.gettempdir()
+    output = _run_api("summarize_api", {"url": f"https://www.youtube.com/watch?v={video_id}", "language": language}, work_dir)
+    # Failed requests are never cached, so there is nothing to build the quiz and flashcards on
+    if not output or "error" in output or "summary" not in output:
+        logger.info(f"Could not prewarm {video_id}: {(output or {}).get('error', 'no output')}")
+        return False
+    # The quiz and flashcard routes send the summary text back, so these land under the keys they will use
+    _run_api("quiz_api", {"summary": output["summary"], "num_questions": PREWARM_QUIZ_QUESTIONS}, work_dir)
+    _run_api("flashcards_api", {"summary": output["summary"], "num_cards": PREWARM_FLASHCARDS}, work_dir)
+    return True
+
+def is_prewarmed(video_id: str, language: str = language_id.AUTO) -> bool:
+    import transcript_cache
+    key = transcript_cache.result_cache_key("summarize", video_id, language, None)
+    return transcript_cache.load_result("summary", key) is not None
+
+def prewarm_round(tracker: HotVideoTracker, top: int, language: str = language_id.AUTO, pause: float = 1.0) -> int:
+    """
+    Prewarm the current hot videos that aren't cached yet, while the rate limiter has room.
+
+    Returns:
+        The number of videos prewarmed
+    """
+    warmed = 0
+    for entry in tracker.ranking(time.time(), top=top):
+        video_id = entry["video_id"]
+        if is_prewarmed(video_id, language):
+            continue
+        if not youtube_headroom():
+            logger.info("YouTube rate limit is busy; leaving the remaining videos for the next round")
+            break
+        logger.info(f"Prewarming {video_id} ({entry['requests_per_hour']} requests/hour, trend {entry['trend']})")
+        if prewarm(video_id, language):
+            warmed += 1
+        time.sleep(pause)
+    return warmed
+
+def main():
+    """
+    Report hot and rising videos from a request log, and optionally keep their results cached.
+    """
+    parser = argparse.ArgumentParser(description="Find hot videos in a request log and prewarm their caches")
+    parser.add_argument("log", nargs="?", default=os.environ.get("SUMMIFY_EVENTS_FILE"),
+                        help="JSON-lines request or event log (default: SUMMIFY_EVENTS_FILE)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP)
+    parser.add_argument("--prewarm", action="store_true", help="precompute results for the hot videos")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep following the log, prewarming every SECONDS")
+    parser.add_argument("--language", default=language_id.AUTO)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    if not args.log:
+        print("No request log given and SUMMIFY_EVENTS_FILE is not set")
+        sys.exit(1)
+
+    if args.prewarm:
+        # Background work: yield the CPU to user requests, and keep our own requests
+        # out of the log so prewarming doesn't make a video look hotter
+        os.nice(PREWARM_NICENESS)
+        os.environ.pop("SUMMIFY_EVENTS_FILE", None)
+        from summarize_api import setup_api_keys
+        setup_api_keys()
+
+    tracker = HotVideoTracker()
+    offset = 0
+    seen = OrderedDict()
+    while True:
+        requests, offset = read_request_log(args.log, offset, seen)
+        for video_id, t in requests:
+            tracker.observe(video_id, t)
+        if args.prewarm:
+            warmed = prewarm_round(tracker, args.top, args.language)
+            logger.info(f"Prewarmed {warmed} videos")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+    print(json.dumps(tracker.ranking(top=args.top), indent=2))
+
+if __name__ == "__main__":
+    main()
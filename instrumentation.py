@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, Iterator, Tuple
+from rate_limiter import FileStateStore
+
+logger = logging.getLogger("summify-events")
+
+# Histogram buckets for stage durations, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _series_key(name: str, labels: Dict[str, Any]) -> str:
+    return name + json.dumps({k: str(v) for k, v in sorted(labels.items())}, separators=(",", ":"))
+
+def _split_series_key(key: str) -> Tuple[str, Dict[str, str]]:
+    brace = key.index("{")
+    return key[:brace], json.loads(key[brace:])
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    merged = dict(labels)
+    if extra:
+        merged.update(extra)
+    if not merged:
+        return ""
+    parts = []
+    for k, v in merged.items():
+        escaped = v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+class MetricsRegistry:
+    """
+    Cumulative counters and histograms.
+
+    Each worker process collects into memory; ``flush()`` merges the values into
+    the shared state file (SUMMIFY_METRICS_FILE) so totals survive the
+    process-per-request model and can be scraped in Prometheus text format.
+    """
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _series_key(name, labels)
+        with self._lock:
+            histogram = self._histograms.setdefault(key, {
+                "buckets": [0] * len(DURATION_BUCKETS),
+                "sum": 0.0,
+                "count": 0,
+            })
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current totals: the shared state file (if any) plus anything not yet flushed.
+        """
+        with self._lock:
+            state = {
+                "counters": dict(self._counters),
+                "histograms": {k: dict(v, buckets=list(v["buckets"])) for k, v in self._histograms.items()},
+            }
+        if self.state_file and os.path.exists(self.state_file):
+            with FileStateStore(self.state_file).transaction() as shared:
+                _merge_metrics(state, shared)
+        return state
+
+    def flush(self) -> None:
+        """
+        Merge collected values into the shared state file and reset the local totals.
+        """
+        if not self.state_file:
+            return
+        with self._lock:
+            local = {"counters": self._counters, "histograms": self._histograms}
+            self._counters = {}
+            self._histograms = {}
+        try:
+            with FileStateStore(self.state_file).transaction() as shared:
+                _merge_metrics(shared, local)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics to {self.state_file}: {str(e)}")
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        state = self.snapshot()
+        lines: List[str] = []
+        seen_types = set()
+
+        for key in sorted(state["counters"]):
+            name, labels = _split_series_key(key)
+            if name not in seen_types:
+                lines.append(f"# TYPE {name} counter")
+                seen_types.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {state['counters'][key]:g}")
+
+        for key in sorted(state["histograms"]):
+            name, labels = _split_series_key(key)
+            histogram = state["histograms"][key]
+            if name not in seen_types:
+                lines.append(f"# TYPE {name} histogram")
+                seen_types.add(name)
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': f'{bound:g}'})} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+def _merge_metrics(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    counters = target.setdefault("counters", {})
+    for key, value in source.get("counters", {}).items():
+        counters[key] = counters.get(key, 0.0) + value
+    histograms = target.setdefault("histograms", {})
+    for key, histogram in source.get("histograms", {}).items():
+        existing = histograms.get(key)
+        if existing is None:
+            histograms[key] = {"buckets": list(histogram["buckets"]), "sum": histogram["sum"], "count": histogram["count"]}
+        else:
+            existing["buckets"] = [a + b for a, b in zip(existing["buckets"], histogram["buckets"])]
+            existing["sum"] += histogram["sum"]
+            existing["count"] += histogram["count"]
+
+metrics = MetricsRegistry(os.environ.get("SUMMIFY_METRICS_FILE"))
+
+class Tracer:
+    """
+    Collects the spans of one request and emits each as a JSON event.
+
+    Events go to the "summify-events" logger and, if SUMMIFY_EVENTS_FILE is set,
+    are appended to that file as JSON lines.
+    """
+    def __init__(self, operation: str, request_id: Optional[str] = None):
+        self.operation = operation
+        self.request_id = request_id or os.urandom(6).hex()
+        self.spans: List[Dict[str, Any]] = []
+        self.events_file = os.environ.get("SUMMIFY_EVENTS_FILE")
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict[str, Any]]:
+        """
+        Time a stage. Attributes added to the yielded dict end up in the event.
+        """
+        record: Dict[str, Any] = dict(attributes)
+        status = "ok"
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield record
+        except BaseException as e:
+            status = "error"
+            record.setdefault("error_type", type(e).__name__)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_started
+            self._finish(name, status, duration, cpu, record)
+
+    def _finish(self, name: str, status: str, duration: float, cpu: float, record: Dict[str, Any]) -> None:
+        event = {
+            "event": "span",
+            "request_id": self.request_id,
+            "operation": self.operation,
+            "span": name,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            # CPU time of the span's thread; the gap to duration_ms is time spent waiting
+            "cpu_ms": round(cpu * 1000, 3),
+            "timestamp": time.time(),
+        }
+        event.update(record)
+        self.spans.append(event)
+
+        metrics.observe("summify_stage_duration_seconds", duration, operation=self.operation, stage=name, status=status)
+        metrics.inc("summify_stage_total", operation=self.operation, stage=name, status=status)
+        if "input_tokens" in record:
+            metrics.inc("summify_llm_tokens_total", record["input_tokens"], stage=name, model=record.get("model", ""), direction="input")
+        if "output_tokens" in record:
+            metrics.inc("summify_llm_tokens_total", record["output_tokens"], stage=name, model=record.get("model", ""), direction="output")
+
+        for listener in list(_span_listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"Span listener failed: {str(e)}")
+
+        line = json.dumps(event, default=str)
+        logger.info(line)
+        if self.events_file:
+            try:
+                with open(self.events_file, "a") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning(f"Failed to write event to {self.events_file}: {str(e)}")
+
+_current_tracer: contextvars.ContextVar = contextvars.ContextVar("summify_tracer", default=None)
+
+# Called with every finished span event, e.g. by job workers to report progress
+_span_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+def add_span_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    _span_listeners.append(listener)
+
+def remove_span_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener in _span_listeners:
+        _span_listeners.remove(listener)
+
+def start_request(operation: str, request_id: Optional[str] = None) -> Tracer:
+    """
+    Start tracing a request; spans opened anywhere below this call attach to it.
+    """
+    tracer = Tracer(operation, request_id)
+    _current_tracer.set(tracer)
+    return tracer
+
+def current_tracer() -> Tracer:
+    tracer = _current_tracer.get()
+    if tracer is None:
+        tracer = start_request("cli")
+    return tracer
+
+def span(name: str, **attributes):
+    """
+    Open a span on the current request's tracer.
+    """
+    return current_tracer().span(name, **attributes)
+
+def finish_request() -> None:
+    """
+    Flush the request's metrics to the shared metrics file.
+    """
+    metrics.flush()
+
+def serve_metrics(port: int) -> None:
+    """
+    Serve the cumulative metrics on http://0.0.0.0:<port>/metrics for Prometheus to scrape.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    print(f"Serving metrics on http://0.0.0.0:{port}/metrics")
+    server.serve_forever()
+
+def main():
+    """
+    Print the cumulative metrics, or serve them with --serve <port>.
+    """
+    if not metrics.state_file:
+        print("SUMMIFY_METRICS_FILE is not set, so there are no cumulative metrics to show")
+        sys.exit(1)
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve":
+        serve_metrics(int(sys.argv[2]))
+    else:
+        sys.stdout.write(metrics.render_prometheus())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger("job-store")
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmp", "jobs.sqlite3")
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RESULT_TTL_SECONDS = 24 * 3600
+# A running job whose worker hasn't reported for this long is assumed lost and handed to another worker.
+# Workers renew the lease every LEASE_SECONDS / HEARTBEATS_PER_LEASE while a job runs, spans or not.
+LEASE_SECONDS = 300.0
+HEARTBEATS_PER_LEASE = 10
+# Delay before the first retry; it doubles with every further attempt
+RETRY_BACKOFF_SECONDS = 5.0
+
+OPERATIONS = ("summarize", "quiz", "flashcards", "ask", "collection")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    operation TEXT NOT NULL,
+    input TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    progress TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, run_after);
+"""
+
+class LeaseLost(Exception):
+    """
+    The job is no longer this worker's: its lease ran out and another worker
+    claimed it, or it already finished. Whatever this worker has is dropped.
+    """
+
+def db_path() -> str:
+    return os.environ.get("SUMMIFY_JOB_DB", DEFAULT_DB_PATH)
+
+def result_ttl() -> float:
+    return float(os.environ.get("SUMMIFY_JOB_RESULT_TTL_SECONDS", DEFAULT_RESULT_TTL_SECONDS))
+
+class JobStore:
+    """
+    A durable job queue in one SQLite file, shared by the API processes that
+    submit and poll and the worker processes that run the jobs.
+
+    A job goes queued -> running -> succeeded or failed. A failed attempt
+    that is worth retrying goes back to queued with a backoff, and a
+    running job whose lease runs out (its worker died) is claimed again.
+    Finished jobs are kept for the result TTL, then purged.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or db_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Autocommit mode; writes take the lock explicitly in _transaction
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets pollers read while a worker writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Spans (and so progress updates) can finish on pipeline threads
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def submit(self, operation: str, input_data: Dict[str, Any], max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        """
+        Queue a job and return its ID.
+
+        Raises:
+            ValueError: If the operation is unknown
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation} (expected one of {', '.join(OPERATIONS)})")
+        job_id = os.urandom(8).hex()
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, operation, input, state, max_attempts, created_at, updated_at, run_after) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, operation, json.dumps(input_data), QUEUED, max_attempts, now, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A job's state, progress and (once finished) result, or None if it is unknown or expired.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+            return None
+        job = {
+            "job_id": row["id"],
+            "operation": row["operation"],
+            "state": row["state"],
+            "attempts": row["attempts"],
+            "max_attempts": row["max_attempts"],
+            "progress": json.loads(row["progress"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        return job
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest runnable job (queued and due, or running with an expired lease).
+
+        Returns:
+            {"job_id", "operation", "input", "attempts", "worker"} or None if nothing is runnable
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, operation, input, attempts FROM jobs "
+                "WHERE (state = ? AND run_after <= ?) OR (state = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, progress = '[]', worker = ?, "
+                "lease_until = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, worker, now + LEASE_SECONDS, now, row["id"]),
+            )
+        return {
+            "job_id": row["id"],
+            "operation": row["operation"],
+            "input": json.loads(row["input"]),
+            "attempts": row["attempts"] + 1,
+            "worker": worker,
+        }
+
+    # Every transition of a running job is guarded by its worker and state, so a
+    # worker whose lease was taken over cannot touch the job any more.
+    _OWNED = f"id = ? AND worker = ? AND state = '{RUNNING}'"
+
+    def _update_owned(self, conn: sqlite3.Connection, job_id: str, worker: str, assignments: str,
+                      values: tuple) -> None:
+        updated = conn.execute(f"UPDATE jobs SET {assignments} WHERE {self._OWNED}",
+                               values + (job_id, worker)).rowcount
+        if updated == 0:
+            raise LeaseLost(f"Job {job_id} is no longer leased to {worker}")
+
+    def renew_lease(self, job_id: str, worker: str) -> None:
+        """
+        Extend a running job's lease.
+
+        Raises:
+            LeaseLost: If the job is no longer this worker's
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._update_owned(conn, job_id, worker, "lease_until = ?", (now + LEASE_SECONDS,))
+
+    def update_progress(self, job_id: str, worker: str, progress: List[Dict[str, Any]]) -> None:
+        """
+        Store a running job's progress; this also renews its lease.
+
+        Raises:
+            LeaseLost: If the job is no longer this worker's
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._update_owned(conn, job_id, worker, "progress = ?, lease_until = ?, updated_at = ?",
+                               (json.dumps(progress), now + LEASE_SECONDS, now))
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> None:
+        """
+        Raises:
+            LeaseLost: If the job is no longer this worker's
+        """
+        with self._transaction() as conn:
+            self._finish(conn, job_id, worker, SUCCEEDED, result)
+
+    def fail(self, job_id: str, worker: str, result: Dict[str, Any], retry: bool = False) -> bool:
+        """
+        Record a failed attempt.
+
+        Returns:
+            True if the job was queued again, False if it failed for good
+
+        Raises:
+            LeaseLost: If the job is no longer this worker's
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(f"SELECT attempts, max_attempts FROM jobs WHERE {self._OWNED}",
+                               (job_id, worker)).fetchone()
+            if row is None:
+                raise LeaseLost(f"Job {job_id} is no longer leased to {worker}")
+            if retry and row["attempts"] < row["max_attempts"]:
+                delay = RETRY_BACKOFF_SECONDS * 2 ** (row["attempts"] - 1)
+                self._update_owned(conn, job_id, worker,
+                                   "state = ?, result = ?, run_after = ?, lease_until = NULL, updated_at = ?",
+                                   (QUEUED, json.dumps(result), now + delay, now))
+                return True
+            self._finish(conn, job_id, worker, FAILED, result)
+            return False
+
+    def _finish(self, conn: sqlite3.Connection, job_id: str, worker: str, state: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+        self._update_owned(conn, job_id, worker,
+                           "state = ?, result = ?, lease_until = NULL, finished_at = ?, expires_at = ?, updated_at = ?",
+                           (state, json.dumps(result), now, now + result_ttl(), now))
+
+    def purge_expired(self) -> int:
+        """
+        Delete finished jobs whose results have outlived the TTL.
+        """
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {row["state"]: row["n"] for row in rows}
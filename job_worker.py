@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import importlib
+import threading
+import multiprocessing
+from typing import Dict, Any, List, Optional
+from instrumentation import add_span_listener, remove_span_listener
+from job_store import JobStore, LeaseLost, LEASE_SECONDS, HEARTBEATS_PER_LEASE
+
+logger = logging.getLogger("job-worker")
+
+# The module whose process_api_request runs each operation
+HANDLERS = {
+    "summarize": "summarize_api",
+    "quiz": "quiz_api",
+    "flashcards": "flashcards_api",
+    "ask": "ask_api",
+    "collection": "collection_api",
+}
+# Failures that are likely to go away on their own; anything else fails the job at once
+RETRYABLE_ERRORS = ("RateLimited", "DeadlineExceeded")
+# A job isn't tied to an HTTP request, so it gets far more time than a synchronous call
+DEFAULT_JOB_DEADLINE_SECONDS = 600.0
+DEFAULT_WORKERS = 2
+POLL_INTERVAL_SECONDS = 0.5
+# Workers exit after this many jobs and are replaced, so module-level caches can't grow forever
+MAX_JOBS_PER_WORKER = 200
+PURGE_INTERVAL_SECONDS = 600.0
+
+_ready_modules: Dict[str, Any] = {}
+
+def _handler(operation: str):
+    name = HANDLERS[operation]
+    if name not in _ready_modules:
+        module = importlib.import_module(name)
+        module.setup_api_keys()
+        _ready_modules[name] = module
+    return _ready_modules[name]
+
+def _read_output(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def run_job(store: JobStore, job: Dict[str, Any], work_dir: str) -> None:
+    """
+    Run one claimed job through its operation's API handler and record the outcome.
+
+    Every span the handler finishes is added to the job's progress, so
+    pollers can see which stage it has reached. A heartbeat renews the lease
+    in between; if the lease is lost anyway, the outcome is dropped, since the
+    job belongs to another worker by then.
+    """
+    job_id = job["job_id"]
+    worker = job["worker"]
+    input_data = dict(job["input"])
+    input_data.setdefault("deadline_seconds", float(
+        os.environ.get("SUMMIFY_JOB_DEADLINE_SECONDS", DEFAULT_JOB_DEADLINE_SECONDS)))
+    input_file = os.path.join(work_dir, f"job_{job_id}_input.json")
+    output_file = os.path.join(work_dir, f"job_{job_id}_output.json")
+    with open(input_file, "w") as f:
+        json.dump(input_data, f)
+
+    lost = threading.Event()
+    progress: List[Dict[str, Any]] = []
+    def on_span(event: Dict[str, Any]) -> None:
+        progress.append({
+            "stage": event["span"],
+            "status": event["status"],
+            "duration_ms": event["duration_ms"],
+        })
+        if lost.is_set():
+            return
+        try:
+            store.update_progress(job_id, worker, list(progress))
+        except LeaseLost:
+            lost.set()
+
+    stopped = threading.Event()
+    def heartbeat() -> None:
+        # A stage without spans (one long LLM call, a slow fetch) must not let the lease lapse
+        while not stopped.wait(LEASE_SECONDS / HEARTBEATS_PER_LEASE):
+            try:
+                store.renew_lease(job_id, worker)
+            except LeaseLost:
+                lost.set()
+                return
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of job {job_id}: {str(e)}")
+
+    crash: Optional[Exception] = None
+    heart = threading.Thread(target=heartbeat, name=f"lease-{job_id}", daemon=True)
+    heart.start()
+    add_span_listener(on_span)
+    try:
+        _handler(job["operation"]).process_api_request(input_file, output_file)
+    except Exception as e:
+        crash = e
+    finally:
+        remove_span_listener(on_span)
+        stopped.set()
+        heart.join()
+        output = _read_output(output_file)
+        for path in (input_file, output_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    try:
+        if lost.is_set():
+            raise LeaseLost(f"Job {job_id} is no longer leased to {worker}")
+        if output is not None and "error" not in output:
+            store.complete(job_id, worker, output)
+            logger.info(f"Job {job_id} ({job['operation']}) succeeded on attempt {job['attempts']}")
+            return
+        if output is None:
+            # The handler died before writing its error; that may well be transient
+            output = {"error": str(crash) if crash else "No output", "error_type": type(crash).__name__ if crash else "NoOutput"}
+            retry = True
+        else:
+            retry = output.get("error_type") in RETRYABLE_ERRORS
+        requeued = store.fail(job_id, worker, output, retry=retry)
+    except LeaseLost:
+        logger.warning(f"Dropping the outcome of job {job_id} ({job['operation']}): another worker took it over")
+        return
+    logger.warning(f"Job {job_id} ({job['operation']}) failed on attempt {job['attempts']}: "
+                   f"{output.get('error')}{' (will retry)' if requeued else ''}")
+
+def worker_loop(name: str, poll_interval: float = POLL_INTERVAL_SECONDS,
+                max_jobs: int = MAX_JOBS_PER_WORKER, drain: bool = False) -> int:
+    """
+    Claim and run jobs until ``max_jobs`` have run, or, with ``drain``, until none is runnable.
+
+    Returns:
+        The number of jobs run
+    """
+    store = JobStore()
+    work_dir = os.path.join(os.path.dirname(store.path), "jobs")
+    os.makedirs(work_dir, exist_ok=True)
+    done = 0
+    last_purge = 0.0
+    try:
+        while done < max_jobs:
+            if time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+                purged = store.purge_expired()
+                if purged:
+                    logger.info(f"Purged {purged} expired jobs")
+                last_purge = time.time()
+            job = store.claim(name)
+            if job is None:
+                if drain:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(store, job, work_dir)
+            done += 1
+    finally:
+        store.close()
+    return done
+
+def worker_name(slot: Optional[int] = None) -> str:
+    """
+    Name the calling process claims jobs under. It carries the process's own pid,
+    so a worker that replaces a crashed one never takes over its leases.
+    """
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return name if slot is None else f"{name}:{slot}"
+
+def _worker_main(slot: int, poll_interval: float) -> None:
+    # Shutdown comes from the parent as SIGTERM; a job cut off by it is retried once its lease runs out
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(worker_name(slot), poll_interval)
+
+def main():
+    """
+    Run a pool of worker processes, replacing each one when it exits.
+    """
+    parser = argparse.ArgumentParser(description="Run queued summify jobs")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SUMMIFY_JOB_WORKERS", DEFAULT_WORKERS)))
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS)
+    parser.add_argument("--drain", action="store_true", help="run the runnable jobs in this process, then exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if args.drain:
+        count = worker_loop(worker_name(), args.poll_interval, drain=True)
+        print(f"Ran {count} jobs")
+        return
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers: Dict[int, multiprocessing.Process] = {}
+    while not stopping:
+        for slot in range(args.workers):
+            if slot not in workers or not workers[slot].is_alive():
+                process = multiprocessing.Process(target=_worker_main, args=(slot, args.poll_interval), daemon=True)
+                process.start()
+                workers[slot] = process
+        time.sleep(1.0)
+
+    for process in workers.values():
+        process.terminate()
+    for process in workers.values():
+        process.join(timeout=10)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
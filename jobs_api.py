@@ -0,0 +1,60 @@
+import sys
+import json
+from typing import Dict, Any
+from job_store import JobStore
+
+def process_api_request(input_file: str, output_file: str) -> None:
+    """
+    Submit a job or report on one, without running anything: job_worker.py does the work.
+
+    Input is either {"action": "submit", "operation": ..., "input": {...}}
+    or {"action": "status", "job_id": ...}.
+
+    Args:
+        input_file: Path to JSON file with input data
+        output_file: Path to write output JSON data
+    """
+    try:
+        with open(input_file, 'r') as f:
+            input_data = json.load(f)
+
+        action = input_data.get('action', 'status')
+        store = JobStore()
+        try:
+            if action == 'submit':
+                operation = input_data.get('operation')
+                job_id = store.submit(operation, input_data.get('input') or {})
+                output_data: Dict[str, Any] = {'job_id': job_id, 'operation': operation, 'state': 'queued'}
+            elif action == 'status':
+                job_id = input_data.get('job_id')
+                if not job_id:
+                    raise ValueError("A job ID is required")
+                output_data = store.get(job_id)
+                if output_data is None:
+                    output_data = {'error': f"Job not found: {job_id}", 'error_type': "JobNotFound"}
+            else:
+                raise ValueError(f"Unknown action: {action}")
+        finally:
+            store.close()
+
+        with open(output_file, 'w') as f:
+            json.dump(output_data, f)
+
+    except Exception as e:
+        # Write error to output file
+        with open(output_file, 'w') as f:
+            json.dump({'error': str(e)}, f)
+        raise
+
+def main():
+    """
+    Main function to handle API requests.
+    """
+    if len(sys.argv) != 3:
+        print("Usage: python jobs_api.py <input_file> <output_file>")
+        sys.exit(1)
+
+    process_api_request(sys.argv[1], sys.argv[2])
+
+if __name__ == "__main__":
+    main()
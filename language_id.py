@@ -0,0 +1,193 @@
+import re
+import math
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# Language code that asks for the video's own language instead of a fixed one
+AUTO = "auto"
+
+# Longest stretch of text looked at; the first minutes of a transcript are plenty
+MAX_CHARS = 2000
+NGRAM_SIZES = (1, 2, 3)
+# Shorter texts ("ok", "[Music]") say nothing about their language
+MIN_LETTERS = 12
+# Below this share of the probability mass the best guess is not trusted
+MIN_CONFIDENCE = 0.6
+# Every sample is in Latin script; a text mostly in another one has no model
+MIN_LATIN_SHARE = 0.5
+# A text with this share of letter pairs that never occur in the best
+# language's sample is in some other language, whatever the probabilities say
+MAX_UNSEEN_SHARE = 0.4
+
+# A few sentences of ordinary spoken text per language, the kind of thing
+# captions contain. Character n-grams of these are the whole model: small,
+# offline, and good enough to tell apart the languages videos come in here.
+SAMPLES = {
+    "en": (
+        "Hello everyone and welcome back to the channel. Today we are going to talk about how this works "
+        "and why it matters for what you do every day. First of all, let me show you the main idea, then "
+        "we will look at some examples together. If you have any questions, just leave them in the comments "
+        "below and I will try to answer them. So let's get started with the first part, which is the most "
+        "important one, because everything else builds on it. Thank you for watching and see you next time."
+    ),
+    "vi": (
+        "Xin chào các bạn và chào mừng các bạn quay trở lại với kênh của mình. Hôm nay chúng ta sẽ nói về "
+        "cách thức hoạt động của điều này và tại sao nó lại quan trọng với những gì bạn làm hằng ngày. "
+        "Trước hết, mình sẽ cho các bạn thấy ý tưởng chính, sau đó chúng ta sẽ cùng xem một vài ví dụ. "
+        "Nếu các bạn có câu hỏi nào, hãy để lại bình luận ở bên dưới và mình sẽ cố gắng trả lời. Vậy thì "
+        "chúng ta bắt đầu với phần đầu tiên, đây là phần quan trọng nhất. Cảm ơn các bạn đã xem video."
+    ),
+    "es": (
+        "Hola a todos y bienvenidos de nuevo al canal. Hoy vamos a hablar de cómo funciona esto y por qué "
+        "es importante para lo que hacéis cada día. En primer lugar, os voy a mostrar la idea principal y "
+        "después veremos algunos ejemplos juntos. Si tenéis alguna pregunta, dejadla en los comentarios y "
+        "intentaré responderla. Así que empecemos con la primera parte, que es la más importante, porque "
+        "todo lo demás se basa en ella. Gracias por ver el vídeo y hasta la próxima."
+    ),
+    "fr": (
+        "Bonjour à tous et bienvenue sur la chaîne. Aujourd'hui nous allons parler de la façon dont cela "
+        "fonctionne et de pourquoi c'est important pour ce que vous faites tous les jours. Tout d'abord, je "
+        "vais vous montrer l'idée principale, puis nous verrons quelques exemples ensemble. Si vous avez des "
+        "questions, laissez-les dans les commentaires et j'essaierai d'y répondre. Alors commençons par la "
+        "première partie, qui est la plus importante. Merci d'avoir regardé et à la prochaine fois."
+    ),
+    "de": (
+        "Hallo zusammen und willkommen zurück auf dem Kanal. Heute sprechen wir darüber, wie das "
+        "funktioniert und warum es für das wichtig ist, was ihr jeden Tag macht. Zuerst zeige ich euch die "
+        "grundlegende Idee, und danach schauen wir uns gemeinsam einige Beispiele an. Wenn ihr Fragen habt, "
+        "schreibt sie einfach unten in die Kommentare und ich versuche, sie zu beantworten. Also fangen wir "
+        "mit dem ersten Teil an, der ist nämlich der wichtigste. Danke fürs Zuschauen und bis zum nächsten Mal."
+    ),
+    "pt": (
+        "Olá a todos e bem-vindos de volta ao canal. Hoje vamos falar sobre como isso funciona e por que é "
+        "importante para o que vocês fazem todos os dias. Em primeiro lugar, vou mostrar a ideia principal e "
+        "depois vamos ver alguns exemplos juntos. Se vocês tiverem alguma pergunta, deixem nos comentários "
+        "abaixo que eu vou tentar responder. Então vamos começar pela primeira parte, que é a mais "
+        "importante, porque todo o resto depende dela. Obrigado por assistir e até a próxima."
+    ),
+    "it": (
+        "Ciao a tutti e bentornati sul canale. Oggi parliamo di come funziona questa cosa e del perché è "
+        "importante per quello che fate ogni giorno. Prima di tutto vi mostro l'idea principale, poi "
+        "vediamo insieme qualche esempio. Se avete delle domande, lasciatele nei commenti qui sotto e "
+        "cercherò di rispondere. Allora cominciamo con la prima parte, che è la più importante, perché "
+        "tutto il resto si basa su questa. Grazie per la visione e alla prossima."
+    ),
+    "id": (
+        "Halo semuanya dan selamat datang kembali di channel ini. Hari ini kita akan membahas bagaimana cara "
+        "kerjanya dan mengapa hal ini penting untuk apa yang kalian lakukan setiap hari. Pertama-tama, saya "
+        "akan menunjukkan ide utamanya, lalu kita akan melihat beberapa contoh bersama. Kalau kalian punya "
+        "pertanyaan, tulis saja di kolom komentar di bawah dan saya akan mencoba menjawabnya. Jadi mari kita "
+        "mulai dengan bagian pertama, yang merupakan bagian paling penting. Terima kasih sudah menonton."
+    ),
+}
+
+def _normalize(text: str) -> str:
+    # Keep letters (with their diacritics, the strongest clue there is) and single spaces
+    text = unicodedata.normalize("NFC", text.lower())
+    return " ".join(re.sub(r"[^\w]+|\d+|_", " ", text).split())
+
+def ngrams(text: str) -> Counter:
+    """
+    Counts of the character n-grams of a text, words padded with spaces.
+    """
+    counts: Counter = Counter()
+    for word in _normalize(text).split():
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    return counts
+
+_models: Optional[Dict[str, Tuple[Dict[str, float], float]]] = None
+
+def _language_models() -> Dict[str, Tuple[Dict[str, float], float]]:
+    """
+    Per language, the log-probability of each n-gram seen in its sample and
+    the log-probability given to unseen ones (add-one smoothing).
+    """
+    global _models
+    if _models is None:
+        vocabulary = set()
+        counts = {}
+        for language, sample in SAMPLES.items():
+            counts[language] = ngrams(sample)
+            vocabulary.update(counts[language])
+        _models = {}
+        for language, grams in counts.items():
+            total = sum(grams.values()) + len(vocabulary) + 1
+            _models[language] = (
+                {gram: math.log((count + 1) / total) for gram, count in grams.items()},
+                math.log(1 / total),
+            )
+    return _models
+
+def scores(text: str, candidates: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    The probability of each language given the text, over ``candidates``
+    (default: every language with a sample).
+    """
+    models = _language_models()
+    languages = [language for language in (candidates or models) if language in models]
+    grams = ngrams(text[:MAX_CHARS])
+    if not grams or not languages:
+        return {}
+    log_likelihoods = {}
+    for language in languages:
+        known, unseen = models[language]
+        log_likelihoods[language] = sum(count * known.get(gram, unseen) for gram, count in grams.items())
+    best = max(log_likelihoods.values())
+    weights = {language: math.exp(value - best) for language, value in log_likelihoods.items()}
+    total = sum(weights.values())
+    return {language: weight / total for language, weight in weights.items()}
+
+def latin_share(text: str) -> float:
+    """
+    The share of the letters of a text that are in Latin script.
+    """
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return 0.0
+    latin = sum(1 for char in letters if unicodedata.name(char, "").startswith("LATIN"))
+    return latin / len(letters)
+
+def unseen_share(text: str, language: str) -> float:
+    """
+    The share of the bigrams of a text that never occur in the sample of ``language``.
+    """
+    known, _ = _language_models()[language]
+    bigrams = {gram: count for gram, count in ngrams(text[:MAX_CHARS]).items() if len(gram) == 2}
+    total = sum(bigrams.values())
+    if not total:
+        return 1.0
+    return sum(count for gram, count in bigrams.items() if gram not in known) / total
+
+def detect(text: str, candidates: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    The language of a text, or None if it is too short, too ambiguous, or in
+    a language (or script) without a sample.
+    """
+    text = text[:MAX_CHARS]
+    letters = _normalize(text).replace(" ", "")
+    if len(letters) < MIN_LETTERS or latin_share(letters) < MIN_LATIN_SHARE:
+        return None
+    probabilities = scores(text, candidates)
+    if not probabilities:
+        return None
+    language, probability = max(probabilities.items(), key=lambda item: item[1])
+    if probability < MIN_CONFIDENCE or unseen_share(text, language) > MAX_UNSEEN_SHARE:
+        return None
+    return language
+
+def detect_segments(segments: Iterable[Dict[str, Any]], candidates: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    The language of a transcript, from its first MAX_CHARS characters.
+    """
+    parts: List[str] = []
+    length = 0
+    for segment in segments:
+        parts.append(segment["text"])
+        length += len(segment["text"]) + 1
+        if length >= MAX_CHARS:
+            break
+    return detect(" ".join(parts), candidates)
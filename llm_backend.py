@@ -0,0 +1,414 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Iterator, Generator, Tuple
+from deadline import Deadline, ensure_deadline
+from instrumentation import span
+import cost_ledger
+
+# Model used for each operation; override with SUMMIFY_MODEL_<OPERATION>, e.g. SUMMIFY_MODEL_QUIZ
+DEFAULT_MODELS = {
+    "summarize": "gemini-2.0-flash",
+    "quiz": "gemini-1.5-flash",
+    "flashcards": "gemini-1.5-flash",
+    "chapters": "gemini-2.0-flash",
+    "ask": "gemini-2.0-flash",
+    "summarize_chunk": "gemini-2.0-flash",
+    "collection": "gemini-2.0-flash",
+}
+FALLBACK_MODEL = "gemini-2.0-flash"
+
+# Stub backend defaults
+DEFAULT_STUB_LATENCY = 0.05
+DEFAULT_STUB_TOKENS_PER_SECOND = 200.0
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about four characters per token) for when the backend doesn't report one.
+    """
+    return max(1, len(text) // 4) if text else 0
+
+class LLMResult:
+    def __init__(self, text: str, model: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.model = model
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "model": self.model,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+class LLMBackend:
+    """
+    Interface every text-generation backend implements.
+
+    ``timeout`` is in seconds; None means no limit.
+    """
+    name = "base"
+    requires_api_key = False
+    # Whether calls cost money; the cost ledger prices only these
+    billed = True
+
+    def configure(self, api_key: Optional[str]) -> None:
+        pass
+
+    def generate(self, prompt: str, model: str, temperature: Optional[float] = None,
+                 max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> LLMResult:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, model: str, temperature: Optional[float] = None,
+                             max_output_tokens: Optional[int] = None, timeout: Optional[float] = None) -> LLMResult:
+        # Backends without native async support run the sync call off the event loop
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.generate(prompt, model, temperature, max_output_tokens, timeout)
+        )
+
+    def stream(self, prompt: str, model: str, temperature: Optional[float] = None,
+               max_output_tokens: Optional[int] = None,
+               timeout: Optional[float] = None) -> Generator[str, None, LLMResult]:
+        """
+        Yield the text as it is generated, then return the whole result with its usage.
+        """
+        result = self.generate(prompt, model, temperature, max_output_tokens, timeout)
+        yield result.text
+        return result
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini through google.generativeai. Model clients are created once and reused.
+
+    The SDK is imported on the first generation, so requests that fail before
+    reaching Gemini don't pay for importing it.
+    """
+    name = "gemini"
+    requires_api_key = True
+
+    def __init__(self):
+        self._genai_module = None
+        self._api_key: Optional[str] = None
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, api_key: Optional[str]) -> None:
+        if api_key:
+            self._api_key = api_key
+            if self._genai_module is not None:
+                self._genai_module.configure(api_key=api_key)
+
+    @property
+    def _genai(self):
+        if self._genai_module is None:
+            import google.generativeai as genai
+            if self._api_key:
+                genai.configure(api_key=self._api_key)
+            self._genai_module = genai
+        return self._genai_module
+
+    def _model(self, model: str):
+        with self._lock:
+            client = self._models.get(model)
+            if client is None:
+                client = self._genai.GenerativeModel(model)
+                self._models[model] = client
+            return client
+
+    def _config(self, temperature: Optional[float], max_output_tokens: Optional[int]):
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_output_tokens is not None:
+            options["max_output_tokens"] = max_output_tokens
+        return self._genai.GenerationConfig(**options)
+
+    @staticmethod
+    def _request_options(timeout: Optional[float]) -> Dict[str, Any]:
+        return {"timeout": timeout} if timeout is not None else {}
+
+    @staticmethod
+    def _result(text: str, usage, prompt: str, model: str) -> LLMResult:
+        input_tokens = getattr(usage, "prompt_token_count", None) if usage else None
+        output_tokens = getattr(usage, "candidates_token_count", None) if usage else None
+        return LLMResult(
+            text,
+            model,
+            input_tokens if input_tokens is not None else estimate_tokens(prompt),
+            output_tokens if output_tokens is not None else estimate_tokens(text),
+        )
+
+    def generate(self, prompt, model, temperature=None, max_output_tokens=None, timeout=None) -> LLMResult:
+        response = self._model(model).generate_content(
+            prompt,
+            generation_config=self._config(temperature, max_output_tokens),
+            request_options=self._request_options(timeout),
+        )
+        return self._result(response.text, getattr(response, "usage_metadata", None), prompt, model)
+
+    async def generate_async(self, prompt, model, temperature=None, max_output_tokens=None, timeout=None) -> LLMResult:
+        response = await self._model(model).generate_content_async(
+            prompt,
+            generation_config=self._config(temperature, max_output_tokens),
+            request_options=self._request_options(timeout),
+        )
+        return self._result(response.text, getattr(response, "usage_metadata", None), prompt, model)
+
+    def stream(self, prompt, model, temperature=None, max_output_tokens=None,
+               timeout=None) -> Generator[str, None, LLMResult]:
+        response = self._model(model).generate_content(
+            prompt,
+            generation_config=self._config(temperature, max_output_tokens),
+            request_options=self._request_options(timeout),
+            stream=True,
+        )
+        text = []
+        usage = None
+        for chunk in response:
+            # The final chunk carries the usage of the whole call
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.text:
+                text.append(chunk.text)
+                yield chunk.text
+        return self._result("".join(text), usage, prompt, model)
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local backend for load tests, profiling and offline development.
+
+    Answers look like what each operation expects (a sectioned summary, a JSON
+    quiz, JSON flashcards) and take ``latency`` seconds before the first token
+    plus one token every ``1 / tokens_per_second`` seconds.
+    """
+    name = "stub"
+    billed = False
+
+    def __init__(self, latency: Optional[float] = None, tokens_per_second: Optional[float] = None):
+        self.latency = latency if latency is not None else float(
+            os.environ.get("LLM_STUB_LATENCY", DEFAULT_STUB_LATENCY)
+        )
+        self.tokens_per_second = tokens_per_second or float(
+            os.environ.get("LLM_STUB_TOKENS_PER_SECOND", DEFAULT_STUB_TOKENS_PER_SECOND)
+        )
+
+    def respond(self, prompt: str, max_output_tokens: Optional[int] = None) -> str:
+        """
+        The deterministic answer to a prompt.
+        """
+        seed = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        count = re.search(r"\b(\d+)\s+(quiz questions|flashcards)", prompt)
+        num = int(count.group(1)) if count else 5
+
+        if "quiz questions" in prompt:
+            text = json.dumps([
+                {
+                    "question": f"Question {i + 1} about the summary ({seed})?",
+                    "options": [f"Option {c}" for c in "ABCD"],
+                    "correctAnswer": i % 4,
+                }
+                for i in range(num)
+            ], indent=2)
+        elif "flashcards" in prompt:
+            text = json.dumps([
+                {"front": f"What is concept {i + 1} ({seed})?", "back": f"Concept {i + 1} explained."}
+                for i in range(num)
+            ], indent=2)
+        elif "EXCERPTS:" in prompt:
+            # Point at the first excerpt's timestamp like a grounded answer would
+            timestamp = re.search(r"\[(\d+:\d{2}(?::\d{2})?) - ", prompt)
+            text = f"According to the video [{timestamp.group(1) if timestamp else '0:00'}], the answer is in the excerpt ({seed})."
+        elif "TRANSCRIPT PART:" in prompt:
+            words = prompt.rsplit("TRANSCRIPT PART:", 1)[-1].split()
+            text = f"- Notes {seed}: {' '.join(words[:30])}"
+        elif "CHAPTER TRANSCRIPT:" in prompt:
+            words = prompt.rsplit("CHAPTER TRANSCRIPT:", 1)[-1].split()
+            text = f"TITLE: {' '.join(words[:4]).capitalize()}\nSUMMARY: {' '.join(words[:30])}"
+        else:
+            # Echo the start of the input so different transcripts get different summaries
+            body = prompt.rsplit("TRANSCRIPT:", 1)[-1].split()
+            excerpt = " ".join(body[:40])
+            text = (
+                f"-Summary {seed}\n"
+                f"-Introduction: {excerpt[:120]}\n"
+                f"-Main points: {excerpt}\n"
+                f"-Conclusion: generated by the stub backend."
+            )
+
+        if max_output_tokens:
+            text = text[:max_output_tokens * 4]
+        return text
+
+    def _chunks(self, text: str):
+        # Roughly one token per four characters
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def generate(self, prompt, model, temperature=None, max_output_tokens=None, timeout=None) -> LLMResult:
+        text = self.respond(prompt, max_output_tokens)
+        delay = self.latency + estimate_tokens(text) / self.tokens_per_second
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Stub backend timed out after {timeout:.1f}s")
+        time.sleep(delay)
+        return LLMResult(text, model, estimate_tokens(prompt), estimate_tokens(text))
+
+    async def generate_async(self, prompt, model, temperature=None, max_output_tokens=None, timeout=None) -> LLMResult:
+        import asyncio
+        text = self.respond(prompt, max_output_tokens)
+        delay = self.latency + estimate_tokens(text) / self.tokens_per_second
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"Stub backend timed out after {timeout:.1f}s")
+        await asyncio.sleep(delay)
+        return LLMResult(text, model, estimate_tokens(prompt), estimate_tokens(text))
+
+    def stream(self, prompt, model, temperature=None, max_output_tokens=None,
+               timeout=None) -> Generator[str, None, LLMResult]:
+        text = self.respond(prompt, max_output_tokens)
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        for i, chunk in enumerate(self._chunks(text)):
+            delay = (self.latency if i == 0 else 0.0) + 1 / self.tokens_per_second
+            if expires_at is not None and time.monotonic() + delay > expires_at:
+                time.sleep(max(0.0, expires_at - time.monotonic()))
+                raise TimeoutError(f"Stub backend timed out after {timeout:.1f}s")
+            time.sleep(delay)
+            yield chunk
+        return LLMResult(text, model, estimate_tokens(prompt), estimate_tokens(text))
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> LLMBackend:
+    """
+    The process-wide backend, created on first use from LLM_BACKEND (default: gemini).
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("LLM_BACKEND", "gemini").lower()
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
+            _backend = BACKENDS[name]()
+        return _backend
+
+def set_backend(backend: LLMBackend) -> None:
+    """
+    Replace the process-wide backend (used by benchmarks and load tests).
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+def model_for(operation: str) -> str:
+    return os.environ.get(f"SUMMIFY_MODEL_{operation.upper()}", DEFAULT_MODELS.get(operation, FALLBACK_MODEL))
+
+def resolve_model(operation: str, model: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    The model a call for ``operation`` runs on: ``model`` or the operation's
+    configured one, switched to the cheapest model when a budget is nearly used up.
+
+    Returns:
+        The model and whether it was downgraded
+
+    Raises:
+        BudgetExceeded: If a budget is used up
+    """
+    return cost_ledger.check_budget(operation, model or model_for(operation))
+
+def configure_backend() -> None:
+    """
+    Hand GEMINI_API_KEY to the backend.
+
+    Raises:
+        ValueError: If the backend needs an API key and none is set
+    """
+    backend = get_backend()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if backend.requires_api_key and not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    backend.configure(api_key)
+
+def generate(operation: str, prompt: str, temperature: Optional[float] = None,
+             max_output_tokens: Optional[int] = None, deadline: Optional[Deadline] = None,
+             model: Optional[str] = None) -> LLMResult:
+    """
+    Run one generation for an operation on the configured backend, traced as a span.
+
+    ``model`` overrides the operation's configured model (see model_router).
+    """
+    deadline = ensure_deadline(deadline)
+    backend = get_backend()
+    model, downgraded = resolve_model(operation, model)
+    with span(f"llm:{operation}", model=model, backend=backend.name, prompt_chars=len(prompt),
+              downgraded=downgraded) as record:
+        started = time.perf_counter()
+        result = backend.generate(
+            prompt,
+            model,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            timeout=deadline.request_options().get("timeout"),
+        )
+        record["input_tokens"] = result.input_tokens
+        record["output_tokens"] = result.output_tokens
+    cost_ledger.record(operation, model, backend.name, result.input_tokens, result.output_tokens,
+                       time.perf_counter() - started, downgraded=downgraded, billed=backend.billed)
+    return result
+
+async def generate_async(operation: str, prompt: str, temperature: Optional[float] = None,
+                         max_output_tokens: Optional[int] = None, deadline: Optional[Deadline] = None,
+                         model: Optional[str] = None) -> LLMResult:
+    deadline = ensure_deadline(deadline)
+    backend = get_backend()
+    model, downgraded = resolve_model(operation, model)
+    with span(f"llm:{operation}", model=model, backend=backend.name, prompt_chars=len(prompt),
+              downgraded=downgraded) as record:
+        started = time.perf_counter()
+        result = await backend.generate_async(
+            prompt,
+            model,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            timeout=deadline.request_options().get("timeout"),
+        )
+        record["input_tokens"] = result.input_tokens
+        record["output_tokens"] = result.output_tokens
+    cost_ledger.record(operation, model, backend.name, result.input_tokens, result.output_tokens,
+                       time.perf_counter() - started, downgraded=downgraded, billed=backend.billed)
+    return result
+
+def stream(operation: str, prompt: str, temperature: Optional[float] = None,
+           max_output_tokens: Optional[int] = None, deadline: Optional[Deadline] = None,
+           model: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield a generation's text as it arrives, traced and recorded like ``generate``
+    once the stream is finished.
+    """
+    deadline = ensure_deadline(deadline)
+    backend = get_backend()
+    model, downgraded = resolve_model(operation, model)
+    with span(f"llm:{operation}", model=model, backend=backend.name, prompt_chars=len(prompt),
+              downgraded=downgraded, stream=True) as record:
+        started = time.perf_counter()
+        result = yield from backend.stream(
+            prompt,
+            model,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            timeout=deadline.request_options().get("timeout"),
+        )
+        record["input_tokens"] = result.input_tokens
+        record["output_tokens"] = result.output_tokens
+    cost_ledger.record(operation, model, backend.name, result.input_tokens, result.output_tokens,
+                       time.perf_counter() - started, downgraded=downgraded, billed=backend.billed)
@@ -0,0 +1,205 @@
+import os
+import json
+import copy
+import logging
+from typing import Dict, Any, Optional
+from deadline import Deadline
+import llm_backend
+
+logger = logging.getLogger("model-router")
+
+# Rough speeds used to predict how long a call takes, without calling the API
+MODEL_SPEEDS = {
+    "gemini-2.0-flash-lite": {"overhead_seconds": 0.4, "input_tokens_per_second": 60000, "output_tokens_per_second": 250},
+    "gemini-2.0-flash": {"overhead_seconds": 0.6, "input_tokens_per_second": 40000, "output_tokens_per_second": 200},
+    "gemini-1.5-flash": {"overhead_seconds": 0.8, "input_tokens_per_second": 30000, "output_tokens_per_second": 150},
+}
+
+# Per operation: tiers by input size (the first one the input fits in wins; a
+# tier model of None means the operation's configured model), the latency each
+# call should stay under, and for quizzes and flashcards the output tokens
+# allowed per requested item. Summaries longer than chunk_tokens are map-reduced.
+DEFAULT_POLICY: Dict[str, Dict[str, Any]] = {
+    "summarize": {
+        "latency_target_seconds": 20.0,
+        "chunk_tokens": 8000,
+        "tiers": [
+            {"max_input_tokens": 4000, "model": "gemini-2.0-flash-lite", "max_output_tokens": 260},
+            {"max_input_tokens": 32000, "model": None, "max_output_tokens": 400},
+            {"max_input_tokens": None, "model": None, "max_output_tokens": 600},
+        ],
+    },
+    "quiz": {
+        "latency_target_seconds": 15.0,
+        "output_tokens_per_item": 120,
+        "tiers": [
+            {"max_input_tokens": 1000, "model": "gemini-2.0-flash-lite"},
+            {"max_input_tokens": None, "model": None},
+        ],
+    },
+    "flashcards": {
+        "latency_target_seconds": 15.0,
+        "output_tokens_per_item": 80,
+        "tiers": [
+            {"max_input_tokens": 1000, "model": "gemini-2.0-flash-lite"},
+            {"max_input_tokens": None, "model": None},
+        ],
+    },
+}
+
+_policy: Optional[Dict[str, Any]] = None
+
+def _positive(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+def merge_policy(overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    DEFAULT_POLICY and MODEL_SPEEDS with ``overrides`` merged over them key by
+    key: an operation that only sets ``chunk_tokens`` keeps its default tiers,
+    and a model that only sets one speed keeps the others.
+
+    Raises:
+        ValueError: If the result is not a usable policy (see validate_policy)
+    """
+    if not isinstance(overrides, dict):
+        raise ValueError("the policy must be a JSON object")
+    policy = copy.deepcopy(DEFAULT_POLICY)
+    policy["models"] = copy.deepcopy(MODEL_SPEEDS)
+    for name, override in overrides.items():
+        if not isinstance(override, dict):
+            raise ValueError(f"{name} must be an object")
+        section = policy.setdefault(name, {})
+        for key, value in override.items():
+            if name == "models" and isinstance(value, dict):
+                section.setdefault(key, {}).update(value)
+            else:
+                section[key] = copy.deepcopy(value)
+    validate_policy(policy)
+    return policy
+
+def validate_policy(policy: Dict[str, Any]) -> None:
+    """
+    Check what route() relies on: every operation has a latency target and
+    tiers ending in one without an input limit, summaries have a chunk size,
+    and every model has all three speeds.
+
+    Raises:
+        ValueError: Naming the first problem found
+    """
+    for model, speed in policy.get("models", {}).items():
+        if not isinstance(speed, dict):
+            raise ValueError(f"models.{model} must be an object")
+        if not (_positive(speed.get("overhead_seconds")) or speed.get("overhead_seconds") == 0):
+            raise ValueError(f"models.{model}.overhead_seconds must be a number of seconds")
+        for key in ("input_tokens_per_second", "output_tokens_per_second"):
+            if not _positive(speed.get(key)):
+                raise ValueError(f"models.{model}.{key} must be a positive number")
+    for operation, settings in policy.items():
+        if operation == "models":
+            continue
+        if not _positive(settings.get("latency_target_seconds")):
+            raise ValueError(f"{operation}.latency_target_seconds must be a positive number")
+        tiers = settings.get("tiers")
+        if not isinstance(tiers, list) or not tiers:
+            raise ValueError(f"{operation}.tiers must be a non-empty list")
+        for i, tier in enumerate(tiers):
+            if not isinstance(tier, dict) or "max_input_tokens" not in tier:
+                raise ValueError(f"{operation}.tiers[{i}] must set max_input_tokens")
+            limit = tier["max_input_tokens"]
+            if limit is not None and not _positive(limit):
+                raise ValueError(f"{operation}.tiers[{i}].max_input_tokens must be positive or null")
+            if tier.get("model") is not None and not isinstance(tier["model"], str):
+                raise ValueError(f"{operation}.tiers[{i}].model must be a model name or null")
+            tier.setdefault("model", None)
+        if tiers[-1]["max_input_tokens"] is not None:
+            raise ValueError(f"the last of {operation}.tiers must have max_input_tokens null, so every input fits one")
+        for key in ("output_tokens_per_item", "chunk_tokens"):
+            if key in settings and not _positive(settings[key]):
+                raise ValueError(f"{operation}.{key} must be a positive number")
+    if not _positive(policy.get("summarize", {}).get("chunk_tokens")):
+        raise ValueError("summarize.chunk_tokens must be a positive number")
+
+def load_policy() -> Dict[str, Any]:
+    """
+    The routing policy: DEFAULT_POLICY, with the JSON file named by
+    SUMMIFY_ROUTING_POLICY merged over it (see merge_policy). A file that
+    cannot be read or does not make a valid policy is ignored as a whole,
+    with a warning, when it is first loaded rather than at request time.
+    """
+    global _policy
+    if _policy is None:
+        policy = merge_policy({})
+        path = os.environ.get("SUMMIFY_ROUTING_POLICY")
+        if path:
+            try:
+                with open(path, "r") as f:
+                    policy = merge_policy(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring routing policy {path}: {str(e)}")
+        _policy = policy
+    return _policy
+
+def chunk_tokens() -> int:
+    return int(os.environ.get("SUMMIFY_CHUNK_TOKENS", load_policy()["summarize"]["chunk_tokens"]))
+
+def estimate_seconds(model: str, input_tokens: int, output_tokens: int) -> float:
+    speed = load_policy()["models"].get(model, MODEL_SPEEDS["gemini-2.0-flash"])
+    return (speed["overhead_seconds"]
+            + input_tokens / speed["input_tokens_per_second"]
+            + output_tokens / speed["output_tokens_per_second"])
+
+def route(operation: str, input_tokens: int, deadline: Optional[Deadline] = None,
+          items: Optional[int] = None, strategy: str = "single",
+          call_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Pick the model and output budget for one call from the size of its input.
+
+    ``call_tokens`` is what the call itself sends when that is less than the
+    input, like the reduce step of a map-reduce; latency is predicted from it.
+
+    A model pinned with SUMMIFY_MODEL_<OPERATION> is always used. Otherwise, if
+    the tier's model is predicted to miss the latency target (or what is left
+    of the deadline), the fastest model that fits is used instead.
+
+    Returns:
+        The decision, meant to be reported with the output: operation,
+        input_tokens, strategy, model, max_output_tokens, estimated_seconds and
+        the reason for the choice
+    """
+    policy = load_policy()[operation]
+    tier = next(t for t in policy["tiers"] if t["max_input_tokens"] is None or input_tokens <= t["max_input_tokens"])
+    max_output_tokens = tier.get("max_output_tokens")
+    if items is not None and policy.get("output_tokens_per_item"):
+        # Some slack for the JSON brackets and code fences around the items
+        max_output_tokens = items * policy["output_tokens_per_item"] + 100
+
+    budget = policy["latency_target_seconds"]
+    if deadline is not None and deadline.expires_at is not None:
+        budget = min(budget, deadline.remaining())
+
+    pinned = os.environ.get(f"SUMMIFY_MODEL_{operation.upper()}")
+    model = pinned or tier["model"] or llm_backend.model_for(operation)
+    output = max_output_tokens or 1000
+    sent = input_tokens if call_tokens is None else call_tokens
+    estimate = estimate_seconds(model, sent, output)
+    if pinned:
+        reason = f"pinned by SUMMIFY_MODEL_{operation.upper()}"
+    elif estimate <= budget:
+        limit = tier["max_input_tokens"]
+        reason = f"input up to {limit} tokens" if limit is not None else "largest input tier"
+    else:
+        by_speed = sorted(load_policy()["models"], key=lambda name: estimate_seconds(name, sent, output))
+        fitting = [name for name in by_speed if estimate_seconds(name, sent, output) <= budget]
+        model = fitting[0] if fitting else by_speed[0]
+        estimate = estimate_seconds(model, sent, output)
+        reason = f"faster model for a {budget:.1f}s latency budget"
+
+    return {
+        "operation": operation,
+        "input_tokens": input_tokens,
+        "strategy": strategy,
+        "model": model,
+        "max_output_tokens": max_output_tokens,
+        "estimated_seconds": round(estimate, 2),
+        "reason": reason,
+    }
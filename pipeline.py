@@ -0,0 +1,262 @@
+import os
+import math
+import zlib
+import hashlib
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Optional, Iterable
+from deadline import Deadline, ensure_deadline
+from instrumentation import span
+from transcript import TimedText, join_segments, stream_transcript_segments, get_transcript_from_api, run_strategy
+from summerize import summarize_text
+import transcript_cache
+import cost_ledger
+import model_router
+import llm_backend
+
+logger = logging.getLogger("summary-pipeline")
+
+PIPELINE_MAX_WORKERS = 4
+# Output budget of each chunk's notes
+CHUNK_NOTES_TOKENS = 400
+
+# Chunk boundaries are content-defined: a chunk ends after a segment containing a
+# word where the rolling hash of the last BOUNDARY_WINDOW_WORDS words hits the
+# boundary pattern, so an edit only moves the boundaries next to it and the
+# other chunks keep their cached notes. Chunks are at least MIN_CHUNK_SHARE of
+# the chunk size and are cut at the full size if no boundary shows up.
+BOUNDARY_WINDOW_WORDS = 16
+MIN_CHUNK_SHARE = 0.5
+
+def pipeline_enabled(input_data: Dict[str, Any]) -> bool:
+    """
+    On by default; ``"pipeline": false`` in the input or SUMMIFY_PIPELINE=0 turns it off.
+    """
+    requested = input_data.get("pipeline")
+    if requested is not None:
+        return bool(requested)
+    return os.environ.get("SUMMIFY_PIPELINE", "1").lower() not in ("0", "false", "no", "")
+
+def _chunk_prompt(text: str) -> str:
+    return f"""
+You are a helpful assistant taking notes on one part of a longer video transcript. Write the key points of this part as a short bullet list; they will be combined with the notes of the other parts into one summary. Do not change the language of the text: the notes must be in the same language as the transcript.
+
+TRANSCRIPT PART:
+{text}
+"""
+
+def _rotl(value: int, bits: int) -> int:
+    bits %= 32
+    return ((value << bits) | (value >> (32 - bits))) & 0xFFFFFFFF
+
+class RollingHash:
+    """
+    Buzhash over the last ``window`` words: O(1) per word, and the value only
+    depends on those words, not on where they are in the transcript.
+    """
+    def __init__(self, window: int = BOUNDARY_WINDOW_WORDS):
+        self.window = window
+        self.words: deque = deque()
+        self.value = 0
+
+    def push(self, word: str) -> int:
+        # crc32 rather than hash() so boundaries are the same in every process
+        h = zlib.crc32(word.encode("utf-8"))
+        self.value = _rotl(self.value, 1) ^ h
+        self.words.append(h)
+        if len(self.words) > self.window:
+            self.value ^= _rotl(self.words.popleft(), self.window)
+        return self.value
+
+def _normalize_word(word: str) -> str:
+    # Caption fixes often only touch casing and punctuation
+    return word.lower().strip(".,!?;:\"'()[]-")
+
+def chunk_cache_key(prompt: str, model: str) -> str:
+    backend = llm_backend.get_backend().name
+    return hashlib.sha256(f"{backend}\n{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+def summarize_chunk(chunk: Dict[str, Any], deadline: Deadline) -> str:
+    """
+    Notes on one chunk, reused from the cache when the same chunk was summarized before.
+    """
+    prompt = _chunk_prompt(chunk["text"])
+    # Keyed by the model that will write the notes, which a budget may have downgraded
+    model, _ = llm_backend.resolve_model("summarize_chunk")
+    path = transcript_cache.chunk_summary_path(chunk_cache_key(prompt, model)) if transcript_cache.cache_dir() else None
+    if path:
+        with span("summarize_chunk:cache", start=chunk["start"]) as record:
+            cached = transcript_cache.read_json(path, transcript_cache.cache_ttl())
+            record["hit"] = cached is not None
+        if cached is not None:
+            cost_ledger.record_cache_hit("summarize_chunk")
+            return cached["notes"]
+
+    deadline.check("summarize_chunk")
+    response = llm_backend.generate("summarize_chunk", prompt, temperature=0.3,
+                                    max_output_tokens=CHUNK_NOTES_TOKENS, deadline=deadline, model=model)
+    notes = response.text.strip()
+    if path and response.model != model:
+        path = transcript_cache.chunk_summary_path(chunk_cache_key(prompt, response.model))
+    if path:
+        try:
+            transcript_cache.write_json_atomic(path, {"notes": notes})
+        except OSError as e:
+            logger.warning(f"Failed to cache chunk notes: {str(e)}")
+    return notes
+
+class PipelinedSummary:
+    """
+    A summary whose map step starts as soon as each token-bounded chunk of the
+    transcript has arrived, instead of after the whole transcript is in.
+
+    Call ``consume`` with the segments, then ``finish`` to start the final
+    summary and ``result`` to wait for it. ``close`` drops whatever is pending.
+    """
+    def __init__(self, deadline: Optional[Deadline] = None, max_tokens: Optional[int] = None,
+                 max_workers: int = PIPELINE_MAX_WORKERS):
+        self.deadline = ensure_deadline(deadline)
+        # Transcripts longer than this are summarized chunk by chunk, the first
+        # chunks while the rest of the captions are still downloading
+        self.max_tokens = max_tokens or model_router.chunk_tokens()
+        self.min_tokens = self.max_tokens * MIN_CHUNK_SHARE
+        # About one boundary word per third of a chunk (a word is ~1.5 estimated tokens)
+        self._chunked = math.isfinite(self.max_tokens)
+        self._boundary_modulus = max(1, int(self.max_tokens / 4.5)) if self._chunked else 0
+        self._hash = RollingHash()
+        self.segments = TimedText()
+        self.chunks: List[Dict[str, Any]] = []
+        self.chunk_futures: List[Future] = []
+        self.final: Optional[Future] = None
+        self.routing: Optional[Dict[str, Any]] = None
+        # Language of the transcript, once known; otherwise the final summary detects it
+        self.language: Optional[str] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_tokens = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _submit(self, fn, *args, **kwargs) -> Future:
+        # Each task runs in a copy of this context so its spans land on the current request
+        return self._pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def _start_chunk(self) -> None:
+        chunk = {
+            "start": self._pending[0]["start"],
+            "end": self._pending[-1]["start"] + self._pending[-1].get("duration", 0.0),
+            "text": join_segments(self._pending),
+        }
+        self.chunks.append(chunk)
+        self.chunk_futures.append(self._submit(summarize_chunk, chunk, self.deadline))
+        self._pending = []
+        self._pending_tokens = 0
+
+    def consume(self, segments: Iterable[Dict[str, Any]]) -> TimedText:
+        """
+        Read all segments, starting a chunk summary whenever a chunk boundary is reached.
+
+        Returns:
+            Every segment read
+        """
+        for segment in segments:
+            self.segments.append(segment)
+            self._pending.append(segment)
+            # +1 for the space join_segments puts between segments
+            self._pending_tokens += llm_backend.estimate_tokens(segment["text"]) + 1
+            if not self._chunked:
+                continue
+            boundary = False
+            for word in segment["text"].split():
+                if self._hash.push(_normalize_word(word)) % self._boundary_modulus == 0:
+                    boundary = True
+            if (boundary and self._pending_tokens >= self.min_tokens) or self._pending_tokens >= self.max_tokens:
+                self._start_chunk()
+        return self.segments
+
+    def _reduce(self) -> str:
+        notes = [future.result() for future in self.chunk_futures]
+        text = "\n\n".join(note for note in notes if note)
+        with span("summarize:reduce", chunks=len(notes), characters=len(text)):
+            return summarize_text(text, max_tokens=self.routing["max_output_tokens"],
+                                  deadline=self.deadline, model=self.routing["model"], language=self.language)
+
+    def finish(self) -> None:
+        """
+        Start the final summary: one call over the whole transcript if it never
+        filled a chunk, otherwise a reduce over the chunk notes.
+
+        The model and output budget come from model_router, sized on the whole
+        transcript; the decision is kept in ``routing``.
+        """
+        if self.final is not None:
+            return
+        text = join_segments(self.segments)
+        input_tokens = llm_backend.estimate_tokens(text)
+        if not self.chunk_futures:
+            self.routing = model_router.route("summarize", input_tokens, self.deadline)
+            self.final = self._submit(summarize_text, text, max_tokens=self.routing["max_output_tokens"],
+                                      deadline=self.deadline, model=self.routing["model"],
+                                      language=self.language)
+            return
+        if self._pending and "".join(segment["text"] for segment in self._pending).strip():
+            self._start_chunk()
+        self.routing = model_router.route("summarize", input_tokens, self.deadline, strategy="map_reduce",
+                                          call_tokens=len(self.chunks) * CHUNK_NOTES_TOKENS)
+        self.final = self._submit(self._reduce)
+
+    def result(self) -> str:
+        self.finish()
+        try:
+            return self.final.result()
+        finally:
+            self._pool.shutdown(wait=False)
+
+    def close(self) -> None:
+        for future in self.chunk_futures:
+            future.cancel()
+        if self.final is not None:
+            self.final.cancel()
+        self._pool.shutdown(wait=False)
+
+def fetch_segments(video_id: str, language: str, deadline: Deadline) -> Iterable[Dict[str, Any]]:
+    """
+    The transcript from the sources get_transcript_segments tries first, in
+    its order: youtube-transcript-api with half the budget, then the json3
+    captions of the watch page, streamed so chunks start while they download.
+    The primary API returns the whole transcript at once.
+    """
+    try:
+        return run_strategy("api", get_transcript_from_api, video_id, language, deadline.child(1 / 2))
+    except Exception as e:
+        logger.warning(f"Primary API method failed, streaming the captions instead: {str(e)}")
+        return stream_transcript_segments(video_id, language, deadline)
+
+def start_summary(video_id: str, language: str = "en", deadline: Optional[Deadline] = None,
+                  fetch_deadline: Optional[Deadline] = None) -> PipelinedSummary:
+    """
+    Read the transcript (cached, or fetched with fetch_segments) and start summarizing it as it arrives.
+
+    The returned run has every segment in ``.segments``; its chunk summaries may
+    still be running. A fetched transcript is cached once it is complete.
+
+    Raises:
+        Whatever the transcript fetch raises; pending chunk summaries are dropped first
+    """
+    deadline = ensure_deadline(deadline)
+    run = PipelinedSummary(deadline)
+    cached = transcript_cache.load_segments(video_id, language)
+    source = cached if cached is not None else fetch_segments(video_id, language, fetch_deadline or deadline)
+    try:
+        with span("transcript:pipeline", video_id=video_id, cached=cached is not None) as record:
+            run.consume(source)
+            record["segments"] = len(run.segments)
+            record["chunks_started"] = len(run.chunks)
+    except BaseException:
+        run.close()
+        raise
+    deadline.mark("transcript", segments=len(run.segments))
+    if cached is None and run.segments:
+        transcript_cache.store_segments(video_id, language, run.segments)
+    logger.info(f"Read {len(run.segments)} segments, {len(run.chunks)} chunk summaries already started")
+    return run
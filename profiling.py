@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from instrumentation import Tracer
+
+logger = logging.getLogger("summify-profiling")
+
+# How many functions and allocation sites to keep in the JSON report
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+# Frames kept per allocation traceback; more frames make tracing slower
+TRACEMALLOC_FRAMES = 5
+
+def profiling_requested(input_data: Dict[str, Any]) -> bool:
+    """
+    Whether to profile this request: ``"profile": true`` in the input, or SUMMIFY_PROFILE=1.
+    """
+    if input_data.get("profile"):
+        return True
+    return os.environ.get("SUMMIFY_PROFILE", "").lower() in ("1", "true", "yes")
+
+class RequestProfiler:
+    """
+    Profiles one request and writes the results next to its output file.
+
+    ``<output>.profile.pstats`` holds the raw cProfile stats (open them with
+    ``python -m pstats`` or snakeviz); ``<output>.profile.json`` holds wall and
+    CPU time per stage, the top functions by cumulative time and the peak
+    allocation sites.
+
+    cProfile only sees the thread that started it, so calls handed to a worker
+    thread (see ``deadline.run_with_deadline``) show up as time spent waiting.
+    """
+    def __init__(self, output_file: str):
+        # The profilers are imported here rather than at the top so that importing
+        # this module stays cheap for the requests that aren't profiled
+        import cProfile
+        self.output_file = output_file
+        self.profile = cProfile.Profile()
+        self._started_tracemalloc = False
+        self._wall_started = 0.0
+        self._cpu_started = 0.0
+
+    def start(self) -> None:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._wall_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self.profile.enable()
+
+    def stop(self, tracer: Optional[Tracer] = None) -> Dict[str, Any]:
+        """
+        Stop profiling and write the report files. Returns the JSON report.
+        """
+        import tracemalloc
+        self.profile.disable()
+        wall = time.perf_counter() - self._wall_started
+        cpu = time.process_time() - self._cpu_started
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        report = {
+            "wall_ms": round(wall * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            "peak_memory_bytes": peak,
+            "stages": self._stages(tracer),
+            "top_functions": self._top_functions(),
+            "top_allocations": self._top_allocations(snapshot),
+        }
+
+        base = f"{self.output_file}.profile"
+        try:
+            self.profile.dump_stats(f"{base}.pstats")
+            with open(f"{base}.json", "w") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Wrote profile to {base}.json and {base}.pstats")
+        except OSError as e:
+            logger.warning(f"Failed to write profile to {base}: {str(e)}")
+        return report
+
+    @staticmethod
+    def _stages(tracer: Optional[Tracer]) -> List[Dict[str, Any]]:
+        if tracer is None:
+            return []
+        return [
+            {
+                "stage": span["span"],
+                "status": span["status"],
+                "wall_ms": span["duration_ms"],
+                "cpu_ms": span.get("cpu_ms"),
+                # Wall time the stage's thread spent off the CPU: network, sleeps, lock waits
+                "waiting_ms": round(span["duration_ms"] - (span.get("cpu_ms") or 0.0), 3),
+            }
+            for span in tracer.spans
+        ]
+
+    def _top_functions(self) -> List[Dict[str, Any]]:
+        import pstats
+        stats = pstats.Stats(self.profile).stats
+        rows = []
+        for (filename, line, function), (primitive_calls, calls, own, cumulative, _) in stats.items():
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{line}({function})" if line else function,
+                "calls": calls,
+                "own_ms": round(own * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3),
+            })
+        rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+    @staticmethod
+    def _top_allocations(snapshot) -> List[Dict[str, Any]]:
+        import cProfile
+        import tracemalloc
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ))
+        return [
+            {
+                "location": f"{frame.filename}:{frame.lineno}",
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            for frame in stat.traceback[:1]
+        ]
@@ -0,0 +1,178 @@
+import math
+import heapq
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from deadline import Deadline, ensure_deadline
+from instrumentation import span
+from chapters import tokenize
+import transcript_cache
+import language_id
+import llm_backend
+
+logger = logging.getLogger("qa-index")
+
+# Bump when the stored layout changes so old index files get rebuilt
+INDEX_VERSION = 1
+
+# About 45 seconds of speech per chunk: enough context to answer from, small enough to keep prompts short
+CHUNK_WORDS = 120
+DEFAULT_TOP_K = 4
+MAX_TOP_K = 10
+
+# BM25 parameters (the usual defaults)
+K1 = 1.5
+B = 0.75
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+def chunk_segments(segments: List[Dict[str, Any]], chunk_words: int = CHUNK_WORDS) -> List[Dict[str, Any]]:
+    """
+    Group timed segments into chunks of about ``chunk_words`` words.
+
+    Consecutive chunks share one segment so an answer split across a chunk
+    boundary is still retrievable from either side.
+    """
+    chunks = []
+    current: List[Dict[str, Any]] = []
+    words = 0
+    for segment in segments:
+        current.append(segment)
+        words += len(segment["text"].split())
+        if words >= chunk_words:
+            chunks.append(current)
+            current = [segment]
+            words = len(segment["text"].split())
+    if len(current) > 1 or not chunks:
+        chunks.append(current)
+    return [
+        {
+            "start": round(chunk[0]["start"], 2),
+            "end": round(chunk[-1]["start"] + chunk[-1].get("duration", 0.0), 2),
+            "text": " ".join(segment["text"] for segment in chunk).strip(),
+        }
+        for chunk in chunks if chunk
+    ]
+
+def build_index(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build a BM25 inverted index over the chunks of a transcript.
+    """
+    chunks = chunk_segments(segments)
+    postings: Dict[str, List[List[int]]] = {}
+    lengths = []
+    for i, chunk in enumerate(chunks):
+        counts = Counter(tokenize(chunk["text"]))
+        lengths.append(sum(counts.values()))
+        for term, frequency in counts.items():
+            postings.setdefault(term, []).append([i, frequency])
+    return {
+        "version": INDEX_VERSION,
+        "chunks": chunks,
+        "lengths": lengths,
+        "average_length": sum(lengths) / len(lengths) if lengths else 0.0,
+        "postings": postings,
+    }
+
+def search(index: Dict[str, Any], query: str, top_k: int = DEFAULT_TOP_K) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    The ``top_k`` chunks that best match a query, best first, as (score, chunk) pairs.
+    """
+    chunks = index["chunks"]
+    lengths = index["lengths"]
+    average_length = index["average_length"] or 1.0
+    scores: Dict[int, float] = {}
+    for term in set(tokenize(query)):
+        postings = index["postings"].get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (len(chunks) - len(postings) + 0.5) / (len(postings) + 0.5))
+        for i, frequency in postings:
+            norm = frequency + K1 * (1 - B + B * lengths[i] / average_length)
+            scores[i] = scores.get(i, 0.0) + idf * frequency * (K1 + 1) / norm
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    return [(score, chunks[i]) for i, score in best]
+
+def build_and_save(video_id: str, language: str, segments: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Index a transcript and store the index beside its cached segments.
+    """
+    with span("qa_index:build", video_id=video_id, segments=len(segments)) as record:
+        index = build_index(segments)
+        record["chunks"] = len(index["chunks"])
+    if transcript_cache.cache_dir():
+        try:
+            transcript_cache.write_json_atomic(transcript_cache.cache_path(video_id, language, "index"), index)
+        except OSError as e:
+            logger.warning(f"Failed to store the index for {video_id}: {str(e)}")
+    return index
+
+def load_index(video_id: str, language: str) -> Optional[Dict[str, Any]]:
+    if not transcript_cache.cache_dir():
+        return None
+    index = transcript_cache.read_json(transcript_cache.cache_path(video_id, language, "index"), transcript_cache.cache_ttl())
+    if not index or index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+def get_index(video_id: str, language: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    The video's index, built from the cached (or freshly fetched) transcript if it isn't stored yet.
+    """
+    index = load_index(video_id, language)
+    if index is not None:
+        return index
+    cached = transcript_cache.load_segments(video_id, language)
+    if cached is not None:
+        return build_and_save(video_id, language, cached)
+    # A miss fetches, caches and indexes the transcript in one go
+    segments = transcript_cache.get_transcript_segments(video_id, language, deadline)
+    return load_index(video_id, language) or build_index(segments)
+
+def _answer_prompt(question: str, hits: List[Tuple[float, Dict[str, Any]]]) -> str:
+    # Excerpts in video order read more naturally than in score order
+    excerpts = "\n\n".join(
+        f"[{format_timestamp(chunk['start'])} - {format_timestamp(chunk['end'])}]\n{chunk['text']}"
+        for _, chunk in sorted(hits, key=lambda hit: hit[1]["start"])
+    )
+    return f"""
+You are a helpful assistant answering a question about a video using only the transcript excerpts below. Cite the timestamps of the excerpts you used, like [12:34]. If the excerpts don't answer the question, say that the video doesn't seem to cover it. Answer in the same language as the question.
+
+EXCERPTS:
+{excerpts}
+
+QUESTION: {question}
+"""
+
+def ask(video_id: str, question: str, language: str = language_id.AUTO, top_k: int = DEFAULT_TOP_K,
+        deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    Answer a question about a video from the transcript chunks most relevant to it.
+
+    Returns:
+        {"answer": str, "sources": [{"start", "end", "text", "score"}]}
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before or during generation
+    """
+    deadline = ensure_deadline(deadline)
+    top_k = max(1, min(int(top_k), MAX_TOP_K))
+    index = get_index(video_id, language, deadline)
+
+    with span("qa:retrieve", video_id=video_id, chunks=len(index["chunks"]), top_k=top_k) as record:
+        hits = search(index, question, top_k)
+        record["hits"] = len(hits)
+    sources = [dict(chunk, score=round(score, 3)) for score, chunk in hits]
+    if not hits:
+        # Nothing in the transcript shares a word with the question: no point paying for a call
+        return {"answer": "The video doesn't seem to cover that.", "sources": []}
+
+    deadline.check("ask")
+    response = llm_backend.generate("ask", _answer_prompt(question, hits), temperature=0.2,
+                                    max_output_tokens=400, deadline=deadline)
+    deadline.mark("ask", sources=len(sources))
+    return {"answer": response.text.strip(), "sources": sources}
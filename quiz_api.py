@@ -1,8 +1,17 @@
 import os
 import sys
 import json
-import google.generativeai as genai
-from typing import List, Dict, Any
+import logging
+from typing import List, Dict, Any, Optional
+from deadline import Deadline, DeadlineExceeded, ensure_deadline
+from instrumentation import start_request, finish_request, span
+from transcript_cache import load_result, result_cache_key, store_result
+import model_router
+import llm_backend
+import cost_ledger
+from cost_ledger import BudgetExceeded
+
+logger = logging.getLogger("quiz-api")
 
 class QuizQuestion:
     def __init__(self, question: str, options: List[str], correct_answer: int):
@@ -32,16 +41,21 @@ def setup_api_keys() -> None:
                         # Skip lines that don't have the format KEY=VALUE
                         continue
     
-    # Configure Gemini API
-    if os.environ.get("GEMINI_API_KEY"):
-        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-    else:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    # Configure the LLM backend
+    llm_backend.configure_backend()
 
-def generate_quiz_questions(summary: str, num_questions: int = 5) -> List[Dict[str, Any]]:
+def generate_quiz_questions(summary: str, num_questions: int = 5, deadline: Optional[Deadline] = None,
+                            routing: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """
     Generate a list of quiz questions from the provided summary.
+
+    ``routing`` is the model_router decision to follow; one is made here if it is not given.
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before or during generation
     """
+    deadline = ensure_deadline(deadline)
+    deadline.check("quiz")
 
     # Define a prompt instructing the model to return a valid JSON array of quiz questions.
     prompt = f"""
@@ -61,20 +75,15 @@ Output only valid JSON:
 """
 
     try:
-        # Configure the model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
         # Generate the questions
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.7,
-            )
-        )
+        if routing is None:
+            routing = model_router.route("quiz", llm_backend.estimate_tokens(summary), deadline, items=num_questions)
+        response = llm_backend.generate("quiz", prompt, temperature=0.7, max_output_tokens=routing["max_output_tokens"],
+                                        deadline=deadline, model=routing["model"])
         
         response_text = response.text.strip()
-        # Debug: Print out the raw text from the model (remove later if desired)
-        print("Quiz response text:\n", response_text)
+        # stdout carries the JSON the Next.js route parses; the raw response goes to the log
+        logger.debug(f"Quiz response text:\n{response_text}")
         
         json_start = response_text.find('[')
         json_end = response_text.rfind(']') + 1
@@ -104,7 +113,10 @@ Output only valid JSON:
             print("Error: Could not extract JSON from response")
             return []
     
+    except BudgetExceeded:
+        raise
     except Exception as e:
+        deadline.check("quiz")
         print(f"Error generating quiz questions: {str(e)}")
         return []
 
@@ -116,6 +128,7 @@ def process_api_request(input_file: str, output_file: str) -> None:
         input_file: Path to JSON file with input data
         output_file: Path to write output JSON data
     """
+    start_request("quiz")
     try:
         # Read input data
         with open(input_file, 'r') as f:
@@ -123,29 +136,57 @@ def process_api_request(input_file: str, output_file: str) -> None:
         
         summary = input_data.get('summary')
         num_questions = input_data.get('num_questions', 5)
+        deadline = Deadline.from_input(input_data)
+        # Clients that know the video pass it along so its spend is counted per video
+        cost_ledger.set_video(input_data.get('video_id'))
         
         if not summary:
             raise ValueError("Summary is required")
+
+        # Pick the model and output budget for this input
+        routing = model_router.route("quiz", llm_backend.estimate_tokens(summary), deadline, items=num_questions)
+        # The same summary gets the same quiz from the same model again, often precomputed by hot_videos.py
+        result_key = result_cache_key("quiz", routing["model"], summary, num_questions)
+        with span("quiz:cache") as record:
+            cached_output = load_result("quiz", result_key)
+            record["hit"] = cached_output is not None
+        if cached_output is not None:
+            cost_ledger.record_cache_hit("quiz")
+            with span("write_output"):
+                with open(output_file, 'w') as f:
+                    json.dump(cached_output, f)
+            return
         
         # Generate quiz questions
-        questions = generate_quiz_questions(summary, num_questions)
+        questions = generate_quiz_questions(summary, num_questions, deadline, routing)
         
         # Prepare output data
         output_data = {
-            'questions': questions
+            'questions': questions,
+            'routing': routing,
         }
         
         # Write output data
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f)
+        with span("write_output"):
+            with open(output_file, 'w') as f:
+                json.dump(output_data, f)
+        # An empty list means generation failed; let the next request try again
+        if questions:
+            store_result("quiz", result_key, output_data)
             
     except Exception as e:
         # Write error to output file
+        error_data = {'error': str(e)}
+        if isinstance(e, DeadlineExceeded):
+            error_data['error_type'] = "DeadlineExceeded"
+            error_data['progress'] = e.progress
+        elif isinstance(e, BudgetExceeded):
+            error_data['error_type'] = "BudgetExceeded"
         with open(output_file, 'w') as f:
-            json.dump({
-                'error': str(e)
-            }, f)
+            json.dump(error_data, f)
         raise
+    finally:
+        finish_request()
 
 def main():
     """
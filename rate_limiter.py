@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl; shared state falls back to a per-process lock
+    fcntl = None
+
+logger = logging.getLogger("rate-limiter")
+
+# Default settings
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 10
+DEFAULT_MAX_WAIT = 30.0
+MIN_RATE_SCALE = 0.1
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_TIMEOUT = 60.0
+
+# Markers of YouTube's consent / "unusual traffic" interstitials
+CONSENT_MARKERS = (
+    "consent.youtube.com",
+    "consent.google.com",
+    "google.com/sorry",
+)
+
+class RateLimitedError(Exception):
+    """
+    Raised when YouTube throttles us or a request would have to wait too long.
+    """
+    pass
+
+class MemoryStateStore:
+    """
+    In-process state store. Used when no shared state file is configured.
+    """
+    def __init__(self):
+        self._state: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            yield self._state
+
+class FileStateStore:
+    """
+    State store shared between worker processes through a locked JSON file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            with os.fdopen(fd, "r+") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    raw = f.read()
+                    try:
+                        state = json.loads(raw) if raw.strip() else {}
+                    except ValueError:
+                        # A corrupted state file only costs us the current limits
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+def get_state_store():
+    """
+    Return the state store configured by YOUTUBE_RATE_STATE_FILE, or an in-process one.
+    """
+    path = os.environ.get("YOUTUBE_RATE_STATE_FILE")
+    if path:
+        return FileStateStore(path)
+    return MemoryStateStore()
+
+def is_throttled_response(response, sniff_body: bool = True) -> bool:
+    """
+    Check whether a response is a 429 or a consent / unusual-traffic page.
+
+    Pass ``sniff_body=False`` for streamed responses: reading ``.text`` would
+    download the whole body before the caller gets to stream it.
+    """
+    if response.status_code == 429:
+        return True
+    final_url = getattr(response, "url", "") or ""
+    if any(marker in final_url for marker in CONSENT_MARKERS):
+        return True
+    if not sniff_body:
+        return False
+    # Consent interstitials are served with a 200, so look at the start of the body too
+    head = (getattr(response, "text", "") or "")[:4096]
+    return 'action="https://consent.' in head
+
+def is_throttle_error(error: Exception) -> bool:
+    """
+    Check whether an exception raised by youtube_transcript_api means we are being throttled.
+    """
+    if isinstance(error, RateLimitedError):
+        return True
+    if type(error).__name__ in ("TooManyRequests", "RequestBlocked", "IpBlocked"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message
+
+def get_retry_after(response) -> Optional[float]:
+    """
+    Parse a numeric Retry-After header, if present.
+    """
+    value = getattr(response, "headers", {}).get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class HostRateLimiter:
+    """
+    Token bucket per host with adaptive (AIMD) backoff.
+
+    Each host refills at ``requests_per_minute`` scaled by a factor that is halved
+    on every throttled response and recovers slowly on success, so batch jobs
+    run at full speed until YouTube pushes back.
+    """
+    def __init__(
+        self,
+        store=None,
+        requests_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_wait: Optional[float] = None,
+    ):
+        self.store = store or get_state_store()
+        self.requests_per_minute = requests_per_minute or float(
+            os.environ.get("YOUTUBE_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)
+        )
+        self.burst = burst or int(os.environ.get("YOUTUBE_BURST", DEFAULT_BURST))
+        self.max_wait = max_wait if max_wait is not None else float(
+            os.environ.get("YOUTUBE_MAX_WAIT", DEFAULT_MAX_WAIT)
+        )
+
+    def _host_state(self, state: Dict[str, Any], host: str, now: float) -> Dict[str, Any]:
+        hosts = state.setdefault("hosts", {})
+        return hosts.setdefault(host, {
+            "tokens": float(self.burst),
+            "updated": now,
+            "scale": 1.0,
+            "backoff_level": 0,
+            "backoff_until": 0.0,
+        })
+
+    def acquire(self, host: str, max_wait: Optional[float] = None) -> float:
+        """
+        Reserve one request slot for a host, sleeping until it is available.
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            RateLimitedError: If the wait would exceed max_wait
+        """
+        limit = self.max_wait if max_wait is None else max_wait
+        with self.store.transaction() as state:
+            now = time.time()
+            host_state = self._host_state(state, host, now)
+            rate = self.requests_per_minute * host_state["scale"] / 60.0
+            elapsed = max(0.0, now - host_state["updated"])
+            tokens = min(float(self.burst), host_state["tokens"] + elapsed * rate)
+
+            # Tokens may go negative: that is a reservation for a future slot
+            wait = max(0.0, (1.0 - tokens) / rate) if tokens < 1.0 else 0.0
+            wait = max(wait, host_state["backoff_until"] - now)
+            if wait > limit:
+                raise RateLimitedError(
+                    f"Rate limit for {host} would require waiting {wait:.1f}s (limit {limit:.1f}s)"
+                )
+            host_state["tokens"] = tokens - 1.0
+            host_state["updated"] = now
+
+        if wait > 0:
+            logger.info(f"Rate limiter waiting {wait:.2f}s before request to {host}")
+            time.sleep(wait)
+        return wait
+
+    def headroom(self, host: str) -> float:
+        """
+        How many requests a host could take right now without waiting, without
+        reserving any. Zero while backing off, negative if slots are reserved ahead.
+        """
+        with self.store.transaction() as state:
+            now = time.time()
+            host_state = self._host_state(state, host, now)
+            if host_state["backoff_until"] > now:
+                return 0.0
+            rate = self.requests_per_minute * host_state["scale"] / 60.0
+            elapsed = max(0.0, now - host_state["updated"])
+            return min(float(self.burst), host_state["tokens"] + elapsed * rate)
+
+    def penalize(self, host: str, retry_after: Optional[float] = None) -> float:
+        """
+        Record a throttled response: halve the rate and back off exponentially.
+
+        Returns:
+            float: The backoff delay that was applied
+        """
+        with self.store.transaction() as state:
+            now = time.time()
+            host_state = self._host_state(state, host, now)
+            host_state["scale"] = max(MIN_RATE_SCALE, host_state["scale"] / 2.0)
+            host_state["backoff_level"] += 1
+            if retry_after is not None:
+                delay = min(BACKOFF_MAX, retry_after)
+            else:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (host_state["backoff_level"] - 1))
+                delay *= 0.5 + random.random() / 2
+            host_state["backoff_until"] = max(host_state["backoff_until"], now + delay)
+        logger.warning(
+            f"Throttled by {host}: backing off {delay:.1f}s, rate scale now {host_state['scale']:.2f}"
+        )
+        return delay
+
+    def reward(self, host: str) -> None:
+        """
+        Record a successful response: reset the backoff and slowly restore the rate.
+        """
+        with self.store.transaction() as state:
+            host_state = self._host_state(state, host, time.time())
+            host_state["backoff_level"] = 0
+            host_state["scale"] = min(1.0, host_state["scale"] + 0.1)
+
+class CircuitBreaker:
+    """
+    Circuit breaker per fetch strategy.
+
+    After ``failure_threshold`` consecutive throttling failures the strategy is
+    skipped for ``reset_timeout`` seconds, then a single probe is let through.
+    """
+    def __init__(
+        self,
+        store=None,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.store = store or get_state_store()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    def allow(self, strategy: str) -> bool:
+        """
+        Check whether a strategy may be attempted right now.
+        """
+        with self.store.transaction() as state:
+            circuit = state.setdefault("circuits", {}).get(strategy)
+            if not circuit or circuit["state"] == "closed":
+                return True
+            now = time.time()
+            # Open circuits (and stale half-open probes) get one new probe after the timeout
+            if now - circuit["opened_at"] >= self.reset_timeout:
+                circuit["state"] = "half_open"
+                circuit["opened_at"] = now
+                return True
+            return False
+
+    def record_success(self, strategy: str) -> None:
+        with self.store.transaction() as state:
+            state.setdefault("circuits", {})[strategy] = {
+                "state": "closed",
+                "failures": 0,
+                "opened_at": 0.0,
+            }
+
+    def record_failure(self, strategy: str) -> None:
+        with self.store.transaction() as state:
+            circuits = state.setdefault("circuits", {})
+            circuit = circuits.setdefault(strategy, {"state": "closed", "failures": 0, "opened_at": 0.0})
+            circuit["failures"] += 1
+            if circuit["state"] == "half_open" or circuit["failures"] >= self.failure_threshold:
+                if circuit["state"] != "open":
+                    logger.warning(f"Circuit for strategy '{strategy}' opened after {circuit['failures']} failures")
+                circuit["state"] = "open"
+                circuit["opened_at"] = time.time()
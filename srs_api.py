@@ -0,0 +1,71 @@
+import sys
+import json
+from typing import Dict, Any
+from srs_scheduler import get_deck
+
+def process_api_request(input_file: str, output_file: str) -> None:
+    """
+    Manage a user's spaced-repetition deck.
+
+    Input is {"user_id": ..., "action": ...} plus, per action:
+        add     "video_id", "flashcards": [{"front", "back"}, ...]
+        due     "limit" (default 20)
+        review  "card_id", "grade": 0-5 or again/hard/good/easy
+        stats   nothing
+
+    Args:
+        input_file: Path to JSON file with input data
+        output_file: Path to write output JSON data
+    """
+    try:
+        with open(input_file, 'r') as f:
+            input_data = json.load(f)
+
+        user_id = input_data.get('user_id')
+        if not user_id:
+            raise ValueError("A user ID is required")
+        action = input_data.get('action', 'due')
+        deck = get_deck(str(user_id))
+
+        if action == 'add':
+            video_id = input_data.get('video_id')
+            flashcards = input_data.get('flashcards') or []
+            if not video_id:
+                raise ValueError("A video ID is required")
+            output_data: Dict[str, Any] = {'card_ids': deck.add(video_id, flashcards)}
+        elif action == 'due':
+            output_data = {'cards': deck.due(int(input_data.get('limit', 20))), 'next_due': deck.next_due()}
+        elif action == 'review':
+            card_id = input_data.get('card_id')
+            if card_id is None:
+                raise ValueError("A card ID is required")
+            try:
+                output_data = {'card': deck.review(int(card_id), input_data.get('grade'))}
+            except KeyError:
+                output_data = {'error': f"Card not found: {card_id}", 'error_type': "CardNotFound"}
+        elif action == 'stats':
+            output_data = dict(deck.stats(), next_due=deck.next_due())
+        else:
+            raise ValueError(f"Unknown action: {action}")
+
+        with open(output_file, 'w') as f:
+            json.dump(output_data, f)
+
+    except Exception as e:
+        # Write error to output file
+        with open(output_file, 'w') as f:
+            json.dump({'error': str(e)}, f)
+        raise
+
+def main():
+    """
+    Main function to handle API requests.
+    """
+    if len(sys.argv) != 3:
+        print("Usage: python srs_api.py <input_file> <output_file>")
+        sys.exit(1)
+
+    process_api_request(sys.argv[1], sys.argv[2])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import heapq
+import struct
+import hashlib
+import logging
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl; a deck is then only safe to use from a single process
+    fcntl = None
+
+logger = logging.getLogger("srs-scheduler")
+
+DEFAULT_SRS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmp", "srs")
+
+# A deck is one user's cards across every video, in a directory of three files:
+#   cards  header, then one fixed-width record per card (card ID = record number)
+#   heap   card IDs as a binary min-heap on the due time, so the next due card is
+#          at the top and a review re-positions one card in O(log n) writes
+#   text   append-only JSON lines with each card's video, front and back
+# Records are updated in place, so a review never rewrites a file. Native byte
+# order: a deck is local state, not an exchange format.
+DECK_MAGIC = b"SRS1"
+DECK_HEADER = struct.Struct("=4s4xQ")   # magic, cards
+# key, due, last review, interval (days), ease, repetitions, lapses, heap position, text offset, text length
+CARD_FIELDS = ("16s", "d", "d", "f", "f", "H", "H", "I", "Q", "I")
+CARD = struct.Struct("=" + "".join(CARD_FIELDS) + "4x")
+# The two fields rewritten on their own, without the rest of the record
+DUE_FIELD = 1
+HEAP_POSITION_FIELD = 7
+
+def _field_offset(field: int) -> int:
+    # "=" packs without alignment, so a field starts where the ones before it end
+    return struct.calcsize("=" + "".join(CARD_FIELDS[:field]))
+
+DUE = struct.Struct("=" + CARD_FIELDS[DUE_FIELD])
+SLOT = struct.Struct("=" + CARD_FIELDS[HEAP_POSITION_FIELD])
+DUE_OFFSET = _field_offset(DUE_FIELD)
+HEAP_POSITION_OFFSET = _field_offset(HEAP_POSITION_FIELD)
+
+# SM-2 parameters
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL_DAYS = 1.0
+SECOND_INTERVAL_DAYS = 6.0
+# Qualities 0-5; these names match the buttons of most flashcard apps
+GRADES = {"again": 1, "hard": 3, "good": 4, "easy": 5}
+DAY_SECONDS = 86400.0
+
+def sm2(interval: float, ease: float, repetitions: int, quality: int) -> Tuple[float, float, int]:
+    """
+    The SM-2 schedule after one review.
+
+    Args:
+        interval: Current interval in days
+        ease: Current ease factor
+        repetitions: Successful reviews in a row
+        quality: 0 (blackout) to 5 (perfect); below 3 the card is relearned
+
+    Returns:
+        The new interval, ease and repetitions
+    """
+    if quality >= 3:
+        if repetitions == 0:
+            interval = FIRST_INTERVAL_DAYS
+        elif repetitions == 1:
+            interval = SECOND_INTERVAL_DAYS
+        else:
+            interval = interval * ease
+        repetitions += 1
+    else:
+        interval = FIRST_INTERVAL_DAYS
+        repetitions = 0
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return interval, ease, repetitions
+
+def parse_grade(grade) -> int:
+    """
+    A quality from 0-5 or a grade name (again, hard, good, easy).
+
+    Raises:
+        ValueError: If it is neither
+    """
+    if isinstance(grade, str) and grade.strip().lower() in GRADES:
+        return GRADES[grade.strip().lower()]
+    quality = int(grade)
+    if not 0 <= quality <= 5:
+        raise ValueError(f"Grade must be 0-5 or one of {', '.join(GRADES)}")
+    return quality
+
+def card_key(video_id: str, front: str) -> bytes:
+    return hashlib.blake2b(f"{video_id}\0{front.strip()}".encode("utf-8"), digest_size=16).digest()
+
+class Deck:
+    """
+    One user's review schedule.
+
+    Readers take a shared lock and writers an exclusive one, so processes can
+    share a deck. A crash in the middle of a review can leave the heap out of
+    order (never a card lost); ``rebuild_heap`` repairs it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._cards = os.open(os.path.join(path, "cards"), os.O_RDWR | os.O_CREAT, 0o666)
+        self._heap = os.open(os.path.join(path, "heap"), os.O_RDWR | os.O_CREAT, 0o666)
+        self._text = os.open(os.path.join(path, "text"), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o666)
+        self._lock = threading.Lock()
+        with self._locked(exclusive=True):
+            if os.fstat(self._cards).st_size < DECK_HEADER.size:
+                os.pwrite(self._cards, DECK_HEADER.pack(DECK_MAGIC, 0), 0)
+
+    def close(self) -> None:
+        os.close(self._cards)
+        os.close(self._heap)
+        os.close(self._text)
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with self._lock:
+            with open(os.path.join(self.path, ".lock"), "a") as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _count(self) -> int:
+        magic, count = DECK_HEADER.unpack(os.pread(self._cards, DECK_HEADER.size, 0))
+        if magic != DECK_MAGIC:
+            raise ValueError(f"Not a flashcard deck: {self.path}")
+        return count
+
+    def _record_offset(self, card_id: int) -> int:
+        return DECK_HEADER.size + card_id * CARD.size
+
+    def _read_card(self, card_id: int) -> tuple:
+        return CARD.unpack(os.pread(self._cards, CARD.size, self._record_offset(card_id)))
+
+    def _due(self, card_id: int) -> float:
+        return DUE.unpack(os.pread(self._cards, DUE.size, self._record_offset(card_id) + DUE_OFFSET))[0]
+
+    def _heap_get(self, position: int) -> int:
+        return SLOT.unpack(os.pread(self._heap, SLOT.size, position * SLOT.size))[0]
+
+    def _heap_set(self, position: int, card_id: int) -> None:
+        os.pwrite(self._heap, SLOT.pack(card_id), position * SLOT.size)
+        os.pwrite(self._cards, SLOT.pack(position), self._record_offset(card_id) + HEAP_POSITION_OFFSET)
+
+    def _sift_up(self, position: int) -> None:
+        card_id = self._heap_get(position)
+        due = self._due(card_id)
+        while position > 0:
+            parent = (position - 1) // 2
+            parent_id = self._heap_get(parent)
+            if self._due(parent_id) <= due:
+                break
+            self._heap_set(position, parent_id)
+            position = parent
+        self._heap_set(position, card_id)
+
+    def _sift_down(self, position: int, count: int) -> None:
+        card_id = self._heap_get(position)
+        due = self._due(card_id)
+        while True:
+            child = 2 * position + 1
+            if child >= count:
+                break
+            child_id = self._heap_get(child)
+            child_due = self._due(child_id)
+            if child + 1 < count:
+                right_id = self._heap_get(child + 1)
+                right_due = self._due(right_id)
+                if right_due < child_due:
+                    child, child_id, child_due = child + 1, right_id, right_due
+            if due <= child_due:
+                break
+            self._heap_set(position, child_id)
+            position = child
+        self._heap_set(position, card_id)
+
+    def _read_text(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(os.pread(self._text, length, offset))
+
+    def _card_dict(self, card_id: int, record: tuple) -> Dict[str, Any]:
+        _, due, last_review, interval, ease, repetitions, lapses, _, offset, length = record
+        return dict(
+            self._read_text(offset, length),
+            card_id=card_id,
+            due=due,
+            last_review=last_review or None,
+            interval_days=round(interval, 3),
+            ease=round(ease, 3),
+            repetitions=repetitions,
+            lapses=lapses,
+        )
+
+    def add(self, video_id: str, flashcards: List[Dict[str, Any]], now: Optional[float] = None) -> List[int]:
+        """
+        Add a video's flashcards, due at once. A card already in the deck (same
+        video and front) keeps its schedule.
+
+        Returns:
+            The card IDs of the given flashcards, new or existing
+        """
+        now = now if now is not None else time.time()
+        with self._locked(exclusive=True):
+            count = self._count()
+            records = os.pread(self._cards, count * CARD.size, DECK_HEADER.size)
+            existing = {records[i:i + 16]: i // CARD.size for i in range(0, len(records), CARD.size)}
+            card_ids = []
+            offset = os.fstat(self._text).st_size
+            for card in flashcards:
+                front, back = card.get("front", ""), card.get("back", "")
+                key = card_key(video_id, front)
+                if key in existing:
+                    card_ids.append(existing[key])
+                    continue
+                line = json.dumps({"video_id": video_id, "front": front, "back": back}).encode("utf-8") + b"\n"
+                os.write(self._text, line)
+                card_id = count
+                os.pwrite(self._cards, CARD.pack(key, now, 0.0, 0.0, INITIAL_EASE, 0, 0, card_id, offset, len(line) - 1),
+                          self._record_offset(card_id))
+                os.pwrite(self._heap, SLOT.pack(card_id), card_id * SLOT.size)
+                self._sift_up(card_id)
+                offset += len(line)
+                count += 1
+                existing[key] = card_id
+                card_ids.append(card_id)
+            os.pwrite(self._cards, DECK_HEADER.pack(DECK_MAGIC, count), 0)
+            return card_ids
+
+    def due(self, limit: int = 20, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Up to ``limit`` cards due by ``now``, most overdue first.
+
+        Walks the heap best-first instead of popping it, so it reads
+        O(limit log limit) entries and changes nothing.
+        """
+        now = now if now is not None else time.time()
+        with self._locked(exclusive=False):
+            count = self._count()
+            cards = []
+            frontier: List[Tuple[float, int]] = []
+            if count:
+                frontier.append((self._due(self._heap_get(0)), 0))
+            while frontier and len(cards) < limit:
+                due, position = heapq.heappop(frontier)
+                if due > now:
+                    break
+                card_id = self._heap_get(position)
+                cards.append(self._card_dict(card_id, self._read_card(card_id)))
+                for child in (2 * position + 1, 2 * position + 2):
+                    if child < count:
+                        heapq.heappush(frontier, (self._due(self._heap_get(child)), child))
+            return cards
+
+    def next_due(self) -> Optional[float]:
+        """
+        When the next card falls due, or None for an empty deck.
+        """
+        with self._locked(exclusive=False):
+            return self._due(self._heap_get(0)) if self._count() else None
+
+    def review(self, card_id: int, grade, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Record a review and reschedule the card.
+
+        Args:
+            card_id: The card reviewed
+            grade: 0-5 or again/hard/good/easy
+
+        Returns:
+            The card with its new schedule
+
+        Raises:
+            KeyError: If the deck has no such card
+        """
+        quality = parse_grade(grade)
+        now = now if now is not None else time.time()
+        with self._locked(exclusive=True):
+            count = self._count()
+            if not 0 <= card_id < count:
+                raise KeyError(card_id)
+            key, _, _, interval, ease, repetitions, lapses, position, offset, length = self._read_card(card_id)
+            interval, ease, repetitions = sm2(interval, ease, repetitions, quality)
+            lapses += 1 if quality < 3 and lapses < 0xFFFF else 0
+            due = now + interval * DAY_SECONDS
+            record = (key, due, now, interval, ease, min(repetitions, 0xFFFF), lapses, position, offset, length)
+            os.pwrite(self._cards, CARD.pack(*record), self._record_offset(card_id))
+            # The due time only moves one way per review, so one of these is a no-op
+            self._sift_up(position)
+            self._sift_down(self._read_card(card_id)[HEAP_POSITION_FIELD], count)
+            return self._card_dict(card_id, self._read_card(card_id))
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now if now is not None else time.time()
+        with self._locked(exclusive=False):
+            count = self._count()
+            records = os.pread(self._cards, count * CARD.size, DECK_HEADER.size)
+        due = new = lapses = 0
+        for record in CARD.iter_unpack(records):
+            due += record[1] <= now
+            new += record[2] == 0.0
+            lapses += record[6]
+        return {"cards": count, "due": due, "new": new, "lapses": lapses}
+
+    def rebuild_heap(self) -> int:
+        """
+        Rebuild the due queue from the card records, e.g. after a crash.
+
+        Returns:
+            The number of cards
+        """
+        with self._locked(exclusive=True):
+            count = self._count()
+            records = os.pread(self._cards, count * CARD.size, DECK_HEADER.size)
+            order = sorted(range(count), key=lambda i: CARD.unpack_from(records, i * CARD.size)[DUE_FIELD])
+            # A sorted array is a valid min-heap
+            os.ftruncate(self._heap, 0)
+            os.pwrite(self._heap, b"".join(SLOT.pack(card_id) for card_id in order), 0)
+            for position, card_id in enumerate(order):
+                os.pwrite(self._cards, SLOT.pack(position), self._record_offset(card_id) + HEAP_POSITION_OFFSET)
+            return count
+
+def srs_dir() -> str:
+    return os.environ.get("SUMMIFY_SRS_DIR", DEFAULT_SRS_DIR)
+
+def deck_path(user_id: str, root: Optional[str] = None) -> str:
+    """
+    A user's deck directory; user IDs are hashed so any string is safe, and
+    spread over 256 subdirectories so millions of users stay listable.
+    """
+    digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+    return os.path.join(root or srs_dir(), digest[:2], digest[2:34])
+
+_decks: Dict[str, Deck] = {}
+
+def get_deck(user_id: str) -> Deck:
+    """
+    The process-wide deck object for a user.
+    """
+    path = deck_path(user_id)
+    if path not in _decks:
+        _decks[path] = Deck(path)
+    return _decks[path]
+
+def main():
+    """
+    Inspect or repair a user's deck: stats, due [N], rebuild.
+    """
+    parser = argparse.ArgumentParser(description="Spaced-repetition decks of generated flashcards")
+    parser.add_argument("user_id")
+    parser.add_argument("command", choices=("stats", "due", "rebuild"))
+    parser.add_argument("limit", nargs="?", type=int, default=20)
+    args = parser.parse_args()
+
+    deck = get_deck(args.user_id)
+    if args.command == "stats":
+        print(json.dumps(dict(deck.stats(), next_due=deck.next_due()), indent=2))
+    elif args.command == "due":
+        print(json.dumps(deck.due(args.limit), indent=2, ensure_ascii=False))
+    else:
+        print(f"Rebuilt the due queue of {deck.rebuild_heap()} cards")
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,18 @@ import sys
 import json
 import logging
 import traceback
-import google.generativeai as genai
-from transcript import get_video_id, get_transcript
+from transcript import get_video_id, join_segments
+from transcript_cache import get_transcript_segments, get_video_metadata, load_result, result_cache_key, store_result
+from rate_limiter import RateLimitedError
+from deadline import Deadline, DeadlineExceeded
+from instrumentation import start_request, finish_request, span
+from profiling import RequestProfiler, profiling_requested
+import llm_backend
+import cost_ledger
 from typing import Dict, Any, Optional
-from summerize import summarize_text  # Make sure to adjust if summerize.py isn't in the same folder
+from chapters import build_chapters, wants_chapters
+from pipeline import PipelinedSummary, pipeline_enabled, start_summary
+from language_id import AUTO, detect_segments
 
 # Configure logging
 logging.basicConfig(
@@ -21,6 +29,8 @@ logger = logging.getLogger("video-summarizer")
 # Default settings
 DEFAULT_MAX_TOKENS = 500
 DEFAULT_TEMPERATURE = 0.7
+# Share of the request deadline reserved for fetching the transcript; the rest is for Gemini
+TRANSCRIPT_BUDGET_SHARE = 0.6
 
 def setup_api_keys() -> None:
     """
@@ -37,11 +47,8 @@ def setup_api_keys() -> None:
                         # Skip lines that don't have the format KEY=VALUE
                         continue
     
-    # Configure Gemini API
-    if os.environ.get("GEMINI_API_KEY"):
-        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-    else:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    # Configure the LLM backend
+    llm_backend.configure_backend()
 
 def log_environment_info():
     """
@@ -52,7 +59,9 @@ def log_environment_info():
     logger.info(f"RENDER: {os.environ.get('RENDER', 'not set')}")
     logger.info(f"Python version: {sys.version}")
     logger.info(f"Working directory: {os.getcwd()}")
-    logger.info(f"Files in current directory: {', '.join(os.listdir('.')[:10])}...")
+    # Listing the directory costs a syscall per request, so only do it when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Files in current directory: {', '.join(os.listdir('.')[:10])}...")
 
 def process_api_request(input_file: str, output_file: str) -> None:
     """
@@ -62,6 +71,8 @@ def process_api_request(input_file: str, output_file: str) -> None:
         input_file: Path to JSON file with input data
         output_file: Path to write output JSON data
     """
+    tracer = start_request("summarize")
+    profiler = None
     try:
         # Log environment information for debugging
         log_environment_info()
@@ -71,8 +82,14 @@ def process_api_request(input_file: str, output_file: str) -> None:
         with open(input_file, 'r') as f:
             input_data = json.load(f)
 
+        if profiling_requested(input_data):
+            profiler = RequestProfiler(output_file)
+            profiler.start()
+
         url = input_data.get('url')
-        language = input_data.get('language', 'en')
+        # "auto" summarizes in the video's own language
+        language = input_data.get('language', AUTO)
+        deadline = Deadline.from_input(input_data)
         
         if not url:
             logger.error("URL is required but not provided")
@@ -80,55 +97,110 @@ def process_api_request(input_file: str, output_file: str) -> None:
         
         # Process the video
         logger.info(f"Processing video URL: {url}")
-        video_id = get_video_id(url)
+        with span("parse_url") as record:
+            video_id = get_video_id(url)
+            # hot_videos.py counts requests per video from these events
+            record["video_id"] = video_id
         logger.info(f"Extracted video ID: {video_id}")
+        cost_ledger.set_video(video_id)
+
+        # Popular videos are usually summarized ahead of time by hot_videos.py
+        result_key = result_cache_key("summarize", video_id, language, input_data.get('chapters'))
+        with span("summary:cache", video_id=video_id) as record:
+            cached_output = load_result("summary", result_key)
+            record["hit"] = cached_output is not None
+        if cached_output is not None:
+            logger.info(f"Using cached summary for {video_id}")
+            cost_ledger.record_cache_hit("summarize")
+            with span("write_output"):
+                with open(output_file, 'w') as f:
+                    json.dump(cached_output, f)
+            return
         
         # Check if we're in the Render environment
         is_render = os.environ.get('RENDER') == 'true'
         
-        # Try multiple times to get the transcript with different methods
-        max_retries = 3
-        last_error = None
-        
-        for attempt in range(1, max_retries + 1):
+        transcript_deadline = deadline.child(TRANSCRIPT_BUDGET_SHARE)
+        segments = None
+        run = None
+        if pipeline_enabled(input_data):
+            # Stream the captions and summarize each chunk as soon as it has arrived
             try:
-                logger.info(f"Transcript retrieval attempt {attempt}/{max_retries}")
-                transcript_text = get_transcript(video_id, language)
-                transcript_length = len(transcript_text)
-                logger.info(f"Retrieved transcript ({transcript_length} characters)")
+                run = start_summary(video_id, language, deadline, transcript_deadline)
+                segments = run.segments
+                transcript_text = join_segments(segments)
+                logger.info(f"Streamed transcript ({len(transcript_text)} characters)")
+            except Exception as e:
+                logger.warning(f"Streaming the transcript failed, falling back to the other methods: {str(e)}")
+                run = None
+
+        if segments is None:
+            # Try multiple times to get the transcript with different methods,
+            # each attempt getting an even share of the transcript budget that is left
+            max_retries = 3
+            last_error = None
+            
+            for attempt in range(1, max_retries + 1):
+                try:
+                    logger.info(f"Transcript retrieval attempt {attempt}/{max_retries}")
+                    attempt_deadline = transcript_deadline.child(1 / (max_retries - attempt + 1))
+                    segments = get_transcript_segments(video_id, language, attempt_deadline)
+                    transcript_text = join_segments(segments)
+                    transcript_length = len(transcript_text)
+                    logger.info(f"Retrieved transcript ({transcript_length} characters)")
                 
-                if transcript_length < 10:
-                    logger.warning("Retrieved transcript is very short, might be incomplete")
+                    if transcript_length < 10:
+                        logger.warning("Retrieved transcript is very short, might be incomplete")
                 
-                # If we got here, we have a transcript
-                break
+                    # If we got here, we have a transcript
+                    break
                 
-            except Exception as e:
-                last_error = e
-                logger.error(f"Attempt {attempt} failed: {str(e)}")
-                if attempt == max_retries:
-                    logger.error(f"All {max_retries} attempts to get transcript failed")
-                    # Create more specific error message for no transcripts case
-                    error_msg = str(last_error)
-                    if "subtitles are disabled" in error_msg.lower() or "no transcripts available" in error_msg.lower() or "does not have available subtitles" in error_msg:
-                        # Write a user-friendly error response for videos without subtitles
-                        error_data = {
-                            'error': "This video does not have subtitles/captions available. Please try a different video that has captions enabled.",
-                            'error_type': "NoTranscriptAvailable",
-                            'video_id': video_id,
-                            'suggestion': "YouTube requires videos to have captions/subtitles for summarization to work."
-                        }
-                        with open(output_file, 'w') as f:
-                            json.dump(error_data, f)
-                        logger.info("Wrote no-transcript error response to output file")
-                        return  # Exit without raising an exception
-                    else:
-                        # For other types of errors
-                        raise ValueError(f"Failed to get transcript after {max_retries} attempts: {str(last_error)}")
+                except RateLimitedError as e:
+                    # Retrying while throttled only digs the hole deeper: report it and stop
+                    logger.error(f"Attempt {attempt} was throttled: {str(e)}")
+                    error_data = {
+                        'error': "YouTube is temporarily limiting our requests. Please try again in a few minutes.",
+                        'error_type': "RateLimited",
+                        'video_id': video_id,
+                        'suggestion': "Wait a little before summarizing another video."
+                    }
+                    with open(output_file, 'w') as f:
+                        json.dump(error_data, f)
+                    logger.info("Wrote rate-limited error response to output file")
+                    return  # Exit without raising an exception
+                
+                except Exception as e:
+                    last_error = e
+                    logger.error(f"Attempt {attempt} failed: {str(e)}")
+                    if isinstance(e, DeadlineExceeded) and (attempt == max_retries or transcript_deadline.expired()):
+                        raise DeadlineExceeded("transcript", deadline.report())
+                    if attempt == max_retries:
+                        logger.error(f"All {max_retries} attempts to get transcript failed")
+                        # Create more specific error message for no transcripts case
+                        error_msg = str(last_error)
+                        if "subtitles are disabled" in error_msg.lower() or "no transcripts available" in error_msg.lower() or "does not have available subtitles" in error_msg:
+                            # Write a user-friendly error response for videos without subtitles
+                            error_data = {
+                                'error': "This video does not have subtitles/captions available. Please try a different video that has captions enabled.",
+                                'error_type': "NoTranscriptAvailable",
+                                'video_id': video_id,
+                                'suggestion': "YouTube requires videos to have captions/subtitles for summarization to work."
+                            }
+                            with open(output_file, 'w') as f:
+                                json.dump(error_data, f)
+                            logger.info("Wrote no-transcript error response to output file")
+                            return  # Exit without raising an exception
+                        else:
+                            # For other types of errors
+                            raise ValueError(f"Failed to get transcript after {max_retries} attempts: {str(last_error)}")
         
         # If we're here, we have a transcript
-        if not transcript_text or len(transcript_text.strip()) < 10:
+        with span("normalize", characters=len(transcript_text)):
+            transcript_text = transcript_text.strip()
+        if not transcript_text or len(transcript_text) < 10:
             logger.error("Retrieved transcript is empty or too short")
+            if run is not None:
+                run.close()
             # Handle empty transcript case with user-friendly error
             error_data = {
                 'error': "Retrieved transcript is too short to generate a meaningful summary.",
@@ -141,21 +213,53 @@ def process_api_request(input_file: str, output_file: str) -> None:
             logger.info("Wrote empty-transcript error response to output file")
             return  # Exit without raising an exception
             
+        if language == AUTO:
+            with span("language:detect") as record:
+                detected = detect_segments(segments)
+                record["language"] = detected
+        else:
+            detected = language
+        if run is None:
+            # Fetched in one go: still summarize it chunk by chunk so unchanged
+            # chunks come from the cache, unless the pipeline is turned off
+            run = PipelinedSummary(deadline, max_tokens=None if pipeline_enabled(input_data) else float("inf"))
+            run.consume(segments)
+        run.language = detected
+        # The overall summary runs next to the chapter summaries rather than before them
         logger.info("Generating summary...")
-        summary = summarize_text(transcript_text)
+        run.finish()
+        chapters = None
+        if wants_chapters(input_data, segments):
+            logger.info(f"Generating chapters from {len(segments)} segments...")
+            chapters = build_chapters(segments, deadline)
+            logger.info(f"Generated {len(chapters)} chapters")
+        summary = run.result()
+        
+        # Metadata comes from the watch page the transcript fetch already loaded
+        metadata = get_video_metadata(video_id)
         
         # Prepare output data
         output_data = {
             'video_id': video_id,
-            'language': language,
+            'language': detected or language,
             'summary': summary,
-            'video_title': f"YouTube Video ({video_id})"  # In a real implementation, you'd get the actual title
+            'video_title': (metadata or {}).get('title') or f"YouTube Video ({video_id})",
         }
+        if metadata is not None:
+            output_data['metadata'] = metadata
+        if chapters is not None:
+            output_data['chapters'] = chapters
+        if run.routing is not None:
+            output_data['routing'] = run.routing
         
         # Write output data
         logger.info(f"Writing output to file: {output_file}")
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f)
+        with span("write_output"):
+            with open(output_file, 'w') as f:
+                json.dump(output_data, f)
+        # A failed generation raises SummaryFailed instead; an empty summary is not worth keeping either
+        if summary:
+            store_result("summary", result_key, output_data)
         logger.info("Request processed successfully")
             
     except Exception as e:
@@ -176,6 +280,12 @@ def process_api_request(input_file: str, output_file: str) -> None:
             'suggestion': "YouTube requires videos to have captions/subtitles for summarization to work."
         }
         
+        # Tell the caller how far we got before the time ran out
+        if isinstance(e, DeadlineExceeded):
+            error_data['error'] = "Processing this video took too long. Please try again or choose a shorter video."
+            error_data['progress'] = e.progress
+            error_data['suggestion'] = "Long videos can take more time than a single request allows."
+        
         try:
             with open(output_file, 'w') as f:
                 json.dump(error_data, f)
@@ -183,6 +293,10 @@ def process_api_request(input_file: str, output_file: str) -> None:
             logger.error(f"Failed to write error to output file: {str(write_error)}")
         # Don't re-raise the exception since we've already handled it by writing to the output file
         return
+    finally:
+        if profiler is not None:
+            profiler.stop(tracer)
+        finish_request()
 
 def main():
     """
@@ -2,19 +2,51 @@ import os
 import sys
 import argparse
 from typing import Optional, Dict, Any
-import google.generativeai as genai
 from transcript import get_video_id, get_transcript
-# Import the quiz functionality
-# from quiz import generate_quiz_questions, run_quiz_in_terminal, export_quiz_to_json
-from quiz_api import generate_quiz_questions  # adjust if run_quiz_in_terminal, export_quiz_to_json also exist in quiz_api
-# Import the flashcards functionality
-from flashcards_api import generate_flashcards, export_flashcards_to_json, export_to_anki_format
+from deadline import Deadline, DeadlineExceeded, ensure_deadline
+from cost_ledger import BudgetExceeded
+import language_id
+import llm_backend
 import re
 
 # Default settings
 DEFAULT_MAX_TOKENS = 500
 DEFAULT_TEMPERATURE = 0.7
 
+# Section headings of the summary, per language of the transcript
+OUTPUT_HEADINGS = {
+    "en": ["Heading of the Text", "Short Introduction", "Main Point", "Final Conclusion"],
+    "vi": ["Tiêu đề của văn bản", "Giới thiệu ngắn gọn", "Thông tin chính", "Kết luận"],
+}
+
+class SummaryFailed(Exception):
+    """
+    Raised when the LLM call behind a summary fails.
+    """
+    pass
+
+def output_format(language: Optional[str]) -> str:
+    """
+    The OUTPUT part of the summary prompt: the headings for ``language``, or
+    every set when the language is not known or has no headings of its own.
+    """
+    if language not in OUTPUT_HEADINGS:
+        language = None
+    headings = OUTPUT_HEADINGS.get(language, OUTPUT_HEADINGS["en"])
+    listing = "\n".join(f"-{heading}" for heading in headings)
+    if language is None:
+        listing += "\nor this if the text is Vietnamese:\n"
+        listing += "\n".join(f"-{heading}" for heading in OUTPUT_HEADINGS["vi"])
+    spaced = "\n\n\n".join(f"-{heading}" for heading in headings)
+    return f"""OUTPUT:
+
+{listing}
+
+Each section should enter 2 times to the next row like this :
+
+{spaced}
+"""
+
 def setup_api_keys() -> None:
     """
     Set up API keys from .env file.
@@ -30,66 +62,56 @@ def setup_api_keys() -> None:
                         # Skip lines that don't have the format KEY=VALUE
                         continue
     
-    # Configure Gemini API
-    if os.environ.get("GEMINI_API_KEY"):
-        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-    else:
-        print("Warning: GEMINI_API_KEY not found in environment variables")
+    # Configure the LLM backend
+    try:
+        llm_backend.configure_backend()
+    except ValueError as e:
+        print(f"Warning: {str(e)}")
 
 def summarize_text(
     text: str, 
     max_tokens: int = 260,  # Just an example
     temperature: float = 0.5,  # Match these with summarize_api.py
+    deadline: Optional[Deadline] = None,
+    model: Optional[str] = None,
+    language: Optional[str] = None,
 ) -> str:
     """
-    Summarize text using Google's Gemini Flash model.
+    Summarize text with the model configured for the "summarize" operation,
+    or ``model`` when the router picked one.
+
+    The prompt asks for headings in ``language``, the language of the text;
+    when it is not given it is detected from the text.
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before or during generation
+        SummaryFailed: If the LLM call fails, so that callers never cache or
+            show the error as if it were a summary
     """
+    deadline = ensure_deadline(deadline)
+    deadline.check("summarize")
+    if language is None or language == language_id.AUTO:
+        language = language_id.detect(text)
     # Create the prompt
     prompt = f"""
 You are a helpful assistant that summarizes video content. Please provide a concise summary of the following video transcript. Focus on the main points, key insights, and important details. Make the summary clear, informative, and well-structured. Do not change the language of the text, the summary must have the same language as the input text.
 You need to summarize following this OUTPUT format:
 
-OUTPUT:
-
--Heading of the Text
--Short Introduction
--Main Point
--Final Conclusion
-or this if the text is Vietnamese:
--Tiêu đề của văn bản
--Giới thiệu ngắn gọn
--Thông tin chính
--Kết luận 
-
-Each section should enter 2 times to the next row like this :
-
--Heading of the Text
-
-
--Short Introduction
-
-
--Main Point
-
-
--Final Conclusion
-
+{output_format(language)}
 
 TRANSCRIPT:
 {text}
 """
 
     try:
-        # Configure the model with the correct name
-        model = genai.GenerativeModel("gemini-2.0-flash")  # Must match the endpoint
-        
         # Generate the summary
-        response = model.generate_content(
+        response = llm_backend.generate(
+            "summarize",
             prompt,
-            generation_config=genai.GenerationConfig(
-                max_output_tokens=max_tokens,
-                temperature=temperature,
-            )
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+            deadline=deadline,
+            model=model,
         )
         
         # Extract and return the summary
@@ -99,33 +121,46 @@ TRANSCRIPT:
         # Warning: This is a naive approach, it will insert newlines before *all* dashes.
         summary = re.sub(r'(^|\n)-', r'\1\n-', summary)
         
+        deadline.mark("summarize", characters=len(summary))
         return summary
     
+    except BudgetExceeded:
+        raise
     except Exception as e:
+        # A timed-out call is not a summary: let the caller report the deadline
+        deadline.check("summarize")
         print(f"Error during summarization: {str(e)}")
-        return f"Failed to generate summary: {str(e)}"
+        raise SummaryFailed(f"Failed to generate summary: {str(e)}") from e
 
 def process_video_and_summarize():
     """
     Process a video and summarize its transcript.
     """
+    # Only the interactive flow needs these; the API workers never should pay for them
+    from quiz_api import generate_quiz_questions  # adjust if run_quiz_in_terminal, export_quiz_to_json also exist in quiz_api
+    from flashcards_api import generate_flashcards, export_flashcards_to_json, export_to_anki_format, study_flashcards_in_terminal
+
     print("\n=== YouTube Video Summarizer ===\n")
     
     # Step 1: Ask for language preference
     print("Select transcript language:")
     print("1. English (en)")
     print("2. Vietnamese (vi)")
+    print("3. The video's own language")
     
     while True:
-        lang_choice = input("Enter your choice (1 or 2): ").strip()
+        lang_choice = input("Enter your choice (1, 2 or 3): ").strip()
         if lang_choice == "1":
             language = "en"
             break
         elif lang_choice == "2":
             language = "vi"
             break
+        elif lang_choice == "3":
+            language = language_id.AUTO
+            break
         else:
-            print("Invalid choice. Please enter 1 or 2.")
+            print("Invalid choice. Please enter 1, 2 or 3.")
     
     # Step 2: Get the URL and process
     url = input("\nEnter YouTube URL: ").strip()
@@ -144,7 +179,7 @@ def process_video_and_summarize():
         print(f"\nTranscript retrieved in {language}")
         
         # Generate summary
-        print("\nGenerating summary using Gemini 2.0 Flash...")
+        print(f"\nGenerating summary using {llm_backend.model_for('summarize')}...")
         summary = summarize_text(transcript_text)
         
         # Print summary
@@ -243,7 +278,7 @@ def process_video_and_summarize():
                     fc_choice = input("Enter your choice (1-4): ").strip()
                     
                     if fc_choice == "1":
-                        study_flashcards_in_terminal(flashcards)
+                        study_flashcards_in_terminal(flashcards, video_id)
                         break
                     elif fc_choice == "2":
                         filename = input("Enter filename (default: flashcards.json): ").strip()
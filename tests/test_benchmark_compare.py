@@ -0,0 +1,43 @@
+import sys
+
+import pytest
+
+from benchmarks import run
+from benchmarks.run import compare, percentile
+
+def case(p50_ms, calibration_ms=10.0, peak=1_000_000):
+    return {"latency_ms": {"p50": p50_ms}, "peak_memory_bytes": peak, "calibration_ms": calibration_ms}
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+def test_a_regression_past_the_tolerance_fails():
+    regressions = compare({"parse": case(13.0)}, {"parse": case(10.0)}, tolerance=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("parse: p50")
+    assert compare({"parse": case(12.0)}, {"parse": case(10.0)}, tolerance=0.25) == []
+
+def test_baselines_are_scaled_by_the_calibration_workload():
+    # This host runs the calibration workload twice as slowly, so twice the time is no regression
+    assert compare({"parse": case(20.0, calibration_ms=20.0)}, {"parse": case(10.0)}, tolerance=0.25) == []
+    # ...but a faster host running as slowly as the baseline did has regressed
+    assert compare({"parse": case(10.0, calibration_ms=5.0)}, {"parse": case(10.0)}, tolerance=0.25)
+
+def test_differences_under_the_noise_floor_pass():
+    # 50% slower, but only 0.1ms: timer noise
+    assert compare({"tiny": case(0.3)}, {"tiny": case(0.2)}, tolerance=0.25) == []
+    assert compare({"tiny": case(0.3 + run.MIN_REGRESSION_MS)}, {"tiny": case(0.2)}, tolerance=0.25)
+
+def test_memory_regressions_and_missing_cases():
+    assert compare({"parse": case(10.0, peak=2_000_000)}, {"parse": case(10.0)}, tolerance=0.25)[0].startswith("parse: peak memory")
+    assert compare({"new": case(10.0)}, {"old": case(1.0)}, tolerance=0.25) == []
+
+@pytest.mark.parametrize("extra", [["--sizes", "1min"], ["--filter", "json3"]])
+def test_partial_runs_cannot_update_the_baseline(monkeypatch, capsys, extra):
+    monkeypatch.setattr(sys, "argv", ["benchmarks.run", "--update-baseline"] + extra)
+    with pytest.raises(SystemExit) as exit_info:
+        run.main()
+    assert exit_info.value.code == 2
+    assert "--update-baseline records the whole suite" in capsys.readouterr().err
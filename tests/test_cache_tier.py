@@ -0,0 +1,67 @@
+import socket
+import time
+
+import pytest
+
+from cache_server import CacheServer, start_cache_server
+from cache_tier import DiskTier, MemoryTier, SharedTier, TieredCache
+
+@pytest.fixture
+def server():
+    server, address = start_cache_server(secret="s3cret")
+    yield server, address
+    server.shutdown()
+    server.server_close()
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_bytes=10)
+    tier.set("a", b"aaaa")
+    tier.set("b", b"bbbb")
+    tier.get("a")
+    tier.set("c", b"cccc")
+    assert tier.get("b") is None
+    assert tier.get("a")[0] == b"aaaa"
+    assert tier.size == 8
+
+def test_disk_tier_keeps_stored_at_and_honours_max_age(tmp_path):
+    tier = DiskTier(str(tmp_path))
+    tier.set("results/x.json", b"{}", stored_at=time.time() - 100)
+    assert tier.get("results/x.json", max_age=10) is None
+    value, stored_at = tier.get("results/x.json", max_age=1000)
+    assert value == b"{}" and time.time() - stored_at >= 100
+
+def test_hit_in_slower_tier_is_copied_up_with_its_age(tmp_path):
+    memory, disk = MemoryTier(), DiskTier(str(tmp_path))
+    disk.set("k", b"v", stored_at=1000.0)
+    cache = TieredCache([memory, disk])
+    assert cache.get("k") == b"v"
+    assert memory.get("k") == (b"v", 1000.0)
+
+def test_shared_tier_round_trip(server):
+    _, address = server
+    tier = SharedTier(address, "s3cret")
+    tier.set("k", b"value", stored_at=5.0)
+    assert tier.get("k") == (b"value", 5.0)
+    assert tier.get("missing") is None
+    tier.close()
+
+def test_shared_tier_with_wrong_secret_gets_nothing(server):
+    store, address = server
+    SharedTier(address, "s3cret").set("k", b"value")
+    intruder = SharedTier(address, "guess")
+    assert intruder.get("k") is None
+    intruder.set("k", b"poisoned")
+    assert store.store.get("k")[0] == b"value"
+    assert store.stats["refused"] >= 1
+
+def test_commands_before_auth_are_refused(server):
+    store, address = server
+    host, port = address.rsplit(":", 1)
+    with socket.create_connection((host, int(port))) as sock:
+        sock.sendall(b"SET k 1.0 8\npoisoned")
+        assert sock.makefile("rb").readline() == b"ERROR unauthorized\n"
+    assert store.store.get("k") is None
+
+def test_server_needs_a_secret():
+    with pytest.raises(ValueError):
+        CacheServer(("127.0.0.1", 0), "")
@@ -0,0 +1,104 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+import chapters
+from chapters import (
+    _parse_chapter_response,
+    depth_scores,
+    find_chapters,
+    gap_scores,
+    keyword_title,
+    summarize_chapter,
+    wants_chapters,
+)
+from deadline import Deadline
+
+TOPICS = [
+    "cache memory eviction latency redis hit miss store key value expiry".split(),
+    "garden tomato soil water seeds compost sunlight harvest weeds pruning".split(),
+    "guitar chord melody rhythm strings tuning scale tempo strum fret".split(),
+]
+
+def transcript(topic_minutes, seed=1):
+    """
+    Five-second segments of words drawn from one topic per stretch of minutes.
+    """
+    rng = random.Random(seed)
+    segments = []
+    for topic, minutes in topic_minutes:
+        for _ in range(minutes * 12):
+            words = [rng.choice(TOPICS[topic]) for _ in range(12)]
+            segments.append({"start": len(segments) * 5.0, "duration": 5.0, "text": " ".join(words)})
+    return segments
+
+def brute_force_gap_scores(blocks, window):
+    def cosine(left, right):
+        a, b = Counter(), Counter()
+        for block in left:
+            a.update(block)
+        for block in right:
+            b.update(block)
+        dot = sum(weight * b[word] for word, weight in a.items())
+        norms = math.sqrt(sum(w * w for w in a.values()) * sum(w * w for w in b.values()))
+        return dot / norms if norms else 0.0
+    return [cosine(blocks[max(0, gap - window):gap], blocks[gap:gap + window]) for gap in range(1, len(blocks))]
+
+def test_sliding_gap_scores_match_a_brute_force_cosine():
+    rng = random.Random(7)
+    vocabulary = [f"w{i}" for i in range(30)]
+    blocks = [{rng.choice(vocabulary): rng.uniform(0.1, 3.0) for _ in range(8)} for _ in range(40)]
+    for window in (1, 3, 6):
+        assert gap_scores(blocks, window) == pytest.approx(brute_force_gap_scores(blocks, window))
+    assert gap_scores(blocks[:1]) == []
+
+def test_depth_scores_only_score_valleys():
+    depths = depth_scores([0.9, 0.9, 0.8, 0.2, 0.1, 0.2, 0.8, 0.9, 0.9])
+    deepest = max(range(len(depths)), key=depths.__getitem__)
+    assert deepest == 4
+    assert depths[0] == depths[-1] == 0.0
+
+def test_finds_the_topic_changes():
+    segments = transcript([(0, 6), (1, 6), (2, 6)])
+    found = find_chapters(segments)
+    assert [chapter["start"] for chapter in found] == [0.0, pytest.approx(360, abs=30), pytest.approx(720, abs=30)]
+    assert found[-1]["end"] == 18 * 60
+    # Every segment lands in exactly one chapter
+    assert " ".join(chapter["text"] for chapter in found) == " ".join(segment["text"] for segment in segments)
+
+def test_one_topic_is_one_chapter():
+    found = find_chapters(transcript([(0, 12)]))
+    assert len(found) == 1
+    assert find_chapters([]) == []
+
+def test_chapters_respect_the_minimum_length():
+    found = find_chapters(transcript([(0, 6), (1, 1), (2, 6)]), min_chapter_seconds=120)
+    starts = [chapter["start"] for chapter in found]
+    assert all(b - a >= 120 for a, b in zip(starts, starts[1:]))
+
+def test_keyword_title_prefers_words_specific_to_the_chapter():
+    corpus = ["cache cache redis and the garden", "garden tomato soil and the garden"]
+    assert keyword_title(corpus[0], corpus, count=2) == "Cache, Redis"
+    assert keyword_title("the and of", corpus) == "Untitled chapter"
+
+def test_parse_chapter_response():
+    assert _parse_chapter_response('TITLE: **"Caching"**\nSUMMARY: Why caches\nhelp.') == {
+        "title": "Caching", "summary": "Why caches\nhelp."}
+    assert _parse_chapter_response("Just text") == {"title": "", "summary": "Just text"}
+
+def test_failed_chapter_keeps_a_keyword_title(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("backend down")
+    monkeypatch.setattr(chapters.llm_backend, "generate", fail)
+    chapter = {"start": 0.0, "end": 60.0, "text": "redis cache eviction cache"}
+    result = summarize_chapter(chapter, [chapter["text"], "garden soil"], Deadline(10))
+    assert result == {"start": 0.0, "end": 60.0, "title": "Cache, Eviction, Redis", "summary": ""}
+
+def test_wants_chapters():
+    long_video = [{"start": 0.0, "duration": 0.0, "text": ""}, {"start": 600.0, "duration": 5.0, "text": ""}]
+    assert wants_chapters({}, long_video)
+    assert not wants_chapters({}, long_video[:1])
+    assert not wants_chapters({"chapters": False}, long_video)
+    assert wants_chapters({"chapters": True}, long_video[:1])
@@ -0,0 +1,78 @@
+import hashlib
+
+import pytest
+
+import collection_summary
+import llm_backend
+from collection_summary import CollectionSummary, MAX_GROUP_SHARE, group_children
+from llm_backend import StubBackend
+
+def hashes(names):
+    return [hashlib.sha256(name.encode("utf-8")).hexdigest() for name in names]
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", StubBackend(latency=0, tokens_per_second=1e9))
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", "")
+    summarized = []
+
+    def video_summary(video_id, language, deadline):
+        if video_id.startswith("nocap"):
+            raise Exception("No captions")
+        summarized.append(video_id)
+        return f"Summary of {video_id} in {language}.", False
+
+    monkeypatch.setattr(collection_summary, "video_summary", video_summary)
+    monkeypatch.setattr(collection_summary, "get_video_metadata", lambda video_id: {"title": f"Title {video_id}"})
+    return summarized
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 7, 50, 200])
+@pytest.mark.parametrize("fan_in", [2, 4, 8])
+def test_groups_cover_every_child_in_order(count, fan_in):
+    groups = group_children(hashes(str(i) for i in range(count)), fan_in)
+    assert [i for group in groups for i in group] == list(range(count))
+    if count > 1:
+        assert all(2 <= len(group) <= fan_in * MAX_GROUP_SHARE + 1 for group in groups)
+
+def test_inserting_a_child_only_regroups_its_neighbourhood():
+    names = [f"video{i}" for i in range(100)]
+    before = group_children(hashes(names))
+    edited = names[:50] + ["inserted"] + names[50:]
+    after = group_children(hashes(edited))
+    named = lambda groups, children: {tuple(children[i] for i in group) for group in groups}
+    unchanged = named(before, names) & named(after, edited)
+    assert len(unchanged) >= len(before) - 3
+
+def test_summarizes_a_collection_as_a_tree(collection):
+    video_ids = [f"video{i}" for i in range(20)]
+    result = CollectionSummary(fan_in=4).summarize(video_ids + ["video3", "nocap1"])
+    assert result["summary"]
+    assert [video["video_id"] for video in result["videos"]] == video_ids
+    assert result["videos"][0] == {"video_id": "video0", "title": "Title video0", "summary": "Summary of video0 in auto."}
+    assert [failed["video_id"] for failed in result["failed"]] == ["nocap1"]
+    assert result["levels"][0] == 20 and result["levels"][-1] == 1
+    assert all(a > b for a, b in zip(result["levels"], result["levels"][1:]))
+    assert [video for section in result["sections"] for video in section["videos"]] == video_ids
+    assert result["computed"] == sum(result["levels"]) and result["reused"] == 0
+
+def test_sections_are_reused_from_the_cache(collection, monkeypatch):
+    video_ids = [f"video{i}" for i in range(30)]
+    first = CollectionSummary().summarize(video_ids)
+    again = CollectionSummary().summarize(video_ids)
+    assert again["summary"] == first["summary"]
+    assert again["computed"] == 30
+    assert again["reused"] == sum(first["levels"]) - 30
+
+    # One more video renames only the sections on its path to the root
+    longer = CollectionSummary().summarize(video_ids + ["video30"])
+    assert longer["computed"] - 31 <= len(longer["levels"])
+
+def test_a_collection_without_any_summary_fails(collection):
+    with pytest.raises(Exception, match="None of the videos"):
+        CollectionSummary().summarize(["nocap1", "nocap2"])
+
+def test_a_single_video_is_its_own_summary(collection):
+    result = CollectionSummary().summarize(["video1"])
+    assert result["summary"] == "Summary of video1 in auto."
+    assert result["levels"] == [1] and result["sections"] == []
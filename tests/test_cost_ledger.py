@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import cost_ledger
+from cost_ledger import BudgetExceeded, check_budget, cost_usd, read_ledger, record, report
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "ledger.jsonl"
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", str(path))
+    monkeypatch.delenv("SUMMIFY_COST_BUDGETS", raising=False)
+    monkeypatch.setattr(cost_ledger, "_budgets", None)
+    video = cost_ledger._video_id.set(None)
+    tokens = cost_ledger._request_tokens.set(None)
+    yield path
+    cost_ledger._video_id.reset(video)
+    cost_ledger._request_tokens.reset(tokens)
+
+def set_budgets(tmp_path, monkeypatch, budgets):
+    path = tmp_path / "budgets.json"
+    path.write_text(json.dumps(budgets))
+    monkeypatch.setenv("SUMMIFY_COST_BUDGETS", str(path))
+    monkeypatch.setattr(cost_ledger, "_budgets", None)
+
+def test_cost_usd(ledger):
+    assert cost_usd("gemini-2.0-flash", 1_000_000, 1_000_000) == pytest.approx(0.50)
+    # Unknown models are priced like the default one
+    assert cost_usd("some-new-model", 1_000_000, 0) == pytest.approx(0.10)
+
+def test_budget_file_prices(ledger, tmp_path, monkeypatch):
+    set_budgets(tmp_path, monkeypatch, {"prices": {"some-new-model": [1.0, 2.0]}})
+    assert cost_usd("some-new-model", 1_000_000, 1_000_000) == pytest.approx(3.0)
+
+def test_record_and_report(ledger):
+    cost_ledger.set_video("abc")
+    record("summarize", "gemini-2.0-flash", "gemini", 1000, 200, 0.5)
+    record("summarize", "gemini-2.0-flash", "gemini", 3000, 200, 1.5)
+    cost_ledger.record_cache_hit("summarize")
+    record("quiz", "gemini-2.0-flash-lite", "gemini", 500, 500, 0.25)
+
+    entries = read_ledger(str(ledger))
+    assert len(entries) == 4
+    assert entries[0]["video_id"] == "abc"
+    assert entries[2]["cache_hit"] and entries[2]["cost_usd"] == 0
+
+    rows = {row["operation"]: row for row in report(entries)}
+    assert rows["summarize"]["calls"] == 2
+    assert rows["summarize"]["cache_hits"] == 1
+    assert rows["summarize"]["cache_hit_rate"] == pytest.approx(0.333)
+    assert rows["summarize"]["avg_input_tokens"] == 2000
+    assert rows["summarize"]["avg_latency_ms"] == 1000.0
+    assert report(entries)[0]["operation"] == "summarize"
+    assert report(entries, by="video")[0]["video"] == "abc"
+
+def test_read_ledger_skips_broken_lines_and_old_entries(ledger):
+    ledger.write_text('{"timestamp": 10, "operation": "a"}\nnot json\n{"timestamp": 20, "operation": "b"}\n')
+    assert [entry["operation"] for entry in read_ledger(str(ledger))] == ["a", "b"]
+    assert [entry["operation"] for entry in read_ledger(str(ledger), since=15)] == ["b"]
+    assert read_ledger(str(ledger) + ".missing") == []
+
+def test_no_budgets_means_no_limits(ledger):
+    record("summarize", "gemini-2.0-flash", "gemini", 10**9, 10**9, 1.0)
+    assert check_budget("summarize", "gemini-2.0-flash") == ("gemini-2.0-flash", False)
+
+def test_daily_budget_downgrades_then_refuses(ledger, tmp_path, monkeypatch):
+    set_budgets(tmp_path, monkeypatch, {"daily_usd": 1.0, "downgrade_share": 0.5})
+    assert check_budget("summarize", "gemini-2.0-flash") == ("gemini-2.0-flash", False)
+    # $0.60 of a $1 budget
+    record("summarize", "gemini-2.0-flash", "gemini", 6_000_000, 0, 1.0)
+    assert check_budget("summarize", "gemini-2.0-flash") == ("gemini-2.0-flash-lite", True)
+    record("summarize", "gemini-2.0-flash", "gemini", 4_000_000, 0, 1.0)
+    with pytest.raises(BudgetExceeded):
+        check_budget("quiz", "gemini-2.0-flash")
+
+def test_operation_and_video_budgets(ledger, tmp_path, monkeypatch):
+    set_budgets(tmp_path, monkeypatch, {"operations": {"quiz": {"daily_usd": 0.1}}, "per_video_daily_usd": 0.2})
+    cost_ledger.set_video("abc")
+    record("quiz", "gemini-2.0-flash", "gemini", 1_000_000, 0, 1.0)
+    with pytest.raises(BudgetExceeded):
+        check_budget("quiz", "gemini-2.0-flash")
+    assert check_budget("summarize", "gemini-2.0-flash")[0] == "gemini-2.0-flash"
+    record("summarize", "gemini-2.0-flash", "gemini", 1_000_000, 0, 1.0)
+    with pytest.raises(BudgetExceeded):
+        check_budget("summarize", "gemini-2.0-flash")
+    cost_ledger.set_video("other")
+    assert check_budget("summarize", "gemini-2.0-flash")[0] == "gemini-2.0-flash"
+
+def test_per_request_tokens(ledger, tmp_path, monkeypatch):
+    set_budgets(tmp_path, monkeypatch, {"per_request_tokens": 1000})
+    cost_ledger.set_video("abc")
+    record("summarize", "gemini-2.0-flash", "gemini", 900, 100, 1.0)
+    with pytest.raises(BudgetExceeded):
+        check_budget("quiz", "gemini-2.0-flash")
+    # A new request starts from zero
+    cost_ledger.set_video("abc")
+    check_budget("quiz", "gemini-2.0-flash")
+
+def test_empty_ledger_path_turns_everything_off(ledger, tmp_path, monkeypatch):
+    set_budgets(tmp_path, monkeypatch, {"daily_usd": 0})
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", "")
+    record("summarize", "gemini-2.0-flash", "gemini", 1000, 100, 1.0)
+    assert check_budget("summarize", "gemini-2.0-flash") == ("gemini-2.0-flash", False)
+    assert not ledger.exists()
@@ -0,0 +1,69 @@
+import time
+import threading
+
+import pytest
+
+import deadline as deadline_module
+from deadline import Deadline, DeadlineExceeded, abandoned_calls, ensure_deadline, run_with_deadline
+
+def test_children_share_the_remaining_budget_and_the_report():
+    deadline = Deadline(10)
+    child = deadline.child(1 / 2)
+    assert child.remaining() == pytest.approx(5, abs=0.1)
+    assert child.child().expires_at <= child.expires_at
+    child.mark("transcript", segments=3)
+    report = deadline.report()
+    assert report["deadline_seconds"] == 10
+    assert report["completed_stages"][0]["stage"] == "transcript"
+    assert report["completed_stages"][0]["segments"] == 3
+
+def test_expired_deadline_raises_with_progress():
+    deadline = Deadline(0)
+    deadline.mark("parse_url")
+    with pytest.raises(DeadlineExceeded) as raised:
+        deadline.check("summarize")
+    assert raised.value.stage == "summarize"
+    assert raised.value.progress["completed_stages"][0]["stage"] == "parse_url"
+
+def test_unlimited_deadline():
+    deadline = ensure_deadline(None)
+    assert deadline.remaining() == float("inf")
+    assert deadline.child(0.1).remaining() == float("inf")
+    assert deadline.timeout(cap=3) == 3
+    assert deadline.request_options() == {}
+    deadline.check("anything")
+
+def test_timeouts_are_capped_and_floored():
+    assert Deadline(100).timeout(cap=10) == 10
+    assert Deadline(0).timeout() == 0.1
+    assert Deadline(100).request_options()["timeout"] == pytest.approx(100, abs=0.1)
+
+def test_from_input(monkeypatch):
+    monkeypatch.setenv("SUMMIFY_DEADLINE_SECONDS", "30")
+    assert Deadline.from_input({}).total_seconds == 30
+    assert Deadline.from_input({"deadline_seconds": 5}).total_seconds == 5
+
+def test_run_with_deadline():
+    assert run_with_deadline("add", Deadline(5), lambda a, b: a + b, 1, 2) == 3
+    with pytest.raises(ValueError):
+        run_with_deadline("fail", Deadline(5), int, "x")
+    release = threading.Event()
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline("wait", Deadline(0.2), release.wait, 5)
+    assert time.monotonic() - started < 2
+    release.set()
+
+def test_abandoned_calls_are_tracked_and_bounded(monkeypatch):
+    monkeypatch.setattr(deadline_module, "MAX_ABANDONED_CALLS", abandoned_calls() + 1)
+    release = threading.Event()
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline("hang", Deadline(0.05), release.wait)
+    assert abandoned_calls() == deadline_module.MAX_ABANDONED_CALLS
+    ran = []
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline("refused", Deadline(5), ran.append, 1)
+    assert ran == []
+    release.set()
+    time.sleep(0.1)
+    assert run_with_deadline("add", Deadline(5), lambda a, b: a + b, 1, 2) == 3
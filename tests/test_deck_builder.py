@@ -0,0 +1,95 @@
+import json
+
+from deck_builder import (
+    NUM_PERM,
+    DeckBuilder,
+    anki_line,
+    build_deck,
+    iter_flashcards,
+    normalize,
+    signature,
+)
+
+def card(front, back, video_id="v1", start=None):
+    return {"front": front, "back": back, "video_id": video_id, "start": start, "sources": None}
+
+def write_deck(path, cards, video_id=None):
+    data = {"flashcards": cards}
+    if video_id:
+        data["video_id"] = video_id
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+def test_normalize():
+    assert normalize("  Thế NÀO là   Caching?! ") == "the nao la caching"
+
+def test_signature_is_deterministic_and_sized():
+    sig = signature("What is a cache?", "A fast store of recent results")
+    assert len(sig) == NUM_PERM
+    assert sig == signature("what is a CACHE", "A fast store of recent results.")
+    assert sig != signature("What is a queue?", "A first-in first-out list")
+
+def test_signature_of_an_empty_card():
+    assert len(signature("", "")) == NUM_PERM
+
+def test_near_duplicates_share_a_group_and_provenance():
+    builder = DeckBuilder()
+    cards = [
+        card("What is a cache?", "A fast store of recently used results.", "v1", 10.0),
+        card("What is a queue?", "A list served first in, first out.", "v1", 20.0),
+        card("What is a cache", "A fast store of recently-used results", "v2", 5.0),
+    ]
+    groups = [builder.add(c) for c in cards]
+    assert groups == [0, 1, 0]
+    assert builder.groups == 2
+    unique = list(builder.unique(cards))
+    assert [c["front"] for c in unique] == ["What is a cache?", "What is a queue?"]
+    assert unique[0]["sources"] == [{"video_id": "v1", "start": 10.0}, {"video_id": "v2", "start": 5.0}]
+
+def test_threshold_one_only_merges_identical_cards():
+    builder = DeckBuilder(threshold=1.0)
+    builder.add(card("What is a cache?", "A fast store of recently used results."))
+    assert builder.add(card("What is a cache?", "A fast store of recently used results!")) == 0
+    assert builder.add(card("What is a cache?", "A fast store of results used recently.")) == 1
+
+def test_iter_flashcards_reads_files_and_directories(tmp_path):
+    decks = tmp_path / "decks"
+    decks.mkdir()
+    write_deck(decks / "b.json", [{"front": "B", "back": "b"}], video_id="vb")
+    write_deck(decks / "a.json", [{"front": "A", "back": "a", "start": 3.0}, {"front": " ", "back": "skipped"}])
+    (decks / "broken.json").write_text("{")
+    single = write_deck(tmp_path / "c.json", [{"front": "C", "back": "c", "video_id": "own"}])
+    cards = list(iter_flashcards([str(decks), single]))
+    assert [(c["front"], c["video_id"], c["start"]) for c in cards] == [
+        ("A", "a", 3.0), ("B", "vb", None), ("C", "own", None)]
+
+def test_anki_line_escapes_and_tags():
+    merged = {"front": "Tab\there", "back": "two\nlines",
+              "sources": [{"video_id": "v1"}, {"video_id": "v2"}, {"video_id": "v1"}]}
+    assert anki_line(merged) == "Tab    here\ttwo lines\tyt::v1 yt::v2\n"
+    assert anki_line(merged, tags=False) == "Tab    here\ttwo lines\n"
+
+def test_build_deck_writes_json_and_anki(tmp_path):
+    first = write_deck(tmp_path / "v1.json", [
+        {"front": "What is a cache?", "back": "A fast store of recently used results."},
+        {"front": "What is a queue?", "back": "A list served first in, first out."},
+    ])
+    second = write_deck(tmp_path / "v2.json", [
+        {"front": "What is a cache", "back": "A fast store of recently-used results"},
+    ])
+    json_path, anki_path = tmp_path / "deck.json", tmp_path / "deck.txt"
+    counts = build_deck([first, second], str(json_path), str(anki_path))
+    assert counts == {"cards": 3, "unique": 2, "duplicates": 1}
+
+    deck = json.loads(json_path.read_text(encoding="utf-8"))["flashcards"]
+    assert [source["video_id"] for source in deck[0]["sources"]] == ["v1", "v2"]
+    lines = anki_path.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "#separator:tab"
+    assert lines[-2].endswith("\tyt::v1 yt::v2")
+    assert len(lines) == 5
+
+    # A merged deck merges again without losing provenance
+    again = tmp_path / "again.json"
+    assert build_deck([str(json_path), second], str(again))["unique"] == 2
+    merged = json.loads(again.read_text(encoding="utf-8"))["flashcards"]
+    assert [source["video_id"] for source in merged[0]["sources"]] == ["v1", "v2", "v2"]
@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+import flashcards_api
+import llm_backend
+from llm_backend import StubBackend
+
+@pytest.fixture(autouse=True)
+def stub_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", StubBackend(latency=0, tokens_per_second=1e9))
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", "")
+
+def run_flashcards(tmp_path, **extra):
+    input_file, output_file = tmp_path / "input.json", tmp_path / "output.json"
+    input_data = dict({"summary": "Caching keeps answers close to the reader.", "num_cards": 2}, **extra)
+    input_file.write_text(json.dumps(input_data))
+    flashcards_api.process_api_request(str(input_file), str(output_file))
+    return json.loads(output_file.read_text())
+
+def test_cached_flashcards_name_the_video_that_asked_for_them(tmp_path):
+    first = run_flashcards(tmp_path, video_id="abc")
+    assert first["video_id"] == "abc" and len(first["flashcards"]) == 2
+    assert run_flashcards(tmp_path, video_id="xyz")["video_id"] == "xyz"
+    assert "video_id" not in run_flashcards(tmp_path)
+    assert run_flashcards(tmp_path, video_id="abc") == first
@@ -0,0 +1,128 @@
+import json
+import random
+import time
+from collections import OrderedDict
+
+import pytest
+
+import hot_videos
+from hot_videos import DecayingCountMinSketch, HotVideoTracker, prewarm_round, read_request_log
+
+HOUR = 3600.0
+
+def test_sketch_counts_halve_every_half_life():
+    sketch = DecayingCountMinSketch(half_life=HOUR, width=64, depth=4)
+    for _ in range(8):
+        sketch.add("abc", 0.0)
+    assert sketch.estimate("abc", 0.0) == pytest.approx(8)
+    assert sketch.estimate("abc", HOUR) == pytest.approx(4)
+    assert sketch.estimate("abc", 3 * HOUR) == pytest.approx(1)
+    assert sketch.estimate("missing", 0.0) <= 8
+    assert DecayingCountMinSketch(HOUR).estimate("abc", 0.0) == 0.0
+
+def test_sketch_never_undercounts():
+    rng = random.Random(5)
+    sketch = DecayingCountMinSketch(half_life=HOUR, width=32, depth=3)
+    counts = {}
+    for _ in range(2000):
+        key = f"video{rng.randrange(200)}"
+        counts[key] = counts.get(key, 0) + 1
+        sketch.add(key, 0.0)
+    assert all(sketch.estimate(key, 0.0) >= count - 1e-9 for key, count in counts.items())
+
+def test_sketch_survives_a_rebase():
+    sketch = DecayingCountMinSketch(half_life=1.0, width=16, depth=2)
+    sketch.add("abc", 0.0, count=4)
+    sketch.add("abc", 1000.0, count=4)
+    assert sketch.origin == 1000.0
+    assert sketch.estimate("abc", 1000.0) == pytest.approx(4)
+    assert sketch.estimate("abc", 1001.0) == pytest.approx(2)
+    # Asking long after the last hit decays to nothing instead of overflowing
+    assert sketch.estimate("abc", 10**7) == 0.0
+
+def test_steady_rate_is_measured_per_hour():
+    sketch = DecayingCountMinSketch(half_life=HOUR)
+    t = 0.0
+    while t < 10 * HOUR:
+        sketch.add("abc", t)
+        t += 60.0
+    assert sketch.rate_per_hour("abc", t) == pytest.approx(60, rel=0.05)
+
+def test_tracker_finds_hot_and_rising_videos():
+    tracker = HotVideoTracker()
+    # A video watched all day at 3 per hour, and one that just took off
+    for minute in range(0, 24 * 60, 20):
+        tracker.observe("steady", minute * 60.0)
+    for second in range(0, 1800, 60):
+        tracker.observe("viral", 24 * HOUR - 1800 + second)
+    tracker.observe("once", 12 * HOUR)
+
+    ranking = {entry["video_id"]: entry for entry in tracker.ranking()}
+    assert set(ranking) == {"steady", "viral"}
+    assert ranking["steady"]["hot"] and not ranking["steady"]["rising"]
+    assert ranking["viral"]["rising"]
+    assert tracker.ranking(top=1)[0]["video_id"] == "viral"
+
+def test_tracker_prunes_to_the_hottest_candidates():
+    tracker = HotVideoTracker(max_candidates=5)
+    for i in range(5):
+        for _ in range(10):
+            tracker.observe(f"hot{i}", 0.0)
+    for i in range(20):
+        tracker.observe(f"cold{i}", 1.0)
+    assert len(tracker.candidates) <= 10
+    assert all(f"hot{i}" in tracker.candidates for i in range(5))
+
+def test_read_request_log(tmp_path):
+    log = tmp_path / "events.jsonl"
+    lines = [
+        {"request_id": "r1", "video_id": "abc", "timestamp": 10.0, "span": "transcript"},
+        {"request_id": "r1", "video_id": "abc", "timestamp": 11.0, "span": "summarize"},
+        {"url": "https://youtu.be/dQw4w9WgXcQ", "timestamp": 12.0},
+        {"url": "https://example.com/", "timestamp": 13.0},
+        {"span": "no video"},
+    ]
+    log.write_text("".join(json.dumps(line) + "\n" for line in lines) + "not json\n" + '{"video_id": "par')
+    requests, offset = read_request_log(str(log))
+    assert requests == [("abc", 10.0), ("dQw4w9WgXcQ", 12.0)]
+    with open(log, "a") as f:
+        f.write('tial", "timestamp": 14.0}\n')
+    assert read_request_log(str(log), offset) == ([("partial", 14.0)], log.stat().st_size)
+
+def test_prewarm_round_skips_cached_videos_and_stops_without_headroom(monkeypatch):
+    tracker = HotVideoTracker()
+    now = time.time()
+    for video_id in ("a", "b", "c"):
+        for second in range(0, 600, 60):
+            tracker.observe(video_id, now - second)
+    warmed, headroom = [], iter([True, False])
+    monkeypatch.setattr(hot_videos, "is_prewarmed", lambda video_id, language: video_id == "a")
+    monkeypatch.setattr(hot_videos, "youtube_headroom", lambda: next(headroom))
+    monkeypatch.setattr(hot_videos, "prewarm", lambda video_id, language: warmed.append((video_id, language)) or True)
+    assert prewarm_round(tracker, top=3, pause=0) == 1
+    assert warmed[0][1] == "auto"
+    assert warmed[0][0] in ("b", "c")
+
+def test_prewarm_skips_failed_summaries(monkeypatch, tmp_path):
+    calls = []
+    def run_api(module, input_data, work_dir):
+        calls.append(module)
+        return {"error": "Failed to generate summary: backend down", "summary": ""}
+    monkeypatch.setattr(hot_videos, "_run_api", run_api)
+    assert not hot_videos.prewarm("abc", "en", str(tmp_path))
+    assert calls == ["summarize_api"]
+
+def test_read_request_log_counts_a_request_once_across_reads(tmp_path, monkeypatch):
+    log = tmp_path / "events.jsonl"
+    log.write_text(json.dumps({"request_id": "r1", "video_id": "abc", "timestamp": 10.0}) + "\n")
+    seen = OrderedDict()
+    requests, offset = read_request_log(str(log), 0, seen)
+    assert requests == [("abc", 10.0)]
+    with open(log, "a") as f:
+        f.write(json.dumps({"request_id": "r1", "video_id": "abc", "timestamp": 11.0}) + "\n")
+        f.write(json.dumps({"request_id": "r2", "video_id": "abc", "timestamp": 12.0}) + "\n")
+    assert read_request_log(str(log), offset, seen)[0] == [("abc", 12.0)]
+    monkeypatch.setattr(hot_videos, "SEEN_REQUESTS_KEPT", 1)
+    seen = OrderedDict()
+    read_request_log(str(log), 0, seen)
+    assert list(seen) == [("r2", "abc")]
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+from benchmarks.import_time import DEFAULT_BUDGET_MS, ENTRY_POINTS, report_module
+
+# A slower CI machine can raise the budget rather than skip the check
+BUDGET_MS = float(os.environ.get("SUMMIFY_IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS))
+RUNS = 3
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_entry_point_imports_within_budget(module):
+    result = report_module(module, RUNS, top=5)
+    heaviest = ", ".join(f"{row['module']} {row['self_ms']}ms" for row in result["heaviest_imports"])
+    # The fastest run is the import cost itself; slower ones add whatever else the machine was doing
+    assert result["min_ms"] <= BUDGET_MS, (
+        f"{module} takes {result['min_ms']}ms to import (budget {BUDGET_MS:.0f}ms); heaviest: {heaviest}"
+    )
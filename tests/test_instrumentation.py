@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import instrumentation
+from instrumentation import MetricsRegistry, Tracer
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    for value in (0.003, 0.2, 0.2, 500.0):
+        registry.observe("summify_stage_duration_seconds", value, stage="summarize")
+    histogram = registry.snapshot()["histograms"]['summify_stage_duration_seconds{"stage":"summarize"}']
+    buckets = dict(zip(instrumentation.DURATION_BUCKETS, histogram["buckets"]))
+    assert buckets[0.005] == 1 and buckets[0.25] == 3 and buckets[120.0] == 3
+    assert histogram["count"] == 4
+    assert histogram["sum"] == pytest.approx(500.403)
+
+def test_flush_merges_processes_into_the_state_file(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    first, second = MetricsRegistry(path), MetricsRegistry(path)
+    first.inc("summify_requests_total", operation="summarize")
+    first.flush()
+    second.inc("summify_requests_total", operation="summarize")
+    second.inc("summify_requests_total", 2, operation="quiz")
+    second.observe("summify_stage_duration_seconds", 0.1, stage="x")
+    second.flush()
+    second.observe("summify_stage_duration_seconds", 0.1, stage="x")
+    counters = MetricsRegistry(path).snapshot()["counters"]
+    assert counters['summify_requests_total{"operation":"summarize"}'] == 2
+    assert counters['summify_requests_total{"operation":"quiz"}'] == 2
+    # Unflushed values count in the process's own snapshot
+    assert second.snapshot()["histograms"]['summify_stage_duration_seconds{"stage":"x"}']["count"] == 2
+
+def test_prometheus_rendering():
+    registry = MetricsRegistry()
+    registry.inc("summify_requests_total", operation='say "hi"\n')
+    registry.observe("summify_stage_duration_seconds", 0.02, stage="fetch")
+    lines = registry.render_prometheus().splitlines()
+    assert "# TYPE summify_requests_total counter" in lines
+    assert 'summify_requests_total{operation="say \\"hi\\"\\n"} 1' in lines
+    assert "# TYPE summify_stage_duration_seconds histogram" in lines
+    assert 'summify_stage_duration_seconds_bucket{stage="fetch",le="0.01"} 0' in lines
+    assert 'summify_stage_duration_seconds_bucket{stage="fetch",le="0.025"} 1' in lines
+    assert 'summify_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 1' in lines
+    assert 'summify_stage_duration_seconds_count{stage="fetch"} 1' in lines
+
+def test_spans_emit_events_to_file_and_listeners(tmp_path, monkeypatch):
+    events_file = tmp_path / "events.jsonl"
+    monkeypatch.setenv("SUMMIFY_EVENTS_FILE", str(events_file))
+    monkeypatch.setattr(instrumentation, "metrics", MetricsRegistry())
+    monkeypatch.setattr(instrumentation, "_current_tracer", instrumentation.contextvars.ContextVar("t", default=None))
+    heard = []
+    def broken(event):
+        raise RuntimeError("listener bug")
+    instrumentation.add_span_listener(heard.append)
+    instrumentation.add_span_listener(broken)
+    try:
+        tracer = instrumentation.start_request("summarize", request_id="req1")
+        with instrumentation.span("transcript", video_id="abc") as record:
+            record["segments"] = 3
+        with pytest.raises(ValueError):
+            with instrumentation.span("summarize", input_tokens=10, model="m"):
+                raise ValueError("boom")
+    finally:
+        instrumentation.remove_span_listener(heard.append)
+        instrumentation.remove_span_listener(broken)
+
+    assert instrumentation.current_tracer() is tracer
+    events = [json.loads(line) for line in events_file.read_text().splitlines()]
+    assert [(e["span"], e["status"]) for e in events] == [("transcript", "ok"), ("summarize", "error")]
+    assert events[0]["segments"] == 3 and events[0]["video_id"] == "abc" and events[0]["request_id"] == "req1"
+    assert events[1]["error_type"] == "ValueError"
+    assert [event["span"] for event in heard] == ["transcript", "summarize"]
+    counters = instrumentation.metrics.snapshot()["counters"]
+    assert counters['summify_llm_tokens_total{"direction":"input","model":"m","stage":"summarize"}'] == 10
+
+def test_spans_without_a_request_attach_to_a_cli_tracer(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_current_tracer", instrumentation.contextvars.ContextVar("t", default=None))
+    with instrumentation.span("parse_url"):
+        pass
+    assert instrumentation.current_tracer().operation == "cli"
+    assert Tracer("x").request_id != Tracer("x").request_id
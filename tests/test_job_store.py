@@ -0,0 +1,119 @@
+import json
+import time
+import types
+
+import pytest
+
+import job_store
+import job_worker
+from job_store import JobStore, LeaseLost
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+def expire_lease(store, job_id):
+    store._conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+def test_job_runs_through_to_success(store):
+    job_id = store.submit("summarize", {"url": "x"})
+    job = store.claim("a")
+    assert job == {"job_id": job_id, "operation": "summarize", "input": {"url": "x"}, "attempts": 1, "worker": "a"}
+    assert store.claim("b") is None
+    store.update_progress(job_id, "a", [{"stage": "transcript"}])
+    assert store.get(job_id)["progress"] == [{"stage": "transcript"}]
+    store.complete(job_id, "a", {"summary": "s"})
+    finished = store.get(job_id)
+    assert finished["state"] == job_store.SUCCEEDED
+    assert finished["result"] == {"summary": "s"}
+
+def test_unknown_operation_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.submit("transcode", {})
+
+def test_retry_backs_off_until_attempts_run_out(store):
+    job_id = store.submit("quiz", {}, max_attempts=2)
+    store.claim("a")
+    assert store.fail(job_id, "a", {"error": "slow", "error_type": "RateLimited"}, retry=True)
+    assert store.get(job_id)["state"] == job_store.QUEUED
+    # Not due until the backoff has passed
+    assert store.claim("a") is None
+    store._conn.execute("UPDATE jobs SET run_after = 0 WHERE id = ?", (job_id,))
+    assert store.claim("a")["attempts"] == 2
+    assert not store.fail(job_id, "a", {"error": "slow"}, retry=True)
+    assert store.get(job_id)["state"] == job_store.FAILED
+
+def test_expired_lease_moves_the_job_and_fences_the_old_worker(store):
+    job_id = store.submit("summarize", {})
+    store.claim("a")
+    expire_lease(store, job_id)
+    assert store.claim("b")["attempts"] == 2
+
+    for transition in (
+        lambda: store.renew_lease(job_id, "a"),
+        lambda: store.update_progress(job_id, "a", [{"stage": "stale"}]),
+        lambda: store.complete(job_id, "a", {"summary": "stale"}),
+        lambda: store.fail(job_id, "a", {"error": "stale"}, retry=True),
+    ):
+        with pytest.raises(LeaseLost):
+            transition()
+
+    store.complete(job_id, "b", {"summary": "fresh"})
+    assert store.get(job_id)["result"] == {"summary": "fresh"}
+    # A finished job cannot be finished again, even by its own worker
+    with pytest.raises(LeaseLost):
+        store.fail(job_id, "b", {"error": "late"})
+
+def test_purge_removes_expired_results(store, monkeypatch):
+    monkeypatch.setenv("SUMMIFY_JOB_RESULT_TTL_SECONDS", "-1")
+    job_id = store.submit("ask", {})
+    store.claim("a")
+    store.complete(job_id, "a", {"answer": "42"})
+    assert store.get(job_id) is None
+    assert store.purge_expired() == 1
+
+def fake_handler(monkeypatch, process_api_request):
+    module = types.SimpleNamespace(process_api_request=process_api_request)
+    monkeypatch.setitem(job_worker._ready_modules, job_worker.HANDLERS["summarize"], module)
+
+def test_heartbeat_keeps_a_silent_job_leased(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_worker, "LEASE_SECONDS", 0.2)
+    def slow(input_file, output_file):
+        # Longer than the lease, with no spans to renew it
+        time.sleep(0.5)
+        assert store.claim("b") is None
+        with open(output_file, "w") as f:
+            json.dump({"summary": "done"}, f)
+    fake_handler(monkeypatch, slow)
+    monkeypatch.setattr(job_store, "LEASE_SECONDS", 0.2)
+
+    job_id = store.submit("summarize", {})
+    job_worker.run_job(store, store.claim("a"), str(tmp_path))
+    assert store.get(job_id)["result"] == {"summary": "done"}
+
+def test_outcome_of_a_lost_job_is_dropped(store, tmp_path, monkeypatch):
+    job_id = store.submit("summarize", {})
+    def overtaken(input_file, output_file):
+        expire_lease(store, job_id)
+        store.claim("b")
+        with open(output_file, "w") as f:
+            json.dump({"summary": "stale"}, f)
+    fake_handler(monkeypatch, overtaken)
+
+    job_worker.run_job(store, store.claim("a"), str(tmp_path))
+    job = store.get(job_id)
+    assert job["state"] == job_store.RUNNING
+    assert "result" not in job
+
+def test_each_worker_process_is_named_after_its_own_pid(monkeypatch):
+    names = []
+    monkeypatch.setattr(job_worker.signal, "signal", lambda signum, handler: None)
+    monkeypatch.setattr(job_worker, "worker_loop", lambda name, poll_interval: names.append(name))
+    monkeypatch.setattr(job_worker.os, "getpid", lambda: 101)
+    job_worker._worker_main(0, 1.0)
+    # The replacement for a crashed worker in the same slot is a new process
+    monkeypatch.setattr(job_worker.os, "getpid", lambda: 102)
+    job_worker._worker_main(0, 1.0)
+    assert names[0].endswith(":101:0") and names[1].endswith(":102:0")
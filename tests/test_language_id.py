@@ -0,0 +1,60 @@
+import pytest
+
+import language_id
+from summerize import OUTPUT_HEADINGS, output_format
+
+TEXTS = {
+    "en": "So in this video I want to show you how I set up my kitchen and what tools I use for cooking dinner every night.",
+    "vi": "Thị trường chứng khoán giảm mạnh sau khi ngân hàng trung ương tăng lãi suất, khiến nhiều nhà đầu tư lo lắng.",
+    "es": "La bolsa cayó ayer después de que el banco central subiera los tipos de interés, sorprendiendo a los analistas.",
+    "fr": "Dans cette vidéo je vais vous montrer comment je prépare le dîner tous les soirs et quels outils j'utilise.",
+    "de": "Die Börse ist gestern eingebrochen, nachdem die Zentralbank die Zinsen erhöht hatte, was viele Analysten überraschte.",
+    "pt": "A bolsa caiu ontem depois que o banco central aumentou os juros, o que surpreendeu muitos analistas do mercado.",
+    "it": "In questo video vi faccio vedere come preparo la cena tutte le sere e quali attrezzi uso in cucina.",
+    "id": "Pasar saham anjlok kemarin setelah bank sentral menaikkan suku bunga, yang mengejutkan banyak analis keuangan.",
+}
+
+UNKNOWN = {
+    "ru": "Привет всем и добро пожаловать обратно на канал. Сегодня мы поговорим о том, как это работает и почему это важно.",
+    "ko": "안녕하세요 여러분 채널에 다시 오신 것을 환영합니다. 오늘은 이것이 어떻게 작동하는지 이야기해 보겠습니다.",
+    "pl": "W tym filmie pokażę wam, jak codziennie przygotowuję kolację i jakich narzędzi używam w kuchni.",
+    "tr": "Bu videoda size her akşam yemeği nasıl hazırladığımı ve mutfakta hangi aletleri kullandığımı göstereceğim.",
+}
+
+@pytest.mark.parametrize("language", sorted(TEXTS))
+def test_detects_languages_with_a_sample(language):
+    assert language_id.detect(TEXTS[language]) == language
+
+@pytest.mark.parametrize("language", sorted(UNKNOWN))
+def test_languages_without_a_sample_are_not_guessed(language):
+    assert language_id.detect(UNKNOWN[language]) is None
+
+@pytest.mark.parametrize("text", ["", "[Music]", "ok ok", "12345 67890 !!!"])
+def test_short_text_is_not_guessed(text):
+    assert language_id.detect(text) is None
+
+def test_candidates_restrict_the_answer():
+    assert language_id.detect(TEXTS["pt"], candidates=["pt", "es"]) == "pt"
+    assert language_id.detect(TEXTS["pt"], candidates=["vi"]) is None
+    assert language_id.detect("Cách nấu phở bò ngon tại nhà", candidates=["en", "vi"]) == "vi"
+
+def test_detect_segments_reads_the_start_of_a_transcript():
+    vietnamese = [{"text": "Xin chào các bạn"}, {"text": "hôm nay chúng ta sẽ nói về cách nấu phở"}] * 40
+    english = [{"text": "So in this video I want to show you how I set up my kitchen"}] * 1000
+    assert language_id.detect_segments(vietnamese + english) == "vi"
+    assert language_id.detect_segments(english + vietnamese) == "en"
+
+def test_latin_share():
+    assert language_id.latin_share("hello") == 1.0
+    assert language_id.latin_share("Привет") == 0.0
+    assert language_id.latin_share("123") == 0.0
+
+def test_output_format_headings():
+    english = output_format("en")
+    assert all(heading in english for heading in OUTPUT_HEADINGS["en"])
+    assert not any(heading in english for heading in OUTPUT_HEADINGS["vi"])
+    vietnamese = output_format("vi")
+    assert not any(heading in vietnamese for heading in OUTPUT_HEADINGS["en"])
+    for language in (None, "it", "ru"):
+        both = output_format(language)
+        assert all(heading in both for headings in OUTPUT_HEADINGS.values() for heading in headings)
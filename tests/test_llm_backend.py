@@ -0,0 +1,109 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import cost_ledger
+import instrumentation
+import llm_backend
+from deadline import Deadline
+from llm_backend import GeminiBackend, StubBackend, estimate_tokens
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    backend = StubBackend(latency=0, tokens_per_second=1e9)
+    monkeypatch.setattr(llm_backend, "_backend", backend)
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", str(tmp_path / "ledger.jsonl"))
+    monkeypatch.delenv("SUMMIFY_COST_BUDGETS", raising=False)
+    monkeypatch.setattr(cost_ledger, "_budgets", None)
+    return backend
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hi") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+def test_stub_answers_look_like_each_operation(stub):
+    quiz = json.loads(stub.respond("Create 3 quiz questions from this summary"))
+    assert len(quiz) == 3 and quiz[0]["correctAnswer"] == 0
+    cards = json.loads(stub.respond("Create 2 flashcards from this summary"))
+    assert [set(card) for card in cards] == [{"front", "back"}] * 2
+    assert stub.respond("TRANSCRIPT PART:\nsome words").startswith("- Notes")
+    assert stub.respond("CHAPTER TRANSCRIPT:\nsome words here now").startswith("TITLE: Some words here now")
+    summary = stub.respond("TRANSCRIPT:\nhello world")
+    assert summary == stub.respond("TRANSCRIPT:\nhello world")
+    assert "hello world" in summary
+    assert len(stub.respond("TRANSCRIPT:\n" + "word " * 500, max_output_tokens=10)) <= 40
+
+def test_stub_times_out_like_a_real_backend():
+    slow = StubBackend(latency=5, tokens_per_second=1e9)
+    with pytest.raises(TimeoutError):
+        slow.generate("prompt", "model", timeout=0.01)
+    with pytest.raises(TimeoutError):
+        list(slow.stream("prompt", "model", timeout=0.01))
+
+def test_generate_uses_the_operation_model_and_records_usage(stub, monkeypatch, tmp_path):
+    monkeypatch.setenv("SUMMIFY_MODEL_QUIZ", "gemini-2.0-flash-lite")
+    result = llm_backend.generate("quiz", "Create 2 quiz questions", deadline=Deadline(10))
+    assert result.model == "gemini-2.0-flash-lite"
+    assert result.output_tokens == estimate_tokens(result.text)
+    assert llm_backend.generate("quiz", "Create 2 quiz questions", model="gemini-2.0-flash").model == "gemini-2.0-flash"
+    entries = cost_ledger.read_ledger(str(tmp_path / "ledger.jsonl"))
+    assert [(entry["operation"], entry["model"], entry["backend"]) for entry in entries] == [
+        ("quiz", "gemini-2.0-flash-lite", "stub"), ("quiz", "gemini-2.0-flash", "stub")]
+
+def test_generate_async_and_stream_match_generate(stub, tmp_path):
+    prompt = "TRANSCRIPT:\nthe same prompt"
+    text = llm_backend.generate("summarize", prompt).text
+    assert asyncio.run(llm_backend.generate_async("summarize", prompt)).text == text
+    assert "".join(llm_backend.stream("summarize", prompt)) == text
+    assert len(cost_ledger.read_ledger(str(tmp_path / "ledger.jsonl"))) == 3
+
+def test_generate_refuses_over_budget(stub, tmp_path, monkeypatch):
+    budgets = tmp_path / "budgets.json"
+    budgets.write_text(json.dumps({"daily_usd": 0}))
+    monkeypatch.setenv("SUMMIFY_COST_BUDGETS", str(budgets))
+    with pytest.raises(cost_ledger.BudgetExceeded):
+        llm_backend.generate("summarize", "TRANSCRIPT:\nanything")
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", None)
+    monkeypatch.setenv("LLM_BACKEND", "nope")
+    with pytest.raises(ValueError):
+        llm_backend.get_backend()
+
+def test_stub_calls_are_logged_at_no_cost(stub, tmp_path, monkeypatch):
+    budgets = tmp_path / "budgets.json"
+    budgets.write_text(json.dumps({"daily_usd": 1.0}))
+    monkeypatch.setenv("SUMMIFY_COST_BUDGETS", str(budgets))
+    llm_backend.generate("summarize", "TRANSCRIPT:\n" + "word " * 1000)
+    "".join(llm_backend.stream("summarize", "TRANSCRIPT:\nanything"))
+    entries = cost_ledger.read_ledger(str(tmp_path / "ledger.jsonl"))
+    assert [entry["cost_usd"] for entry in entries] == [0, 0]
+    assert entries[0]["input_tokens"] > 0
+    with cost_ledger._totals_store().transaction() as state:
+        assert state == {}
+
+def test_stream_is_traced_and_recorded_with_the_final_chunk_usage(tmp_path, monkeypatch):
+    backend = GeminiBackend()
+    backend._genai_module = SimpleNamespace(GenerationConfig=lambda **options: options)
+    chunks = [
+        SimpleNamespace(text="Hello ", usage_metadata=None),
+        SimpleNamespace(text="world", usage_metadata=SimpleNamespace(prompt_token_count=42, candidates_token_count=7)),
+    ]
+    monkeypatch.setattr(backend, "_model", lambda model: SimpleNamespace(generate_content=lambda *a, **kw: iter(chunks)))
+    monkeypatch.setattr(llm_backend, "_backend", backend)
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", str(tmp_path / "ledger.jsonl"))
+    monkeypatch.delenv("SUMMIFY_COST_BUDGETS", raising=False)
+    monkeypatch.setattr(cost_ledger, "_budgets", None)
+    spans = []
+    instrumentation.add_span_listener(spans.append)
+    try:
+        assert "".join(llm_backend.stream("summarize", "TRANSCRIPT:\nhello")) == "Hello world"
+    finally:
+        instrumentation.remove_span_listener(spans.append)
+    assert [(event["span"], event["input_tokens"], event["output_tokens"]) for event in spans] == [("llm:summarize", 42, 7)]
+    entries = cost_ledger.read_ledger(str(tmp_path / "ledger.jsonl"))
+    assert [(entry["input_tokens"], entry["output_tokens"], entry["backend"]) for entry in entries] == [(42, 7, "gemini")]
+    assert entries[0]["cost_usd"] > 0
@@ -0,0 +1,70 @@
+import json
+from argparse import Namespace
+
+import pytest
+
+from benchmarks import fixtures
+from benchmarks.loadtest import LoadTest, summarize_results, video_url
+from benchmarks.stub_server import start_stand_in_server
+
+def load_args(**overrides):
+    args = dict(concurrency=2, rate=0.0, requests=4, duration=0.0, operations="summarize:0.5,quiz:0.5",
+                videos="1min:1", llm_latency=0.0, llm_tokens_per_second=1e6, rate_limits=False,
+                shared_files=False, seed=1)
+    args.update(overrides)
+    return Namespace(**args)
+
+@pytest.fixture
+def stand_in():
+    server, base_url = start_stand_in_server(0.0)
+    yield base_url
+    server.shutdown()
+
+def test_closed_loop_run_against_the_stub_backend(stand_in, tmp_path):
+    test = LoadTest(load_args(requests=5, concurrency=3), stand_in, str(tmp_path))
+    elapsed = test.run()
+    report = summarize_results(test.results, elapsed)
+    assert report["requests"] == 5
+    assert report["outcomes"] == {"ok": 5}
+    assert sum(row["requests"] for row in report["per_operation"].values()) == 5
+    latency = report["latency"]
+    assert 0 < latency["p50_ms"] <= latency["p95_ms"] <= latency["p99_ms"]
+    assert all(row["latency"] >= row["service_time"] for row in test.results)
+
+def test_summarize_results_counts_outcomes_and_percentiles():
+    rows = [{"operation": "quiz", "outcome": "ok", "latency": (i + 1) / 1000, "cpu_seconds": None, "max_rss_mb": None}
+            for i in range(100)]
+    rows[-1]["outcome"] = "WorkerCrashed"
+    report = summarize_results(rows, elapsed=2.0)
+    assert report["outcomes"] == {"ok": 99, "WorkerCrashed": 1}
+    assert report["success_per_s"] == 49.5
+    assert report["latency"]["p50_ms"] == pytest.approx(50.5, abs=0.6)
+    assert report["latency"]["p99_ms"] == pytest.approx(99.0, abs=1.1)
+    assert report["worker_cpu_seconds"] is None
+
+def test_a_summary_for_another_video_is_a_mismatch(tmp_path):
+    output_file = tmp_path / "temp_output.json"
+    payload = {"url": video_url("1min")}
+    output_file.write_text(json.dumps({"video_id": fixtures.synthetic_video_id(fixtures.SIZES["10min"]), "summary": "s"}))
+    assert LoadTest._classify("summarize", payload, str(output_file), 0) == "MismatchedOutput"
+    output_file.write_text(json.dumps({"video_id": payload["url"].split("v=")[-1], "summary": "s"}))
+    assert LoadTest._classify("summarize", payload, str(output_file), 0) == "ok"
+    assert LoadTest._classify("summarize", payload, str(tmp_path / "missing.json"), 1) == "WorkerCrashed"
+
+def test_shared_files_reuse_one_summarize_path(tmp_path):
+    test = LoadTest(load_args(shared_files=True), "http://127.0.0.1:1", str(tmp_path))
+    assert test._paths(1, "summarize") == test._paths(2, "summarize")
+    assert test._paths(1, "quiz") != test._paths(2, "quiz")
+
+def test_open_loop_schedules_poisson_arrivals(tmp_path):
+    scheduled = []
+    class Recording(LoadTest):
+        def run_one(self, scheduled_at):
+            scheduled.append(scheduled_at)
+    test = Recording(load_args(rate=2000.0, requests=200, concurrency=4), "http://127.0.0.1:1", str(tmp_path))
+    test.run()
+    assert len(scheduled) == 200
+    gaps = [b - a for a, b in zip(scheduled, scheduled[1:])]
+    assert all(gap >= 0 for gap in gaps)
+    # Exponential gaps average 1/rate
+    assert sum(gaps) / len(gaps) == pytest.approx(1 / 2000.0, rel=0.3)
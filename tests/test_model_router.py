@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+import model_router
+
+@pytest.fixture
+def policy_file(tmp_path, monkeypatch):
+    path = tmp_path / "policy.json"
+    monkeypatch.setenv("SUMMIFY_ROUTING_POLICY", str(path))
+    monkeypatch.delenv("SUMMIFY_CHUNK_TOKENS", raising=False)
+    monkeypatch.setattr(model_router, "_policy", None)
+
+    def write(policy):
+        path.write_text(json.dumps(policy))
+        model_router._policy = None
+        return model_router.load_policy()
+    return write
+
+def test_partial_operation_keeps_default_tiers_and_chunk_size(policy_file):
+    policy = policy_file({"summarize": {"latency_target_seconds": 5}})
+    assert policy["summarize"]["latency_target_seconds"] == 5
+    assert policy["summarize"]["tiers"] == model_router.DEFAULT_POLICY["summarize"]["tiers"]
+    assert model_router.chunk_tokens() == 8000
+    assert model_router.route("summarize", 100_000)["max_output_tokens"] == 600
+
+def test_partial_model_speed_keeps_other_speeds(policy_file):
+    policy = policy_file({"models": {"gemini-2.0-flash": {"overhead_seconds": 2.0}}})
+    speed = policy["models"]["gemini-2.0-flash"]
+    assert speed["overhead_seconds"] == 2.0
+    assert speed["input_tokens_per_second"] == model_router.MODEL_SPEEDS["gemini-2.0-flash"]["input_tokens_per_second"]
+
+def test_tiers_without_catch_all_are_rejected_at_load(policy_file):
+    policy = policy_file({"quiz": {"tiers": [{"max_input_tokens": 1000, "model": "gemini-2.0-flash-lite"}]}})
+    # The whole file is ignored, so a large input still finds a tier
+    assert policy["quiz"]["tiers"] == model_router.DEFAULT_POLICY["quiz"]["tiers"]
+    assert model_router.route("quiz", 50_000, items=5)["max_output_tokens"] == 5 * 120 + 100
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"summarize": {"chunk_tokens": 0}}, "chunk_tokens"),
+    ({"summarize": {"tiers": []}}, "tiers"),
+    ({"quiz": {"tiers": [{"model": "x"}]}}, "max_input_tokens"),
+    ({"ask": {"tiers": [{"max_input_tokens": None}]}}, "latency_target_seconds"),
+    ({"models": {"new-model": {"overhead_seconds": 0.1}}}, "input_tokens_per_second"),
+    ([], "JSON object"),
+])
+def test_invalid_overrides(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        model_router.merge_policy(overrides)
+
+def test_new_operation_with_complete_settings_is_accepted():
+    policy = model_router.merge_policy({"ask": {"latency_target_seconds": 10, "tiers": [{"max_input_tokens": None}]}})
+    assert policy["ask"]["tiers"] == [{"max_input_tokens": None, "model": None}]
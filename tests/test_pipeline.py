@@ -0,0 +1,218 @@
+import json
+import random
+import threading
+import time
+
+import pytest
+
+import cost_ledger
+import llm_backend
+import model_router
+import pipeline
+import summarize_api
+from deadline import Deadline
+from llm_backend import StubBackend
+from pipeline import PipelinedSummary, RollingHash
+from summerize import SummaryFailed
+
+WORDS = "cache memory latency request server client tomato garden chord melody rhythm soil water".split()
+
+@pytest.fixture(autouse=True)
+def stub_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", StubBackend(latency=0, tokens_per_second=1e9))
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", "")
+
+def transcript(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        {"start": i * 4.0, "duration": 4.0, "text": " ".join(rng.choice(WORDS) for _ in range(10))}
+        for i in range(count)
+    ]
+
+def chunk_texts(segments, max_tokens=300):
+    run = PipelinedSummary(max_tokens=max_tokens)
+    try:
+        run.consume(segments)
+        run.finish()
+        run.result()
+    finally:
+        run.close()
+    return [chunk["text"] for chunk in run.chunks]
+
+def test_rolling_hash_only_depends_on_the_window():
+    first, second = RollingHash(window=4), RollingHash(window=4)
+    for word in ["a", "b", "c", "x", "y", "z", "w"]:
+        first.push(word)
+    for word in ["q", "x", "y", "z", "w"]:
+        second.push(word)
+    assert first.value == second.value
+    third = RollingHash(window=4)
+    for word in ["x", "y", "z", "w"]:
+        third.push(word)
+    assert third.value == first.value
+
+def test_chunks_cover_the_transcript_within_the_size_bounds():
+    segments = transcript(400)
+    run = PipelinedSummary(max_tokens=300)
+    try:
+        run.consume(segments)
+        summary = run.result()
+    finally:
+        run.close()
+    assert "-Summary" in summary and "Notes" in summary
+    assert " ".join(chunk["text"] for chunk in run.chunks) == " ".join(s["text"] for s in segments)
+    assert len(run.chunks) == len(run.chunk_futures) > 2
+    longest_segment = max(llm_backend.estimate_tokens(s["text"]) + 1 for s in segments)
+    for chunk in run.chunks[:-1]:
+        # Per-segment estimates round down, so allow one token per segment
+        tokens = llm_backend.estimate_tokens(chunk["text"])
+        segments_in_chunk = round((chunk["end"] - chunk["start"]) / 4.0)
+        assert run.min_tokens <= tokens + segments_in_chunk
+        assert tokens < run.max_tokens + longest_segment
+
+def test_an_edit_only_moves_nearby_chunk_boundaries():
+    segments = transcript(400)
+    edited = [dict(segment) for segment in segments]
+    edited[200]["text"] = "an entirely different sentence was spoken here"
+    before, after = chunk_texts(segments), chunk_texts(edited)
+    unchanged = set(before) & set(after)
+    assert len(unchanged) >= len(before) - 3
+    # Casing fixes don't move any boundary
+    fixed = [dict(segment, text=segment["text"].capitalize()) for segment in segments]
+    assert [text.lower() for text in chunk_texts(fixed)] == before
+
+def test_short_transcripts_are_summarized_in_one_call():
+    run = PipelinedSummary(max_tokens=10_000)
+    try:
+        run.consume(transcript(5))
+        assert "-Summary" in run.result()
+    finally:
+        run.close()
+    assert run.chunks == []
+    assert run.routing["model"]
+
+def test_chunk_notes_are_cached(monkeypatch):
+    calls = []
+    generate = llm_backend.generate
+    def counting(operation, *args, **kwargs):
+        calls.append(operation)
+        return generate(operation, *args, **kwargs)
+    monkeypatch.setattr(pipeline.llm_backend, "generate", counting)
+    segments = transcript(200)
+    chunk_texts(segments)
+    first = calls.count("summarize_chunk")
+    assert first > 1
+    chunk_texts(segments)
+    assert calls.count("summarize_chunk") == first
+
+def test_pipeline_enabled(monkeypatch):
+    monkeypatch.delenv("SUMMIFY_PIPELINE", raising=False)
+    assert pipeline.pipeline_enabled({})
+    assert not pipeline.pipeline_enabled({"pipeline": False})
+    monkeypatch.setenv("SUMMIFY_PIPELINE", "0")
+    assert not pipeline.pipeline_enabled({})
+    assert pipeline.pipeline_enabled({"pipeline": True})
+
+def test_a_failed_summary_raises_instead_of_returning_the_error(monkeypatch):
+    def failing(operation, *args, **kwargs):
+        raise RuntimeError("backend down")
+    monkeypatch.setattr(llm_backend, "generate", failing)
+    run = PipelinedSummary(max_tokens=10_000)
+    try:
+        run.consume(transcript(5))
+        with pytest.raises(SummaryFailed, match="backend down"):
+            run.result()
+    finally:
+        run.close()
+
+def test_chunk_notes_are_keyed_by_the_model_that_wrote_them(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", str(tmp_path / "ledger.jsonl"))
+    budgets = tmp_path / "budgets.json"
+    budgets.write_text(json.dumps({"daily_usd": 1.0}))
+    monkeypatch.setenv("SUMMIFY_COST_BUDGETS", str(budgets))
+    monkeypatch.setattr(cost_ledger, "_budgets", None)
+    models = []
+    generate = llm_backend.generate
+    def recording(operation, *args, **kwargs):
+        result = generate(operation, *args, **kwargs)
+        models.append(result.model)
+        return result
+    monkeypatch.setattr(pipeline.llm_backend, "generate", recording)
+    chunk = {"start": 0.0, "text": "cache memory latency request server client"}
+
+    def set_spent(usd):
+        with cost_ledger._totals_store().transaction() as state:
+            state.clear()
+            state[cost_ledger._day(time.time())] = {"total": usd}
+
+    pipeline.summarize_chunk(chunk, Deadline(10))
+    set_spent(0.9)
+    pipeline.summarize_chunk(chunk, Deadline(10))
+    pipeline.summarize_chunk(chunk, Deadline(10))
+    set_spent(0.0)
+    pipeline.summarize_chunk(chunk, Deadline(10))
+    assert models == ["gemini-2.0-flash", "gemini-2.0-flash-lite"]
+
+def test_fetch_segments_tries_the_api_before_streaming(monkeypatch):
+    calls = []
+    def api(video_id, language, deadline):
+        calls.append("api")
+        return transcript(3)
+    def stream(video_id, language, deadline):
+        calls.append("stream")
+        return iter(transcript(4))
+    monkeypatch.setattr(pipeline, "get_transcript_from_api", api)
+    monkeypatch.setattr(pipeline, "stream_transcript_segments", stream)
+    assert pipeline.fetch_segments("abc", "en", Deadline(10)) == transcript(3)
+    assert calls == ["api"]
+
+    def failing_api(video_id, language, deadline):
+        calls.append("api")
+        raise ValueError("no transcript from the API")
+    monkeypatch.setattr(pipeline, "get_transcript_from_api", failing_api)
+    assert list(pipeline.fetch_segments("abc", "en", Deadline(10))) == transcript(4)
+    assert calls == ["api", "api", "stream"]
+
+def test_chunks_are_summarized_while_the_captions_stream_in(monkeypatch):
+    segments = transcript(400)
+    first_chunk = threading.Event()
+    generate = llm_backend.generate
+    def recording(operation, *args, **kwargs):
+        if operation == "summarize_chunk":
+            first_chunk.set()
+        return generate(operation, *args, **kwargs)
+    monkeypatch.setattr(pipeline.llm_backend, "generate", recording)
+    monkeypatch.setattr(model_router, "chunk_tokens", lambda: 300)
+    seen_before_the_end = []
+    def streaming(video_id, language, deadline):
+        yield from segments[:-1]
+        # The last caption event has not arrived yet
+        seen_before_the_end.append(first_chunk.wait(timeout=5))
+        yield segments[-1]
+    monkeypatch.setattr(pipeline, "fetch_segments", streaming)
+    run = pipeline.start_summary("abc", "en", Deadline(30))
+    try:
+        assert "-Summary" in run.result()
+    finally:
+        run.close()
+    assert seen_before_the_end == [True]
+    assert len(run.segments) == len(segments)
+
+def test_a_stream_failing_midway_falls_back_to_the_other_strategies(tmp_path, monkeypatch):
+    segments = transcript(60)
+    def broken_stream(video_id, language, deadline):
+        yield from segments[:10]
+        raise ConnectionError("caption download reset")
+    fetched = []
+    def other_strategies(video_id, language, deadline):
+        fetched.append(video_id)
+        return segments
+    monkeypatch.setattr(pipeline, "fetch_segments", broken_stream)
+    monkeypatch.setattr(summarize_api, "get_transcript_segments", other_strategies)
+    input_file, output_file = tmp_path / "input.json", tmp_path / "output.json"
+    input_file.write_text(json.dumps({"url": "https://youtu.be/dQw4w9WgXcQ", "language": "en"}))
+    summarize_api.process_api_request(str(input_file), str(output_file))
+    output = json.loads(output_file.read_text())
+    assert fetched == ["dQw4w9WgXcQ"]
+    assert "-Summary" in output["summary"]
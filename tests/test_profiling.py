@@ -0,0 +1,54 @@
+import json
+import pstats
+
+import pytest
+
+import llm_backend
+import summarize_api
+import transcript_cache
+from llm_backend import StubBackend
+from profiling import profiling_requested
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+@pytest.fixture(autouse=True)
+def cached_video(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", StubBackend(latency=0, tokens_per_second=1e9))
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", "")
+    monkeypatch.delenv("SUMMIFY_PROFILE", raising=False)
+    segments = [{"start": i * 4.0, "duration": 4.0, "text": f"sentence number {i} about caching"} for i in range(50)]
+    transcript_cache.store_segments(VIDEO_ID, "en", segments)
+
+def summarize(tmp_path, **extra):
+    input_file, output_file = tmp_path / "input.json", tmp_path / "output.json"
+    input_file.write_text(json.dumps(dict({"url": f"https://youtu.be/{VIDEO_ID}", "language": "en"}, **extra)))
+    summarize_api.process_api_request(str(input_file), str(output_file))
+    assert "summary" in json.loads(output_file.read_text())
+    return output_file
+
+def test_profiling_requested(monkeypatch):
+    assert not profiling_requested({})
+    assert profiling_requested({"profile": True})
+    monkeypatch.setenv("SUMMIFY_PROFILE", "0")
+    assert not profiling_requested({})
+    monkeypatch.setenv("SUMMIFY_PROFILE", "1")
+    assert profiling_requested({})
+
+def test_a_profiled_request_writes_stage_timings_and_pstats(tmp_path):
+    output_file = summarize(tmp_path, profile=True)
+    report = json.loads((tmp_path / "output.json.profile.json").read_text())
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert {"parse_url", "summary:cache", "write_output"} <= set(stages)
+    for stage in stages.values():
+        assert stage["wall_ms"] >= 0 and stage["cpu_ms"] is not None
+    assert report["wall_ms"] > 0 and report["top_functions"]
+    stats = pstats.Stats(str(output_file) + ".profile.pstats")
+    assert stats.total_calls > 0
+
+@pytest.mark.parametrize("setting", [None, "0"])
+def test_unprofiled_requests_write_nothing_extra(tmp_path, monkeypatch, setting):
+    if setting is not None:
+        monkeypatch.setenv("SUMMIFY_PROFILE", setting)
+    summarize(tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["cache", "input.json", "output.json"]
@@ -0,0 +1,52 @@
+import qa_index
+import transcript_cache
+from qa_index import build_index, chunk_segments, format_timestamp, search
+
+def segments_of(texts, seconds=5.0):
+    return [{"start": i * seconds, "duration": seconds, "text": text} for i, text in enumerate(texts)]
+
+def test_format_timestamp():
+    assert format_timestamp(0) == "0:00"
+    assert format_timestamp(754.9) == "12:34"
+    assert format_timestamp(3 * 3600 + 5) == "3:00:05"
+
+def test_chunks_overlap_by_one_segment():
+    segments = segments_of(["one two three", "four five six", "seven eight nine", "ten eleven"])
+    chunks = chunk_segments(segments, chunk_words=6)
+    assert [chunk["text"] for chunk in chunks] == [
+        "one two three four five six",
+        "four five six seven eight nine",
+        "seven eight nine ten eleven",
+    ]
+    assert (chunks[0]["start"], chunks[0]["end"]) == (0.0, 10.0)
+    assert (chunks[-1]["start"], chunks[-1]["end"]) == (10.0, 20.0)
+
+def test_short_transcripts_are_one_chunk():
+    assert chunk_segments(segments_of(["hello"]))[0]["text"] == "hello"
+    assert chunk_segments([]) == []
+
+def test_index_layout():
+    index = build_index(segments_of(["caching makes repeated requests fast"]))
+    assert index["version"] == qa_index.INDEX_VERSION
+    assert index["lengths"] == [sum(index["postings"][term][0][1] for term in index["postings"])]
+    assert index["postings"]["caching"] == [[0, 1]]
+
+def test_search_ranks_by_bm25():
+    filler = " ".join(["we talk about the weather and the mountains"] * 15)
+    texts = [filler] * 5 + ["the cache stores results so a cache hit skips the slow fetch " * 10]
+    texts += [filler] * 5 + ["a cache is mentioned once " + filler] + [filler] * 5
+    index = build_index(segments_of(texts))
+    hits = search(index, "How does the cache work?", top_k=3)
+    assert len(hits) == 3
+    assert hits[0][0] >= hits[1][0] > hits[2][0] > 0
+    assert "cache hit" in hits[0][1]["text"] and "cache hit" in hits[1][1]["text"]
+    assert "mentioned once" in hits[2][1]["text"]
+    assert search(index, "unrelated xylophone") == []
+
+def test_get_index_is_stored_beside_the_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path))
+    segments = segments_of(["the cache stores results"] * 50)
+    transcript_cache.save_segments("abc", "auto", segments)
+    index = qa_index.get_index("abc", "auto")
+    assert qa_index.load_index("abc", "auto") == index
+    assert search(index, "cache")
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import llm_backend
+import quiz_api
+from llm_backend import StubBackend
+
+@pytest.fixture(autouse=True)
+def stub_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", StubBackend(latency=0, tokens_per_second=1e9))
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SUMMIFY_COST_LEDGER", "")
+    monkeypatch.delenv("SUMMIFY_MODEL_QUIZ", raising=False)
+
+def run_quiz(tmp_path):
+    input_file, output_file = tmp_path / "input.json", tmp_path / "output.json"
+    input_file.write_text(json.dumps({"summary": "Caching keeps answers close to the reader.", "num_questions": 2}))
+    quiz_api.process_api_request(str(input_file), str(output_file))
+    return json.loads(output_file.read_text())
+
+def test_cached_quizzes_are_keyed_by_the_routed_model(tmp_path, monkeypatch):
+    generated = []
+    generate = quiz_api.llm_backend.generate
+    def recording(operation, *args, **kwargs):
+        generated.append(kwargs.get("model"))
+        return generate(operation, *args, **kwargs)
+    monkeypatch.setattr(quiz_api.llm_backend, "generate", recording)
+
+    first = run_quiz(tmp_path)
+    assert len(first["questions"]) == 2
+    assert run_quiz(tmp_path) == first
+    assert generated == [first["routing"]["model"]]
+    monkeypatch.setenv("SUMMIFY_MODEL_QUIZ", "some-other-model")
+    assert run_quiz(tmp_path)["routing"]["model"] == "some-other-model"
+    assert generated[1:] == ["some-other-model"]
@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import (
+    CircuitBreaker,
+    FileStateStore,
+    HostRateLimiter,
+    MemoryStateStore,
+    RateLimitedError,
+    is_throttle_error,
+    is_throttled_response,
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(time=clock.time, sleep=clock.sleep))
+    return clock
+
+def limiter(**kwargs):
+    options = dict(store=MemoryStateStore(), requests_per_minute=60, burst=2, max_wait=10)
+    options.update(kwargs)
+    return HostRateLimiter(**options)
+
+def test_burst_then_one_request_per_refill(clock):
+    host_limiter = limiter()
+    assert host_limiter.acquire("youtube.com") == 0
+    assert host_limiter.acquire("youtube.com") == 0
+    assert host_limiter.acquire("youtube.com") == pytest.approx(1.0)
+    assert clock.slept == [pytest.approx(1.0)]
+    # Hosts have buckets of their own
+    assert host_limiter.acquire("www.youtube.com") == 0
+
+def test_refill_is_capped_at_the_burst(clock):
+    host_limiter = limiter()
+    host_limiter.acquire("youtube.com")
+    clock.now += 3600
+    assert host_limiter.headroom("youtube.com") == 2
+
+def test_wait_over_the_limit_raises_without_reserving(clock):
+    host_limiter = limiter(burst=1, max_wait=0.5)
+    host_limiter.acquire("youtube.com")
+    with pytest.raises(RateLimitedError):
+        host_limiter.acquire("youtube.com")
+    assert host_limiter.headroom("youtube.com") == pytest.approx(0)
+    assert host_limiter.acquire("youtube.com", max_wait=5) == pytest.approx(1.0)
+
+def test_penalize_halves_the_rate_and_backs_off(clock):
+    host_limiter = limiter()
+    assert host_limiter.penalize("youtube.com", retry_after=5) == 5
+    assert host_limiter.headroom("youtube.com") == 0
+    with pytest.raises(RateLimitedError):
+        host_limiter.acquire("youtube.com", max_wait=1)
+    assert host_limiter.acquire("youtube.com") == pytest.approx(5)
+
+    # The bucket refilled during the backoff; at half the rate, a slot takes two seconds
+    assert host_limiter.acquire("youtube.com") == 0
+    assert host_limiter.acquire("youtube.com") == 0
+    assert host_limiter.acquire("youtube.com") == pytest.approx(2.0)
+
+def test_exponential_backoff_with_jitter_is_bounded(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "random", lambda: 1.0)
+    host_limiter = limiter()
+    delays = [host_limiter.penalize("youtube.com") for _ in range(10)]
+    assert delays[:4] == [2.0, 4.0, 8.0, 16.0]
+    assert max(delays) == rate_limiter.BACKOFF_MAX
+
+def test_reward_restores_the_rate_slowly(clock):
+    store = MemoryStateStore()
+    host_limiter = limiter(store=store)
+    for _ in range(10):
+        host_limiter.penalize("youtube.com", retry_after=0)
+    with store.transaction() as state:
+        assert state["hosts"]["youtube.com"]["scale"] == rate_limiter.MIN_RATE_SCALE
+    for _ in range(3):
+        host_limiter.reward("youtube.com")
+    with store.transaction() as state:
+        host_state = state["hosts"]["youtube.com"]
+    assert host_state["scale"] == pytest.approx(0.4)
+    assert host_state["backoff_level"] == 0
+
+def test_file_store_is_shared_and_survives_corruption(tmp_path, clock):
+    path = tmp_path / "rate.json"
+    limiter(store=FileStateStore(str(path))).acquire("youtube.com")
+    assert limiter(store=FileStateStore(str(path))).headroom("youtube.com") == pytest.approx(1)
+    path.write_text("{not json")
+    assert limiter(store=FileStateStore(str(path))).headroom("youtube.com") == 2
+
+def test_circuit_opens_then_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(MemoryStateStore(), failure_threshold=2, reset_timeout=60)
+    breaker.record_failure("api")
+    assert breaker.allow("api")
+    breaker.record_failure("api")
+    assert not breaker.allow("api")
+    clock.now += 60
+    assert breaker.allow("api")
+    assert not breaker.allow("api")
+
+    # A failed probe opens the circuit again at once
+    breaker.record_failure("api")
+    clock.now += 30
+    assert not breaker.allow("api")
+    clock.now += 30
+    assert breaker.allow("api")
+    breaker.record_success("api")
+    assert breaker.allow("api")
+    breaker.record_failure("api")
+    assert breaker.allow("api")
+
+def test_throttle_detection():
+    assert is_throttled_response(SimpleNamespace(status_code=429, url="", text=""))
+    assert is_throttled_response(SimpleNamespace(status_code=200, url="https://consent.youtube.com/m", text=""))
+    consent = SimpleNamespace(status_code=200, url="https://www.youtube.com/watch", text='<form action="https://consent.youtube.com/s">')
+    assert is_throttled_response(consent)
+    assert not is_throttled_response(consent, sniff_body=False)
+    assert not is_throttled_response(SimpleNamespace(status_code=200, url="https://www.youtube.com/watch", text="ok"))
+
+    assert is_throttle_error(RateLimitedError("slow down"))
+    assert is_throttle_error(type("TooManyRequests", (Exception,), {})())
+    assert is_throttle_error(Exception("HTTP Error 429"))
+    assert not is_throttle_error(Exception("video unavailable"))
@@ -0,0 +1,146 @@
+import json
+import os
+import random
+import struct
+
+import pytest
+
+import srs_api
+import srs_scheduler
+from srs_scheduler import CARD, DAY_SECONDS, Deck, sm2
+
+NOW = 1_700_000_000.0
+
+@pytest.fixture
+def deck(tmp_path):
+    deck = Deck(str(tmp_path / "deck"))
+    yield deck
+    deck.close()
+
+def cards(n, prefix="card"):
+    return [{"front": f"{prefix} {i}?", "back": f"answer {i}"} for i in range(n)]
+
+def heap_order(deck):
+    count = deck._count()
+    heap = [deck._heap_get(position) for position in range(count)]
+    for position, card_id in enumerate(heap):
+        assert deck._read_card(card_id)[srs_scheduler.HEAP_POSITION_FIELD] == position
+        for child in (2 * position + 1, 2 * position + 2):
+            if child < count:
+                assert deck._due(card_id) <= deck._due(heap[child])
+    return heap
+
+def test_field_offsets_match_the_record_layout():
+    record = CARD.pack(b"k" * 16, 1.5, 0.0, 0.0, 2.5, 0, 0, 0xABCDEF, 0, 0)
+    assert struct.unpack_from("=d", record, srs_scheduler.DUE_OFFSET)[0] == 1.5
+    assert struct.unpack_from("=I", record, srs_scheduler.HEAP_POSITION_OFFSET)[0] == 0xABCDEF
+    assert CARD.size % 8 == 0
+
+@pytest.mark.parametrize("grades, expected", [
+    # Three good reviews: 1 day, 6 days, then 6 x ease
+    ([4, 4, 4], (15.0, 2.5, 3)),
+    ([5], (1.0, 2.6, 1)),
+    ([3], (1.0, 2.36, 1)),
+    # A lapse starts the card over and lowers its ease
+    ([4, 4, 1], (1.0, 1.96, 0)),
+    # Ease never drops below 1.3
+    ([0] * 10, (1.0, 1.3, 0)),
+])
+def test_sm2_known_sequences(grades, expected):
+    interval, ease, repetitions = 0.0, srs_scheduler.INITIAL_EASE, 0
+    for quality in grades:
+        interval, ease, repetitions = sm2(interval, ease, repetitions, quality)
+    assert interval == pytest.approx(expected[0])
+    assert ease == pytest.approx(expected[1])
+    assert repetitions == expected[2]
+
+def test_parse_grade():
+    assert srs_scheduler.parse_grade("good") == 4
+    assert srs_scheduler.parse_grade("2") == 2
+    with pytest.raises(ValueError):
+        srs_scheduler.parse_grade("perfect")
+    with pytest.raises(ValueError):
+        srs_scheduler.parse_grade(6)
+
+def test_add_deduplicates_by_video_and_front(deck):
+    assert deck.add("v1", cards(3), now=NOW) == [0, 1, 2]
+    assert deck.add("v1", cards(4), now=NOW) == [0, 1, 2, 3]
+    assert deck.add("v2", cards(1), now=NOW) == [4]
+    assert deck.stats(now=NOW) == {"cards": 5, "due": 5, "new": 5, "lapses": 0}
+
+def test_due_is_most_overdue_first_and_reviews_reschedule(deck):
+    for i in range(5):
+        deck.add("v", cards(1, prefix=f"c{i}"), now=NOW + i)
+    assert [card["card_id"] for card in deck.due(now=NOW + 10)] == [0, 1, 2, 3, 4]
+    assert [card["card_id"] for card in deck.due(limit=2, now=NOW + 10)] == [0, 1]
+    assert deck.due(now=NOW - 1) == []
+
+    card = deck.review(0, "good", now=NOW + 10)
+    assert card["due"] == pytest.approx(NOW + 10 + DAY_SECONDS)
+    assert card["front"] == "c0 0?" and card["repetitions"] == 1
+    deck.review(2, "again", now=NOW + 11)
+    assert [card["card_id"] for card in deck.due(now=NOW + 11)] == [1, 3, 4]
+    assert deck.next_due() == NOW + 1
+    # A day later both reviewed cards are due again, in due order
+    assert [card["card_id"] for card in deck.due(now=NOW + 11 + DAY_SECONDS)] == [1, 3, 4, 0, 2]
+    assert deck.stats(now=NOW + 11)["lapses"] == 1
+    heap_order(deck)
+
+def test_review_of_unknown_card(deck):
+    with pytest.raises(KeyError):
+        deck.review(0, "good")
+
+def test_heap_stays_ordered_over_random_reviews(deck):
+    rng = random.Random(7)
+    deck.add("v", cards(200), now=NOW)
+    now = NOW
+    for _ in range(500):
+        now += rng.uniform(0, DAY_SECONDS)
+        deck.review(rng.randrange(200), rng.randint(0, 5), now=now)
+    heap = heap_order(deck)
+    due = [card["due"] for card in deck.due(limit=200, now=float("inf"))]
+    assert due == sorted(due) and len(due) == 200
+    assert deck._due(heap[0]) == deck.next_due()
+
+def test_rebuild_heap_repairs_a_scrambled_queue(deck):
+    deck.add("v", cards(50), now=NOW)
+    rng = random.Random(3)
+    for card_id in range(50):
+        deck.review(card_id, rng.randint(0, 5), now=NOW + rng.uniform(0, DAY_SECONDS))
+    expected = [card["card_id"] for card in deck.due(limit=50, now=float("inf"))]
+    # What a crash between two heap writes could leave behind
+    order = list(range(50))
+    rng.shuffle(order)
+    os.pwrite(deck._heap, b"".join(srs_scheduler.SLOT.pack(card_id) for card_id in order), 0)
+
+    assert deck.rebuild_heap() == 50
+    heap_order(deck)
+    assert [card["card_id"] for card in deck.due(limit=50, now=float("inf"))] == expected
+
+def test_deck_survives_reopening(tmp_path):
+    path = str(tmp_path / "deck")
+    deck = Deck(path)
+    deck.add("v", cards(3), now=NOW)
+    deck.review(1, "easy", now=NOW)
+    deck.close()
+    reopened = Deck(path)
+    assert [card["card_id"] for card in reopened.due(now=NOW)] == [0, 2]
+    reopened.close()
+
+def run_api(tmp_path, request):
+    input_file, output_file = tmp_path / "in.json", tmp_path / "out.json"
+    input_file.write_text(json.dumps(request))
+    srs_api.process_api_request(str(input_file), str(output_file))
+    return json.loads(output_file.read_text())
+
+def test_api_actions(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUMMIFY_SRS_DIR", str(tmp_path / "srs"))
+    monkeypatch.setattr(srs_scheduler, "_decks", {})
+    user = {"user_id": "u1"}
+    assert run_api(tmp_path, dict(user, action="add", video_id="v", flashcards=cards(2)))["card_ids"] == [0, 1]
+    assert len(run_api(tmp_path, dict(user, action="due"))["cards"]) == 2
+    assert run_api(tmp_path, dict(user, action="review", card_id=0, grade="good"))["card"]["repetitions"] == 1
+    assert run_api(tmp_path, dict(user, action="review", card_id=9, grade="good"))["error_type"] == "CardNotFound"
+    assert run_api(tmp_path, dict(user, action="stats"))["cards"] == 2
+    with pytest.raises(ValueError):
+        run_api(tmp_path, dict(user, action="shuffle"))
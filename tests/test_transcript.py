@@ -0,0 +1,173 @@
+import json
+
+import pytest
+
+import transcript
+from deadline import Deadline
+from transcript import (
+    TimedText,
+    choose_track,
+    iter_json3_segments,
+    join_segments,
+    parse_json3_captions,
+    parse_json3_segments,
+)
+
+CAPTIONS = {
+    "wireMagic": "pb3",
+    "events": [
+        {"tStartMs": 0, "dDurationMs": 1500, "segs": [{"utf8": "Xin chào"}, {"utf8": "các bạn"}]},
+        {"tStartMs": 1500, "dDurationMs": 0, "aAppend": 1, "segs": [{"utf8": "\n"}]},
+        {"tStartMs": 2000, "dDurationMs": 2500, "segs": [{"utf8": "[Music] \"quoted\" ]"}]},
+        {"tStartMs": 5000, "dDurationMs": 1000},
+        {"tStartMs": 6000, "segs": [{"utf8": "字幕"}]},
+    ],
+}
+
+SEGMENTS = [
+    {"start": 0.0, "duration": 1.5, "text": "Xin chào các bạn"},
+    {"start": 2.0, "duration": 2.5, "text": '[Music] "quoted" ]'},
+    {"start": 6.0, "duration": 0.0, "text": "字幕"},
+]
+
+class FakeTrack:
+    def __init__(self, language_code, is_generated=False, translation_languages=()):
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.is_translatable = bool(translation_languages)
+        self.translation_languages = list(translation_languages)
+
+    def translate(self, language_code):
+        return FakeTrack(language_code, self.is_generated)
+
+def dict_option(code):
+    # youtube-transcript-api 0.6
+    return {"language": code.upper(), "language_code": code}
+
+def dataclass_option(code):
+    # youtube-transcript-api 1.x
+    translation_language = pytest.importorskip("youtube_transcript_api._transcripts")._TranslationLanguage
+    return translation_language(language=code.upper(), language_code=code)
+
+def test_exact_language_before_regional_variant_and_manual_before_generated():
+    tracks = [FakeTrack("en-GB"), FakeTrack("en", is_generated=True), FakeTrack("en")]
+    track, reason = choose_track(tracks, "en")
+    assert (track.language_code, track.is_generated, reason) == ("en", False, "manual")
+    track, reason = choose_track(tracks[:2], "en")
+    assert (track.language_code, reason) == ("en", "generated")
+    track, reason = choose_track([FakeTrack("en-GB"), FakeTrack("fr")], "en")
+    assert (track.language_code, reason) == ("en-GB", "manual")
+
+@pytest.mark.parametrize("option", [dict_option, dataclass_option])
+def test_translation_into_the_language(option):
+    tracks = [FakeTrack("en", translation_languages=[option("fr"), option("vi")])]
+    track, reason = choose_track(tracks, "vi")
+    assert (track.language_code, reason) == ("vi", "translated")
+
+@pytest.mark.parametrize("option", [dict_option, dataclass_option])
+def test_any_track_when_nothing_matches(option):
+    tracks = [FakeTrack("en", translation_languages=[option("fr")])]
+    track, reason = choose_track(tracks, "vi")
+    assert (track.language_code, reason) == ("en", "other_language")
+
+def test_no_tracks():
+    assert choose_track([], "en") == (None, None)
+
+def test_language_matches():
+    assert transcript._language_matches("en-GB", "en")
+    assert transcript._language_matches("PT-br", "pt")
+    assert not transcript._language_matches("es", "en")
+
+def test_parse_json3_segments_skips_empty_events():
+    assert parse_json3_segments(CAPTIONS) == SEGMENTS
+    assert parse_json3_segments({}) == []
+    assert parse_json3_captions(CAPTIONS) == 'Xin chào các bạn [Music] "quoted" ] 字幕'
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 16])
+def test_iter_json3_segments_matches_the_whole_document_parse(chunk_size):
+    payload = json.dumps(CAPTIONS, ensure_ascii=False, indent=1).encode("utf-8")
+    chunks = (payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size))
+    assert list(iter_json3_segments(chunks)) == SEGMENTS
+
+def test_iter_json3_segments_yields_before_the_stream_ends():
+    payload = json.dumps(CAPTIONS).encode("utf-8")
+    cut = payload.index(b"[Music]")
+    segments = iter_json3_segments(iter([payload[:cut]]))
+    assert next(segments) == SEGMENTS[0]
+    with pytest.raises(ValueError):
+        next(segments)
+
+def test_timed_text_reads_like_a_list_of_segments():
+    timed = TimedText(SEGMENTS)
+    assert len(timed) == 3
+    assert list(timed) == SEGMENTS
+    assert timed[-1] == SEGMENTS[-1]
+    assert timed[1:] == SEGMENTS[1:]
+    assert join_segments(timed) == join_segments(SEGMENTS)
+    with pytest.raises(IndexError):
+        timed[3]
+    copy = TimedText.from_arrays(timed.text, timed.starts, timed.durations, timed.offsets)
+    assert list(copy) == SEGMENTS
+
+def watch_page(player_response):
+    return f"<html><script>var ytInitialPlayerResponse = {json.dumps(player_response)};</script></html>"
+
+def test_parse_video_metadata():
+    page = watch_page({
+        "videoDetails": {"title": "Cách nấu phở {ngon}", "author": "Bếp", "channelId": "UC1", "lengthSeconds": "754"},
+        "captions": {"playerCaptionsTracklistRenderer": {"captionTracks": [
+            {"languageCode": "vi", "kind": "asr", "name": {"simpleText": "Vietnamese (auto-generated)"}},
+            {"languageCode": "en", "name": {"runs": [{"text": "English"}, {"text": " (UK)"}]}},
+        ]}},
+    })
+    assert transcript.parse_video_metadata(page) == {
+        "title": "Cách nấu phở {ngon}",
+        "channel": "Bếp",
+        "channel_id": "UC1",
+        "duration_seconds": 754,
+        "caption_languages": [
+            {"code": "vi", "name": "Vietnamese (auto-generated)", "auto_generated": True},
+            {"code": "en", "name": "English (UK)", "auto_generated": False},
+        ],
+    }
+
+def test_parse_video_metadata_without_details_or_captions():
+    assert transcript.parse_video_metadata("<html></html>") is None
+    metadata = transcript.parse_video_metadata(watch_page({"videoDetails": {"title": "Live", "lengthSeconds": "0x"}}))
+    assert metadata["duration_seconds"] is None
+    assert metadata["caption_languages"] == []
+
+def test_remember_video_metadata(monkeypatch):
+    monkeypatch.setattr(transcript, "_video_metadata", {})
+    transcript.remember_video_metadata("abc", "<html></html>")
+    assert transcript.video_metadata("abc") is None
+    transcript.remember_video_metadata("abc", watch_page({"videoDetails": {"title": "Hello"}}))
+    assert transcript.video_metadata("abc")["title"] == "Hello"
+
+def test_the_primary_api_takes_a_rate_limiter_slot_per_request(monkeypatch):
+    requests = []
+    class FetchableTrack(FakeTrack):
+        def fetch(self):
+            requests.append("fetch")
+            return [{"start": 0.0, "duration": 1.0, "text": "hello"}]
+    class FakeApi:
+        def __init__(self, http_client):
+            self.http_client = http_client
+        def list(self, video_id):
+            requests.append("list")
+            return [FetchableTrack("en")]
+    monkeypatch.setattr(transcript, "transcript_api", lambda: FakeApi)
+    monkeypatch.setattr(transcript.rate_limiter, "acquire", lambda host, max_wait=None: requests.append("acquire") or 0.0)
+    monkeypatch.setattr(transcript.rate_limiter, "reward", lambda host: None)
+    assert transcript.get_transcript_from_api("abc", "en") == [{"start": 0.0, "duration": 1.0, "text": "hello"}]
+    assert requests == ["acquire", "list", "acquire", "fetch"]
+
+def test_deadline_session_times_requests_out_with_the_deadline(monkeypatch):
+    import requests
+    sent = []
+    monkeypatch.setattr(requests.Session, "request", lambda self, method, url, **kwargs: sent.append(kwargs["timeout"]))
+    session = transcript.deadline_session(Deadline(3))
+    session.get("https://www.youtube.com/api/timedtext")
+    session.get("https://www.youtube.com/api/timedtext", timeout=1)
+    assert sent[0] == pytest.approx(3, abs=0.1)
+    assert sent[1] == 1
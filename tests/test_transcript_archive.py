@@ -0,0 +1,113 @@
+import json
+import os
+import time
+
+import pytest
+
+from transcript import TimedText
+from transcript_archive import (
+    INDEX_ENTRY,
+    INDEX_HEADER,
+    RECORD_HEADER,
+    TranscriptArchive,
+    decode_record,
+    encode_record,
+    import_cache,
+)
+
+SEGMENTS = [
+    {"start": 0.0, "duration": 2.5, "text": "Xin chào các bạn"},
+    {"start": 2.5, "duration": 1.25, "text": "hello world"},
+    {"start": 3.75, "duration": 4.0, "text": "ünïcödé 字幕"},
+]
+
+def test_record_round_trip_is_aligned_and_in_place():
+    record = encode_record(SEGMENTS, fetched_at=123.5)
+    assert len(record) % 8 == 0
+    buffer = memoryview(bytes(16) + record)
+    timed, fetched_at = decode_record(buffer, 16)
+    assert fetched_at == 123.5
+    assert list(timed) == SEGMENTS
+    assert timed.starts.obj is buffer.obj
+    with pytest.raises(ValueError):
+        decode_record(buffer, 0)
+
+def test_record_header_layout():
+    # The on-disk format: changing these breaks every existing archive
+    assert RECORD_HEADER.size == 32
+    assert INDEX_HEADER.size == 24
+    assert INDEX_ENTRY.size == 64
+
+def test_append_and_get(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "transcripts"))
+    assert archive.get("abc", "en") is None
+    archive.append("abc", "en", SEGMENTS)
+    archive.append("abc", "vi", SEGMENTS[:1])
+    assert list(archive.get("abc", "en")) == SEGMENTS
+    assert list(archive.get("abc", "vi")) == SEGMENTS[:1]
+    assert ("abc", "en") in archive
+    assert ("abc", "fr") not in archive
+    assert ("abd", "en") not in archive
+
+def test_max_age(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "transcripts"))
+    archive.append("old", "en", SEGMENTS, fetched_at=time.time() - 100)
+    assert archive.get("old", "en", max_age=10) is None
+    assert archive.get("old", "en", max_age=1000) is not None
+
+def test_index_stays_sorted_across_batches(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "transcripts"))
+    ids = [f"video{i:03d}" for i in range(200)]
+    archive.append_many((video_id, "en", [{"start": 0.0, "duration": 1.0, "text": video_id}], None) for video_id in ids[::2])
+    archive.append_many((video_id, "en", [{"start": 0.0, "duration": 1.0, "text": video_id}], None) for video_id in ids[1::2])
+    for video_id in ids:
+        assert archive.get(video_id, "en")[0]["text"] == video_id
+    keys = [key for key, _, _ in archive._entries()]
+    assert keys == sorted(keys)
+
+def test_other_readers_see_appends(tmp_path):
+    path = str(tmp_path / "transcripts")
+    reader = TranscriptArchive(path)
+    assert reader.get("abc", "en") is None
+    TranscriptArchive(path).append("abc", "en", SEGMENTS)
+    assert list(reader.get("abc", "en")) == SEGMENTS
+
+def test_replace_then_compact(tmp_path):
+    path = str(tmp_path / "transcripts")
+    archive = TranscriptArchive(path)
+    archive.append("abc", "en", SEGMENTS)
+    archive.append("def", "en", SEGMENTS[1:])
+    archive.append("abc", "en", SEGMENTS[:2])
+    assert list(archive.get("abc", "en")) == SEGMENTS[:2]
+    stats = archive.stats()
+    assert stats["transcripts"] == 2
+    assert stats["dead_bytes"] > 0
+
+    reader = TranscriptArchive(path)
+    reader.get("def", "en")
+    assert archive.compact() == stats["dead_bytes"]
+    assert archive.stats()["dead_bytes"] == 0
+    assert list(reader.get("abc", "en")) == SEGMENTS[:2]
+    assert list(reader.get("def", "en")) == SEGMENTS[1:]
+
+def test_long_keys_are_hashed(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "transcripts"))
+    archive.append("x" * 100, "en", SEGMENTS)
+    assert list(archive.get("x" * 100, "en")) == SEGMENTS
+    assert archive.get("x" * 99, "en") is None
+
+def test_import_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / "abc.en.segments.json").write_text(json.dumps(
+        {"video_id": "abc", "language": "en", "segments": SEGMENTS, "fetched_at": 10.0}))
+    (cache_dir / "bad.en.segments.json").write_text("{")
+    archive = TranscriptArchive(str(tmp_path / "transcripts"))
+    assert import_cache(archive, str(cache_dir)) == 1
+    assert list(archive.get("abc", "en")) == SEGMENTS
+    assert sorted(os.listdir(cache_dir)) == ["bad.en.segments.json"]
+
+def test_timed_text_input_is_stored_as_is(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "transcripts"))
+    archive.append("abc", "en", TimedText(SEGMENTS))
+    assert archive.get("abc", "en").text == " ".join(segment["text"] for segment in SEGMENTS)
@@ -1,13 +1,23 @@
 import time
-from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 import os
 import sys
 import logging
-import requests
 import re
 import json
 import random
+import codecs
+from array import array
+from collections.abc import Sequence
+from io import StringIO
+from typing import Optional, List, Dict, Any, Iterable, Iterator
+from deadline import Deadline, DeadlineExceeded, ensure_deadline, run_with_deadline, DEFAULT_REQUEST_TIMEOUT
+from instrumentation import span
+import language_id
+from rate_limiter import (
+    HostRateLimiter, CircuitBreaker, RateLimitedError, get_state_store,
+    is_throttled_response, is_throttle_error, get_retry_after,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +40,54 @@ USER_AGENTS = [
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.3 Safari/605.1.15',
 ]
 
+YOUTUBE_HOST = "www.youtube.com"
+# Overridable so the benchmark suite can replay recorded pages from a local stand-in server
+YOUTUBE_BASE_URL = os.environ.get("YOUTUBE_BASE_URL", "https://www.youtube.com").rstrip("/")
+
+# Rate limiter and circuit breakers share one store so several workers can cooperate
+_rate_state = get_state_store()
+rate_limiter = HostRateLimiter(_rate_state)
+circuit_breaker = CircuitBreaker(_rate_state)
+
+# youtube_transcript_api and requests are imported on first use: together they take
+# about 200ms to import, which every worker process would otherwise pay up front
+YouTubeTranscriptApi = None
+
+def transcript_api():
+    """
+    The YouTubeTranscriptApi class, imported on first use (benchmarks may replace it).
+    """
+    global YouTubeTranscriptApi
+    if YouTubeTranscriptApi is None:
+        from youtube_transcript_api import YouTubeTranscriptApi as api
+        YouTubeTranscriptApi = api
+    return YouTubeTranscriptApi
+
+def throttled_request(method: str, url: str, strategy: str, session=None, deadline: Optional[Deadline] = None, **kwargs):
+    """
+    Send an HTTP request through the per-host rate limiter.
+
+    Throttled responses (429 or consent pages) trigger adaptive backoff, count
+    against the strategy's circuit breaker and raise RateLimitedError. Waiting
+    for a slot and the request itself are both bounded by the deadline; an
+    explicit ``timeout`` only caps it further.
+    """
+    deadline = ensure_deadline(deadline)
+    deadline.check(f"transcript:{strategy}")
+    host = urlparse(url).netloc
+    rate_limiter.acquire(host, max_wait=min(rate_limiter.max_wait, deadline.remaining()))
+    kwargs['timeout'] = deadline.timeout(kwargs.get('timeout', DEFAULT_REQUEST_TIMEOUT))
+    if session is None:
+        import requests
+        session = requests
+    response = session.request(method, url, **kwargs)
+    if is_throttled_response(response, sniff_body=not kwargs.get('stream')):
+        rate_limiter.penalize(host, get_retry_after(response))
+        circuit_breaker.record_failure(strategy)
+        raise RateLimitedError(f"YouTube throttled the {strategy} strategy (status code {response.status_code})")
+    rate_limiter.reward(host)
+    return response
+
 def get_video_id(url: str) -> str:
     """
     Extract the video ID from various YouTube URL formats.
@@ -63,20 +121,369 @@ def get_video_id(url: str) -> str:
     
     raise ValueError("Could not extract video ID from URL")
 
-def get_transcript_from_api(video_id: str, language: str = 'en') -> str:
+class TimedText(Sequence):
+    """
+    Timed segments kept as one text buffer plus parallel start/duration/offset arrays.
+
+    Reads like a list of {"start", "duration", "text"} dicts, but costs 24 bytes
+    of timing per segment on top of the text itself instead of a dict, two
+    floats and a string object each, which is what makes 10-hour caption
+    tracks affordable.
+    """
+    def __init__(self, segments: Iterable[Dict[str, Any]] = ()):
+        self.starts = array('d')
+        self.durations = array('d')
+        self.offsets = array('q')
+        self._buffer = StringIO()
+        self._length = 0
+        self._text: Optional[str] = None
+        for segment in segments:
+            self.append(segment)
+
+    @classmethod
+    def from_arrays(cls, text: str, starts, durations, offsets) -> "TimedText":
+        """
+        Wrap already-built text and timing arrays without copying them; they may
+        be memoryviews into a memory-mapped transcript archive. The result is
+        read-only: don't append to it.
+        """
+        timed = cls()
+        timed.starts, timed.durations, timed.offsets = starts, durations, offsets
+        timed._text = text
+        timed._length = len(text)
+        return timed
+
+    def append(self, segment: Dict[str, Any]) -> None:
+        if self.offsets:
+            self._buffer.write(" ")
+            self._length += 1
+        self.starts.append(segment["start"])
+        self.durations.append(segment.get("duration", 0.0))
+        self.offsets.append(self._length)
+        self._buffer.write(segment["text"])
+        self._length += len(segment["text"])
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        """
+        All segment texts joined with single spaces.
+        """
+        if self._text is None:
+            self._text = self._buffer.getvalue()
+        return self._text
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _segment(self, i: int, text: str) -> Dict[str, Any]:
+        end = self.offsets[i + 1] - 1 if i + 1 < len(self.offsets) else len(text)
+        return {"start": self.starts[i], "duration": self.durations[i], "text": text[self.offsets[i]:end]}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return self._segment(index, self.text)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        text = self.text
+        for i in range(len(self)):
+            yield self._segment(i, text)
+
+def join_segments(segments: List[Dict[str, Any]]) -> str:
+    """
+    Join timed transcript segments into plain transcript text.
+    """
+    if isinstance(segments, TimedText):
+        return segments.text.strip()
+    return " ".join(segment["text"] for segment in segments).strip()
+
+def _event_segment(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    texts = [seg['utf8'] for seg in event.get('segs', []) if 'utf8' in seg]
+    # Skip the line-break events auto-generated tracks append after every line
+    if not texts or not "".join(texts).strip():
+        return None
+    return {
+        "start": event.get('tStartMs', 0) / 1000,
+        "duration": event.get('dDurationMs', 0) / 1000,
+        "text": " ".join(texts),
+    }
+
+def parse_json3_segments(caption_data: dict) -> List[Dict[str, Any]]:
+    """
+    Turn a json3 caption payload into timed segments.
+
+    Returns:
+        One {"start", "duration", "text"} dict (times in seconds) per caption event with text
+    """
+    segments = []
+    for event in caption_data.get('events', []):
+        segment = _event_segment(event)
+        if segment:
+            segments.append(segment)
+    return segments
+
+# Bytes read from the caption response at a time when streaming
+JSON3_STREAM_CHUNK_BYTES = 64 * 1024
+_EVENTS_START_RE = re.compile(r'"events"\s*:\s*\[')
+
+def iter_json3_segments(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse a json3 caption payload incrementally, yielding segments as their events arrive.
+
+    Each event is decoded on its own as soon as it is complete, and only the
+    not-yet-decoded tail of the stream is kept, so memory is bounded by the
+    largest event rather than the whole document.
+
+    Raises:
+        ValueError: If the stream ends before the events array is closed
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    in_events = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        if not in_events:
+            match = _EVENTS_START_RE.search(buffer)
+            if not match:
+                # Keep enough of the tail for a key split across two chunks
+                buffer = buffer[-32:]
+                continue
+            buffer = buffer[match.end():]
+            in_events = True
+
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                event, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The event continues in the next chunk
+                break
+            segment = _event_segment(event)
+            if segment:
+                yield segment
+        buffer = buffer[position:]
+    raise ValueError("Caption stream ended before the events array was complete")
+
+def read_json3_segments(response) -> TimedText:
+    """
+    Parse a streamed (``stream=True``) json3 caption response without holding the whole document.
+    """
+    with response:
+        return TimedText(iter_json3_segments(response.iter_content(JSON3_STREAM_CHUNK_BYTES)))
+
+def parse_json3_captions(caption_data: dict) -> str:
+    """
+    Join the text of every segment in a json3 caption payload.
+    """
+    return join_segments(parse_json3_segments(caption_data))
+
+def deadline_session(deadline: Deadline):
+    """
+    A requests session whose requests time out with the deadline unless given a timeout.
+    """
+    import requests
+    session = requests.Session()
+    request = session.request
+
+    def bounded(method, url, **kwargs):
+        kwargs.setdefault("timeout", deadline.timeout())
+        return request(method, url, **kwargs)
+
+    session.request = bounded
+    return session
+
+def list_tracks(video_id: str, deadline: Deadline):
+    """
+    One listing of a video's caption tracks (youtube_transcript_api's TranscriptList).
+    """
+    api = transcript_api()
+    # youtube-transcript-api 1.x lists through an instance whose session the tracks
+    # fetch with too, so its requests can time out with the deadline; 0.6 lists
+    # through a classmethod and sets no timeout at all
+    if hasattr(api, "list"):
+        lister = api(http_client=deadline_session(deadline)).list
+    else:
+        lister = api.list_transcripts
+    rate_limiter.acquire(YOUTUBE_HOST, max_wait=min(rate_limiter.max_wait, deadline.remaining()))
+    return run_with_deadline("transcript:list", deadline, lister, video_id)
+
+def _language_matches(code: str, language: str) -> bool:
+    """
+    Whether two language codes share a primary language, e.g. "en" and "en-GB".
+    """
+    return code.split("-")[0].lower() == language.split("-")[0].lower()
+
+def auto_language(tracks: List[tuple], hint: str = "") -> Optional[str]:
+    """
+    The video's own language, for ``language="auto"``, from its
+    (language_code, is_generated) caption tracks: the language YouTube's speech
+    recognition heard, else the manual track in the language of ``hint``
+    (e.g. the title), else the first track.
+    """
+    for code, generated in tracks:
+        if generated:
+            return code
+    codes = [code for code, _ in tracks]
+    if hint and len(codes) > 1:
+        detected = language_id.detect(hint, candidates={code.split("-")[0].lower() for code in codes})
+        for code in codes:
+            if detected and _language_matches(code, detected):
+                return code
+    return codes[0] if codes else None
+
+def _translation_code(option) -> Optional[str]:
+    # 1.x lists translation languages as dataclasses, 0.6 as dicts
+    code = getattr(option, "language_code", None)
+    return code if code is not None else option.get("language_code")
+
+def choose_track(tracks, language: str):
+    """
+    Pick the caption track to fetch from one listing.
+
+    Ranked: exact language before a regional variant (en for en-GB), manual
+    captions before generated ones at each step, then a translation into
+    ``language``, then whatever track there is.
+
+    Returns:
+        The track to fetch (possibly a translation) and why it was picked, or (None, None)
+    """
+    tracks = sorted(tracks, key=lambda track: track.is_generated)
+    if language == language_id.AUTO:
+        language = auto_language([(track.language_code, track.is_generated) for track in tracks])
+    for matches in (lambda code: code == language, lambda code: _language_matches(code, language)):
+        for track in tracks:
+            if matches(track.language_code):
+                return track, "generated" if track.is_generated else "manual"
+    for track in tracks:
+        if track.is_translatable and any(
+            _translation_code(option) == language for option in track.translation_languages
+        ):
+            return track.translate(language), "translated"
+    if tracks:
+        return tracks[0], "other_language"
+    return None, None
+
+def _track_segments(fetched) -> List[Dict[str, Any]]:
+    # 1.x returns a FetchedTranscript, 0.6 a list of dicts
+    entries = fetched.to_raw_data() if hasattr(fetched, "to_raw_data") else fetched
+    return [
+        {"start": entry.get("start", 0.0), "duration": entry.get("duration", 0.0), "text": entry["text"]}
+        for entry in entries
+    ]
+
+def get_transcript_from_api(video_id: str, language: str = 'en', deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
     """
-    Try to get transcript using youtube_transcript_api
+    Get transcript segments with youtube_transcript_api: list the caption
+    tracks once, pick one with choose_track and fetch it from the listing.
     """
     logger.info(f"Attempting to fetch transcript for video ID {video_id} with language {language} using primary API")
-    transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
-    return " ".join([entry["text"] for entry in transcript])
+    deadline = ensure_deadline(deadline)
+    try:
+        with span("transcript:resolve", video_id=video_id, language=language) as record:
+            tracks = list(list_tracks(video_id, deadline))
+            track, reason = choose_track(tracks, language)
+            record["tracks"] = len(tracks)
+            record["track"] = reason
+            if track is None:
+                raise Exception(f"No transcripts available for this video ({video_id})")
+            record["track_language"] = track.language_code
+        if reason == "translated" or track.language_code != language:
+            logger.info(f"Using {reason} track {track.language_code} for requested language {language}")
+        # The listing and the fetch are separate requests, each taking its own slot
+        rate_limiter.acquire(YOUTUBE_HOST, max_wait=min(rate_limiter.max_wait, deadline.remaining()))
+        # Backstop for 0.6, whose requests have no timeout of their own
+        fetched = run_with_deadline("transcript:api", deadline, track.fetch)
+    except (DeadlineExceeded, RateLimitedError):
+        # Our own limiter had no slot in time: YouTube never saw the request
+        raise
+    except Exception as e:
+        if is_throttle_error(e):
+            rate_limiter.penalize(YOUTUBE_HOST)
+            circuit_breaker.record_failure("api")
+            raise RateLimitedError(f"YouTube throttled the primary API: {str(e)}")
+        raise
+    rate_limiter.reward(YOUTUBE_HOST)
+    return _track_segments(fetched)
+
+# Metadata from the watch pages fetched by this process, by video ID
+_video_metadata: Dict[str, Dict[str, Any]] = {}
+
+def _decode_after(page: str, pattern: str) -> Optional[Any]:
+    # Decode the JSON value that follows a key, however deeply it nests
+    match = re.search(pattern, page)
+    if not match:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(page, match.end())[0]
+    except ValueError:
+        return None
 
-def get_transcript_from_alternative(video_id: str, language: str = 'en') -> str:
+def parse_video_metadata(page: str) -> Optional[Dict[str, Any]]:
     """
-    Alternative method to get transcript by simulating browser requests
+    Title, channel, duration and caption languages from a watch page's player response.
+
+    Returns:
+        {"title", "channel", "channel_id", "duration_seconds", "caption_languages"},
+        or None if the page has no video details
+    """
+    details = _decode_after(page, r'"videoDetails":\s*')
+    if not isinstance(details, dict):
+        return None
+    tracks = _decode_after(page, r'"captionTracks":\s*') or []
+    length = str(details.get("lengthSeconds", ""))
+    return {
+        "title": details.get("title"),
+        "channel": details.get("author"),
+        "channel_id": details.get("channelId"),
+        "duration_seconds": int(length) if length.isdigit() else None,
+        "caption_languages": [
+            {
+                "code": track.get("languageCode"),
+                "name": track.get("name", {}).get("simpleText")
+                        or "".join(run.get("text", "") for run in track.get("name", {}).get("runs", [])),
+                "auto_generated": track.get("kind") == "asr",
+            }
+            for track in tracks if isinstance(track, dict)
+        ],
+    }
+
+def remember_video_metadata(video_id: str, page: str) -> None:
+    """
+    Keep the metadata of a watch page that was fetched anyway, so the output can use it for free.
+    """
+    try:
+        metadata = parse_video_metadata(page)
+    except Exception as e:
+        logger.warning(f"Failed to read video metadata for {video_id}: {str(e)}")
+        return
+    if metadata:
+        _video_metadata[video_id] = metadata
+
+def video_metadata(video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Metadata of a video whose watch page this process has fetched, if any.
+    """
+    return _video_metadata.get(video_id)
+
+def find_caption_url(video_id: str, language: str, strategy: str, deadline: Optional[Deadline] = None):
+    """
+    Find the json3 caption URL for a video from its watch page.
+
+    Returns:
+        The caption URL and the browser-like headers to fetch it with
     """
-    logger.info(f"Attempting to fetch transcript for video ID {video_id} with language {language} using alternative method")
-    
     # Use a browser-like user agent
     headers = {
         'User-Agent': random.choice(USER_AGENTS),
@@ -84,11 +491,12 @@ def get_transcript_from_alternative(video_id: str, language: str = 'en') -> str:
         'Referer': 'https://www.youtube.com/',
     }
     
-    url = f"https://www.youtube.com/watch?v={video_id}"
-    response = requests.get(url, headers=headers)
+    url = f"{YOUTUBE_BASE_URL}/watch?v={video_id}"
+    response = throttled_request("GET", url, strategy, deadline=deadline, headers=headers)
     
     if response.status_code != 200:
         raise Exception(f"Failed to fetch video page, status code: {response.status_code}")
+    remember_video_metadata(video_id, response.text)
     
     # Try to extract transcript data from the page
     # YouTube stores captions data in a "captionTracks" JSON object in the page source
@@ -103,6 +511,12 @@ def get_transcript_from_alternative(video_id: str, language: str = 'en') -> str:
     if not captions_data:
         raise Exception("No caption tracks available")
     
+    if language == language_id.AUTO:
+        language = auto_language(
+            [(caption.get('languageCode', ''), caption.get('kind') == 'asr') for caption in captions_data],
+            hint=(video_metadata(video_id) or {}).get('title') or "",
+        )
+
     # Find the caption track with the requested language
     target_caption = None
     for caption in captions_data:
@@ -124,35 +538,60 @@ def get_transcript_from_alternative(video_id: str, language: str = 'en') -> str:
         raise Exception("Caption URL not found")
     
     # Add parameters to get plain text format
-    caption_url += "&fmt=json3"
+    return caption_url + "&fmt=json3", headers
+
+def get_transcript_from_alternative(video_id: str, language: str = 'en', deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+    """
+    Alternative method to get transcript segments by simulating browser requests
+    """
+    logger.info(f"Attempting to fetch transcript for video ID {video_id} with language {language} using alternative method")
+    caption_url, headers = find_caption_url(video_id, language, "alternative", deadline)
     
-    # Fetch the captions
-    caption_response = requests.get(caption_url, headers=headers)
+    # Fetch the captions, parsing them as they stream in
+    caption_response = throttled_request("GET", caption_url, "alternative", deadline=deadline, headers=headers, stream=True)
     if caption_response.status_code != 200:
+        caption_response.close()
         raise Exception(f"Failed to fetch captions, status code: {caption_response.status_code}")
     
     try:
-        caption_data = caption_response.json()
-        events = caption_data.get('events', [])
-        
-        # Extract text from each caption event
-        transcript_text = []
-        for event in events:
-            if 'segs' in event:
-                for seg in event['segs']:
-                    if 'utf8' in seg:
-                        transcript_text.append(seg['utf8'])
-        
-        return " ".join(transcript_text).strip()
+        return read_json3_segments(caption_response)
     except Exception as e:
         raise Exception(f"Failed to parse caption data: {str(e)}")
 
-def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
+def stream_transcript_segments(video_id: str, language: str = 'en', deadline: Optional[Deadline] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield timed segments while the json3 captions are still downloading.
+
+    Same requests as the alternative strategy, and counted against its circuit
+    breaker, but the caption track is parsed as it streams in.
+    """
+    import requests
+    deadline = ensure_deadline(deadline)
+    if not circuit_breaker.allow("alternative"):
+        raise RateLimitedError("Circuit open for the alternative strategy, skipping it")
+    logger.info(f"Streaming transcript for video ID {video_id} with language {language}")
+    try:
+        caption_url, headers = find_caption_url(video_id, language, "alternative", deadline)
+        response = throttled_request("GET", caption_url, "alternative", deadline=deadline, headers=headers, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch captions, status code: {response.status_code}")
+            for segment in iter_json3_segments(response.iter_content(JSON3_STREAM_CHUNK_BYTES)):
+                yield segment
+    except requests.RequestException:
+        circuit_breaker.record_failure("alternative")
+        raise
+    circuit_breaker.record_success("alternative")
+
+def get_transcript_render_fallback(video_id: str, language: str = 'en', deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
     """
     Special fallback method for Render environment that tries multiple approaches
     with different user agents and request patterns
     """
     logger.info(f"Attempting Render-specific fallback method for video ID {video_id}")
+    deadline = ensure_deadline(deadline)
+    # The page is asked for in English when the video's own language is wanted
+    page_language = "en" if language == language_id.AUTO else language
     
     # Try multiple different approaches with delays between them
     errors = []
@@ -161,7 +600,7 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
     try:
         headers = {
             'User-Agent': random.choice(USER_AGENTS),
-            'Accept-Language': f'{language}-US,{language};q=0.9,en;q=0.8',
+            'Accept-Language': f'{page_language}-US,{page_language};q=0.9,en;q=0.8',
             'Referer': 'https://www.google.com/',
             'sec-ch-ua': '"Not A(Brand";v="99", "Google Chrome";v="121", "Chromium";v="121"',
             'sec-ch-ua-mobile': '?0',
@@ -174,13 +613,15 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
         }
         
         # First get the page to establish cookies
+        import requests
         session = requests.Session()
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        response = session.get(url, headers=headers, timeout=10)
+        url = f"{YOUTUBE_BASE_URL}/watch?v={video_id}"
+        response = throttled_request("GET", url, "render_fallback", session=session, deadline=deadline, headers=headers, timeout=10)
         
         if response.status_code != 200:
             errors.append(f"Approach 1 failed: status code {response.status_code}")
         else:
+            remember_video_metadata(video_id, response.text)
             # Try to extract transcript data from the page
             captions_regex = r'"captionTracks":\s*(\[.+?\])'
             captions_match = re.search(captions_regex, response.text)
@@ -193,6 +634,11 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
                 if not captions_data:
                     errors.append("Approach 1 failed: No caption tracks available")
                 else:
+                    if language == language_id.AUTO:
+                        language = auto_language(
+                            [(caption.get('languageCode', ''), caption.get('kind') == 'asr') for caption in captions_data],
+                            hint=(video_metadata(video_id) or {}).get('title') or "",
+                        )
                     # Find the caption track with the requested language
                     target_caption = None
                     for caption in captions_data:
@@ -217,49 +663,46 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
                             caption_url += "&fmt=json3"
                             
                             # Fetch the captions
-                            caption_response = session.get(caption_url, headers=headers, timeout=10)
+                            caption_response = throttled_request("GET", caption_url, "render_fallback", session=session, deadline=deadline, headers=headers, timeout=10, stream=True)
                             if caption_response.status_code != 200:
+                                caption_response.close()
                                 errors.append(f"Approach 1 failed: Failed to fetch captions, status code: {caption_response.status_code}")
                             else:
-                                caption_data = caption_response.json()
-                                events = caption_data.get('events', [])
-                                
-                                # Extract text from each caption event
-                                transcript_text = []
-                                for event in events:
-                                    if 'segs' in event:
-                                        for seg in event['segs']:
-                                            if 'utf8' in seg:
-                                                transcript_text.append(seg['utf8'])
+                                segments = read_json3_segments(caption_response)
                                 
-                                if not transcript_text:
+                                if not segments:
                                     errors.append("Approach 1 failed: No transcript text found in captions")
                                 else:
-                                    return " ".join(transcript_text).strip()
+                                    return segments
+    except (RateLimitedError, DeadlineExceeded):
+        # Approach 2 talks to the same host, so don't make things worse
+        raise
     except Exception as e:
         errors.append(f"Approach 1 failed with exception: {str(e)}")
     
-    # Wait between attempts
-    time.sleep(1)
+    # Wait between attempts, if the budget allows it
+    deadline.check("transcript:render_fallback")
+    time.sleep(min(1, deadline.remaining()))
     
     # Approach 2: Try to use the innertube API (YouTube's internal API)
     try:
         # This is YouTube's client for web, which should work better on Render
         headers = {
             'User-Agent': random.choice(USER_AGENTS),
-            'Accept-Language': f'{language},en-US;q=0.9,en;q=0.8',
+            'Accept-Language': f'{page_language},en-US;q=0.9,en;q=0.8',
             'Content-Type': 'application/json',
             'X-YouTube-Client-Name': '1',
             'X-YouTube-Client-Version': '2.20240227.01.00',
         }
         
         # First get the video page to extract API key
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        response = requests.get(url, headers=headers, timeout=10)
+        url = f"{YOUTUBE_BASE_URL}/watch?v={video_id}"
+        response = throttled_request("GET", url, "render_fallback", deadline=deadline, headers=headers, timeout=10)
         
         if response.status_code != 200:
             errors.append(f"Approach 2 failed: status code {response.status_code}")
         else:
+            remember_video_metadata(video_id, response.text)
             # Extract API key from page
             api_key_regex = r'"INNERTUBE_API_KEY":\s*"([^"]+)"'
             api_key_match = re.search(api_key_regex, response.text)
@@ -270,7 +713,7 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
                 api_key = api_key_match.group(1)
                 
                 # Construct the request to fetch timedtext
-                url = f"https://www.youtube.com/youtubei/v1/get_transcript?key={api_key}"
+                url = f"{YOUTUBE_BASE_URL}/youtubei/v1/get_transcript?key={api_key}"
                 payload = {
                     "context": {
                         "client": {
@@ -283,7 +726,7 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
                     }
                 }
                 
-                response = requests.post(url, headers=headers, json=payload, timeout=10)
+                response = throttled_request("POST", url, "render_fallback", deadline=deadline, headers=headers, json=payload, timeout=10)
                 
                 if response.status_code != 200:
                     errors.append(f"Approach 2 failed: Transcript API returned status code {response.status_code}")
@@ -296,18 +739,23 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
                         if not transcript_data:
                             errors.append("Approach 2 failed: Could not find transcript data in API response")
                         else:
-                            transcript_text = []
+                            segments = []
                             for segment in transcript_data:
-                                text = segment.get('transcriptSegmentRenderer', {}).get('snippet', {}).get('runs', [{}])[0].get('text', '')
+                                renderer = segment.get('transcriptSegmentRenderer', {})
+                                text = renderer.get('snippet', {}).get('runs', [{}])[0].get('text', '')
                                 if text:
-                                    transcript_text.append(text)
+                                    start_ms = int(renderer.get('startMs', 0))
+                                    end_ms = int(renderer.get('endMs', start_ms))
+                                    segments.append({"start": start_ms / 1000, "duration": (end_ms - start_ms) / 1000, "text": text})
                             
-                            if not transcript_text:
+                            if not segments:
                                 errors.append("Approach 2 failed: No transcript text found in API response")
                             else:
-                                return " ".join(transcript_text)
+                                return segments
                     except Exception as e:
                         errors.append(f"Approach 2 failed to parse response: {str(e)}")
+    except (RateLimitedError, DeadlineExceeded):
+        raise
     except Exception as e:
         errors.append(f"Approach 2 failed with exception: {str(e)}")
     
@@ -315,7 +763,39 @@ def get_transcript_render_fallback(video_id: str, language: str = 'en') -> str:
     error_message = "\n".join(errors)
     raise Exception(f"All Render-specific fallback approaches failed: {error_message}")
 
-def get_transcript(video_url_or_id: str, language: str = 'en') -> str:
+def run_strategy(strategy: str, fetch, video_id: str, language: str, deadline: Deadline) -> List[Dict[str, Any]]:
+    """
+    Run a fetch strategy within its deadline, unless its circuit breaker is open.
+
+    Raises:
+        RateLimitedError: If the circuit is open or the strategy was throttled
+        DeadlineExceeded: If the strategy ran out of time
+    """
+    import requests
+    deadline.check(f"transcript:{strategy}")
+    if not circuit_breaker.allow(strategy):
+        raise RateLimitedError(f"Circuit open for the {strategy} strategy, skipping it")
+    try:
+        with span(f"transcript:{strategy}", video_id=video_id, language=language) as record:
+            result = fetch(video_id, language, deadline)
+            characters = sum(len(segment["text"]) for segment in result)
+            record["segments"] = len(result)
+            record["characters"] = characters
+    except (RateLimitedError, DeadlineExceeded):
+        # Already counted against the circuit when the throttled response came in
+        raise
+    except requests.RequestException:
+        circuit_breaker.record_failure(strategy)
+        raise
+    except Exception:
+        # YouTube answered normally (e.g. no captions), so the strategy itself is healthy
+        circuit_breaker.record_success(strategy)
+        raise
+    circuit_breaker.record_success(strategy)
+    deadline.mark(f"transcript:{strategy}", characters=characters)
+    return result
+
+def get_transcript(video_url_or_id: str, language: str = 'en', deadline: Optional[Deadline] = None) -> str:
     """
     Get the transcript from a YouTube video URL or ID.
     Returns the full transcript text as a string.
@@ -323,13 +803,34 @@ def get_transcript(video_url_or_id: str, language: str = 'en') -> str:
     Args:
         video_url_or_id: YouTube URL or video ID
         language: Preferred language code (default: 'en')
+        deadline: Time budget; each strategy gets a share of what is left (default: no limit)
         
     Returns:
         str: Transcript text
     
     Raises:
+        The same errors as get_transcript_segments
+    """
+    return join_segments(get_transcript_segments(video_url_or_id, language, deadline))
+
+def get_transcript_segments(video_url_or_id: str, language: str = 'en', deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+    """
+    Get the timed transcript segments of a YouTube video URL or ID.
+    
+    Args:
+        video_url_or_id: YouTube URL or video ID
+        language: Preferred language code (default: 'en')
+        deadline: Time budget; each strategy gets a share of what is left (default: no limit)
+        
+    Returns:
+        List of {"start", "duration", "text"} dicts, times in seconds
+    
+    Raises:
+        RateLimitedError: If every strategy was throttled or skipped by its circuit breaker
+        DeadlineExceeded: If the budget ran out before any strategy succeeded
         Exception: If transcript cannot be retrieved with a user-friendly error message
     """
+    deadline = ensure_deadline(deadline)
     try:
         # Check if input is a URL or an ID
         video_id = video_url_or_id
@@ -341,54 +842,48 @@ def get_transcript(video_url_or_id: str, language: str = 'en') -> str:
         # Special handling for Render environment
         is_render = os.environ.get('RENDER') == 'true'
         
+        # Errors from every strategy we tried; if all of them are throttling we say so
+        strategy_errors = []
+        
+        # Split the budget evenly across the strategies still to come
+        strategies_left = 3 if is_render else 2
+        api_deadline = deadline.child(1 / strategies_left)
+        
         # Try to get transcript using main API
         try:
-            return get_transcript_from_api(video_id, language)
+            return run_strategy("api", get_transcript_from_api, video_id, language, api_deadline)
         except Exception as api_error:
             logger.warning(f"Primary API method failed: {str(api_error)}")
-            
-            # Try listing available transcripts
-            try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                available_languages = []
-                
-                logger.info("Available transcripts:")
-                
-                # List manually created transcripts
-                for transcript in transcript_list._manually_created_transcripts.values():
-                    logger.info(f" - {transcript.language_code} ({transcript.language})")
-                    available_languages.append(transcript.language_code)
-                    
-                # List generated transcripts
-                for transcript in transcript_list._generated_transcripts.values():
-                    logger.info(f" - {transcript.language_code} ({transcript.language})")
-                    available_languages.append(transcript.language_code)
-                
-                if available_languages:
-                    # If requested language is not available but others are, try to use an alternative language
-                    if language not in available_languages and available_languages:
-                        alt_language = available_languages[0]
-                        logger.info(f"Trying alternative language: {alt_language}")
-                        return get_transcript_from_api(video_id, alt_language)
-                else:
-                    logger.info("No transcripts available through primary API")
-            except Exception as list_error:
-                logger.warning(f"Failed to list transcripts: {str(list_error)}")
+            strategy_errors.append(api_error)
             
             # Try alternative method as a fallback
             logger.info("Trying alternative transcript fetching method...")
             try:
-                return get_transcript_from_alternative(video_id, language)
+                return run_strategy(
+                    "alternative", get_transcript_from_alternative, video_id, language,
+                    deadline.child(1 / (strategies_left - 1))
+                )
             except Exception as alt_error:
                 logger.error(f"Alternative method failed: {str(alt_error)}")
+                strategy_errors.append(alt_error)
                 
                 # If we're in the Render environment, try the Render-specific fallback method
                 if is_render:
                     logger.info("Using Render-specific fallback method...")
                     try:
-                        return get_transcript_render_fallback(video_id, language)
+                        return run_strategy("render_fallback", get_transcript_render_fallback, video_id, language, deadline)
                     except Exception as render_error:
                         logger.error(f"Render-specific fallback failed: {str(render_error)}")
+                        strategy_errors.append(render_error)
+                
+                # Out of time overall: report what we got through rather than a misleading error
+                deadline.check("transcript")
+                
+                # Don't hide throttling behind a "no subtitles" message: callers should back off
+                if all(isinstance(error, RateLimitedError) for error in strategy_errors):
+                    raise RateLimitedError(
+                        f"YouTube is throttling transcript requests, please try again later. Video ID: {video_id}"
+                    )
                 
                 # Create a custom error message with more detail
                 env_info = f"Environment: NODE_ENV={os.environ.get('NODE_ENV', 'not set')}, RENDER={os.environ.get('RENDER', 'not set')}"
@@ -405,7 +900,9 @@ def get_transcript(video_url_or_id: str, language: str = 'en') -> str:
                     error_message = str(api_error)
                 
                 raise Exception(error_message)
-                
+    
+    except (RateLimitedError, DeadlineExceeded):
+        raise
     except Exception as e:
         error_msg = str(e)
         # Check for known error conditions
@@ -429,17 +926,21 @@ def process_video():
     print("Select transcript language:")
     print("1. English (en)")
     print("2. Vietnamese (vi)")
+    print("3. The video's own language")
     
     while True:
-        lang_choice = input("Enter your choice (1 or 2): ").strip()
+        lang_choice = input("Enter your choice (1, 2 or 3): ").strip()
         if lang_choice == "1":
             language = "en"
             break
         elif lang_choice == "2":
             language = "vi"
             break
+        elif lang_choice == "3":
+            language = language_id.AUTO
+            break
         else:
-            print("Invalid choice. Please enter 1 or 2.")
+            print("Invalid choice. Please enter 1, 2 or 3.")
     
     # Step 2: Get the URL and process
     url = input("\nEnter YouTube URL: ").strip()
@@ -0,0 +1,349 @@
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from transcript import TimedText
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl; appends are then only safe from a single process
+    fcntl = None
+
+logger = logging.getLogger("transcript-archive")
+
+# Record: header, then the start, duration and text-offset arrays (8 bytes per
+# segment each, stored raw so readers can use them in place), then the
+# zlib-compressed UTF-8 text. Records start on 8-byte boundaries. Native byte
+# order: an archive is a local cache, not an exchange format.
+RECORD_MAGIC = b"SMTR"
+RECORD_HEADER = struct.Struct("=4sIQQd")   # magic, segments, compressed text bytes, text bytes, fetched_at
+# Index: header, then entries sorted by key. The header names the data file's
+# inode so a reader never pairs an index with a data file it doesn't describe.
+INDEX_MAGIC = b"SMTI"
+INDEX_HEADER = struct.Struct("=4s4xQQ")    # magic, data file inode, entries
+KEY_BYTES = 48
+INDEX_ENTRY = struct.Struct(f"={KEY_BYTES}sQQ")  # key, record offset, record length
+COMPRESSION_LEVEL = 6
+# Transcripts per append when importing a cache directory
+IMPORT_BATCH = 500
+
+def _key(video_id: str, language: str) -> bytes:
+    key = f"{video_id}\0{language}".encode("utf-8")
+    if len(key) > KEY_BYTES:
+        # Never the case for YouTube IDs and language codes, but keep odd input storable
+        key = hashlib.sha256(key).hexdigest()[:KEY_BYTES].encode("ascii")
+    return key.ljust(KEY_BYTES, b"\0")
+
+def _search(index, count: int, key: bytes) -> Tuple[int, bool]:
+    """
+    Binary search the sorted entries of an index buffer.
+
+    Returns:
+        The position of ``key`` (or where it would go) and whether it is there
+    """
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        pos = INDEX_HEADER.size + mid * INDEX_ENTRY.size
+        if index[pos:pos + KEY_BYTES] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    pos = INDEX_HEADER.size + lo * INDEX_ENTRY.size
+    return lo, lo < count and index[pos:pos + KEY_BYTES] == key
+
+def encode_record(segments, fetched_at: float) -> bytes:
+    timed = segments if isinstance(segments, TimedText) else TimedText(segments)
+    raw = timed.text.encode("utf-8")
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    record = b"".join((
+        RECORD_HEADER.pack(RECORD_MAGIC, len(timed), len(compressed), len(raw), fetched_at),
+        bytes(timed.starts), bytes(timed.durations), bytes(timed.offsets),
+        compressed,
+    ))
+    return record + b"\0" * (-len(record) % 8)
+
+def decode_record(buffer: memoryview, offset: int) -> Tuple[TimedText, float]:
+    """
+    Read a record in place: the timing arrays stay views into ``buffer``; only the text is decompressed.
+    """
+    magic, count, compressed_length, _, fetched_at = RECORD_HEADER.unpack_from(buffer, offset)
+    if magic != RECORD_MAGIC:
+        raise ValueError(f"No transcript record at offset {offset}")
+    pos = offset + RECORD_HEADER.size
+    arrays = []
+    for typecode in ("d", "d", "q"):
+        arrays.append(buffer[pos:pos + 8 * count].cast(typecode))
+        pos += 8 * count
+    text = zlib.decompress(buffer[pos:pos + compressed_length]).decode("utf-8")
+    return TimedText.from_arrays(text, *arrays), fetched_at
+
+class TranscriptArchive:
+    """
+    An append-only file of compressed transcripts with a sorted index, read through mmap.
+
+    Every process maps the same two files, so a large corpus sits once in the
+    page cache instead of once per worker, and a lookup is a binary search
+    over the index plus one decompression. Appends go to the end of the data
+    file and then atomically replace the index; a transcript stored twice
+    leaves its old record behind until ``compact``.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + ".index"
+        self._lock = threading.Lock()
+        self._index: Optional[mmap.mmap] = None
+        self._index_id: Optional[Tuple[int, int, int]] = None
+        self._data: Optional[memoryview] = None
+        self._data_inode = 0
+
+    def _refresh(self) -> bool:
+        """
+        Remap the index if a writer replaced it; returns whether there is one.
+        """
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._index = None
+            self._index_id = None
+            return False
+        ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if ident != self._index_id:
+            with open(self.index_path, "rb") as f:
+                self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index_id = ident
+        return True
+
+    def _data_view(self, inode: int, end: int) -> Optional[memoryview]:
+        # The data file only grows between compactions, so a mapping is kept until it is too short
+        if self._data is None or self._data_inode != inode or len(self._data) < end:
+            try:
+                with open(self.path, "rb") as f:
+                    if os.fstat(f.fileno()).st_ino != inode:
+                        # Compaction swapped the data file and the index isn't swapped yet
+                        return None
+                    self._data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                    self._data_inode = inode
+            except (OSError, ValueError):
+                return None
+            if len(self._data) < end:
+                return None
+        return self._data
+
+    def _locate(self, video_id: str, language: str) -> Optional[Tuple[memoryview, int]]:
+        with self._lock:
+            if not self._refresh():
+                return None
+            _, inode, count = INDEX_HEADER.unpack_from(self._index, 0)
+            position, found = _search(self._index, count, _key(video_id, language))
+            if not found:
+                return None
+            _, offset, length = INDEX_ENTRY.unpack_from(self._index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+            data = self._data_view(inode, offset + length)
+        return (data, offset) if data is not None else None
+
+    def get(self, video_id: str, language: str, max_age: Optional[float] = None) -> Optional[TimedText]:
+        """
+        A stored transcript, or None if it isn't stored or is older than ``max_age`` seconds.
+        """
+        located = self._locate(video_id, language)
+        if located is None:
+            return None
+        data, offset = located
+        fetched_at = RECORD_HEADER.unpack_from(data, offset)[4]
+        if max_age is not None and time.time() - fetched_at > max_age:
+            return None
+        return decode_record(data, offset)[0]
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        return self._locate(*item) is not None
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + ".lock", "a") as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self) -> Tuple[int, bytes]:
+        try:
+            with open(self.index_path, "rb") as f:
+                index = f.read()
+        except FileNotFoundError:
+            return 0, b""
+        _, _, count = INDEX_HEADER.unpack_from(index, 0)
+        return count, index[INDEX_HEADER.size:]
+
+    def _write_index(self, inode: int, count: int, entries: bytes) -> None:
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".index")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, inode, count))
+                f.write(entries)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def append(self, video_id: str, language: str, segments, fetched_at: Optional[float] = None) -> None:
+        """
+        Store a transcript, replacing any earlier one for the same video and language.
+        """
+        self.append_many([(video_id, language, segments, fetched_at)])
+
+    def append_many(self, transcripts: Iterable[Tuple[str, str, Any, Optional[float]]]) -> int:
+        """
+        Store (video_id, language, segments, fetched_at) transcripts with one
+        sync and one index rewrite for the whole batch.
+
+        Returns:
+            The number of transcripts stored
+        """
+        now = time.time()
+        with self._write_lock():
+            added: Dict[bytes, bytes] = {}
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                for video_id, language, segments, fetched_at in transcripts:
+                    record = encode_record(segments, fetched_at if fetched_at is not None else now)
+                    padding = -offset % 8
+                    f.write(b"\0" * padding)
+                    f.write(record)
+                    key = _key(video_id, language)
+                    added[key] = INDEX_ENTRY.pack(key, offset + padding, len(record))
+                    offset += padding + len(record)
+                f.flush()
+                # The records must be on disk before an index points at them
+                os.fsync(f.fileno())
+                inode = os.fstat(f.fileno()).st_ino
+            if not added:
+                return 0
+
+            # Merge the new entries into the sorted index; a new entry wins over an old one
+            count, entries = self._read_index()
+            merged = {entries[i:i + KEY_BYTES]: entries[i:i + INDEX_ENTRY.size]
+                      for i in range(0, count * INDEX_ENTRY.size, INDEX_ENTRY.size)}
+            merged.update(added)
+            self._write_index(inode, len(merged), b"".join(merged[key] for key in sorted(merged)))
+            return len(added)
+
+    def _entries(self) -> List[Tuple[bytes, int, int]]:
+        count, entries = self._read_index()
+        return [INDEX_ENTRY.unpack_from(entries, i * INDEX_ENTRY.size) for i in range(count)]
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        live = sum(length for _, _, length in entries)
+        return {"transcripts": len(entries), "file_bytes": size, "live_bytes": live, "dead_bytes": max(0, size - live)}
+
+    def compact(self) -> int:
+        """
+        Rewrite the archive without replaced records.
+
+        Returns:
+            The number of bytes reclaimed
+        """
+        with self._write_lock():
+            before = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            entries = self._entries()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".archive")
+            try:
+                new_entries = []
+                with open(self.path, "rb") as old, os.fdopen(fd, "wb") as new:
+                    for key, offset, length in entries:
+                        old.seek(offset)
+                        new_entries.append(INDEX_ENTRY.pack(key, new.tell(), length))
+                        new.write(old.read(length))
+                    new.flush()
+                    os.fsync(new.fileno())
+                    inode = os.fstat(new.fileno()).st_ino
+                # Data first: until the index is swapped too, readers see the
+                # inode mismatch and treat lookups as misses
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._write_index(inode, len(new_entries), b"".join(new_entries))
+            return before - os.path.getsize(self.path)
+
+_archives: Dict[str, TranscriptArchive] = {}
+
+def get_archive(path: str) -> TranscriptArchive:
+    """
+    The process-wide archive object for a path, so its mappings are shared by all callers.
+    """
+    if path not in _archives:
+        _archives[path] = TranscriptArchive(path)
+    return _archives[path]
+
+def import_cache(archive: TranscriptArchive, cache_dir: str) -> int:
+    """
+    Move the per-video JSON transcripts of a cache directory into the archive.
+
+    Returns:
+        The number of transcripts imported
+    """
+    paths = [os.path.join(cache_dir, name) for name in sorted(os.listdir(cache_dir)) if name.endswith(".segments.json")]
+    imported = 0
+    for start in range(0, len(paths), IMPORT_BATCH):
+        batch, done = [], []
+        for path in paths[start:start + IMPORT_BATCH]:
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                batch.append((data["video_id"], data["language"], data["segments"], data.get("fetched_at")))
+                done.append(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping {os.path.basename(path)}: {str(e)}")
+        imported += archive.append_many(batch)
+        for path in done:
+            os.remove(path)
+    return imported
+
+def main():
+    """
+    Inspect or maintain an archive: stats, compact, import <cache_dir>, get <video_id> [language].
+    """
+    if len(sys.argv) < 3 or sys.argv[2] not in ("stats", "compact", "import", "get"):
+        print("Usage: python transcript_archive.py <archive> stats|compact|import <cache_dir>|get <video_id> [language]")
+        sys.exit(1)
+    archive = get_archive(sys.argv[1])
+    command = sys.argv[2]
+    if command == "stats":
+        print(json.dumps(archive.stats(), indent=2))
+    elif command == "compact":
+        print(f"Reclaimed {archive.compact()} bytes")
+    elif command == "import":
+        print(f"Imported {import_cache(archive, sys.argv[3])} transcripts")
+    else:
+        segments = archive.get(sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else "en")
+        if segments is None:
+            print("Not in the archive")
+            sys.exit(1)
+        print(json.dumps(list(segments), indent=2))
+
+if __name__ == "__main__":
+    main()
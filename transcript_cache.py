@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from io import StringIO
+from typing import Dict, Any, Callable, List, Optional, TextIO
+from deadline import Deadline
+from instrumentation import span
+import transcript
+import transcript_archive
+import cache_tier
+import llm_backend
+
+logger = logging.getLogger("transcript-cache")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmp", "transcripts")
+# Captions rarely change once published; a week keeps edits from lingering forever
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+def cache_dir() -> str:
+    """
+    The cache directory (TRANSCRIPT_CACHE_DIR); an empty value turns caching off.
+    """
+    return os.environ.get("TRANSCRIPT_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+def archive_path() -> str:
+    """
+    A transcript archive (TRANSCRIPT_ARCHIVE) to keep transcripts in instead of
+    one JSON file per video; unset by default.
+    """
+    return os.environ.get("TRANSCRIPT_ARCHIVE", "")
+
+def cache_ttl() -> float:
+    return float(os.environ.get("TRANSCRIPT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+def _safe_name(name: str) -> str:
+    # Video IDs come from user input, so keep them from escaping the cache directory
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name)
+
+def cache_path(video_id: str, language: str, kind: str = "segments") -> str:
+    """
+    Where a cached artifact of a video lives, e.g. tmp/transcripts/<id>.en.segments.json.
+    """
+    return os.path.join(cache_dir(), f"{_safe_name(video_id)}.{_safe_name(language)}.{kind}.json")
+
+def metadata_path(video_id: str) -> str:
+    """
+    Where a video's metadata lives; unlike its transcripts it has no language.
+    """
+    return os.path.join(cache_dir(), f"{_safe_name(video_id)}.metadata.json")
+
+def chunk_summary_path(key: str) -> str:
+    """
+    Where the cached notes of one transcript chunk live, keyed by a hash of their prompt.
+    """
+    return os.path.join(cache_dir(), "chunks", f"{key}.json")
+
+def result_path(kind: str, key: str) -> str:
+    """
+    Where a finished response (a summary, quiz or flashcard set) lives, keyed by a hash of what produced it.
+    """
+    return os.path.join(cache_dir(), "results", kind, f"{key}.json")
+
+def result_cache_key(kind: str, *parts: Any) -> str:
+    """
+    Key of a cached response: the LLM backend plus the request's own inputs.
+
+    Callers that know the model before looking up pass it as one of ``parts``;
+    the others record the model that answered in the cached entry.
+    """
+    backend = llm_backend.get_backend().name
+    data = json.dumps([backend] + list(parts), sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def _tier_key(path: str) -> Optional[str]:
+    # Files in the cache directory are shared between tiers under their relative path
+    root = cache_dir()
+    if not root:
+        return None
+    key = os.path.relpath(path, root)
+    return None if key.startswith("..") else key.replace(os.sep, "/")
+
+def _publish(key: str, value: Callable[[], bytes], skip_disk: bool = True) -> None:
+    """
+    Pass a value just written to disk on to the other tiers: the shared tier gets
+    it (in the background), and a stale copy in memory is replaced.
+    """
+    cache = cache_tier.get_cache(cache_dir())
+    if cache.shared:
+        cache.set(key, value(), skip_disk=skip_disk)
+    else:
+        cache.forget(key)
+
+def write_atomic(path: str, write: Callable[[TextIO], None]) -> None:
+    """
+    Write a file through ``write(f)`` so that concurrent readers never see it half-written.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    key = _tier_key(path)
+    if key is not None:
+        def value() -> bytes:
+            with open(path, "rb") as f:
+                return f.read()
+        _publish(key, value)
+
+def write_json_atomic(path: str, data: Any) -> None:
+    write_atomic(path, lambda f: json.dump(data, f))
+
+def read_json(path: str, ttl: Optional[float] = None) -> Optional[Any]:
+    """
+    Read a cached JSON file, or None if it is missing, unreadable or older than ``ttl`` seconds.
+
+    Files in the cache directory are looked up in memory first and, when not
+    on disk, on the shared cache server (SUMMIFY_CACHE_SERVER).
+    """
+    key = _tier_key(path)
+    if key is not None:
+        try:
+            raw = cache_tier.get_cache(cache_dir()).get(key, ttl)
+            return json.loads(raw) if raw is not None else None
+        except ValueError:
+            return None
+    try:
+        if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_segments(video_id: str, language: str) -> Optional[List[Dict[str, Any]]]:
+    if not cache_dir():
+        return None
+    if archive_path():
+        try:
+            segments = transcript_archive.get_archive(archive_path()).get(video_id, language, cache_ttl())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read {video_id} from the transcript archive: {str(e)}")
+            segments = None
+        if segments is None:
+            # Another machine may have fetched it; the shared tier holds the JSON form
+            cache = cache_tier.get_cache(cache_dir())
+            raw = cache.get(_tier_key(cache_path(video_id, language)), cache_ttl()) if cache.shared else None
+            if raw is not None:
+                try:
+                    data = json.loads(raw)
+                    segments = data["segments"]
+                    transcript_archive.get_archive(archive_path()).append(
+                        video_id, language, segments, data.get("fetched_at"))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Failed to archive shared transcript for {video_id}: {str(e)}")
+        return segments
+    data = read_json(cache_path(video_id, language), cache_ttl())
+    return data.get("segments") if data else None
+
+def save_segments(video_id: str, language: str, segments: List[Dict[str, Any]]) -> None:
+    if not cache_dir():
+        return
+    header = json.dumps({"video_id": video_id, "language": language, "fetched_at": time.time()})
+    def write(f: TextIO) -> None:
+        # One segment at a time, so a TimedText never has to become a list of dicts
+        f.write(header[:-1] + ', "segments": [')
+        for i, segment in enumerate(segments):
+            f.write(", " if i else "")
+            f.write(json.dumps(segment))
+        f.write("]}")
+    if archive_path():
+        try:
+            transcript_archive.get_archive(archive_path()).append(video_id, language, segments)
+        except OSError as e:
+            logger.warning(f"Failed to archive transcript for {video_id}: {str(e)}")
+        def value() -> bytes:
+            buffer = StringIO()
+            write(buffer)
+            return buffer.getvalue().encode("utf-8")
+        _publish(_tier_key(cache_path(video_id, language)), value)
+        return
+    try:
+        write_atomic(cache_path(video_id, language), write)
+    except OSError as e:
+        logger.warning(f"Failed to cache transcript for {video_id}: {str(e)}")
+
+def load_result(kind: str, key: str) -> Optional[Dict[str, Any]]:
+    if not cache_dir():
+        return None
+    return read_json(result_path(kind, key), cache_ttl())
+
+def store_result(kind: str, key: str, output: Dict[str, Any]) -> None:
+    """
+    Cache a successful response so the same request is answered without fetching or calling the LLM.
+    """
+    if not cache_dir():
+        return
+    try:
+        write_json_atomic(result_path(kind, key), output)
+    except OSError as e:
+        logger.warning(f"Failed to cache {kind} response: {str(e)}")
+
+def get_video_metadata(video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Title, channel, duration and caption languages of a video, from the watch
+    page fetched for its transcript or from the cache. Never fetches anything.
+    """
+    metadata = transcript.video_metadata(video_id)
+    if metadata is None and cache_dir():
+        metadata = read_json(metadata_path(video_id), cache_ttl())
+    return metadata
+
+def store_segments(video_id: str, language: str, segments: List[Dict[str, Any]]) -> None:
+    """
+    Cache freshly fetched segments (and the video's metadata, if the fetch saw
+    it) and index them for question answering.
+    """
+    if not cache_dir():
+        return
+    save_segments(video_id, language, segments)
+    metadata = transcript.video_metadata(video_id)
+    if metadata is not None:
+        try:
+            write_json_atomic(metadata_path(video_id), metadata)
+        except OSError as e:
+            logger.warning(f"Failed to cache metadata for {video_id}: {str(e)}")
+    # Indexing now keeps it off the first question's critical path.
+    # qa_index stores its files through this module, hence the late import
+    import qa_index
+    qa_index.build_and_save(video_id, language, segments)
+
+def get_transcript_segments(video_id: str, language: str = "en", deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+    """
+    Timed transcript segments, from the cache when possible and from YouTube otherwise.
+
+    Freshly fetched transcripts are cached and indexed for question answering.
+    """
+    with span("transcript:cache", video_id=video_id, language=language) as record:
+        segments = load_segments(video_id, language)
+        record["hit"] = segments is not None
+    if segments is not None:
+        logger.info(f"Using cached transcript for {video_id} ({language})")
+        return segments
+
+    segments = transcript.get_transcript_segments(video_id, language, deadline)
+    store_segments(video_id, language, segments)
+    return segments